@@ -64,4 +64,5 @@ setup(
             "beautifulsoup4",
         ]
     ),
+    extras_require={"arrow": ["pyarrow>=14.0.1"]},
 )
@@ -675,6 +675,39 @@ class Sketch(resource.BaseResource):
             return_list.append(graph_obj)
         return return_list
 
+    def get_progress_events(self, since="", wait=25):
+        """Returns status transitions of timelines and analyzers.
+
+        Call this first without "since" to get the ID of the latest event,
+        then fetch the current state and pass the returned "last_event_id"
+        to the following calls to only receive the changes.
+
+        Args:
+            since (str): optional ID of the last event that was seen.
+            wait (int): number of seconds to wait for new events if there are
+                none yet. Defaults to 25.
+
+        Returns:
+            A dict with a list of "events", the "last_event_id" to pass as
+            "since" in the next call, a "reset" flag that is set if events were
+            missed and the full state should be fetched again, and an
+            "enabled" flag that is False if the server does not publish
+            progress events, in which case the state has to be polled.
+        """
+        resource_uri = f"{self.api.api_root}/sketches/{self.id}/progress/"
+        params = {"wait": wait}
+        if since:
+            params["since"] = since
+        response = self.api.session.get(resource_uri, params=params)
+        response_json = error.get_response_json(response, logger)
+        meta = response_json.get("meta", {})
+        return {
+            "events": response_json.get("objects", []),
+            "last_event_id": meta.get("last_event_id", since),
+            "reset": meta.get("reset", False),
+            "enabled": meta.get("enabled", False),
+        }
+
     def get_analyzer_status(self, as_sessions=False):
         """Returns a list of started analyzers and their status.
 
@@ -1980,12 +2013,18 @@ class Sketch(resource.BaseResource):
         self._archived = not return_status
         return return_status
 
-    def export(self, file_path, stream=False):
+    def export(self, file_path, stream=False, poll_interval=5):
         """Exports the content of the sketch to a ZIP file.
 
+        The export runs as a job on the server. The job is polled until the
+        ZIP file is ready, which is then downloaded. An interrupted download
+        is resumed where it stopped. Servers that don't run exports as jobs
+        return the ZIP file directly.
+
         Args:
             file_path (str): a file path where the ZIP file will be saved.
             stream (bool): whether to stream the download.
+            poll_interval (int): number of seconds between polls of the job.
 
         Raises:
             RuntimeError: if sketch cannot be exported.
@@ -2013,7 +2052,7 @@ class Sketch(resource.BaseResource):
         if os.path.isfile(file_path):
             raise RuntimeError(f"File [{file_path}] already exists.")
 
-        form_data = {"action": "export"}
+        form_data = {"action": "export", "run_async": True}
         resource_url = "{0:s}/sketches/{1:d}/archive/".format(
             self.api.api_root, self.id
         )
@@ -2027,33 +2066,117 @@ class Sketch(resource.BaseResource):
                 error=RuntimeError,
             )
 
-        with open(file_path, "wb") as fw:
-            if stream:
-                for chunk in response.iter_content(chunk_size=1024 * 1024):
-                    if chunk:
-                        fw.write(chunk)
-            else:
-                fw.write(response.content)
+        if "application/json" not in response.headers.get("Content-Type", ""):
+            with open(file_path, "wb") as fw:
+                if stream:
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        if chunk:
+                            fw.write(chunk)
+                else:
+                    fw.write(response.content)
+            return
 
-    def export_events_stream(
+        job_id = response.json().get("meta", {}).get("job_id")
+        if not job_id:
+            raise RuntimeError("Failed exporting the sketch, no job ID returned.")
+
+        export_url = "{0:s}/sketches/{1:d}/archive/export/?job_id={2:s}".format(
+            self.api.api_root, self.id, job_id
+        )
+        self._download_export(export_url, file_path, poll_interval)
+
+    def _download_export(self, export_url, file_path, poll_interval):
+        """Polls a sketch export job and downloads the ZIP file.
+
+        Args:
+            export_url (str): URL of the export job.
+            file_path (str): a file path where the ZIP file will be saved.
+            poll_interval (int): number of seconds between polls of the job.
+
+        Raises:
+            RuntimeError: if the export job fails or the download can't be
+                completed.
+        """
+        attempt = 0
+        while True:
+            headers = {}
+            if os.path.isfile(file_path):
+                headers["Range"] = f"bytes={os.path.getsize(file_path):d}-"
+
+            try:
+                response = self.api.session.get(
+                    export_url, headers=headers, stream=True
+                )
+                if response.status_code == 416:
+                    # The file was already downloaded completely.
+                    return
+                # A partial content response continues the previous download.
+                if response.status_code != 206 and not error.check_return_status(
+                    response, logger
+                ):
+                    error.error_message(
+                        response,
+                        message="Failed exporting the sketch",
+                        error=RuntimeError,
+                    )
+
+                if "application/json" in response.headers.get("Content-Type", ""):
+                    meta = response.json().get("meta", {})
+                    logger.debug(
+                        "Export job is in state %s, step: %s",
+                        meta.get("job_state"),
+                        meta.get("step", "-"),
+                    )
+                    time.sleep(poll_interval)
+                    continue
+
+                # Start over if the server does not support the range.
+                mode = "ab" if response.status_code == 206 else "wb"
+                with open(file_path, mode) as fw:
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        if chunk:
+                            fw.write(chunk)
+                return
+
+            except RequestException as e:
+                attempt += 1
+                if attempt >= self.api.DEFAULT_RETRY_COUNT:
+                    raise RuntimeError(
+                        f"Unable to download the sketch export: {e!s}"
+                    ) from e
+                backoff_time = 0.5 * (2**attempt)
+                logger.warning(
+                    "[%d/%d] Download of the sketch export interrupted: %s. "
+                    "Resuming in %.1fs.",
+                    attempt,
+                    self.api.DEFAULT_RETRY_COUNT,
+                    e,
+                    backoff_time,
+                )
+                time.sleep(backoff_time)
+
+    def _post_export_stream(
         self,
         query_string: Optional[str] = None,
         query_dsl: Optional[str] = None,
         query_filter: Optional[Dict] = None,
         return_fields: Optional[List[str]] = None,
-    ) -> Generator[Dict, None, None]:
-        """Exports all events from the sketch matching the query.
-
-        This uses the high-performance sliced export API endpoint.
+        format: Optional[str] = None,  # pylint: disable=redefined-builtin
+    ):
+        """Starts an export of the events matching the query.
 
         Args:
             query_string (str): OpenSearch query string.
             query_dsl (str): OpenSearch query DSL as JSON string.
             query_filter (dict): Filter for the query as a dict.
             return_fields (list): List of strings with fields to return.
+            format (str): Optional export format, JSONL if not set.
 
-        Yields:
-            dict: A dictionary representing an event.
+        Returns:
+            The streamed response (instance of requests.Response).
+
+        Raises:
+            RuntimeError: If the export fails.
         """
         if return_fields is None:
             return_fields = ["datetime", "message", "timestamp_desc"]
@@ -2072,6 +2195,8 @@ class Sketch(resource.BaseResource):
             "dsl": query_dsl,
             "fields": return_fields,
         }
+        if format:
+            form_data["format"] = format
 
         response = self.api.session.post(resource_url, json=form_data, stream=True)
 
@@ -2079,6 +2204,34 @@ class Sketch(resource.BaseResource):
             error.error_message(
                 response, message="Unable to export events", error=RuntimeError
             )
+        return response
+
+    def export_events_stream(
+        self,
+        query_string: Optional[str] = None,
+        query_dsl: Optional[str] = None,
+        query_filter: Optional[Dict] = None,
+        return_fields: Optional[List[str]] = None,
+    ) -> Generator[Dict, None, None]:
+        """Exports all events from the sketch matching the query.
+
+        This uses the high-performance sliced export API endpoint.
+
+        Args:
+            query_string (str): OpenSearch query string.
+            query_dsl (str): OpenSearch query DSL as JSON string.
+            query_filter (dict): Filter for the query as a dict.
+            return_fields (list): List of strings with fields to return.
+
+        Yields:
+            dict: A dictionary representing an event.
+        """
+        response = self._post_export_stream(
+            query_string=query_string,
+            query_dsl=query_dsl,
+            query_filter=query_filter,
+            return_fields=return_fields,
+        )
 
         for line in response.iter_lines():
             if line:
@@ -2088,6 +2241,64 @@ class Sketch(resource.BaseResource):
                     logger.warning("Received invalid JSON line during export")
                     continue
 
+    def export_events_columnar(
+        self,
+        query_string: Optional[str] = None,
+        query_dsl: Optional[str] = None,
+        query_filter: Optional[Dict] = None,
+        return_fields: Optional[List[str]] = None,
+        format: str = "arrow",  # pylint: disable=redefined-builtin
+    ) -> pandas.DataFrame:
+        """Exports all events from the sketch matching the query as a DataFrame.
+
+        This uses the sliced export API endpoint with a columnar format. The
+        events are converted to a DataFrame backed by the Arrow data, without
+        copying it. Requires pyarrow, which is installed with the "arrow"
+        extra of the API client.
+
+        Args:
+            query_string (str): OpenSearch query string.
+            query_dsl (str): OpenSearch query DSL as JSON string.
+            query_filter (dict): Filter for the query as a dict.
+            return_fields (list): List of strings with fields to return.
+            format (str): Export format, either "arrow" (default) for the
+                Arrow IPC stream format or "parquet".
+
+        Returns:
+            A pandas DataFrame with the events.
+
+        Raises:
+            ValueError: If the format is not supported.
+            ImportError: If pyarrow is not installed.
+            RuntimeError: If the export fails.
+        """
+        if format not in ("arrow", "parquet"):
+            raise ValueError(f"Unsupported columnar export format: {format}")
+
+        try:
+            import pyarrow  # pylint: disable=import-outside-toplevel
+        except ImportError as e:
+            raise ImportError(
+                f"Exporting events in the {format} format requires pyarrow."
+            ) from e
+
+        response = self._post_export_stream(
+            query_string=query_string,
+            query_dsl=query_dsl,
+            query_filter=query_filter,
+            return_fields=return_fields,
+            format=format,
+        )
+
+        if format == "arrow":
+            response.raw.decode_content = True
+            table = pyarrow.ipc.open_stream(response.raw).read_all()
+        else:
+            from pyarrow import parquet  # pylint: disable=import-outside-toplevel
+
+            table = parquet.read_table(pyarrow.BufferReader(response.content))
+        return table.to_pandas(types_mapper=pandas.ArrowDtype)
+
     def create_timeline(self, searchindex_id: int, timeline_name: str):
         """Creates a Timeline in this Sketch
 
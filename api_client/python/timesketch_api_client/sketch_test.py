@@ -15,8 +15,13 @@
 
 from __future__ import unicode_literals
 
+import os
+import tempfile
+import types
 import unittest
+
 import mock
+import requests
 
 from . import client
 from . import search
@@ -231,6 +236,24 @@ class SketchTest(unittest.TestCase):
                 generator = self.sketch.export_events_stream()
                 list(generator)
 
+    def test_export_events_columnar_invalid_format(self):
+        """Test export_events_columnar rejects unsupported formats."""
+        with mock.patch.object(self.api_client.session, "post") as mock_post:
+            with self.assertRaises(ValueError):
+                self.sketch.export_events_columnar(format="jsonl")
+            mock_post.assert_not_called()
+
+    def test_export_events_stream_is_generator(self):
+        """Test export_events_stream only sends the request when iterated."""
+        with mock.patch.object(self.api_client.session, "post") as mock_post:
+            mock_post.return_value.status_code = 200
+            mock_post.return_value.iter_lines.return_value = [b'{"message": "a"}']
+            generator = self.sketch.export_events_stream()
+            self.assertIsInstance(generator, types.GeneratorType)
+            mock_post.assert_not_called()
+            self.assertEqual(list(generator), [{"message": "a"}])
+            self.assertNotIn("format", mock_post.call_args.kwargs["json"])
+
     def test_explore_wildcard(self):
         """Test explore_wildcard method."""
         mock_response = mock.Mock()
@@ -267,3 +290,49 @@ class SketchTest(unittest.TestCase):
             mock_post.assert_called_once()
             call_args = mock_post.call_args
             self.assertEqual(call_args.kwargs["json"]["filter"]["size"], 0)
+
+    def test_export_job(self):
+        """Test that export polls the job and resumes the download."""
+        post_response = mock.Mock()
+        post_response.status_code = 200
+        post_response.headers = {"Content-Type": "application/json"}
+        post_response.json.return_value = {"meta": {"job_id": "1234"}}
+
+        pending_response = mock.Mock()
+        pending_response.status_code = 200
+        pending_response.headers = {"Content-Type": "application/json"}
+        pending_response.json.return_value = {"meta": {"job_state": "PROGRESS"}}
+
+        def _broken_download(**_):
+            yield b"PK"
+            raise requests.exceptions.ConnectionError("connection reset")
+
+        first_response = mock.Mock()
+        first_response.status_code = 200
+        first_response.headers = {"Content-Type": "application/zip"}
+        first_response.iter_content.side_effect = _broken_download
+
+        resumed_response = mock.Mock()
+        resumed_response.status_code = 206
+        resumed_response.headers = {"Content-Type": "application/zip"}
+        resumed_response.iter_content.return_value = [b"zip"]
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, "export.zip")
+            with mock.patch.object(
+                self.api_client.session, "post", return_value=post_response
+            ) as mock_post, mock.patch.object(
+                self.api_client.session,
+                "get",
+                side_effect=[pending_response, first_response, resumed_response],
+            ) as mock_get, mock.patch(
+                "time.sleep"
+            ):
+                self.sketch.export(file_path)
+
+            with open(file_path, "rb") as fh:
+                self.assertEqual(fh.read(), b"PKzip")
+
+        self.assertTrue(mock_post.call_args.kwargs["json"]["run_async"])
+        self.assertIn("archive/export/?job_id=1234", mock_get.call_args.args[0])
+        self.assertEqual(mock_get.call_args.kwargs["headers"], {"Range": "bytes=2-"})
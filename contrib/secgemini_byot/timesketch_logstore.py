@@ -15,8 +15,11 @@
 
 import asyncio
 import datetime
+import json
 import logging
 import math
+import threading
+import time
 from typing import Any, Iterable, Optional
 
 # pylint: disable=import-error
@@ -32,6 +35,17 @@ logger = logging.getLogger("timesketch.byot.logstore")
 
 EPOCH_START = datetime.datetime(1970, 1, 1, 0, 0, 0, tzinfo=datetime.timezone.utc)
 
+# Maximum number of data types described, and samples shown per data type.
+MAX_DATA_TYPES = 1000
+SAMPLES_PER_DATA_TYPE = 5
+SAMPLE_FIELDS = ["datetime", "message", "timestamp_desc", "tag", "yara_match"]
+
+# Number of seconds log descriptions of a sketch are cached.
+DESCRIPTION_CACHE_TTL = 600
+
+_DESCRIPTION_CACHE = {}
+_DESCRIPTION_CACHE_LOCK = threading.Lock()
+
 
 def _safe_str(val: Any, default: str = "") -> str:
     """Safely converts a value to a string, handling pandas NaN and None."""
@@ -100,6 +114,113 @@ def _parse_datetime(val) -> datetime.datetime:
         return EPOCH_START
 
 
+def _merge_enrichment(tags_val: Any, yara_val: Any) -> Optional[str]:
+    """Returns the tags and YARA matches of an event as a single string."""
+    merged = set()
+    for val in (tags_val, yara_val):
+        if isinstance(val, list):
+            values = val
+        elif val:
+            values = [val]
+        else:
+            values = []
+        merged.update(str(t) for t in values if t and str(t).lower() != "n/a")
+    return ", ".join(sorted(merged)) if merged else None
+
+
+def _timeline_ids(sketch) -> list:
+    """Returns the IDs of all timelines in a sketch."""
+    objects = sketch.lazyload_data().get("objects") or [{}]
+    return sorted(t["id"] for t in objects[0].get("timelines", []) if "id" in t)
+
+
+def _description_cache_key(sketch) -> tuple:
+    """Returns the description cache key of a sketch.
+
+    The key changes when a timeline is added, removed or updated, e.g. when
+    more events are imported into it.
+    """
+    objects = sketch.lazyload_data().get("objects") or [{}]
+    timelines = tuple(
+        sorted(
+            (t.get("id"), str(t.get("updated_at")), str(t.get("status")))
+            for t in objects[0].get("timelines", [])
+        )
+    )
+    return (sketch.id, timelines)
+
+
+def _get_cached_descriptions(key: tuple) -> Optional[ls.LogDescriptions]:
+    """Returns cached log descriptions, or None if there are none."""
+    with _DESCRIPTION_CACHE_LOCK:
+        entry = _DESCRIPTION_CACHE.get(key)
+        if not entry:
+            return None
+        created, descriptions = entry
+        if created + DESCRIPTION_CACHE_TTL < time.time():
+            del _DESCRIPTION_CACHE[key]
+            return None
+        return descriptions
+
+
+def _set_cached_descriptions(key: tuple, descriptions: ls.LogDescriptions):
+    """Caches log descriptions, replacing older entries of the same sketch."""
+    with _DESCRIPTION_CACHE_LOCK:
+        for old_key in [k for k in _DESCRIPTION_CACHE if k[0] == key[0]]:
+            del _DESCRIPTION_CACHE[old_key]
+        _DESCRIPTION_CACHE[key] = (time.time(), descriptions)
+
+
+def _build_description_dsl(timeline_ids: list) -> dict:
+    """Returns the aggregation DSL that describes all data types of a sketch.
+
+    Args:
+        timeline_ids: IDs of the timelines to describe.
+
+    Returns:
+        A dictionary with the aggregation DSL.
+    """
+    dsl = {
+        "aggs": {
+            "data_types": {
+                "terms": {"field": "data_type.keyword", "size": MAX_DATA_TYPES},
+                "aggs": {
+                    "samples": {
+                        "top_hits": {
+                            "size": SAMPLES_PER_DATA_TYPE,
+                            "sort": [{"datetime": {"order": "desc"}}],
+                            "_source": {"includes": SAMPLE_FIELDS},
+                        }
+                    },
+                    "per_day": {
+                        "date_histogram": {
+                            "field": "datetime",
+                            "calendar_interval": "day",
+                            "format": "yyyy-MM-dd",
+                            "min_doc_count": 1,
+                        }
+                    },
+                },
+            }
+        }
+    }
+    if timeline_ids:
+        dsl["query"] = {
+            "bool": {"filter": [{"terms": {"__ts_timeline_id": timeline_ids}}]}
+        }
+    return dsl
+
+
+def _get_data_type_buckets(resource_data: Any) -> list:
+    """Returns the data type buckets from an aggregation response."""
+    if not isinstance(resource_data, dict):
+        return []
+    for entry in resource_data.get("objects", []):
+        if isinstance(entry, dict) and isinstance(entry.get("data_types"), dict):
+            return entry["data_types"].get("buckets", [])
+    return []
+
+
 class TimesketchLogStore(ls.LogStore):
     """Adapter implementing the Arcadia LogStore format backed by Timesketch API."""
 
@@ -128,180 +249,72 @@ class TimesketchLogStore(ls.LogStore):
                 error_messages=[f"Failed to get sketch {self.sketch_id}: {str(e)}"],
             )
 
-        # Discover unique data types using run_aggregator
+        # Samples and the daily histogram of all data types are computed in a
+        # single aggregation request.
         try:
-            type_res = sketch.run_aggregator(
-                aggregator_name="field_bucket",
-                aggregator_parameters={"field": "data_type", "limit": 1000},
+            cache_key = _description_cache_key(sketch)
+            cached = _get_cached_descriptions(cache_key)
+            if cached is not None:
+                logger.info("[%d] Using cached log descriptions.", self.sketch_id)
+                return cached
+
+            aggregation_obj = sketch.aggregate(
+                json.dumps(_build_description_dsl(_timeline_ids(sketch)))
             )
-            objects = type_res.data.get("objects")
-            buckets = []
-            if objects and isinstance(objects, list) and isinstance(objects[0], dict):
-                field_bucket = objects[0].get("field_bucket")
-                if isinstance(field_bucket, dict):
-                    buckets = field_bucket.get("buckets", [])
+            buckets = _get_data_type_buckets(aggregation_obj.resource_data)
         except Exception as e:  # pylint: disable=broad-exception-caught
-            logger.exception("Failed to discover unique log types")
+            logger.exception("Failed to describe log types")
             return ls.LogDescriptions(
                 status=ls.ResultStatus.ERROR,
                 descriptions=[],
-                error_messages=[f"Failed to discover unique log types: {str(e)}"],
+                error_messages=[f"Failed to describe log types: {str(e)}"],
             )
 
         descriptions = []
-        for b in buckets:
-            dt = b["data_type"]
-
-            # Query for the earliest event (min time) for this data type
-            min_search = search.Search(sketch=sketch)
-            min_search.query_string = f'data_type:"{dt}"'
-            min_search.max_entries = 1
-            min_search.return_fields = "datetime"
-            min_search.order_ascending()
-            min_df = min_search.table
-
-            start_str = "1970-01-01T00:00:00Z"
-            if not min_df.empty:
-                min_val = min_df.iloc[0].get("datetime")
-                if min_val:
-                    min_time = _parse_datetime(min_val)
-                    min_bounded = (min_time - datetime.timedelta(days=1)).replace(
-                        hour=0, minute=0, second=0, microsecond=0
-                    )
-                    start_str = min_bounded.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-            # Query for the latest event (max time) for this data type
-            max_search = search.Search(sketch=sketch)
-            max_search.query_string = f'data_type:"{dt}"'
-            max_search.max_entries = 1
-            max_search.return_fields = "datetime"
-            max_search.order_descending()
-            max_df = max_search.table
-
-            end_str = "2099-01-01T00:00:00Z"
-            if not max_df.empty:
-                max_val = max_df.iloc[0].get("datetime")
-                if max_val:
-                    max_time = _parse_datetime(max_val)
-                    max_bounded = (max_time + datetime.timedelta(days=1)).replace(
-                        hour=0, minute=0, second=0, microsecond=0
-                    )
-                    end_str = max_bounded.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-            search_obj = search.Search(sketch=sketch)
-            search_obj.query_string = f'data_type:"{dt}"'
-            search_obj.max_entries = 5
-            search_obj.return_fields = (
-                "datetime,message,_id,timestamp_desc,tag,yara_match"
-            )
-            search_obj.order_descending()
-            results_df = search_obj.table
+        for bucket in buckets:
+            dt = bucket.get("key")
+            if not dt:
+                continue
 
             examples = []
-            for _, row in results_df.iterrows():
-                msg = row.get("message", "")
-                tags_val = row.get("tag", [])
-                if isinstance(tags_val, list):
-                    tags_list = tags_val
-                elif tags_val:
-                    tags_list = [tags_val]
-                else:
-                    tags_list = []
-
-                yara_val = row.get("yara_match", [])
-                if isinstance(yara_val, list):
-                    yara_list = yara_val
-                elif yara_val:
-                    yara_list = [yara_val]
-                else:
-                    yara_list = []
-
-                merged_tags = sorted(
-                    list(
-                        set(
-                            str(t)
-                            for t in tags_list + yara_list
-                            if t and str(t).lower() != "n/a"
-                        )
-                    )
-                )
-                enrich = ", ".join(merged_tags) if merged_tags else None
-
+            for hit in bucket.get("samples", {}).get("hits", {}).get("hits", []):
+                source = hit.get("_source", {})
                 examples.append(
                     ls.LogRecordResult(
-                        record_id=str(row.get("_id", "")),
+                        record_id=str(hit.get("_id", "")),
                         log_type=dt,
-                        timestamp=_parse_datetime(row.get("datetime")),
-                        timestamp_desc=str(row.get("timestamp_desc", "null")),
-                        message=str(msg),
-                        enrichment=enrich,
+                        timestamp=_parse_datetime(source.get("datetime")),
+                        timestamp_desc=str(source.get("timestamp_desc", "null")),
+                        message=str(source.get("message", "")),
+                        enrichment=_merge_enrichment(
+                            source.get("tag"), source.get("yara_match")
+                        ),
                     )
                 )
 
             day_counts = []
-            error_suffix = ""
-            try:
-                aggregator_params = {
-                    "field": "data_type",
-                    "field_query_string": dt,
-                    "supported_intervals": "day",
-                    "supported_charts": "table",
-                    "start_time": start_str,
-                    "end_time": end_str,
-                }
-                agg_obj = sketch.run_aggregator(
-                    aggregator_name="date_histogram",
-                    aggregator_parameters=aggregator_params,
-                )
-                resource_data = agg_obj.resource_data
-                raw_objects = (
-                    resource_data.get("objects", [])
-                    if isinstance(resource_data, dict)
-                    else []
-                )
-
-                hist_buckets = []
-                if (
-                    raw_objects
-                    and isinstance(raw_objects, list)
-                    and isinstance(raw_objects[0], dict)
-                ):
-                    agg_data = raw_objects[0].get("date_histogram")
-                    if isinstance(agg_data, dict):
-                        hist_buckets = agg_data.get("buckets", [])
-
-                if hist_buckets and isinstance(hist_buckets[0], list):
-                    hist_buckets = hist_buckets[0]
-
-                for row in hist_buckets:
-                    d_raw = row.get("datetime") or row.get("key_as_string")
-                    if d_raw:
-                        d_str = str(d_raw)[:10]
-                        c_val = int(row.get("count") or row.get("doc_count") or 0)
-                        if c_val > 0:
-                            day_counts.append((d_str, c_val))
-            except Exception:  # pylint: disable=broad-exception-caught
-                logger.exception("Failed to run date histogram aggregation for %s", dt)
-                error_suffix = " ERROR: Failed to compute date histogram."
-
-            dt_desc = plaso_types.PLASO_DATA_TYPE_DESCRIPTIONS.get(
-                dt, f"Timesketch log source for {dt}"
-            )
-            if error_suffix:
-                dt_desc += error_suffix
+            for row in bucket.get("per_day", {}).get("buckets", []):
+                d_raw = row.get("key_as_string")
+                c_val = int(row.get("doc_count") or 0)
+                if d_raw and c_val > 0:
+                    day_counts.append((str(d_raw)[:10], c_val))
 
             descriptions.append(
                 ls.LogDescription(
                     log_type=dt,
-                    description=dt_desc,
+                    description=plaso_types.PLASO_DATA_TYPE_DESCRIPTIONS.get(
+                        dt, f"Timesketch log source for {dt}"
+                    ),
                     per_day_counts=day_counts,
                     examples=examples,
                 )
             )
 
-        return ls.LogDescriptions(
+        result = ls.LogDescriptions(
             status=ls.ResultStatus.SUCCESS, descriptions=descriptions
         )
+        _set_cached_descriptions(cache_key, result)
+        return result
 
     async def search_logs(
         self,
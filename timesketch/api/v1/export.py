@@ -13,18 +13,34 @@
 # limitations under the License.
 """This module holds methods and classes to export events."""
 
+import datetime
 import io
 import json
 import logging
+import os
+import tempfile
+import time
+import zipfile
 
 import pandas as pd
+from flask import current_app
 
+from timesketch import version
 from timesketch.api.v1 import utils
+from timesketch.lib import index_placement
 from timesketch.lib import utils as lib_utils
 from timesketch.lib.stories import api_fetcher as story_api_fetcher
+from timesketch.lib.stories import manager as story_export_manager
+from timesketch.models import db_session
+from timesketch.models.sketch import Event
+from timesketch.models.sketch import SearchIndex
 
 logger = logging.getLogger("timesketch.api_exporter")
 
+# Maximum number of events, per shard, that query_to_filehandle collects. It
+# builds the whole file in memory, larger exports run as a background job.
+QUERY_TO_FILEHANDLE_MAX_EVENTS = 10000
+
 
 def export_aggregation(aggregation, sketch, zip_file):
     """Export an aggregation from a sketch and write it to a ZIP file.
@@ -110,7 +126,7 @@ def export_story(story, sketch, story_exporter, zip_file):
         )
 
 
-def query_to_filehandle(
+def scroll_search(
     query_string="",
     query_dsl="",
     query_filter=None,
@@ -119,13 +135,13 @@ def query_to_filehandle(
     indices=None,
     timeline_ids=None,
     return_fields=None,
-    output_format="csv",
+    terminate_after=None,
 ):
-    """Query the datastore and return back a file object with the results.
+    """Query the datastore and yield back the results, one page at a time.
 
-    This function takes a query string or DSL, queries the datastore
-    and fetches all the events and stores them in a file-like object
-    which gets returned back.
+    Unless terminate_after is set, the search is not limited in the number
+    of events, all events that match the query are fetched with a scrolling
+    search.
 
     Args:
         query_string (str): OpenSearch query string.
@@ -137,18 +153,20 @@ def query_to_filehandle(
         timeline_ids (list): Optional list of IDs of Timeline objects that
             should be queried as part of the search.
         return_fields (list): List of fields to return
-        output_format (str): The format to return (csv or jsonl).
+        terminate_after (int): Optional maximum number of events to collect
+            per shard.
 
-    Returns:
-        file-like object in the requested format with the results.
+    Yields:
+        dict: a search result with a page of events.
     """
-    # Ignoring the size limits to reduce the amount of queries
-    # needed to get all the data.
-    query_filter["terminate_after"] = 10000
+    query_filter = dict(query_filter or {})
+    # Large pages reduce the amount of queries needed to get all the data.
     query_filter["size"] = 10000
-
-    if "from" in query_filter:
-        del query_filter["from"]
+    query_filter.pop("from", None)
+    if terminate_after:
+        query_filter["terminate_after"] = terminate_after
+    else:
+        query_filter.pop("terminate_after", None)
 
     result = datastore.search(
         sketch_id=sketch.id,
@@ -160,13 +178,13 @@ def query_to_filehandle(
         return_fields=return_fields,
         indices=indices,
     )
+    yield result
 
     scroll_id = result.get("_scroll_id", "")
     if not scroll_id:
-        return query_results_to_filehandle(result, sketch, output_format=output_format)
+        return
 
     total_count = result.get("hits", {}).get("total", {}).get("value", 0)
-    data_frame = lib_utils.query_results_to_dataframe(result, sketch)
     event_count = len(result["hits"]["hits"])
 
     while event_count < total_count:
@@ -187,23 +205,61 @@ def query_to_filehandle(
             )
             break
 
-        add_frame = lib_utils.query_results_to_dataframe(result, sketch)
-        if add_frame.shape[0]:
-            data_frame = pd.concat([data_frame, add_frame], sort=False)
-            event_count += len(hits)
-        else:
-            logger.warning(
-                "Sketch %d: Data Frame returned from a search operation was "
-                "empty, count %d out of %d total. Query is: "
-                '"%s"',
-                sketch.id,
-                event_count,
-                total_count,
-                query_string or query_dsl,
-            )
-            # Increment event_count to avoid infinite loop
-            event_count += len(hits)
-            continue
+        event_count += len(hits)
+        yield result
+
+
+def query_to_filehandle(
+    query_string="",
+    query_dsl="",
+    query_filter=None,
+    sketch=None,
+    datastore=None,
+    indices=None,
+    timeline_ids=None,
+    return_fields=None,
+    output_format="csv",
+    terminate_after=QUERY_TO_FILEHANDLE_MAX_EVENTS,
+):
+    """Query the datastore and return back a file object with the results.
+
+    This function takes a query string or DSL, queries the datastore
+    and fetches the events and stores them in a file-like object
+    which gets returned back. The file is built in memory, so by default
+    the number of events is capped, see QUERY_TO_FILEHANDLE_MAX_EVENTS.
+
+    Args:
+        query_string (str): OpenSearch query string.
+        query_dsl (str): OpenSearch query DSL as JSON string.
+        query_filter (dict): Filter for the query as a dict.
+        sketch (timesketch.models.sketch.Sketch): a sketch object.
+        datastore (opensearch.OpenSearchDataStore): the datastore object.
+        indices (list): List of indices to query
+        timeline_ids (list): Optional list of IDs of Timeline objects that
+            should be queried as part of the search.
+        return_fields (list): List of fields to return
+        output_format (str): The format to return (csv or jsonl).
+        terminate_after (int): Maximum number of events to collect per
+            shard, or None to fetch all events.
+
+    Returns:
+        file-like object in the requested format with the results.
+    """
+    data_frames = [
+        lib_utils.query_results_to_dataframe(result, sketch)
+        for result in scroll_search(
+            query_string=query_string,
+            query_dsl=query_dsl,
+            query_filter=query_filter,
+            sketch=sketch,
+            datastore=datastore,
+            indices=indices,
+            timeline_ids=timeline_ids,
+            return_fields=return_fields,
+            terminate_after=terminate_after,
+        )
+    ]
+    data_frame = pd.concat(data_frames, sort=False)
 
     fh = io.StringIO()
     if output_format.lower() == "jsonl":
@@ -234,3 +290,386 @@ def query_results_to_filehandle(result, sketch, output_format="csv"):
         data_frame.to_csv(fh, index=False)
     fh.seek(0)
     return fh
+
+
+EXPORT_FILE_PREFIX = "timesketch_export_"
+
+
+def get_export_folder():
+    """Returns the folder sketch exports are written to."""
+    return current_app.config.get("EXPORT_FOLDER") or current_app.config.get(
+        "UPLOAD_FOLDER", "/tmp"
+    )
+
+
+def get_export_path(sketch_id, job_id):
+    """Returns the path of the ZIP file of a sketch export job.
+
+    Args:
+        sketch_id (int): the sketch ID.
+        job_id (str): the ID of the Celery job, a UUID.
+
+    Returns:
+        str: the path to the ZIP file.
+    """
+    return os.path.join(
+        get_export_folder(), f"{EXPORT_FILE_PREFIX}{sketch_id:d}_{job_id:s}.zip"
+    )
+
+
+def remove_expired_exports():
+    """Removes export files older than EXPORT_RETENTION_HOURS."""
+    folder = get_export_folder()
+    max_age = current_app.config.get("EXPORT_RETENTION_HOURS", 24) * 3600
+    now = time.time()
+    try:
+        entries = list(os.scandir(folder))
+    except OSError as e:
+        logger.warning("Unable to list the export folder %s: %s", folder, e)
+        return
+
+    for entry in entries:
+        if not entry.name.startswith(EXPORT_FILE_PREFIX):
+            continue
+        try:
+            if now - entry.stat().st_mtime > max_age:
+                os.remove(entry.path)
+        except OSError as e:
+            logger.warning("Unable to remove the export %s: %s", entry.path, e)
+
+
+class SketchExporter:
+    """Writes the content of a sketch to a ZIP file.
+
+    Events with comments are looked up in the database and their documents
+    fetched in chunks with multi get requests, events with labels or tags are
+    fetched with scrolling searches.
+    """
+
+    DEFAULT_QUERY_FILTER = {"size": 10000}
+
+    # Number of documents fetched per multi get request.
+    MGET_CHUNK_SIZE = 500
+
+    # Number of events written to a CSV file at a time.
+    CSV_BATCH_SIZE = 10000
+
+    def __init__(self, sketch, datastore, username):
+        """Initialize the exporter.
+
+        Args:
+            sketch (timesketch.models.sketch.Sketch): a sketch object.
+            datastore (opensearch.OpenSearchDataStore): the datastore object.
+            username (str): the name of the user that exports the sketch.
+        """
+        self.sketch = sketch
+        self.datastore = datastore
+        self.username = username
+        timelines = [
+            t for t in sketch.timelines if t.get_status.status.lower() == "ready"
+        ]
+        self.indices = {t.searchindex.index_name for t in timelines}
+        # Shared indices hold events of other sketches.
+        self.timeline_ids = index_placement.get_timeline_ids(timelines, self.indices)
+
+    def export(self, file_object, progress_callback=None):
+        """Writes the ZIP file.
+
+        Args:
+            file_object (file): a binary, seekable file object.
+            progress_callback (callable): optional function that is called
+                with the name of each step of the export.
+        """
+        sketch = self.sketch
+        story_exporter = story_export_manager.StoryExportManager.get_exporter("html")
+
+        meta = {
+            "user": self.username,
+            "time": datetime.datetime.utcnow().isoformat(),
+            "sketch_id": sketch.id,
+            "sketch_name": sketch.name,
+            "sketch_description": sketch.description,
+            "timesketch_version": version.get_version(),
+        }
+
+        def _progress(step):
+            if progress_callback:
+                progress_callback(step)
+
+        with zipfile.ZipFile(file_object, mode="w") as zip_file:
+            zip_file.writestr("METADATA", data=json.dumps(meta))
+
+            _progress("stories")
+            for story in sketch.stories:
+                export_story(story, sketch, story_exporter, zip_file)
+
+            _progress("aggregations")
+            for aggregation in sketch.aggregations:
+                export_aggregation(aggregation, sketch, zip_file)
+
+            _progress("views")
+            for view in sketch.views:
+                self._export_view(view, zip_file)
+
+            _progress("aggregation_groups")
+            for group in sketch.aggregationgroups:
+                export_aggregation_group(group, sketch, zip_file)
+
+            _progress("events")
+            self._export_events_with_comments(zip_file)
+            self._export_starred_events(zip_file)
+            self._export_tagged_events(zip_file)
+
+            # TODO (kiddi): Add in aggregation group support.
+
+    def _export_search(
+        self, zip_file, name, query_string="", query_dsl="", query_filter=None
+    ):
+        """Writes all events matching a query to a CSV file in a ZIP file.
+
+        The CSV header needs the fields of all events, so the events are
+        first spooled to a temporary file, page by page. The CSV file is
+        then written in batches, only one batch of events is kept in memory.
+
+        Args:
+            zip_file (ZipFile): a zip file handle that can be used to write
+                content to.
+            name (str): name of the CSV file in the ZIP file.
+            query_string (str): OpenSearch query string.
+            query_dsl (str): OpenSearch query DSL as JSON string.
+            query_filter (dict): Filter for the query as a dict.
+        """
+        columns = {}
+        with tempfile.TemporaryFile(mode="w+", dir=get_export_folder()) as spool:
+            for result in scroll_search(
+                query_string=query_string,
+                query_dsl=query_dsl,
+                query_filter=query_filter or dict(self.DEFAULT_QUERY_FILTER),
+                sketch=self.sketch,
+                datastore=self.datastore,
+                indices=list(self.indices),
+                timeline_ids=self.timeline_ids or None,
+            ):
+                for line in lib_utils.query_results_to_lines(result, self.sketch):
+                    columns.update(dict.fromkeys(line))
+                    spool.write(json.dumps(line, default=str))
+                    spool.write("\n")
+            spool.seek(0)
+
+            with zip_file.open(name, mode="w", force_zip64=True) as zip_fh:
+                text_fh = io.TextIOWrapper(zip_fh, encoding="utf-8", newline="")
+                header = True
+                for batch in self._read_batches(spool):
+                    data_frame = pd.DataFrame(batch, columns=list(columns))
+                    data_frame.to_csv(text_fh, index=False, header=header)
+                    header = False
+                if header:
+                    pd.DataFrame(columns=list(columns)).to_csv(text_fh, index=False)
+                text_fh.flush()
+                text_fh.detach()
+
+    def _read_batches(self, spool):
+        """Yields the events of a spool file in batches of CSV_BATCH_SIZE."""
+        batch = []
+        for line in spool:
+            batch.append(json.loads(line))
+            if len(batch) >= self.CSV_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _get_events_by_id(self, event_ids):
+        """Returns the documents of events, fetched in chunks.
+
+        Args:
+            event_ids (list): list of (index name, document ID) tuples.
+
+        Returns:
+            list: the documents in the format of search hits.
+        """
+        hits = []
+        for i in range(0, len(event_ids), self.MGET_CHUNK_SIZE):
+            chunk = event_ids[i : i + self.MGET_CHUNK_SIZE]
+            result = self.datastore.client.mget(
+                body={
+                    "docs": [
+                        {"_index": index_name, "_id": document_id}
+                        for index_name, document_id in chunk
+                    ]
+                }
+            )
+            hits.extend(doc for doc in result.get("docs", []) if doc.get("found"))
+        return hits
+
+    def _export_events_with_comments(self, zip_file):
+        """Export all events that have comments and store in a ZIP file."""
+        rows = (
+            db_session.query(SearchIndex.index_name, Event.document_id, Event.Comment)
+            .join(Event, Event.searchindex_id == SearchIndex.id)
+            .join(Event.Comment, Event.Comment.parent_id == Event.id)
+            .filter(Event.sketch_id == self.sketch.id)
+            .order_by(Event.Comment.id)
+        )
+
+        lines = []
+        event_ids = set()
+        for index_name, document_id, comment in rows:
+            if index_name not in self.indices:
+                continue
+            event_ids.add((index_name, document_id))
+            line = {
+                "_index": index_name,
+                "_id": document_id,
+                "comment": comment.comment,
+                "comment_date": comment.created_at,
+            }
+            if not comment.user:
+                line["username"] = "System"
+            else:
+                line["username"] = comment.user.username
+            lines.append(line)
+
+        if not lines:
+            return
+        db_frame = pd.DataFrame(lines)
+
+        hits = self._get_events_by_id(sorted(event_ids))
+        event_frame = lib_utils.query_results_to_dataframe(
+            {"hits": {"hits": hits}}, self.sketch
+        )
+        if not event_frame.shape[0]:
+            return
+        frame = event_frame.merge(db_frame, on=["_index", "_id"])
+
+        string_io = io.StringIO()
+        frame.to_csv(string_io, index=False)
+        string_io.seek(0)
+        zip_file.writestr("events/events_with_comments.csv", data=string_io.read())
+
+    def _export_starred_events(self, zip_file):
+        """Export all events that have been starred and store in a ZIP file."""
+        query_dsl = {
+            "query": {
+                "nested": {
+                    "path": "timesketch_label",
+                    "query": {
+                        "bool": {
+                            "must": [
+                                {"term": {"timesketch_label.name": "__ts_star"}},
+                                {
+                                    "term": {
+                                        "timesketch_label.sketch_id": self.sketch.id
+                                    }
+                                },
+                            ]
+                        }
+                    },
+                }
+            }
+        }
+        self._export_search(
+            zip_file, "events/starred_events.csv", query_dsl=json.dumps(query_dsl)
+        )
+
+    def _export_tagged_events(self, zip_file):
+        """Export all events that have been tagged and store in a ZIP file."""
+        sketch = self.sketch
+        self._export_search(
+            zip_file, "events/tagged_events.csv", query_string="_exists_:tag"
+        )
+
+        parameters = {
+            "limit": 100,
+            "field": "tag",
+        }
+        result_obj, meta = utils.run_aggregator(
+            sketch.id, aggregator_name="field_bucket", aggregator_parameters=parameters
+        )
+
+        zip_file.writestr("events/tagged_event_stats.meta", data=json.dumps(meta))
+
+        html = ""
+        if result_obj.values is not None and result_obj.encoding:
+            try:
+                html = result_obj.to_chart(
+                    chart_name="hbarchart",
+                    chart_title="Top 100 identified tags",
+                    interactive=True,
+                    as_html=True,
+                )
+            except RuntimeError as e:
+                logger.warning(
+                    "Sketch ID [%s]: Unable to generate chart [%s] with title [%s]. "
+                    "The error was: %s. Skipping chart export.",
+                    sketch.id,
+                    "hbarchart",
+                    "Top 100 identified tags",
+                    e,
+                )
+
+        else:
+            logger.warning(
+                "Sketch ID [%s]: No values or encoding found "
+                "for chart [%s] with title [%s]. "
+                "Skipping chart export.",
+                sketch.id,
+                "hbarchart",
+                "Top 100 identified tags",
+            )
+
+        if html:
+            zip_file.writestr("events/tagged_event_stats.html", data=html)
+
+        string_io = io.StringIO()
+        data_frame = result_obj.to_pandas()
+        data_frame.to_csv(string_io, index=False)
+        string_io.seek(0)
+        zip_file.writestr("events/tagged_event_stats.csv", data=string_io.read())
+
+    def _export_view(self, view, zip_file):
+        """Export a view from a sketch and write it to a ZIP file.
+
+        Args:
+            view (timesketch.models.sketch.View): a View object.
+            zip_file (ZipFile): a zip file handle that can be used to write
+                content to.
+        """
+        name = f"{view.id:04d}_{view.name:s}"
+        query_filter = None
+
+        if view.query_filter:
+            query_filter = json.loads(view.query_filter)
+
+        if not query_filter:
+            query_filter = dict(self.DEFAULT_QUERY_FILTER)
+
+        query_dsl = view.query_dsl
+        if query_dsl:
+            query_dict = json.loads(query_dsl)
+            if not query_dict:
+                query_dsl = None
+
+        self._export_search(
+            zip_file,
+            f"views/{name:s}.csv",
+            query_string=view.query_string,
+            query_dsl=query_dsl,
+            query_filter=query_filter,
+        )
+
+        if not view.user:
+            username = "System"
+        else:
+            username = view.user.username
+        meta = {
+            "name": view.name,
+            "view_id": view.id,
+            "description": view.description,
+            "query_string": view.query_string,
+            "query_filter": view.query_filter,
+            "query_dsl": view.query_dsl,
+            "username": username,
+            "sketch_id": view.sketch_id,
+        }
+        zip_file.writestr(f"views/{name:s}.meta", data=json.dumps(meta))
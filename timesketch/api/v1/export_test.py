@@ -0,0 +1,189 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the sketch export."""
+
+import io
+import os
+import tempfile
+import time
+import zipfile
+from unittest import mock
+
+from timesketch.api.v1 import export
+from timesketch.lib.testlib import BaseTest
+
+
+class TestSketchExporter(BaseTest):
+    """Tests for the sketch exporter."""
+
+    def test_export_events_with_comments(self):
+        """Test that commented events are fetched with multi get requests."""
+        sketch = self._create_sketch("export", self.user1)
+        searchindex = self._create_searchindex("export_index", self.user1)
+        self._create_timeline("timeline", sketch, searchindex, self.user1)
+        self._create_event(sketch, searchindex, self.user1)
+
+        datastore = mock.Mock()
+        datastore.client.mget.return_value = {
+            "docs": [
+                {
+                    "_index": "export_index",
+                    "_id": "test",
+                    "found": True,
+                    "_source": {"message": "commented event"},
+                }
+            ]
+        }
+        exporter = export.SketchExporter(sketch, datastore, "test1")
+        exporter.MGET_CHUNK_SIZE = 1
+
+        file_object = io.BytesIO()
+        with zipfile.ZipFile(file_object, mode="w") as zip_file:
+            # pylint: disable=protected-access
+            exporter._export_events_with_comments(zip_file)
+        datastore.client.mget.assert_called_once_with(
+            body={"docs": [{"_index": "export_index", "_id": "test"}]}
+        )
+
+        with zipfile.ZipFile(file_object) as zip_file:
+            data = zip_file.read("events/events_with_comments.csv").decode("utf-8")
+        self.assertIn("commented event", data)
+        self.assertIn("test1", data)
+
+    def test_export_search(self):
+        """Test that all pages of a search are written to the CSV file."""
+        sketch = self._create_sketch("export", self.user1)
+        searchindex = self._create_searchindex("export_index", self.user1)
+        self._create_timeline("timeline", sketch, searchindex, self.user1)
+
+        def _hit(event_id, source):
+            return {"_index": "export_index", "_id": event_id, "_source": source}
+
+        datastore = mock.Mock()
+        datastore.search.return_value = {
+            "_scroll_id": "scroll",
+            "hits": {
+                "total": {"value": 3},
+                "hits": [_hit("1", {"message": "first"})],
+            },
+        }
+        datastore.client.scroll.side_effect = [
+            {
+                "hits": {
+                    "hits": [
+                        _hit("2", {"message": "second", "tag": ["a", "b"]}),
+                        _hit("3", {"message": "third"}),
+                    ]
+                }
+            },
+        ]
+        exporter = export.SketchExporter(sketch, datastore, "test1")
+        exporter.CSV_BATCH_SIZE = 2
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.app.config["EXPORT_FOLDER"] = temp_dir
+            file_object = io.BytesIO()
+            with zipfile.ZipFile(file_object, mode="w") as zip_file:
+                # pylint: disable=protected-access
+                exporter._export_search(
+                    zip_file, "events/tagged_events.csv", query_string="_exists_:tag"
+                )
+
+        query_filter = datastore.search.call_args.kwargs["query_filter"]
+        self.assertNotIn("terminate_after", query_filter)
+        with zipfile.ZipFile(file_object) as zip_file:
+            data = zip_file.read("events/tagged_events.csv").decode("utf-8")
+        self.assertEqual(
+            data.splitlines(),
+            [
+                "message,label,_id,_index,tag",
+                "first,[],1,export_index,",
+                'second,[],2,export_index,"a,b"',
+                "third,[],3,export_index,",
+            ],
+        )
+
+    def test_query_to_filehandle(self):
+        """Test that the in memory export keeps the event cap."""
+        sketch = self._create_sketch("export", self.user1)
+        datastore = mock.Mock()
+        datastore.search.return_value = {
+            "hits": {
+                "total": {"value": 1},
+                "hits": [
+                    {
+                        "_index": "export_index",
+                        "_id": "1",
+                        "_source": {"message": "first"},
+                    }
+                ],
+            },
+        }
+
+        fh = export.query_to_filehandle(
+            query_string="*",
+            query_filter={"from": 10, "size": 40},
+            sketch=sketch,
+            datastore=datastore,
+        )
+        query_filter = datastore.search.call_args.kwargs["query_filter"]
+        self.assertEqual(
+            query_filter["terminate_after"], export.QUERY_TO_FILEHANDLE_MAX_EVENTS
+        )
+        self.assertNotIn("from", query_filter)
+        self.assertIn("first", fh.read())
+
+    def test_export_search_shared_index(self):
+        """Test that searches on a shared index are limited to the sketch."""
+        sketch = self._create_sketch("export", self.user1)
+        other_sketch = self._create_sketch("other", self.user1)
+        searchindex = self._create_searchindex(
+            "timesketch_shared_plaso_000001", self.user1
+        )
+        timeline = self._create_timeline("timeline", sketch, searchindex, self.user1)
+        self._create_timeline("other", other_sketch, searchindex, self.user1)
+
+        datastore = mock.Mock()
+        datastore.search.return_value = {"hits": {"total": {"value": 0}, "hits": []}}
+        exporter = export.SketchExporter(sketch, datastore, "test1")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.app.config["EXPORT_FOLDER"] = temp_dir
+            with zipfile.ZipFile(io.BytesIO(), mode="w") as zip_file:
+                # pylint: disable=protected-access
+                exporter._export_search(
+                    zip_file, "events/tagged_events.csv", query_string="_exists_:tag"
+                )
+        self.assertEqual(
+            datastore.search.call_args.kwargs["timeline_ids"], [timeline.id]
+        )
+
+    def test_remove_expired_exports(self):
+        """Test that only expired export files are removed."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.app.config["EXPORT_FOLDER"] = temp_dir
+            expired = export.get_export_path(1, "expired")
+            recent = export.get_export_path(1, "recent")
+            other = os.path.join(temp_dir, "other.zip")
+            for path in (expired, recent, other):
+                with open(path, "wb") as fh:
+                    fh.write(b"zip")
+            old_time = time.time() - 25 * 3600
+            os.utime(expired, (old_time, old_time))
+            os.utime(other, (old_time, old_time))
+
+            export.remove_expired_exports()
+            self.assertFalse(os.path.exists(expired))
+            self.assertTrue(os.path.exists(recent))
+            self.assertTrue(os.path.exists(other))
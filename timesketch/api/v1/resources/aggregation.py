@@ -31,8 +31,10 @@ from flask_login import current_user
 from timesketch.api.v1 import resources
 from timesketch.api.v1 import utils
 from timesketch.lib import forms
+from timesketch.lib import index_placement
 from timesketch.lib import utils as lib_utils
-from timesketch.lib.aggregators import apex
+from timesketch.lib.aggregators import cache as aggregator_cache
+from timesketch.lib.aggregators import runner as aggregator_runner
 from timesketch.lib.definitions import HTTP_STATUS_CODE_OK
 from timesketch.lib.definitions import HTTP_STATUS_CODE_CREATED
 from timesketch.lib.definitions import HTTP_STATUS_CODE_BAD_REQUEST
@@ -444,7 +446,63 @@ class AggregationGroupResource(resources.ResourceMixin, Resource):
 class AggregationExploreResource(resources.ResourceMixin, Resource):
     """Resource to send an aggregation request."""
 
-    REMOVE_FIELDS = frozenset(["_shards", "hits", "timed_out", "took"])
+    REMOVE_FIELDS = aggregator_runner.REMOVE_FIELDS
+
+    @login_required
+    def get(self, sketch_id: int):
+        """Handles GET request to the resource.
+
+        Handler for /api/v1/sketches/<int:sketch_id>/aggregation/explore/
+        with a job_id argument, returns the state of an aggregation job and
+        the results once the job has finished.
+
+        Args:
+            sketch_id: Integer primary key for a sketch database model
+
+        Returns:
+            JSON with the job state and aggregation results
+        """
+        sketch = Sketch.get_with_acl(sketch_id)
+        if not sketch:
+            abort(HTTP_STATUS_CODE_NOT_FOUND, "No sketch found with this ID.")
+
+        if not sketch.has_permission(current_user, "read"):
+            abort(
+                HTTP_STATUS_CODE_FORBIDDEN,
+                "User does not have read access controls on sketch.",
+            )
+
+        job_id = request.args.get("job_id", "")
+        if not job_id:
+            abort(HTTP_STATUS_CODE_BAD_REQUEST, "A job ID needs to be provided.")
+
+        # pylint: disable=too-many-function-args
+        celery_task = utils.get_celery_app().AsyncResult(job_id)
+        meta = {"job_id": job_id, "job_state": celery_task.state}
+
+        job_info = celery_task.info if isinstance(celery_task.info, dict) else {}
+        if job_info and job_info.get("sketch_id") != sketch.id:
+            abort(HTTP_STATUS_CODE_NOT_FOUND, "No aggregation job found with this ID.")
+
+        # Errors of the aggregation are returned by the job together with the
+        # sketch ID. A job that failed otherwise can not be tied to a sketch,
+        # so its error is not returned.
+        if celery_task.state == "FAILURE":
+            abort(HTTP_STATUS_CODE_BAD_REQUEST, "Unable to run the aggregation.")
+
+        if "error" in job_info:
+            abort(
+                HTTP_STATUS_CODE_BAD_REQUEST,
+                f"Unable to run the aggregation, with error: {job_info['error']!s}",
+            )
+
+        if celery_task.state != "SUCCESS":
+            if "started_at" in job_info:
+                meta["started_at"] = job_info["started_at"]
+            return jsonify({"meta": meta, "objects": []})
+
+        meta.update(job_info.get("meta", {}))
+        return jsonify({"meta": meta, "objects": job_info.get("objects", [])})
 
     @login_required
     def post(self, sketch_id: int):
@@ -452,12 +510,18 @@ class AggregationExploreResource(resources.ResourceMixin, Resource):
 
         Handler for /api/v1/sketches/<int:sketch_id>/aggregation/explore/
 
+        Results are cached for identical aggregations on indices that have
+        not been written to since. If run_async is set, aggregations that are
+        not cached run as a Celery job and the response contains the job ID
+        to poll with a GET request.
+
         Args:
             sketch_id: Integer primary key for a sketch database model
 
         Returns:
             JSON with aggregation results
         """
+        time_start = time.time()
         form = forms.AggregationExploreForm.build(request)
         if not form.validate_on_submit():
             abort(
@@ -488,15 +552,18 @@ class AggregationExploreResource(resources.ResourceMixin, Resource):
         ):
             allowed_statuses.append("processing")
 
-        sketch_indices = {
-            t.searchindex.index_name
+        sketch_timelines = [
+            t
             for t in sketch.timelines
             if t.get_status.status.lower() in allowed_statuses
-        }
+        ]
+        sketch_indices = {t.searchindex.index_name for t in sketch_timelines}
 
         aggregation_dsl = form.aggregation_dsl.data
         aggregator_name = form.aggregator_name.data
 
+        cache_name = ""
+        cache_parameters = {}
         if aggregator_name:
             agg_class = aggregator_manager.AggregatorManager.get_aggregator(
                 aggregator_name
@@ -522,51 +589,119 @@ class AggregationExploreResource(resources.ResourceMixin, Resource):
             if not (indices or timeline_ids):
                 abort(HTTP_STATUS_CODE_NOT_FOUND, "No indices to aggregate on found.")
 
-            aggregator = agg_class(
-                sketch_id=sketch_id, indices=indices, timeline_ids=timeline_ids
+            cache_name = aggregator_name
+            cache_parameters = {
+                "parameters": aggregator_parameters,
+                "timeline_ids": sorted(timeline_ids),
+            }
+        elif aggregation_dsl:
+            indices = sketch_indices
+            timeline_ids = index_placement.get_timeline_ids(
+                sketch_timelines, sketch_indices
+            )
+            cache_name = aggregator_runner.DSL_AGGREGATION_NAME
+            cache_parameters = {
+                "aggregation_dsl": aggregation_dsl,
+                "timeline_ids": timeline_ids,
+            }
+        else:
+            abort(
+                HTTP_STATUS_CODE_BAD_REQUEST,
+                "An aggregation DSL or a name for an aggregator name needs "
+                "to be provided!",
             )
-            aggregator_description = aggregator.describe
 
-            # legacy chart settings
-            chart_type = aggregator_parameters.pop("supported_charts", None)
-
-            time_before = time.time()
-            try:
-                result_obj = aggregator.run(**aggregator_parameters)
-            except NotFoundError:
-                indices_msg = ", ".join(indices)
-                abort(
-                    HTTP_STATUS_CODE_NOT_FOUND,
-                    "Attempting to run an aggregation on a non-existing index, "
-                    f"index: {indices_msg:s} and parameters: {aggregator_parameters!s}",
-                )
-            except ValueError as exc:
-                abort(
-                    HTTP_STATUS_CODE_BAD_REQUEST,
-                    f"Unable to run the aggregation, with error: {exc!s}",
+        cache = aggregator_cache.get_cache()
+        cache_key = ""
+        if cache.enabled:
+            generation = aggregator_cache.get_index_generation(
+                self.datastore, list(indices)
+            )
+            if generation:
+                cache_key = aggregator_cache.build_cache_key(
+                    sketch.id, generation, cache_name, cache_parameters
                 )
-            except RequestError as exc:
-                indices_msg = ", ".join(indices)
-                if exc.error == "index_closed_exception":
-                    logger.error(
-                        "Unable to run aggregation on a closed index."
-                        "index: %s and parameters: %s",
-                        indices_msg,
-                        aggregator_parameters,
-                        exc_info=True,
-                        stack_info=True,
-                        extra={"request": request},
-                    )
-                    abort(
-                        HTTP_STATUS_CODE_BAD_REQUEST,
-                        "Unable to run aggregation on a closed index."
-                        f"index: {indices_msg:s} and parameters:"
-                        f" {aggregator_parameters!s}",
-                    )
+                cached_schema = cache.get(cache_key)
+                if cached_schema:
+                    meta = dict(cached_schema["meta"])
+                    meta["cached"] = True
+                    meta["total_time"] = time.time() - time_start
+                    utils.update_sketch_last_activity(sketch)
+                    return jsonify({"meta": meta, "objects": cached_schema["objects"]})
+
+        if form.run_async.data:
+            # Import here to avoid circular imports.
+            # pylint: disable=import-outside-toplevel
+            from timesketch.lib import tasks
+
+            job = tasks.run_explore_aggregation.apply_async(
+                kwargs={
+                    "sketch_id": sketch.id,
+                    "indices": list(indices),
+                    "timeline_ids": list(timeline_ids),
+                    "aggregator_name": aggregator_name,
+                    "aggregator_parameters": (
+                        aggregator_parameters if aggregator_name else None
+                    ),
+                    "aggregation_dsl": aggregation_dsl,
+                    "cache_key": cache_key,
+                }
+            )
+            utils.update_sketch_last_activity(sketch)
+            return jsonify(
+                {"meta": {"job_id": job.id, "job_state": job.state}, "objects": []}
+            )
+
+        if aggregator_name:
+            schema = self._run_aggregator(
+                sketch.id, indices, timeline_ids, aggregator_name, aggregator_parameters
+            )
+        else:
+            schema = self._run_aggregation_dsl(
+                sketch_indices, timeline_ids, aggregation_dsl
+            )
+
+        schema["meta"]["cached"] = False
+        schema["meta"]["total_time"] = time.time() - time_start
+        if cache_key:
+            cache.set(cache_key, schema)
+
+        # Update the last activity of a sketch.
+        utils.update_sketch_last_activity(sketch)
+
+        return jsonify(schema)
+
+    @staticmethod
+    def _run_aggregator(
+        sketch_id, indices, timeline_ids, aggregator_name, aggregator_parameters
+    ):
+        """Runs an aggregator and aborts the request on errors."""
+        try:
+            return aggregator_runner.run_aggregator(
+                sketch_id=sketch_id,
+                indices=indices,
+                timeline_ids=timeline_ids,
+                aggregator_name=aggregator_name,
+                aggregator_parameters=aggregator_parameters,
+            )
+        except NotFoundError:
+            indices_msg = ", ".join(indices)
+            abort(
+                HTTP_STATUS_CODE_NOT_FOUND,
+                "Attempting to run an aggregation on a non-existing index, "
+                f"index: {indices_msg:s} and parameters: {aggregator_parameters!s}",
+            )
+        except ValueError as exc:
+            abort(
+                HTTP_STATUS_CODE_BAD_REQUEST,
+                f"Unable to run the aggregation, with error: {exc!s}",
+            )
+        except RequestError as exc:
+            indices_msg = ", ".join(indices)
+            if exc.error == "index_closed_exception":
                 logger.error(
-                    "Unable to run aggregation, with error: %s, "
+                    "Unable to run aggregation on a closed index."
                     "index: %s and parameters: %s",
-                    str(exc),
                     indices_msg,
                     aggregator_parameters,
                     exc_info=True,
@@ -575,68 +710,44 @@ class AggregationExploreResource(resources.ResourceMixin, Resource):
                 )
                 abort(
                     HTTP_STATUS_CODE_BAD_REQUEST,
-                    f"Unable to run the aggregation, with error: {exc!s} "
-                    f"index: {indices_msg:s} and parameters: {aggregator_parameters!s}",
-                )
-            time_after = time.time()
-
-            buckets = result_obj.to_dict()
-            buckets["buckets"] = buckets.pop("values")
-            if "labels" in buckets:
-                buckets["labels"] = buckets.pop("labels")
-            if "chart_options" in buckets:
-                buckets["chart_options"] = buckets.pop("chart_options")
-
-            result = {"aggregation_result": {aggregator_name: buckets}}
-            meta = {
-                "method": "aggregator_run",
-                "aggregator_class": (
-                    "apex" if isinstance(aggregator, apex.ApexAggregation) else "legacy"
-                ),
-                "chart_type": chart_type,
-                "name": aggregator_description.get("name"),
-                "description": aggregator_description.get("description"),
-                "es_time": time_after - time_before,
-            }
-
-            if chart_type:
-                chart_color = aggregator_parameters.pop("chart_color", "")
-                chart_title = aggregator_parameters.pop("chart_title", None)
-                chart_spec = result_obj.to_chart(
-                    chart_name=chart_type, chart_title=chart_title, color=chart_color
+                    "Unable to run aggregation on a closed index."
+                    f"index: {indices_msg:s} and parameters:"
+                    f" {aggregator_parameters!s}",
                 )
-                if chart_spec:
-                    meta["vega_spec"] = chart_spec
-                    if not chart_title:
-                        chart_title = aggregator.chart_title
-                    meta["vega_chart_title"] = chart_title
+            logger.error(
+                "Unable to run aggregation, with error: %s, "
+                "index: %s and parameters: %s",
+                str(exc),
+                indices_msg,
+                aggregator_parameters,
+                exc_info=True,
+                stack_info=True,
+                extra={"request": request},
+            )
+            abort(
+                HTTP_STATUS_CODE_BAD_REQUEST,
+                f"Unable to run the aggregation, with error: {exc!s} "
+                f"index: {indices_msg:s} and parameters: {aggregator_parameters!s}",
+            )
+        return None
 
-        elif aggregation_dsl:
-            try:
-                # pylint: disable=unexpected-keyword-arg
-                result = self.datastore.client.search(
-                    index=",".join(sketch_indices), body=aggregation_dsl, size=0
-                )
-            except RequestError as e:
-                indices_msg = ",".join(sketch_indices)
-                if e.error == "index_closed_exception":
-                    logger.error(
-                        "Unable to run aggregation on a closed index. "
-                        "index: %s and dsl: %s",
-                        indices_msg,
-                        aggregation_dsl,
-                        exc_info=True,
-                        stack_info=True,
-                        extra={"request": request},
-                    )
-                    abort(
-                        HTTP_STATUS_CODE_BAD_REQUEST,
-                        "Unable to run aggregation on a closed index.",
-                    )
+    def _run_aggregation_dsl(self, sketch_indices, timeline_ids, aggregation_dsl):
+        """Runs a raw aggregation DSL and aborts the request on errors."""
+        try:
+            return aggregator_runner.run_aggregation_dsl(
+                self.datastore, sketch_indices, aggregation_dsl, timeline_ids
+            )
+        except ValueError as e:
+            abort(
+                HTTP_STATUS_CODE_BAD_REQUEST,
+                f"Unable to parse the aggregation DSL, with error: {e!s}",
+            )
+        except RequestError as e:
+            indices_msg = ",".join(sketch_indices)
+            if e.error == "index_closed_exception":
                 logger.error(
-                    "Unable to run aggregation on an index with error: %s. "
+                    "Unable to run aggregation on a closed index. "
                     "index: %s and dsl: %s",
-                    str(e),
                     indices_msg,
                     aggregation_dsl,
                     exc_info=True,
@@ -645,31 +756,23 @@ class AggregationExploreResource(resources.ResourceMixin, Resource):
                 )
                 abort(
                     HTTP_STATUS_CODE_BAD_REQUEST,
-                    f"Unable to run the aggregation, with error: {e!s}",
+                    "Unable to run aggregation on a closed index.",
                 )
-
-            meta = {
-                "es_time": result.get("took", 0),
-                "es_total_count": result.get("hits", {}).get("total", 0),
-                "timed_out": result.get("timed_out", False),
-                "method": "aggregator_query",
-                "max_score": result.get("hits", {}).get("max_score", 0.0),
-            }
-        else:
+            logger.error(
+                "Unable to run aggregation on an index with error: %s. "
+                "index: %s and dsl: %s",
+                str(e),
+                indices_msg,
+                aggregation_dsl,
+                exc_info=True,
+                stack_info=True,
+                extra={"request": request},
+            )
             abort(
                 HTTP_STATUS_CODE_BAD_REQUEST,
-                "An aggregation DSL or a name for an aggregator name needs "
-                "to be provided!",
+                f"Unable to run the aggregation, with error: {e!s}",
             )
-
-        result_keys = set(result.keys()) - self.REMOVE_FIELDS
-        objects = [result[key] for key in result_keys]
-        schema = {"meta": meta, "objects": objects}
-
-        # Update the last activity of a sketch.
-        utils.update_sketch_last_activity(sketch)
-
-        return jsonify(schema)
+        return None
 
 
 class AggregationListResource(resources.ResourceMixin, Resource):
@@ -13,11 +13,10 @@
 # limitations under the License.
 """This module holds archive API calls for version 1 of the Timesketch API."""
 
-import datetime
-import io
-import json
 import logging
-import zipfile
+import os
+import tempfile
+import uuid
 
 import opensearchpy
 
@@ -30,21 +29,17 @@ from flask_login import current_user
 from flask_login import login_required
 from flask_restful import Resource
 
-import pandas as pd
-
-from timesketch import version
 from timesketch.api.v1 import export
 from timesketch.api.v1 import resources
 from timesketch.api.v1 import utils
-from timesketch.lib import utils as lib_utils
+from timesketch.lib import index_placement
+from timesketch.lib.datastores import index_archive
 from timesketch.lib.definitions import HTTP_STATUS_CODE_BAD_REQUEST
 from timesketch.lib.definitions import HTTP_STATUS_CODE_FORBIDDEN
 from timesketch.lib.definitions import HTTP_STATUS_CODE_NOT_FOUND
 from timesketch.lib.definitions import HTTP_STATUS_CODE_INTERNAL_SERVER_ERROR
 
-from timesketch.lib.stories import manager as story_export_manager
 from timesketch.models import db_session
-from timesketch.models.sketch import Event
 from timesketch.models.sketch import Sketch
 
 logger = logging.getLogger("timesketch.api_archive")
@@ -53,27 +48,6 @@ logger = logging.getLogger("timesketch.api_archive")
 class SketchArchiveResource(resources.ResourceMixin, Resource):
     """Resource to archive a sketch."""
 
-    DEFAULT_QUERY_FILTER = {"size": 10000, "terminate_after": 10000}
-
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self._sketch = None
-        self._sketch_indices = None
-
-    @property
-    def sketch_indices(self):
-        """Returns a set of sketch indices that are ready."""
-        if not self._sketch_indices:
-            if not self._sketch:
-                return set()
-
-            self._sketch_indices = {
-                t.searchindex.index_name
-                for t in self._sketch.timelines
-                if t.get_status.status.lower() == "ready"
-            }
-        return self._sketch_indices
-
     @login_required
     def get(self, sketch_id):
         """Handles GET request to the resource.
@@ -147,7 +121,6 @@ class SketchArchiveResource(resources.ResourceMixin, Resource):
         if not sketch:
             abort(HTTP_STATUS_CODE_NOT_FOUND, "No sketch found with this ID.")
 
-        self._sketch = sketch
         form = request.json
         if not form:
             form = request.data
@@ -172,6 +145,10 @@ class SketchArchiveResource(resources.ResourceMixin, Resource):
                     "read from a sketch.",
                 )
 
+            # Archived sketches are exported in the request, as they are
+            # unarchived while exporting.
+            if form.get("run_async") and sketch.get_status.status != "archived":
+                return self._start_export_job(sketch)
             return self._export_sketch(sketch)
 
         if action == "unarchive":
@@ -190,182 +167,26 @@ class SketchArchiveResource(resources.ResourceMixin, Resource):
             f"The action: [{action:s}] is not supported.",
         )
 
-    def _get_all_events_with_a_label(self, label: str, sketch: Sketch):
-        """Returns a DataFrame with events in a sketch with a certain label.
-
-        Args:
-            label (string): the label string to search for.
-            sketch (timesketch.models.sketch.Sketch): a sketch object.
+    def _export_sketch(self, sketch: Sketch):
+        """Returns a ZIP file with the exported content of a sketch.
 
-        Returns:
-            pd.DataFrame: a pandas DataFrame with all the events in the
-                datastore that have a label.
+        The ZIP file is written to a temporary file on disk and streamed to
+        the client. Archived sketches are unarchived while they are exported.
         """
-        query_dsl = {
-            "query": {
-                "nested": {
-                    "path": "timesketch_label",
-                    "query": {
-                        "bool": {
-                            "must": [
-                                {"term": {"timesketch_label.name": label}},
-                                {"term": {"timesketch_label.sketch_id": sketch.id}},
-                            ]
-                        }
-                    },
-                }
-            }
-        }
-        result = self.datastore.search(
-            sketch_id=sketch.id,
-            query_string="",
-            query_filter=self.DEFAULT_QUERY_FILTER,
-            query_dsl=json.dumps(query_dsl),
-            indices=self.sketch_indices,
-        )
-
-        return lib_utils.query_results_to_dataframe(result, sketch)
-
-    def _export_events_with_comments(self, sketch, zip_file):
-        """Export all events that have comments and store in a ZIP file."""
-        db_events = Event.query.filter_by(sketch_id=sketch.id).all()
-        lines = []
-        for db_event in db_events:
-            for comment in db_event.comments:
-                line = {
-                    "_index": db_event.searchindex.index_name,
-                    "_id": db_event.document_id,
-                    "comment": comment.comment,
-                    "comment_date": comment.created_at,
-                }
-                if not comment.user:
-                    line["username"] = "System"
-                else:
-                    line["username"] = comment.user.username
-                lines.append(line)
-        db_frame = pd.DataFrame(lines)
-
-        size = db_frame.shape[0]
-        if not size:
-            return
-
-        event_frame = self._get_all_events_with_a_label("__ts_comment", sketch)
-        frame = event_frame.merge(db_frame, on=["_index", "_id"])
-
-        string_io = io.StringIO()
-        frame.to_csv(string_io, index=False)
-        string_io.seek(0)
-        zip_file.writestr("events/events_with_comments.csv", data=string_io.read())
-
-    def _export_starred_events(self, sketch, zip_file):
-        """Export all events that have been starred and store in a ZIP file."""
-        event_frame = self._get_all_events_with_a_label("__ts_star", sketch)
-
-        string_io = io.StringIO()
-        event_frame.to_csv(string_io, index=False)
-        string_io.seek(0)
-        zip_file.writestr("events/starred_events.csv", data=string_io.read())
-
-    def _export_tagged_events(self, sketch, zip_file):
-        """Export all events that have been tagged and store in a ZIP file."""
-        result = self.datastore.search(
-            sketch_id=sketch.id,
-            query_string="_exists_:tag",
-            query_filter=self.DEFAULT_QUERY_FILTER,
-            query_dsl="",
-            indices=self.sketch_indices,
-        )
-
-        fh = export.query_results_to_filehandle(result, sketch)
-        zip_file.writestr("events/tagged_events.csv", data=fh.read())
-
-        parameters = {
-            "limit": 100,
-            "field": "tag",
-        }
-        result_obj, meta = utils.run_aggregator(
-            sketch.id, aggregator_name="field_bucket", aggregator_parameters=parameters
-        )
-
-        zip_file.writestr("events/tagged_event_stats.meta", data=json.dumps(meta))
-
-        html = ""
-        if result_obj.values is not None and result_obj.encoding:
-            try:
-                html = result_obj.to_chart(
-                    chart_name="hbarchart",
-                    chart_title="Top 100 identified tags",
-                    interactive=True,
-                    as_html=True,
-                )
-            except RuntimeError as e:
-                logger.warning(
-                    "Sketch ID [%s]: Unable to generate chart [%s] with title [%s]. "
-                    "The error was: %s. Skipping chart export.",
-                    sketch.id,
-                    "hbarchart",
-                    "Top 100 identified tags",
-                    e,
-                )
-
-        else:
-            logger.warning(
-                "Sketch ID [%s]: No values or encoding found "
-                "for chart [%s] with title [%s]. "
-                "Skipping chart export.",
-                sketch.id,
-                "hbarchart",
-                "Top 100 identified tags",
-            )
-
-        if html:
-            zip_file.writestr("events/tagged_event_stats.html", data=html)
-
-        string_io = io.StringIO()
-        data_frame = result_obj.to_pandas()
-        data_frame.to_csv(string_io, index=False)
-        string_io.seek(0)
-        zip_file.writestr("events/tagged_event_stats.csv", data=string_io.read())
-
-    def _export_sketch(self, sketch: Sketch):
-        """Returns a ZIP file with the exported content of a sketch."""
-        file_object = io.BytesIO()
         sketch_is_archived = sketch.get_status.status == "archived"
 
         if sketch_is_archived:
             _ = self._unarchive_sketch(sketch)
 
-        story_exporter = story_export_manager.StoryExportManager.get_exporter("html")
-
-        meta = {
-            "user": current_user.username,
-            "time": datetime.datetime.utcnow().isoformat(),
-            "sketch_id": sketch.id,
-            "sketch_name": sketch.name,
-            "sketch_description": sketch.description,
-            "timesketch_version": version.get_version(),
-        }
-
-        with zipfile.ZipFile(file_object, mode="w") as zip_file:
-            zip_file.writestr("METADATA", data=json.dumps(meta))
-
-            for story in sketch.stories:
-                export.export_story(story, sketch, story_exporter, zip_file)
-
-            for aggregation in sketch.aggregations:
-                export.export_aggregation(aggregation, sketch, zip_file)
-
-            for view in sketch.views:
-                self._export_view(view, sketch, zip_file)
-
-            for group in sketch.aggregationgroups:
-                export.export_aggregation_group(group, sketch, zip_file)
-
-            self._export_events_with_comments(sketch, zip_file)
-            self._export_starred_events(sketch, zip_file)
-            self._export_tagged_events(sketch, zip_file)
-
-            # TODO (kiddi): Add in aggregation group support.
+        # pylint: disable=consider-using-with
+        file_object = tempfile.TemporaryFile(dir=export.get_export_folder())
+        try:
+            export.SketchExporter(sketch, self.datastore, current_user.username).export(
+                file_object
+            )
+        except Exception:
+            file_object.close()
+            raise
 
         if sketch_is_archived:
             _ = self._archive_sketch(sketch)
@@ -375,99 +196,24 @@ class SketchArchiveResource(resources.ResourceMixin, Resource):
             file_object, mimetype="zip", download_name="timesketch_export.zip"
         )
 
-    def _export_view(self, view, sketch, zip_file):
-        """Export a view from a sketch and write it to a ZIP file.
+    @staticmethod
+    def _start_export_job(sketch: Sketch):
+        """Starts a Celery job that exports a sketch to a ZIP file.
 
-        Args:
-            view (timesketch.models.sketch.View): a View object.
-            sketch (timesketch.models.sketch.Sketch): a sketch object.
-            zip_file (ZipFile): a zip file handle that can be used to write
-                content to.
+        Returns:
+            JSON with the ID of the job, to poll and download the file with
+            the archive export resource.
         """
-        name = f"{view.id:04d}_{view.name:s}"
-        query_filter = None
-
-        if view.query_filter:
-            query_filter = json.loads(view.query_filter)
-
-        if not query_filter:
-            query_filter = self.DEFAULT_QUERY_FILTER
-
-        indices = self.sketch_indices
-
-        # Ignoring the size limits in views to reduce the amount of queries
-        # needed to get all the data.
-        query_filter["terminate_after"] = 10000
-        query_filter["size"] = 10000
-
-        query_dsl = view.query_dsl
-        if query_dsl:
-            query_dict = json.loads(query_dsl)
-            if not query_dict:
-                query_dsl = None
-
-        result = self.datastore.search(
-            sketch_id=sketch.id,
-            query_string=view.query_string,
-            query_filter=query_filter,
-            query_dsl=query_dsl,
-            enable_scroll=True,
-            indices=indices,
-        )
-
-        scroll_id = result.get("_scroll_id", "")
-        if scroll_id:
-            data_frame = lib_utils.query_results_to_dataframe(result, sketch)
-
-            total_count = result.get("hits", {}).get("total", {}).get("value", 0)
-
-            if isinstance(total_count, str):
-                try:
-                    total_count = int(total_count, 10)
-                except ValueError:
-                    total_count = 0
+        # Import here to avoid circular imports.
+        # pylint: disable=import-outside-toplevel
+        from timesketch.lib import tasks
 
-            event_count = len(result["hits"]["hits"])
-
-            while event_count < total_count:
-                # pylint: disable=unexpected-keyword-arg
-                result = self.datastore.client.scroll(scroll_id=scroll_id, scroll="1m")
-                event_count += len(result["hits"]["hits"])
-                add_frame = lib_utils.query_results_to_dataframe(result, sketch)
-                if add_frame.shape[0]:
-                    data_frame = pd.concat([data_frame, add_frame], sort=False)
-                else:
-                    logger.warning(
-                        "Data Frame returned from a search operation was "
-                        "empty, count {:d} out of {:d} total. Query is: "
-                        '"{:s}"'.format(
-                            event_count, total_count, view.query_string or query_dsl
-                        )
-                    )
-
-            fh = io.StringIO()
-            data_frame.to_csv(fh, index=False)
-            fh.seek(0)
-        else:
-            fh = export.query_results_to_filehandle(result, sketch)
-
-        zip_file.writestr(f"views/{name:s}.csv", data=fh.read())
-
-        if not view.user:
-            username = "System"
-        else:
-            username = view.user.username
-        meta = {
-            "name": view.name,
-            "view_id": view.id,
-            "description": view.description,
-            "query_string": view.query_string,
-            "query_filter": view.query_filter,
-            "query_dsl": view.query_dsl,
-            "username": username,
-            "sketch_id": view.sketch_id,
-        }
-        zip_file.writestr(f"views/{name:s}.meta", data=json.dumps(meta))
+        job = tasks.run_sketch_export.apply_async(
+            args=(sketch.id, current_user.username)
+        )
+        return jsonify(
+            {"meta": {"job_id": job.id, "job_state": job.state}, "objects": []}
+        )
 
     def _archive_sketch(self, sketch: Sketch):
         """Archives a sketch. This involves:
@@ -485,6 +231,10 @@ class SketchArchiveResource(resources.ResourceMixin, Resource):
              tools like `tsctl list-sketches --archived-with-open-indexes`
              to identify potential issues requiring administrative attention.
 
+        If ARCHIVE_BACKEND is set to "snapshot", the indices are not closed.
+        Instead a Celery task copies them to the snapshot repository, deletes
+        them from the cluster and sets the SearchIndex's status to 'archived'.
+
         This is a non-destructive operation; it does not delete any event data.
 
         Args:
@@ -558,6 +308,10 @@ class SketchArchiveResource(resources.ResourceMixin, Resource):
             can_be_closed = True
             if not search_index:
                 continue
+            # Shared indices hold the timelines of other sketches and stay
+            # open, archived timelines are filtered out of searches.
+            if index_placement.is_shared_index(search_index.index_name):
+                continue
             for timeline in search_index.timelines:
                 # If the timeline is in the sketch we are currently archiving,
                 # we can ignore its current status, as it's about to be archived.
@@ -583,6 +337,8 @@ class SketchArchiveResource(resources.ResourceMixin, Resource):
         # 3. Attempt to close all necessary OpenSearch indices first.
         successfully_closed_indexes = set()
         failed_to_find_indexes = set()
+        indexes_to_snapshot = set()
+        use_snapshots = index_archive.is_snapshot_backend()
 
         # Re-check for non-archivable states before proceeding
         for timeline_to_check in sketch.timelines:
@@ -604,6 +360,11 @@ class SketchArchiveResource(resources.ResourceMixin, Resource):
                 )
 
         for search_index in search_indexes_to_close:
+            if use_snapshots:
+                # Snapshots are taken in the background, the index stays
+                # searchable until it is deleted.
+                indexes_to_snapshot.add(search_index)
+                continue
             try:
                 self.datastore.client.indices.close(index=search_index.index_name)
                 successfully_closed_indexes.add(search_index)
@@ -661,13 +422,27 @@ class SketchArchiveResource(resources.ResourceMixin, Resource):
         # Commit changes after processing all indices
         db_session.commit()
 
+        if indexes_to_snapshot:
+            index_archive.schedule_archive(sketch.id, indexes_to_snapshot)
+            return jsonify(
+                {
+                    "message": (
+                        f"Sketch {sketch.id} has been archived, "
+                        f"{len(indexes_to_snapshot)} indices are being moved "
+                        "to the archive."
+                    )
+                }
+            )
+
         return jsonify({"message": f"Sketch {sketch.id} has been archived."})
 
     def _unarchive_sketch(self, sketch: Sketch):
         """Unarchives a sketch, making it and its data active again.
 
         This method attempts to open all necessary OpenSearch indices
-        associated with the sketch's archived timelines.
+        associated with the sketch's archived timelines. Indices that were
+        moved to the snapshot repository are restored by a Celery task, their
+        timelines stay 'archived' until the index is restored.
 
         The status of a SearchIndex is determined by the availability of
         its underlying OpenSearch index. If an index cannot be opened
@@ -738,8 +513,14 @@ class SketchArchiveResource(resources.ResourceMixin, Resource):
 
         # 3. Attempt to open all necessary OpenSearch indices first.
         successfully_opened_indexes = set()
+        indexes_to_restore = set()
 
         for search_index in search_indexes_to_open:
+            if not self.datastore.client.indices.exists(
+                index=search_index.index_name
+            ) and index_archive.has_snapshot(self.datastore, search_index.index_name):
+                indexes_to_restore.add(search_index)
+                continue
             try:
                 logger.info(
                     "Attempting to open OpenSearch index: %s (DB ID: %s)"
@@ -801,6 +582,9 @@ class SketchArchiveResource(resources.ResourceMixin, Resource):
         for timeline in sketch.timelines:
             if timeline.get_status.status != "archived":
                 continue
+            # Set to ready by the task once the index is restored.
+            if timeline.searchindex in indexes_to_restore:
+                continue
             # Only set timeline to ready if its index was successfully opened
             # OR if the index was already ready (e.g. shared with another
             # unarchived timeline)
@@ -823,6 +607,8 @@ class SketchArchiveResource(resources.ResourceMixin, Resource):
                 )
 
         for search_index in search_indexes_to_open:
+            if search_index in indexes_to_restore:
+                continue
             if search_index in successfully_opened_indexes:
                 search_index.set_status(status="ready")
                 logger.info(
@@ -845,4 +631,92 @@ class SketchArchiveResource(resources.ResourceMixin, Resource):
         db_session.commit()
         logger.info("Unarchiving of sketch %s complete.", sketch.id)
 
+        if indexes_to_restore:
+            index_archive.schedule_restore(sketch.id, indexes_to_restore)
+            return jsonify(
+                {
+                    "message": (
+                        f"Sketch {sketch.id} has been unarchived, "
+                        f"{len(indexes_to_restore)} indices are being restored "
+                        "from the archive."
+                    )
+                }
+            )
+
         return jsonify({"message": f"Sketch {sketch.id} has been unarchived."})
+
+
+class SketchArchiveExportResource(resources.ResourceMixin, Resource):
+    """Resource to download a sketch export created by a Celery job."""
+
+    @login_required
+    def get(self, sketch_id: int):
+        """Handles GET request to the resource.
+
+        Handler for /api/v1/sketches/<int:sketch_id>/archive/export/ with a
+        job_id argument. Returns the state of the export job while it runs,
+        and the ZIP file once the job has finished. The file supports range
+        requests, so an interrupted download can be resumed.
+
+        Args:
+            sketch_id: Integer primary key for a sketch database model
+
+        Returns:
+            JSON with the job state or the ZIP file.
+        """
+        sketch = Sketch.get_with_acl(sketch_id)
+        if not sketch:
+            abort(HTTP_STATUS_CODE_NOT_FOUND, "No sketch found with this ID.")
+
+        if not sketch.has_permission(current_user, "read"):
+            abort(
+                HTTP_STATUS_CODE_FORBIDDEN,
+                "User does not have sufficient access rights to read from a sketch.",
+            )
+
+        job_id = request.args.get("job_id", "")
+        try:
+            job_id = str(uuid.UUID(job_id))
+        except ValueError:
+            abort(HTTP_STATUS_CODE_BAD_REQUEST, "A valid job ID needs to be provided.")
+
+        # pylint: disable=too-many-function-args
+        celery_task = utils.get_celery_app().AsyncResult(job_id)
+        meta = {"job_id": job_id, "job_state": celery_task.state}
+
+        job_info = celery_task.info if isinstance(celery_task.info, dict) else {}
+        if job_info and job_info.get("sketch_id") != sketch.id:
+            abort(HTTP_STATUS_CODE_NOT_FOUND, "No export job found with this ID.")
+
+        # Errors of the export are returned by the job together with the
+        # sketch ID. A job that failed otherwise can not be tied to a sketch,
+        # so its error is not returned.
+        if celery_task.state == "FAILURE":
+            abort(HTTP_STATUS_CODE_BAD_REQUEST, "Unable to export the sketch.")
+
+        if "error" in job_info:
+            abort(
+                HTTP_STATUS_CODE_BAD_REQUEST,
+                f"Unable to export the sketch, with error: {job_info['error']!s}",
+            )
+
+        if celery_task.state != "SUCCESS":
+            for key in ("started_at", "step"):
+                if key in job_info:
+                    meta[key] = job_info[key]
+            return jsonify({"meta": meta, "objects": []})
+
+        export_path = export.get_export_path(sketch.id, job_id)
+        if not os.path.isfile(export_path):
+            abort(
+                HTTP_STATUS_CODE_NOT_FOUND,
+                "The export file does not exist anymore, export the sketch again.",
+            )
+
+        return send_file(
+            export_path,
+            mimetype="application/zip",
+            as_attachment=True,
+            download_name="timesketch_export.zip",
+            conditional=True,
+        )
@@ -14,6 +14,7 @@
 """Event resources for version 1 of the Timesketch API."""
 
 import codecs
+import collections
 import datetime
 import hashlib
 import json
@@ -38,7 +39,9 @@ from flask_login import login_required
 from flask_login import current_user
 
 from timesketch.api.v1 import resources
+from timesketch.lib import field_catalog
 from timesketch.lib import forms
+from timesketch.lib.datastores import mapping_cache
 from timesketch.lib.definitions import HTTP_STATUS_CODE_OK
 from timesketch.lib.definitions import HTTP_STATUS_CODE_CREATED
 from timesketch.lib.definitions import HTTP_STATUS_CODE_BAD_REQUEST
@@ -97,6 +100,26 @@ def _tag_event(row, tag_dict, tags_to_add, datastore, flush_interval):
     tag_dict["number_of_events_with_added_tags"] += 1
 
 
+def _update_field_catalogs(datastore, sketch, index_names, fields):
+    """Adds fields written to events to the field catalogs of the timelines.
+
+    Args:
+        datastore (opensearch.OpenSearchDataStore): the datastore object.
+        sketch (Sketch): the sketch the events belong to.
+        index_names (set[str]): names of the indices the events are stored in.
+        fields (set[str]): names of the fields that were written.
+    """
+    timelines = [
+        timeline
+        for timeline in sketch.timelines
+        if timeline.searchindex.index_name in index_names
+    ]
+    changed = field_catalog.add_fields(datastore.client, timelines, fields)
+    if changed:
+        db_session.add_all(changed)
+        db_session.commit()
+
+
 class EventCreateResource(resources.ResourceMixin, Resource):
     """Resource to create an annotation for an event."""
 
@@ -459,6 +482,7 @@ class EventAddAttributeResource(resources.ResourceMixin, Resource):
 
         events_by_index = self._parse_request(request)
         info_dict["chunks_per_index"] = {index: [] for index in list(events_by_index)}
+        added_fields = collections.defaultdict(set)
 
         allowed_statuses = ["ready"]
         if current_app.config.get("SEARCH_PROCESSING_TIMELINES", False):
@@ -550,8 +574,11 @@ class EventAddAttributeResource(resources.ResourceMixin, Resource):
                         )
                         info_dict["events_modified"] += 1
                         info_dict["attributes_added"] += len(new_attributes)
+                        added_fields[index].update(new_attributes)
 
         datastore.flush_queued_events()
+        for index, fields in added_fields.items():
+            _update_field_catalogs(datastore, sketch, {index}, fields)
         info_dict["error_count"] = len(info_dict["last_10_errors"])
         # Only return last 10 errors to prevent overly large responses.
         info_dict["last_10_errors"] = info_dict["last_10_errors"][-10:]
@@ -769,6 +796,10 @@ class EventTaggingResource(resources.ResourceMixin, Resource):
             flush_interval=flush_interval,
         )
         datastore.flush_queued_events()
+        if tag_dict["number_of_events_with_added_tags"]:
+            _update_field_catalogs(
+                datastore, sketch, set(event_df["_index"].unique()), {"tag"}
+            )
 
         if verbose:
             tag_dict["time_to_tag"] = time.time() - time_tag_start
@@ -1042,14 +1073,22 @@ class EventAnnotationResource(resources.ResourceMixin, Resource):
         annotation_type = form.annotation_type.data
         events = form.events.raw_data
 
+        if "comment" not in annotation_type and "label" not in annotation_type:
+            abort(
+                HTTP_STATUS_CODE_BAD_REQUEST,
+                "Annotation type needs to be either label or comment, "
+                f"not {annotation_type!s}",
+            )
+
+        # All events are validated before any of them is changed, so that a
+        # request is either applied to all events or to none of them.
+        validated_events = []
         for _event in events:
             if not _event.get("_index"):
                 searchindex_id = self._get_search_index_for_event(sketch, _event["_id"])
                 _event["_index"] = searchindex_id
             else:
                 searchindex_id = _event["_index"]
-            searchindex = SearchIndex.query.filter_by(index_name=searchindex_id).first()
-            event_id = _event["_id"]
 
             if searchindex_id not in indices:
                 abort(
@@ -1057,6 +1096,60 @@ class EventAnnotationResource(resources.ResourceMixin, Resource):
                     f"Search index ID ({searchindex_id!s}) does not belong to the"
                     " list of indices",
                 )
+            validated_events.append((searchindex_id, _event["_id"]))
+
+        label_name = None
+        conclusion = None
+        if "comment" in annotation_type:
+            datastore_label = "__ts_comment"
+            datastore_action = "add"
+        else:
+            # TODO(#3434): Fix the label logic.
+            conclusion_id = request.json.get("conclusion_id", None)
+
+            # Construct the specific fact label if a conclusion_id is present
+            label_name = form.annotation.data
+            if "__ts_fact" in label_name and conclusion_id:
+                label_name = f"__ts_fact_{conclusion_id}"
+
+            if "__ts_fact" in label_name:
+                if current_search_node:
+                    conclusion = self._get_current_search_node_conclusion(
+                        current_search_node
+                    )
+                if not conclusion and conclusion_id:
+                    conclusion = InvestigativeQuestionConclusion.get_by_id(
+                        conclusion_id
+                    )
+
+                if not conclusion:
+                    abort(
+                        HTTP_STATUS_CODE_BAD_REQUEST,
+                        "Conclusion ID is required to add a fact.",
+                    )
+                # Enforce that the conclusion belongs to the sketch in the
+                # URL to prevent cross-sketch linkage of facts.
+                if conclusion.investigativequestion.sketch.id != sketch.id:
+                    abort(
+                        HTTP_STATUS_CODE_NOT_FOUND,
+                        "No conclusion found with this ID.",
+                    )
+
+            toggle = False
+            if "__ts_star" in label_name:
+                toggle = True
+            if "__ts_hidden" in label_name:
+                toggle = True
+            if "__ts_fact" in label_name:
+                toggle = True
+            if form.remove.data:
+                toggle = True
+
+            datastore_label = label_name
+            datastore_action = "toggle" if toggle else "add"
+
+        for searchindex_id, event_id in validated_events:
+            searchindex = SearchIndex.query.filter_by(index_name=searchindex_id).first()
 
             # Get or create an event in the SQL database to have something
             # to attach the annotation to.
@@ -1073,27 +1166,10 @@ class EventAnnotationResource(resources.ResourceMixin, Resource):
                     comment=form.annotation.data, user=current_user
                 )
                 event.comments.append(annotation)
-                self.datastore.set_label(
-                    searchindex_id,
-                    event_id,
-                    sketch.id,
-                    current_user.id,
-                    "__ts_comment",
-                    toggle=False,
-                )
                 if current_search_node:
                     current_search_node.add_label("__ts_comment")
 
-            elif "label" in annotation_type:
-                # TODO(#3434): Fix the label logic.
-                conclusion = None
-                conclusion_id = request.json.get("conclusion_id", None)
-
-                # Construct the specific fact label if a conclusion_id is present
-                label_name = form.annotation.data
-                if "__ts_fact" in label_name and conclusion_id:
-                    label_name = f"__ts_fact_{conclusion_id}"
-
+            else:
                 annotation = Event.Label.get_or_create(
                     label=label_name, user=current_user
                 )
@@ -1101,55 +1177,16 @@ class EventAnnotationResource(resources.ResourceMixin, Resource):
                 if annotation not in event.labels:
                     event.labels.append(annotation)
 
-                toggle = False
-                if "__ts_star" in label_name:
-                    toggle = True
-                if "__ts_hidden" in label_name:
-                    toggle = True
-                if "__ts_fact" in label_name:
-                    toggle = True
-                if form.remove.data:
-                    toggle = True
-
-                self.datastore.set_label(
-                    searchindex_id,
-                    event_id,
-                    sketch.id,
-                    current_user.id,
-                    label_name,
-                    toggle=toggle,
-                )
-
                 if current_search_node:
                     if "__ts_star" in label_name:
                         search_node_label = "__ts_star"
                     elif "__ts_fact" in label_name:
                         search_node_label = "__ts_fact"
-                        conclusion = self._get_current_search_node_conclusion(
-                            current_search_node
-                        )
                     else:
                         search_node_label = "__ts_label"
                     current_search_node.add_label(search_node_label)
 
-                if "__ts_fact" in label_name:
-                    if not conclusion and conclusion_id:
-                        conclusion = InvestigativeQuestionConclusion.get_by_id(
-                            conclusion_id
-                        )
-
-                    if not conclusion:
-                        abort(
-                            HTTP_STATUS_CODE_BAD_REQUEST,
-                            "Conclusion ID is required to add a fact.",
-                        )
-                    # Enforce that the conclusion belongs to the sketch in the
-                    # URL to prevent cross-sketch linkage of facts.
-                    if conclusion.investigativequestion.sketch.id != sketch.id:
-                        abort(
-                            HTTP_STATUS_CODE_NOT_FOUND,
-                            "No conclusion found with this ID.",
-                        )
+                if conclusion:
                     # Adding facts to conclusions
                     if not form.remove.data:
                         event.conclusions.append(conclusion)
@@ -1157,18 +1194,41 @@ class EventAnnotationResource(resources.ResourceMixin, Resource):
                     if form.remove.data:
                         event.conclusions.remove(conclusion)
 
-            else:
-                abort(
-                    HTTP_STATUS_CODE_BAD_REQUEST,
-                    "Annotation type needs to be either label or comment, "
-                    f"not {annotation_type!s}",
-                )
-
             annotations.append(annotation)
             # Save the event to the database
             db_session.add(event)
             db_session.commit()
 
+        # The same label change applies to all events, it is written to the
+        # datastore in bulk. An event that is listed more than once is
+        # toggled once for every time it is listed, like it would be with
+        # one update per event.
+        datastore_events = validated_events
+        if datastore_action == "toggle":
+            counts = collections.Counter(validated_events)
+            datastore_events = [event for event, count in counts.items() if count % 2]
+
+        if datastore_events:
+            counts = self.datastore.bulk_label_events(
+                sketch_id=sketch.id,
+                user_id=current_user.id,
+                label=datastore_label,
+                action=datastore_action,
+                events=datastore_events,
+            )
+            _update_field_catalogs(
+                self.datastore,
+                sketch,
+                {index_name for index_name, _ in datastore_events},
+                {"timesketch_label"},
+            )
+            if counts["failed"]:
+                abort(
+                    HTTP_STATUS_CODE_INTERNAL_SERVER_ERROR,
+                    f"Unable to change the label of {counts['failed']:d} out of "
+                    f"{counts['total']:d} events in the datastore.",
+                )
+
         return self.to_json(annotations, status_code=HTTP_STATUS_CODE_CREATED)
 
     @login_required
@@ -1518,6 +1578,7 @@ class MarkEventsWithTimelineIdentifier(resources.ResourceMixin, Resource):
             body={"properties": {"timesketch_label": mapping_update}},
             index=searchindex.index_name,
         )
+        mapping_cache.invalidate([searchindex.index_name])
 
         return HTTP_STATUS_CODE_OK
 
@@ -1596,8 +1657,6 @@ class EventUnTagResource(resources.ResourceMixin, Resource):
                 "single request",
             )
 
-        datastore = self.datastore
-
         allowed_statuses = ["ready"]
         if current_app.config.get("SEARCH_PROCESSING_TIMELINES", False):
             allowed_statuses.append("processing")
@@ -1608,6 +1667,7 @@ class EventUnTagResource(resources.ResourceMixin, Resource):
             if t.get_status.status.lower() in allowed_statuses
         }
 
+        events_to_untag = []
         for _event in events:
             # every event entry can have a dedicated searchindex_id or searchindex_name
             searchindex_id = _event.get("searchindex_id", None)
@@ -1647,29 +1707,15 @@ class EventUnTagResource(resources.ResourceMixin, Resource):
                     "does not belong to the sketch",
                 )
 
-            result = self.datastore.get_event(searchindex.index_name, _event.get("_id"))
-            if not result:
-                logger.debug(
-                    "Unable to find event %s in index %s to untag",
-                    _event.get("_id"),
-                    searchindex.index_name,
-                )
-
-            existing_tags = result.get("_source").get("tag", [])
+            events_to_untag.append((searchindex.index_name, _event.get("_id")))
 
-            new_tags = list(set(existing_tags) - set(tags_to_remove))
-
-            if existing_tags == new_tags:
-                continue
-
-            # write the new tags to the datastore
-            datastore.import_event(
-                index_name=searchindex.index_name,
-                event_id=_event.get("_id"),
-                event={"tag": new_tags},
-                flush_interval=datastore.DEFAULT_FLUSH_INTERVAL,
-            )
-
-        datastore.flush_queued_events()
+        if events_to_untag and tags_to_remove:
+            counts = self.datastore.bulk_remove_tags(events_to_untag, tags_to_remove)
+            if counts["failed"]:
+                abort(
+                    HTTP_STATUS_CODE_INTERNAL_SERVER_ERROR,
+                    f"Unable to remove the tags from {counts['failed']:d} out of "
+                    f"{counts['total']:d} events in the datastore.",
+                )
 
         return HTTP_STATUS_CODE_OK
@@ -33,6 +33,7 @@ from flask_login import current_user
 
 from timesketch.api.v1 import export
 from timesketch.api.v1 import resources
+from timesketch.lib import field_catalog
 from timesketch.lib import forms
 from timesketch.lib import utils
 from timesketch.lib.utils import get_validated_indices
@@ -195,6 +196,14 @@ class ExploreResource(resources.ResourceMixin, Resource):
                 "No valid search indices were found to perform the search on.",
             )
 
+        # Read wildcard capable fields from the timeline field catalogs, this
+        # is None if any timeline lacks a catalog and mappings are needed.
+        wildcard_fields = None
+        if use_wildcard_fields and timeline_ids:
+            wildcard_fields = field_catalog.get_wildcard_fields(
+                t for t in sketch.timelines if t.id in timeline_ids
+            )
+
         # Make sure we have a query string or star filter
         if not (
             form.query.data,
@@ -247,6 +256,7 @@ class ExploreResource(resources.ResourceMixin, Resource):
                     timeline_ids=timeline_ids,
                     count=True,
                     use_wildcard_fields=use_wildcard_fields,
+                    wildcard_fields=wildcard_fields,
                 )
             except DatastoreTimeoutError as e:
                 abort(HTTP_STATUS_CODE_GATEWAY_TIMEOUT, str(e))
@@ -268,6 +278,8 @@ class ExploreResource(resources.ResourceMixin, Resource):
                 "query_dsl": query_dsl,
                 "query_filter": query_filter,
                 "return_fields": return_fields,
+                # Exports of all events run as a background job.
+                "max_events_per_shard": export.QUERY_TO_FILEHANDLE_MAX_EVENTS,
             }
             with zipfile.ZipFile(file_object, mode="w") as zip_file:
                 zip_file.writestr("METADATA", data=json.dumps(form_data))
@@ -302,6 +314,7 @@ class ExploreResource(resources.ResourceMixin, Resource):
                     enable_scroll=enable_scroll,
                     timeline_ids=timeline_ids,
                     use_wildcard_fields=use_wildcard_fields,
+                    wildcard_fields=wildcard_fields,
                 )
             except DatastoreTimeoutError as e:
                 abort(HTTP_STATUS_CODE_GATEWAY_TIMEOUT, str(e))
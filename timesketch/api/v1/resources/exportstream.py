@@ -26,12 +26,14 @@ from flask_login import login_required
 from flask_login import current_user
 
 from timesketch.api.v1 import resources
+from timesketch.lib import columnar_export
 from timesketch.lib import utils
 from timesketch.lib import forms
 from timesketch.lib.definitions import HTTP_STATUS_CODE_NOT_FOUND
 from timesketch.lib.definitions import HTTP_STATUS_CODE_FORBIDDEN
 from timesketch.lib.definitions import HTTP_STATUS_CODE_BAD_REQUEST
 from timesketch.lib.definitions import DEFAULT_SOURCE_FIELDS
+from timesketch.lib.datastores import mapping_cache
 from timesketch.lib.datastores.opensearch import OpenSearchDataStore
 from timesketch.models.sketch import Sketch
 
@@ -76,13 +78,18 @@ class ExportStreamListResource(resources.ResourceMixin, Resource):
         Args:
             sketch_id (int): Integer primary key for a sketch database model.
 
+        The export format is set with the optional "format" attribute of the
+        request, either "jsonl" (default), "arrow" for an Apache Arrow IPC
+        stream or "parquet".
+
         Returns:
-            Streamed response of events in JSONL format.
+            Streamed response of events in the requested format.
 
         Raises:
             HTTPException:
-                - 400 (BAD_REQUEST): If the form data is invalid or if no
-                  valid search indices are found for the export.
+                - 400 (BAD_REQUEST): If the form data or the export format
+                  is invalid or if no valid search indices are found for the
+                  export.
                 - 403 (FORBIDDEN): If the user does not have read permissions
                   for the sketch, or if the sketch is archived.
                 - 404 (NOT_FOUND): If the sketch with the given ID does not
@@ -108,6 +115,22 @@ class ExportStreamListResource(resources.ResourceMixin, Resource):
                 "Unable to export data, unable to validate form data",
             )
 
+        export_format = request.json.get("format") or columnar_export.FORMAT_JSONL
+        if not columnar_export.get_mimetype(export_format):
+            abort(
+                HTTP_STATUS_CODE_BAD_REQUEST,
+                f"Unsupported export format: {export_format}",
+            )
+        if (
+            export_format in columnar_export.COLUMNAR_FORMATS
+            and not columnar_export.ARROW_AVAILABLE
+        ):
+            abort(
+                HTTP_STATUS_CODE_BAD_REQUEST,
+                f"The {export_format} export format is not available on this "
+                "server, pyarrow is not installed.",
+            )
+
         query_dsl = form.dsl.data
         query_filter = request.json.get("filter") or {}
         return_field_string = form.fields.data
@@ -155,6 +178,9 @@ class ExportStreamListResource(resources.ResourceMixin, Resource):
             query_dsl,
             None,  # No aggregations
             timeline_ids,
+            wildcard_fields=self.datastore.get_routing_wildcard_fields(
+                indices_for_pit, form.query.data
+            ),
         )
 
         # Prepare the lightweight body for slicing.
@@ -170,6 +196,20 @@ class ExportStreamListResource(resources.ResourceMixin, Resource):
         if post_filter:
             base_query_body["post_filter"] = post_filter
 
+        column_types = None
+        if export_format in columnar_export.COLUMNAR_FORMATS:
+            # The schema is derived up front so that all record batches share
+            # it, independent of the fields set in the exported events.
+            column_types = columnar_export.get_column_types(
+                mapping_cache.get_cache().get_properties(
+                    self.datastore.client, indices_for_pit
+                ),
+                return_fields,
+            )
+        batch_size = current_app.config.get(
+            "EXPORT_STREAM_BATCH_SIZE", columnar_export.DEFAULT_BATCH_SIZE
+        )
+
         def generate():
             try:
                 event_generator = self.datastore.export_events_with_slicing(
@@ -177,6 +217,15 @@ class ExportStreamListResource(resources.ResourceMixin, Resource):
                     base_query_body=base_query_body,
                 )
 
+                if column_types is not None:
+                    yield from columnar_export.stream_events(
+                        event_generator,
+                        column_types,
+                        export_format=export_format,
+                        batch_size=batch_size,
+                    )
+                    return
+
                 for event in event_generator:
                     yield json.dumps(event) + "\n"
             except Exception as e:
@@ -190,5 +239,6 @@ class ExportStreamListResource(resources.ResourceMixin, Resource):
                 raise
 
         return Response(
-            stream_with_context(generate()), mimetype="application/x-json-stream"
+            stream_with_context(generate()),
+            mimetype=columnar_export.get_mimetype(export_format),
         )
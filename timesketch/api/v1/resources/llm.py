@@ -17,11 +17,11 @@ import logging
 import multiprocessing
 import multiprocessing.managers
 import time
-from typing import Any
+from typing import Any, Optional
 from werkzeug.exceptions import HTTPException
 
 import prometheus_client
-from flask import request, abort, jsonify, Response
+from flask import current_app, request, abort, jsonify, Response
 from flask_login import login_required, current_user
 from flask_restful import Resource
 
@@ -29,6 +29,7 @@ from timesketch.api.v1 import resources
 from timesketch.lib import definitions, utils
 from timesketch.lib.definitions import METRICS_NAMESPACE
 from timesketch.lib.llms.providers import manager as llm_provider_manager
+from timesketch.lib.llms.providers import runner as llm_runner
 from timesketch.lib.llms.features import manager as feature_manager
 from timesketch.models.sketch import Sketch
 
@@ -53,6 +54,7 @@ def _get_content_with_timeout_helper(
     feature_payload: dict[str, Any],
     prompt: str,
     shared_response: multiprocessing.managers.DictProxy,
+    cache_config: Optional[dict[str, Any]] = None,
 ) -> None:
     """Runs the LLM generation in a separate process and stores the result.
 
@@ -68,6 +70,8 @@ def _get_content_with_timeout_helper(
         prompt: The prompt string to send to the LLM.
         shared_response: A multiprocessing manager dictionary to store the
             response or error.
+        cache_config: Optional settings of the response cache, as returned
+            by llm_runner.get_cache_config.
     """
     # Define fallback variables for logging to prevent NameError in except block
     feature_name = "Unknown"
@@ -86,7 +90,8 @@ def _get_content_with_timeout_helper(
         provider_name = getattr(provider_class, "NAME", "Unknown")
 
         llm_provider = provider_class(config=provider_config)
-        api_response = llm_provider.generate(prompt, response_schema=response_schema)
+        prompt_runner = llm_runner.create_runner(llm_provider, cache_config)
+        api_response = prompt_runner.generate(prompt, response_schema=response_schema)
         shared_response.update({"response": api_response})
     except Exception as e:  # pylint: disable=broad-except
         process_logger = logging.getLogger("timesketch.api.llm.subprocess")
@@ -487,6 +492,7 @@ class LLMResource(resources.ResourceMixin, Resource):
         )
         provider_payload = llm_provider.to_dict()
         feature_payload = feature.get_execution_context()
+        cache_config = llm_runner.get_cache_config(current_app.config)
 
         with multiprocessing.Manager() as manager_mp:
             shared_response = manager_mp.dict()
@@ -497,6 +503,7 @@ class LLMResource(resources.ResourceMixin, Resource):
                     feature_payload,
                     prompt,
                     shared_response,
+                    cache_config,
                 ),
             )
             process.start()
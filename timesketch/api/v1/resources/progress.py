@@ -0,0 +1,151 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Progress resources for version 1 of the Timesketch API."""
+
+import json
+import logging
+import time
+
+from flask import abort
+from flask import current_app
+from flask import jsonify
+from flask import request
+from flask import Response
+from flask import stream_with_context
+from flask_restful import Resource
+from flask_login import login_required
+from flask_login import current_user
+
+from timesketch.api.v1 import resources
+from timesketch.lib import progress
+from timesketch.lib.definitions import HTTP_STATUS_CODE_BAD_REQUEST
+from timesketch.lib.definitions import HTTP_STATUS_CODE_FORBIDDEN
+from timesketch.lib.definitions import HTTP_STATUS_CODE_INTERNAL_SERVER_ERROR
+from timesketch.lib.definitions import HTTP_STATUS_CODE_NOT_FOUND
+from timesketch.models.sketch import Sketch
+
+logger = logging.getLogger("timesketch.api.progress")
+
+# Number of seconds an event stream is kept open, clients reconnect with the
+# Last-Event-ID header afterwards.
+DEFAULT_STREAM_DURATION = 300
+
+# Minimum number of seconds an event stream waits for new events per read.
+# Without it a stream requested with wait=0 would read in a busy loop.
+MIN_STREAM_WAIT = 1
+
+
+class SketchProgressResource(resources.ResourceMixin, Resource):
+    """Resource to follow status transitions of timelines and analyzers."""
+
+    @staticmethod
+    def _stream(channel, sketch_id: int, since: str, wait: float):
+        """Returns a response with the events as server-sent events."""
+        duration = int(
+            current_app.config.get("PROGRESS_STREAM_DURATION", DEFAULT_STREAM_DURATION)
+        )
+        wait = max(wait, MIN_STREAM_WAIT)
+
+        def generate():
+            last_event_id = since
+            deadline = time.time() + duration
+            yield "retry: 3000\n\n"
+            while time.time() < deadline:
+                try:
+                    result = channel.read(sketch_id, since=last_event_id, wait=wait)
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.warning("Unable to read progress events: %s", e)
+                    return
+                if result["reset"]:
+                    yield "event: reset\ndata: {}\n\n"
+                for event in result["events"]:
+                    yield "id: {0:s}\ndata: {1:s}\n\n".format(
+                        event["event_id"], json.dumps(event)
+                    )
+                if not result["events"]:
+                    # Keeps proxies from closing an idle connection.
+                    yield ": keepalive\n\n"
+                last_event_id = result["last_event_id"]
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @login_required
+    def get(self, sketch_id: int):
+        """Handles GET request to the resource.
+
+        Without "since", only the ID of the latest event is returned, clients
+        then fetch the full state once and read the events after that ID. If
+        the Accept header asks for text/event-stream, events are sent as
+        server-sent events, otherwise the request waits up to "wait" seconds
+        for new events and returns them in JSON (long polling).
+
+        Args:
+            sketch_id: Integer primary key for a sketch database model
+
+        Returns:
+            Progress events in JSON (instance of flask.wrappers.Response) or
+            a stream of server-sent events.
+        """
+        sketch = Sketch.get_with_acl(sketch_id)
+        if not sketch:
+            abort(HTTP_STATUS_CODE_NOT_FOUND, "No sketch found with this ID.")
+        if not sketch.has_permission(current_user, "read"):
+            abort(
+                HTTP_STATUS_CODE_FORBIDDEN, "User does not have read access to sketch"
+            )
+
+        channel = progress.get_channel()
+        if not channel.enabled:
+            # Clients fall back to polling the task and analyzer resources.
+            return jsonify({"objects": [], "meta": {"enabled": False}})
+
+        max_wait = float(
+            current_app.config.get("PROGRESS_MAX_WAIT", progress.DEFAULT_MAX_WAIT)
+        )
+        try:
+            wait = min(float(request.args.get("wait", max_wait)), max_wait)
+        except ValueError:
+            abort(HTTP_STATUS_CODE_BAD_REQUEST, "Wait must be a number of seconds.")
+
+        since = request.headers.get("Last-Event-ID") or request.args.get("since", "")
+        if "text/event-stream" in request.headers.get("Accept", ""):
+            if not since:
+                since = channel.get_last_event_id(sketch.id)
+            return self._stream(channel, sketch.id, since, wait)
+
+        try:
+            result = channel.read(sketch.id, since=since, wait=wait)
+        except ValueError:
+            abort(HTTP_STATUS_CODE_BAD_REQUEST, "Invalid event ID.")
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Unable to read progress events: %s", e)
+            abort(
+                HTTP_STATUS_CODE_INTERNAL_SERVER_ERROR,
+                "Unable to read progress events.",
+            )
+
+        return jsonify(
+            {
+                "objects": result["events"],
+                "meta": {
+                    "enabled": True,
+                    "last_event_id": result["last_event_id"],
+                    "reset": result["reset"],
+                },
+            }
+        )
@@ -16,8 +16,7 @@
 import logging
 import uuid as uuid_lib
 import json
-from os.path import isdir
-from typing import Optional
+from typing import List, Optional
 from requests.exceptions import RequestException
 
 from flask import jsonify
@@ -41,7 +40,8 @@ from timesketch.api.v1 import resources
 from timesketch.lib.definitions import HTTP_STATUS_CODE_FORBIDDEN
 from timesketch.lib.definitions import HTTP_STATUS_CODE_NOT_FOUND
 from timesketch.lib.definitions import HTTP_STATUS_CODE_BAD_REQUEST
-from timesketch.lib.dfiq import DFIQCatalog
+from timesketch.lib.definitions import HTTP_STATUS_CODE_INTERNAL_SERVER_ERROR
+from timesketch.lib import dfiq_cache
 from timesketch.models import db_session
 from timesketch.models.sketch import SearchTemplate, Sketch
 from timesketch.models.sketch import Scenario
@@ -54,12 +54,12 @@ from timesketch.lib.analyzers.dfiq_plugins.manager import DFIQAnalyzerManager
 logger = logging.getLogger("timesketch.scenario_api")
 
 
-def _load_dfiq_from_yeti() -> Optional[DFIQCatalog]:
+def _load_dfiq_from_yeti() -> Optional[List[str]]:
     """Fetches DFIQ templates from a configured Yeti instance.
 
     Returns:
-        A DFIQ object populated with templates from Yeti, or None if not
-        configured or if an error occurs.
+        A list of DFIQ YAML strings from Yeti, or None if not configured or
+        if an error occurs.
     """
     if not YETI_AVAILABLE:
         logger.error(
@@ -86,10 +86,6 @@ def _load_dfiq_from_yeti() -> Optional[DFIQCatalog]:
         questions = api.search_dfiq(name="", dfiq_type="question")
         all_dfiq_objects = scenarios + facets + questions
 
-        if not all_dfiq_objects:
-            logger.info("No DFIQ objects found in Yeti.")
-            return None
-
     except yeti_errors.YetiApiError as e:
         logger.error("Failed to fetch DFIQ objects from Yeti: %s", str(e))
         return None
@@ -97,20 +93,19 @@ def _load_dfiq_from_yeti() -> Optional[DFIQCatalog]:
         logger.error("A network error occurred while connecting to Yeti: %s", str(e))
         return None
 
-    # Extract YAML strings and load them directly into a DFIQ object in memory.
-    yaml_strings = [
-        obj["dfiq_yaml"] for obj in all_dfiq_objects if obj.get("dfiq_yaml")
-    ]
-
-    if not yaml_strings:
-        return None
+    if not all_dfiq_objects:
+        logger.info("No DFIQ objects found in Yeti.")
 
-    return DFIQCatalog.from_yaml_list(yaml_strings)
+    # Extract the YAML strings, they are parsed when the catalog is built.
+    return [obj["dfiq_yaml"] for obj in all_dfiq_objects if obj.get("dfiq_yaml")]
 
 
 def load_dfiq_from_config():
     """Create DFIQ object from config, potentially merging filesystem and Yeti sources.
 
+    The catalog is cached for the process and only rebuilt when the files in
+    DFIQ_PATH or the templates in Yeti change.
+
     Returns:
         DFIQ object or None if DFIQ is not enabled or no templates are found.
     """
@@ -118,46 +113,23 @@ def load_dfiq_from_config():
         logger.debug("DFIQ is disabled. Enable in the timesketch.conf!")
         return None
 
-    dfiq_path = current_app.config.get("DFIQ_PATH")
-    dfiq_from_files = None
-    if dfiq_path and isdir(dfiq_path):
-        try:
-            dfiq_from_files = DFIQCatalog(dfiq_path)
-        except Exception as e:  # pylint: disable=broad-exception-caught
-            logger.error("Error loading DFIQ from path %s: %s", dfiq_path, str(e))
-    else:
-        logger.info(
-            "No DFIQ_PATH configured or path is invalid, skipping file-based loading."
-        )
-
-    if not current_app.config.get("YETI_DFIQ_ENABLED"):
-        return dfiq_from_files
-
-    dfiq_from_yeti = _load_dfiq_from_yeti()
-
-    if not dfiq_from_files:
-        return dfiq_from_yeti
-    if not dfiq_from_yeti:
-        return dfiq_from_files
-
-    # Create a new, empty DFIQ object to hold the merged results.
-    final_dfiq = DFIQCatalog()
-
-    # Merge components from both sources.
-    merged_components = dfiq_from_files.components.copy()
-    merged_components.update(dfiq_from_yeti.components)
-
-    final_dfiq.components = merged_components
-
-    final_dfiq.id_to_uuid_map = {
-        c.id: c.uuid for c in final_dfiq.components.values() if c.id
-    }
-
-    # Rebuild the graph from the final, merged set of components.
-    if final_dfiq.components:
-        final_dfiq.graph = final_dfiq._build_graph()  # pylint: disable=protected-access
-
-    return final_dfiq
+    yeti_loader = None
+    if current_app.config.get("YETI_DFIQ_ENABLED"):
+        yeti_loader = _load_dfiq_from_yeti
+
+    return dfiq_cache.get_cache().get_catalog(
+        current_app.config.get("DFIQ_PATH"),
+        yeti_loader=yeti_loader,
+        yeti_ttl=float(
+            current_app.config.get("DFIQ_YETI_CACHE_TTL", dfiq_cache.DEFAULT_YETI_TTL)
+        ),
+        snapshot_path=current_app.config.get("DFIQ_YETI_SNAPSHOT_PATH", ""),
+        check_interval=float(
+            current_app.config.get(
+                "DFIQ_CACHE_CHECK_INTERVAL", dfiq_cache.DEFAULT_CHECK_INTERVAL
+            )
+        ),
+    )
 
 
 def check_and_run_dfiq_analysis_steps(
@@ -1095,22 +1067,26 @@ class QuestionConclusionResource(resources.ResourceMixin, Resource):
             )
 
         label_to_remove = f"__ts_fact_{conclusion_id}"
-        events_to_update = list(conclusion.events)
-        for event in events_to_update:
-            existing_labels = event.get_labels
-
-            if label_to_remove in existing_labels:
-                self.datastore.set_label(
-                    searchindex_id=event.searchindex.index_name,
-                    event_id=event.document_id,
-                    sketch_id=sketch.id,
-                    user_id=current_user.id,
-                    label=label_to_remove,
-                    toggle=True,
+        events_to_update = [
+            (event.searchindex.index_name, event.document_id)
+            for event in conclusion.events
+            if label_to_remove in event.get_labels
+        ]
+        if events_to_update:
+            counts = self.datastore.bulk_label_events(
+                sketch_id=sketch.id,
+                user_id=current_user.id,
+                label=label_to_remove,
+                action="remove",
+                events=events_to_update,
+            )
+            if counts["failed"]:
+                abort(
+                    HTTP_STATUS_CODE_INTERNAL_SERVER_ERROR,
+                    f"Unable to remove the fact label from {counts['failed']:d} "
+                    f"out of {counts['total']:d} events, the conclusion is kept.",
                 )
 
-        self.datastore.flush_queued_events()
-
         db_session.delete(conclusion)
         db_session.commit()
 
@@ -24,6 +24,7 @@ from flask_login import current_user
 
 from timesketch.api.v1 import resources
 from timesketch.lib import forms
+from timesketch.lib import index_placement
 from timesketch.lib.definitions import HTTP_STATUS_CODE_OK
 from timesketch.lib.definitions import HTTP_STATUS_CODE_CREATED
 from timesketch.lib.definitions import HTTP_STATUS_CODE_BAD_REQUEST
@@ -226,6 +227,21 @@ class SearchIndexResource(resources.ResourceMixin, Resource):
         # TODO: Actually implement to delete the index
         db_session.commit()
 
+        if index_placement.is_shared_index(searchindex.index_name):
+            # Only the events of this search index are removed from a
+            # shared index.
+            for timeline in searchindex.timelines:
+                try:
+                    self.datastore.delete_timeline_events(
+                        searchindex.index_name, timeline.id
+                    )
+                except opensearchpy.NotFoundError:
+                    logger.warning(
+                        "Unable to delete timeline: {:d}, the index wasn't "
+                        "found.".format(timeline.id)
+                    )
+            return HTTP_STATUS_CODE_OK
+
         other_indexes = SearchIndex.query.filter_by(
             index_name=searchindex.index_name
         ).all()
@@ -128,6 +128,9 @@ class SigmaRuleListResource(resources.ResourceMixin, Resource):
         )
 
         sigma_rule.set_status(parsed_rule.get("status", "experimental"))
+        ts_sigma_lib.set_compiled_rule(
+            sigma_rule, parsed_rule, ts_sigma_lib.get_sigma_config_hash()
+        )
         # query string is not stored in the database but we attach it to
         # the JSON result here as it is added in the GET methods
         sigma_rule.query_string = parsed_rule.get("search_query")
@@ -185,6 +188,8 @@ class SigmaRuleResource(resources.ResourceMixin, Resource):
         return_rule.append(
             ts_sigma_lib.enrich_sigma_rule_object(rule=rule, parse_yaml=True)
         )
+        # Stores the parsed rule if it was stale.
+        db_session.commit()
 
         return jsonify({"objects": return_rule, "meta": {}})
 
@@ -268,6 +273,9 @@ class SigmaRuleResource(resources.ResourceMixin, Resource):
         sigma_rule_from_db.title = parsed_rule.get("title")
         sigma_rule_from_db.description = parsed_rule.get("description")
         sigma_rule_from_db.set_status(parsed_rule.get("status", "experimental"))
+        ts_sigma_lib.set_compiled_rule(
+            sigma_rule_from_db, parsed_rule, ts_sigma_lib.get_sigma_config_hash()
+        )
 
         try:
             db_session.add(sigma_rule_from_db)
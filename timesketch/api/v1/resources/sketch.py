@@ -34,7 +34,9 @@ from sqlalchemy import inspect
 
 from timesketch.api.v1 import resources
 from timesketch.api.v1 import utils
+from timesketch.lib import field_catalog
 from timesketch.lib import forms
+from timesketch.lib import index_placement
 from timesketch.lib.definitions import HTTP_STATUS_CODE_OK
 from timesketch.lib.definitions import HTTP_STATUS_CODE_CREATED
 from timesketch.lib.definitions import HTTP_STATUS_CODE_BAD_REQUEST
@@ -47,6 +49,7 @@ from timesketch.models import db_session
 from timesketch.models.sketch import Sketch
 from timesketch.models.sketch import SearchTemplate
 from timesketch.models.sketch import View
+from timesketch.models.sketch import Timeline
 
 logger = logging.getLogger("timesketch.sketch_api")
 
@@ -394,11 +397,12 @@ class SketchResource(resources.ResourceMixin, Resource):
 
         # Get mappings for all indices in the sketch. This is used to set
         # columns shown in the event list.
-        sketch_indices = [
-            t.searchindex.index_name
+        ready_timelines = [
+            t
             for t in sketch.active_timelines
             if t.searchindex.get_status.status == "ready"
         ]
+        sketch_indices = [t.searchindex.index_name for t in ready_timelines]
 
         # Make sure the list of index names is uniq
         sketch_indices = list(set(sketch_indices))
@@ -410,7 +414,11 @@ class SketchResource(resources.ResourceMixin, Resource):
             indices_metadata[timeline.searchindex.index_name] = {}
             stats_per_timeline[timeline.id] = {"count": 0}
 
-        if not sketch_indices:
+        # Timelines indexed with a field catalog don't need the index mappings.
+        catalogs = [t.get_field_catalog() for t in ready_timelines]
+        use_catalogs = bool(catalogs) and all(catalogs)
+
+        if not sketch_indices or use_catalogs:
             mappings_settings = {}
         else:
             try:
@@ -425,6 +433,20 @@ class SketchResource(resources.ResourceMixin, Resource):
                 mappings_settings = {}
 
         mappings = []
+        catalog_wildcard_fields = set()
+
+        if use_catalogs:
+            for timeline, catalog_dict in zip(ready_timelines, catalogs):
+                # Catalogs only exist for timelines with a __ts_timeline_id.
+                indices_metadata[timeline.searchindex.index_name]["is_legacy"] = False
+                catalog = field_catalog.FieldCatalog.from_dict(catalog_dict)
+                catalog_wildcard_fields.update(catalog.wildcard_fields)
+                for field, field_dict in catalog_dict.get("fields", {}).items():
+                    if field.startswith("__") or field.split(".")[0] == (
+                        "timesketch_label"
+                    ):
+                        continue
+                    mappings.append({"field": field, "type": field_dict["type"]})
 
         for index_name, value in mappings_settings.items():
             # The structure is different in ES version 6.x and lower. This check
@@ -490,7 +512,9 @@ class SketchResource(resources.ResourceMixin, Resource):
 
         # Check if any field mapping or multi-field sub-field contains 'wildcard' type
         supports_wildcard = False
-        if sketch_indices:
+        if use_catalogs:
+            supports_wildcard = bool(catalog_wildcard_fields)
+        elif sketch_indices:
             try:
                 supports_wildcard = bool(
                     self.datastore.get_wildcard_fields(
@@ -568,6 +592,44 @@ class SketchResource(resources.ResourceMixin, Resource):
         }
         return self.to_json(sketch, meta=meta)
 
+    def _delete_shared_index_timeline(self, sketch, timeline, searchindex):
+        """Permanently delete a timeline that is stored in a shared index.
+
+        Only the events of the timeline are deleted from the index, which
+        holds the timelines of other sketches as well. The search index is
+        deleted from the database if no other sketch uses it.
+
+        Args:
+            sketch (Sketch): The sketch that is deleted.
+            timeline (Timeline): The timeline to delete.
+            searchindex (SearchIndex): The search index of the timeline.
+        """
+        try:
+            self.datastore.delete_timeline_events(searchindex.index_name, timeline.id)
+        except NotFoundError:
+            logger.warning(
+                "OpenSearch index %s was not found while deleting timeline %s.",
+                searchindex.index_name,
+                timeline.id,
+            )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            e_msg = (
+                f"An unexpected error occurred while deleting timeline "
+                f"{timeline.id} from OpenSearch index {searchindex.index_name}: {e}"
+            )
+            logger.error(e_msg)
+            abort(HTTP_STATUS_CODE_INTERNAL_SERVER_ERROR, e_msg)
+
+        other_sketch_timeline = searchindex.timelines.filter(
+            Timeline.sketch_id != sketch.id
+        ).first()
+        if other_sketch_timeline or not inspect(searchindex).persistent:
+            if inspect(timeline).persistent:
+                db_session.delete(timeline)
+            return
+        # The timelines of the search index are deleted with it.
+        db_session.delete(searchindex)
+
     def _force_delete_sketch(self, sketch):
         """Permanently delete a sketch and all its associated data.
 
@@ -607,6 +669,10 @@ class SketchResource(resources.ResourceMixin, Resource):
                     db_session.delete(timeline)
                 continue
 
+            if index_placement.is_shared_index(searchindex.index_name):
+                self._delete_shared_index_timeline(sketch, timeline, searchindex)
+                continue
+
             # Check if this index is used in any other active sketch
             if searchindex.is_shared(exclude_sketch_id=sketch.id):
                 logger.warning(
@@ -834,6 +900,11 @@ class SketchResource(resources.ResourceMixin, Resource):
             for timeline in sketch.timelines:
                 searchindex = timeline.searchindex
 
+                # Shared indices are kept open for the timelines of other
+                # sketches.
+                if index_placement.is_shared_index(searchindex.index_name):
+                    continue
+
                 # Check if this index is used in any other active sketch
                 if searchindex.is_shared(exclude_sketch_id=sketch.id):
                     logger.warning(
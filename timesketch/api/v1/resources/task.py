@@ -23,19 +23,16 @@ from flask_login import login_required
 from flask_login import current_user
 
 from timesketch.api.v1 import resources
+from timesketch.api.v1 import utils
 from timesketch.models.sketch import SearchIndex
 
 
 class TaskResource(resources.ResourceMixin, Resource):
     """Resource to get information on celery task."""
 
-    # pylint: disable=import-outside-toplevel
     def __init__(self):
         super().__init__()
-        # pylint: disable=import-outside-toplevel
-        from timesketch.app import create_celery_app
-
-        self.celery = create_celery_app()
+        self.celery = utils.get_celery_app()
 
     def _get_celery_information(self, job_id):
         # pylint: disable=too-many-function-args
@@ -69,13 +66,11 @@ class TaskResource(resources.ResourceMixin, Resource):
             return jsonify(schema)
 
         indices = (
-            SearchIndex.query.filter(SearchIndex.status.any(status="processing"))
+            SearchIndex.query.filter(SearchIndex.current_status == "processing")
             .filter_by(user=current_user)
             .all()
         )
         for search_index in indices:
-            if search_index.get_status.status == "deleted":
-                continue
             task = self._get_celery_information(search_index.index_name)
             task["name"] = search_index.name
 
@@ -29,7 +29,10 @@ from flask_login import current_user
 
 from timesketch.api.v1 import resources
 from timesketch.api.v1 import utils
+from timesketch.lib import field_catalog
 from timesketch.lib import forms
+from timesketch.lib import index_placement
+from timesketch.lib.datastores import index_archive
 from timesketch.lib.definitions import HTTP_STATUS_CODE_OK
 from timesketch.lib.definitions import HTTP_STATUS_CODE_CREATED
 from timesketch.lib.definitions import HTTP_STATUS_CODE_BAD_REQUEST
@@ -579,7 +582,29 @@ class TimelineResource(resources.ResourceMixin, Resource):
         # Check if this searchindex is used in other sketches.
         close_index = True
         searchindex = timeline.searchindex
-        if searchindex.is_shared(exclude_sketch_id=sketch.id):
+        if index_placement.is_shared_index(searchindex.index_name):
+            # A shared index holds timelines of other sketches as well, only
+            # the events of this timeline are removed from it.
+            close_index = False
+            try:
+                self.datastore.delete_timeline_events(
+                    searchindex.index_name, timeline.id
+                )
+            except opensearchpy.NotFoundError:
+                logger.error(
+                    "Unable to delete timeline %d - index %s not found",
+                    timeline.id,
+                    searchindex.index_name,
+                )
+            except opensearchpy.TransportError as e:
+                error_msg = (
+                    f"Unable to delete timeline {timeline.id:d} from index "
+                    f"{searchindex.index_name:s}. Error: {e!s}"
+                )
+                logger.error(error_msg)
+                abort(HTTP_STATUS_CODE_INTERNAL_SERVER_ERROR, error_msg)
+            timeline.set_status(status="deleted")
+        elif searchindex.is_shared(exclude_sketch_id=sketch.id):
             close_index = False
         else:
             # If not shared with other sketches, we still need to check if there
@@ -595,7 +620,12 @@ class TimelineResource(resources.ResourceMixin, Resource):
                     close_index = False
                     break
 
-        if close_index:
+        archive_index = close_index and index_archive.is_snapshot_backend()
+        if archive_index:
+            # The index is moved to the archive by a background task, which
+            # sets the status of the search index.
+            timeline.set_status(status="archived")
+        elif close_index:
             try:
                 self.datastore.client.indices.close(index=searchindex.index_name)
             except opensearchpy.NotFoundError:
@@ -618,6 +648,9 @@ class TimelineResource(resources.ResourceMixin, Resource):
         sketch.timelines.remove(timeline)
         db_session.commit()
 
+        if archive_index:
+            index_archive.schedule_archive(sketch.id, [searchindex])
+
         # Update the last activity of a sketch.
         utils.update_sketch_last_activity(sketch)
 
@@ -720,15 +753,18 @@ class TimelineCreateResource(resources.ResourceMixin, Resource):
         return self.to_json(searchindex, status_code=HTTP_STATUS_CODE_CREATED)
 
 
-# TODO(Issue 3200): Research more efficient ways to gather unique fields.
 class TimelineFieldsResource(resources.ResourceMixin, Resource):
     """Resource to retrieve unique fields present in a timeline.
 
-    This resource aggregates data types within a timeline and then queries
-    OpenSearch to retrieve all unique fields present across those data types,
-    excluding default Timesketch fields.
+    Fields are read from the field catalog built when the timeline was
+    indexed and updated when fields are added to its events. Timelines
+    indexed before catalogs existed fall back to aggregating the data types
+    within the timeline and sampling one event per data type. Default
+    Timesketch fields are excluded.
     """
 
+    EXCLUDED_FIELDS = frozenset(["datetime", "timestamp", "__ts_timeline_id"])
+
     @login_required
     def get(self, sketch_id, timeline_id):
         """Handles GET request to retrieve unique fields in a timeline.
@@ -764,6 +800,19 @@ class TimelineFieldsResource(resources.ResourceMixin, Resource):
                 "The timeline does not belong to the sketch.",
             )
 
+        catalog = timeline.get_field_catalog()
+        if catalog:
+            timeline_fields = field_catalog.FieldCatalog.from_dict(catalog).fields
+            return jsonify(
+                {
+                    "objects": [
+                        field
+                        for field in timeline_fields
+                        if field not in self.EXCLUDED_FIELDS
+                    ]
+                }
+            )
+
         index_name = timeline.searchindex.index_name
         timeline_fields = set()
 
@@ -807,11 +856,7 @@ class TimelineFieldsResource(resources.ResourceMixin, Resource):
             if isinstance(result, dict) and result.get("hits", {}).get("hits", []):
                 event = result["hits"]["hits"][0]["_source"]
                 for field in event:
-                    if field not in [
-                        "datetime",
-                        "timestamp",
-                        "__ts_timeline_id",
-                    ]:
+                    if field not in self.EXCLUDED_FIELDS:
                         timeline_fields.add(field)
 
         return jsonify({"objects": sorted(list(timeline_fields))})
@@ -35,6 +35,7 @@ from timesketch.lib.definitions import HTTP_STATUS_CODE_BAD_REQUEST
 from timesketch.lib.definitions import HTTP_STATUS_CODE_FORBIDDEN
 from timesketch.lib.definitions import HTTP_STATUS_CODE_NOT_FOUND
 from timesketch.lib.definitions import HTTP_STATUS_CODE_INTERNAL_SERVER_ERROR
+from timesketch.lib import index_placement
 from timesketch.models import db_session
 from timesketch.models.sketch import SearchIndex
 from timesketch.models.sketch import Sketch
@@ -55,6 +56,7 @@ class UploadFileResource(resources.ResourceMixin, Resource):
         index_name: str = "",
         data_label: str = "",
         extension: str = "",
+        file_size: int = 0,
     ):
         """Returns a SearchIndex object to be used for uploads.
 
@@ -70,6 +72,8 @@ class UploadFileResource(resources.ResourceMixin, Resource):
             extension: optional file extension if a file is being uploaded,
                 if supplied and no data label used, then the extension will be
                 used as a data label.
+            file_size: optional size of the uploaded file in bytes, small
+                files are placed in a shared index if that is enabled.
 
         Returns:
             A SearchIndex object.
@@ -103,15 +107,36 @@ class UploadFileResource(resources.ResourceMixin, Resource):
             if t.get_status.status not in ("deleted", "archived")
         )
         for index in indices:
+            # Shared indices are chosen for each upload, based on its size.
+            if index_placement.is_shared_index(index.index_name):
+                continue
             if index.has_label(data_label) and sketch.has_permission(
                 permission="write", user=current_user
             ):
                 return index
 
-        index_name = index_name or uuid.uuid4().hex
-        searchindex = SearchIndex.get_or_create(
-            name=name, index_name=index_name, description=description, user=current_user
-        )
+        if not index_name and index_placement.is_small_upload(extension, file_size):
+            index_name = index_placement.get_shared_index_name(
+                self.datastore, index_placement.get_source_type(extension)
+            )
+
+        if index_placement.is_shared_index(index_name):
+            # Timelines of other sketches may have the same name, each
+            # timeline gets a search index of its own.
+            searchindex = SearchIndex(
+                name=name,
+                index_name=index_name,
+                description=description,
+                user=current_user,
+            )
+        else:
+            index_name = index_name or uuid.uuid4().hex
+            searchindex = SearchIndex.get_or_create(
+                name=name,
+                index_name=index_name,
+                description=description,
+                user=current_user,
+            )
 
         searchindex.grant_permission(permission="read", user=current_user)
         searchindex.grant_permission(permission="write", user=current_user)
@@ -178,6 +203,7 @@ class UploadFileResource(resources.ResourceMixin, Resource):
             index_name=index_name,
             data_label=data_label,
             extension=file_extension,
+            file_size=int(form.get("total_file_size", 0) or 0),
         )
 
         if not searchindex:
@@ -512,15 +538,14 @@ class UploadFileResource(resources.ResourceMixin, Resource):
             )
 
         # For file chunks we need the correct filepath, otherwise each chunk
-        # will get their own UUID as a filename.
-        if index_name:
-            if not utils.is_valid_index_name(index_name):
-                abort(
-                    HTTP_STATUS_CODE_BAD_REQUEST,
-                    "Unable to upload file. Index name is not valid",
-                )
-            file_path = utils.format_upload_path(upload_folder, index_name)
-        elif chunk_index_name:
+        # will get their own UUID as a filename. The path never depends on
+        # the index name, timelines of different uploads may share an index.
+        if index_name and not utils.is_valid_index_name(index_name):
+            abort(
+                HTTP_STATUS_CODE_BAD_REQUEST,
+                "Unable to upload file. Index name is not valid",
+            )
+        if chunk_index_name:
             if not utils.is_valid_index_name(chunk_index_name):
                 abort(
                     HTTP_STATUS_CODE_BAD_REQUEST,
@@ -653,6 +678,12 @@ class UploadFileResource(resources.ResourceMixin, Resource):
         utils.update_sketch_last_activity(sketch)
 
         index_name = form.get("index_name", "")
+        # Shared indices are only chosen by the server, based on the upload.
+        if index_placement.is_shared_index(index_name):
+            abort(
+                HTTP_STATUS_CODE_BAD_REQUEST,
+                "Unable to upload data. Index name is not valid",
+            )
         plaso_event_filter = form.get("plaso_event_filter", "")
         file_storage = request.files.get("file")
         if file_storage:
@@ -15,6 +15,7 @@
 
 import os
 import shutil
+import sys
 import tempfile
 import json
 from unittest import mock
@@ -25,11 +26,18 @@ from timesketch.lib.definitions import HTTP_STATUS_CODE_NOT_FOUND
 from timesketch.lib.definitions import HTTP_STATUS_CODE_OK
 from timesketch.lib.definitions import HTTP_STATUS_CODE_FORBIDDEN
 from timesketch.lib.definitions import HTTP_STATUS_CODE_GATEWAY_TIMEOUT
+from timesketch.lib.definitions import HTTP_STATUS_CODE_INTERNAL_SERVER_ERROR
 from timesketch.lib.errors import DatastoreTimeoutError
+from timesketch.lib import field_catalog
+from timesketch.lib import progress
+from timesketch.lib.aggregators import cache as aggregator_cache
 from timesketch.lib.testlib import BaseTest
 from timesketch.lib.testlib import MockDataStore
+from timesketch.lib.testlib import MockOpenSearchClient
+from timesketch.lib.testlib import MockOpenSearchIndices
 from timesketch.lib.dfiq import DFIQCatalog
 from timesketch.api.v1.resources import scenarios
+from timesketch.models.sketch import Event
 from timesketch.models.sketch import Scenario
 from timesketch.models.sketch import InvestigativeQuestion
 from timesketch.models.sketch import InvestigativeQuestionApproach
@@ -490,6 +498,111 @@ class SketchResourceTest(BaseTest):
         self.assertEqual(tl_fail.get_status.status, "fail")
         self.assertEqual(tl_proc.get_status.status, "processing")
 
+    @mock.patch("timesketch.api.v1.resources.OpenSearchDataStore", MockDataStore)
+    @mock.patch("timesketch.api.v1.resources.archive.index_archive.schedule_restore")
+    @mock.patch("timesketch.api.v1.resources.archive.index_archive.has_snapshot")
+    @mock.patch("timesketch.api.v1.resources.archive.index_archive.schedule_archive")
+    def test_archive_sketch_to_snapshots(
+        self, mock_schedule_archive, mock_has_snapshot, mock_schedule_restore
+    ):
+        """Tests archiving and unarchiving a sketch with the snapshot backend."""
+        self.app.config["ARCHIVE_BACKEND"] = "snapshot"
+        self.app.config["ARCHIVE_SNAPSHOT_LOCATION"] = "/mnt/snapshots"
+        self.login()
+
+        sketch = self._create_sketch(name="snapshots", user=self.user1, acl=True)
+        searchindex = self._create_searchindex("snapshot_index", self.user1)
+        searchindex.set_status("ready")
+        timeline = self._create_timeline("timeline", sketch, searchindex, self.user1)
+        timeline.set_status("ready")
+        db_session.commit()
+
+        resource_url = f"/api/v1/sketches/{sketch.id}/archive/"
+        with mock.patch.object(
+            MockOpenSearchIndices, "close", create=True
+        ) as mock_close:
+            response = self.client.post(
+                resource_url,
+                data=json.dumps({"action": "archive"}),
+                content_type="application/json",
+            )
+            mock_close.assert_not_called()
+        self.assert200(response)
+        mock_schedule_archive.assert_called_once_with(sketch.id, {searchindex})
+        self.assertEqual(sketch.get_status.status, "archived")
+        self.assertEqual(timeline.get_status.status, "archived")
+        # Set by the task once the snapshot is taken.
+        self.assertEqual(searchindex.get_status.status, "ready")
+
+        searchindex.set_status("archived")
+        db_session.commit()
+        mock_has_snapshot.return_value = True
+        with mock.patch.object(MockOpenSearchIndices, "exists", return_value=False):
+            response = self.client.post(
+                resource_url,
+                data=json.dumps({"action": "unarchive"}),
+                content_type="application/json",
+            )
+        self.assert200(response)
+        mock_schedule_restore.assert_called_once_with(sketch.id, {searchindex})
+        self.assertEqual(sketch.get_status.status, "ready")
+        # Set by the task once the index is restored.
+        self.assertEqual(timeline.get_status.status, "archived")
+        self.assertEqual(searchindex.get_status.status, "archived")
+
+    @mock.patch("timesketch.api.v1.utils.get_celery_app")
+    def test_download_sketch_export(self, mock_celery_app):
+        """Tests polling and downloading a sketch export job."""
+        self.login()
+        job_id = "8d1e7f8c-7c62-4b9a-9bd2-6d3e38b5b1c1"
+        resource_url = f"/api/v1/sketches/1/archive/export/?job_id={job_id}"
+        job = mock_celery_app.return_value.AsyncResult.return_value
+
+        response = self.client.get("/api/v1/sketches/1/archive/export/?job_id=1")
+        self.assertEqual(response.status_code, HTTP_STATUS_CODE_BAD_REQUEST)
+
+        job.state = "PROGRESS"
+        job.info = {"sketch_id": 1, "started_at": 1.0, "step": "events"}
+        response = self.client.get(resource_url)
+        self.assert200(response)
+        self.assertEqual(response.json["meta"]["job_state"], "PROGRESS")
+        self.assertEqual(response.json["meta"]["step"], "events")
+
+        job.info = {"sketch_id": 2}
+        response = self.client.get(resource_url)
+        self.assert404(response)
+
+        # Errors are only returned for jobs of the sketch.
+        job.state = "SUCCESS"
+        job.info = {"sketch_id": 2, "error": "secret"}
+        response = self.client.get(resource_url)
+        self.assert404(response)
+        job.info = {"sketch_id": 1, "error": "secret"}
+        response = self.client.get(resource_url)
+        self.assert400(response)
+        self.assertIn("secret", response.json["message"])
+
+        job.state = "FAILURE"
+        job.info = RuntimeError("secret")
+        response = self.client.get(resource_url)
+        self.assert400(response)
+        self.assertNotIn("secret", response.json["message"])
+
+        job.state = "SUCCESS"
+        job.info = {"sketch_id": 1, "size": 10}
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.app.config["EXPORT_FOLDER"] = temp_dir
+            response = self.client.get(resource_url)
+            self.assert404(response)
+
+            export_path = os.path.join(temp_dir, f"timesketch_export_1_{job_id}.zip")
+            with open(export_path, "wb") as fh:
+                fh.write(b"0123456789")
+            response = self.client.get(resource_url, headers={"Range": "bytes=4-"})
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response.data, b"456789")
+            response.close()
+
     def test_sketch_delete_not_existant_sketch(self):
         """Authenticated request to delete a sketch that does not exist."""
         self.login()
@@ -927,6 +1040,10 @@ class AggregationExploreResourceTest(BaseTest):
 
     resource_url = "/api/v1/sketches/1/aggregation/explore/"
 
+    def setUp(self):
+        super().setUp()
+        aggregator_cache.get_cache().clear()
+
     @mock.patch("timesketch.api.v1.resources.OpenSearchDataStore", MockDataStore)
     def test_heatmap_aggregation(self):
         """Authenticated request to get aggregation requests."""
@@ -938,6 +1055,138 @@ class AggregationExploreResourceTest(BaseTest):
             content_type="application/json",
         )
         self.assert200(response)
+        self.assertFalse(response.json["meta"]["cached"])
+
+    @mock.patch("timesketch.api.v1.resources.OpenSearchDataStore", MockDataStore)
+    def test_cached_aggregation(self):
+        """Identical aggregations on unchanged indices are served from cache."""
+        self.login()
+        data = {"aggregation_dsl": "test"}
+        stats = {
+            "indices": {
+                "test": {
+                    "primaries": {
+                        "indexing": {"index_total": 10, "delete_total": 0},
+                        "docs": {"count": 10, "deleted": 0},
+                    }
+                }
+            }
+        }
+        with mock.patch.object(
+            MockOpenSearchIndices, "stats", return_value=stats
+        ), mock.patch.object(
+            MockOpenSearchClient,
+            "search",
+            return_value={"took": 1, "aggregations": {}},
+        ) as mock_search:
+            for _ in range(2):
+                response = self.client.post(
+                    self.resource_url,
+                    data=json.dumps(data, ensure_ascii=False),
+                    content_type="application/json",
+                )
+                self.assert200(response)
+            self.assertTrue(response.json["meta"]["cached"])
+            mock_search.assert_called_once()
+
+            # A write to the index invalidates the cached result.
+            stats["indices"]["test"]["primaries"]["indexing"]["index_total"] = 11
+            response = self.client.post(
+                self.resource_url,
+                data=json.dumps(data, ensure_ascii=False),
+                content_type="application/json",
+            )
+            self.assertFalse(response.json["meta"]["cached"])
+            self.assertEqual(mock_search.call_count, 2)
+
+    @mock.patch("timesketch.api.v1.resources.OpenSearchDataStore", MockDataStore)
+    def test_aggregation_dsl_shared_index(self):
+        """Aggregations on a shared index only include the sketch timelines."""
+        shared_index = self._create_searchindex(
+            "timesketch_shared_plaso_000001", self.user1
+        )
+        timeline = self._create_timeline(
+            "shared", self.sketch1, shared_index, self.user1
+        )
+        self._create_timeline("other", self.sketch2, shared_index, self.user1)
+        self.login()
+        data = {"aggregation_dsl": json.dumps({"aggs": {}})}
+        with mock.patch.object(
+            MockOpenSearchClient,
+            "search",
+            return_value={"took": 1, "aggregations": {}},
+        ) as mock_search:
+            response = self.client.post(
+                self.resource_url,
+                data=json.dumps(data, ensure_ascii=False),
+                content_type="application/json",
+            )
+        self.assert200(response)
+        body = mock_search.call_args.kwargs["body"]
+        timeline_filter = body["query"]["bool"]["filter"][0]["bool"]["should"][0]
+        self.assertEqual(
+            timeline_filter,
+            {"terms": {"__ts_timeline_id": sorted([self.timeline.id, timeline.id])}},
+        )
+
+    @mock.patch("timesketch.api.v1.resources.OpenSearchDataStore", MockDataStore)
+    def test_async_aggregation(self):
+        """Aggregations can run as background jobs that are polled."""
+        mock_tasks = mock.Mock()
+        mock_apply_async = mock_tasks.run_explore_aggregation.apply_async
+        mock_apply_async.return_value = mock.Mock(id="job-1", state="PENDING")
+        self.login()
+        data = {"aggregation_dsl": "test", "run_async": True}
+        with mock.patch.dict(sys.modules, {"timesketch.lib.tasks": mock_tasks}):
+            response = self.client.post(
+                self.resource_url,
+                data=json.dumps(data, ensure_ascii=False),
+                content_type="application/json",
+            )
+        self.assert200(response)
+        self.assertEqual(response.json["meta"]["job_id"], "job-1")
+        self.assertEqual(response.json["objects"], [])
+        job_kwargs = mock_apply_async.call_args[1]["kwargs"]
+        self.assertEqual(job_kwargs["sketch_id"], 1)
+        self.assertEqual(job_kwargs["aggregation_dsl"], "test")
+
+        job_result = {
+            "sketch_id": 1,
+            "meta": {"method": "aggregator_query"},
+            "objects": [{"foo": "bar"}],
+        }
+        with mock.patch("timesketch.api.v1.utils.get_celery_app") as mock_celery:
+            mock_celery.return_value.AsyncResult.return_value = mock.Mock(
+                state="SUCCESS", info=job_result
+            )
+            response = self.client.get(self.resource_url + "?job_id=job-1")
+            self.assert200(response)
+            self.assertEqual(response.json["objects"], [{"foo": "bar"}])
+            self.assertEqual(response.json["meta"]["job_state"], "SUCCESS")
+
+            # Jobs of other sketches are not returned.
+            job_result["sketch_id"] = 2
+            response = self.client.get(self.resource_url + "?job_id=job-1")
+            self.assert404(response)
+
+            # Errors are only returned for jobs of the sketch.
+            job_result = {"sketch_id": 2, "error": "secret"}
+            mock_celery.return_value.AsyncResult.return_value = mock.Mock(
+                state="SUCCESS", info=job_result
+            )
+            response = self.client.get(self.resource_url + "?job_id=job-1")
+            self.assert404(response)
+            job_result["sketch_id"] = 1
+            response = self.client.get(self.resource_url + "?job_id=job-1")
+            self.assert400(response)
+            self.assertIn("secret", response.json["message"])
+
+            mock_celery.return_value.AsyncResult.return_value = mock.Mock(
+                state="FAILURE", info=RuntimeError("secret")
+            )
+            response = self.client.get(self.resource_url + "?job_id=job-1")
+            self.assert400(response)
+            self.assertNotIn("secret", response.json["message"])
 
 
 class EventResourceTest(BaseTest):
@@ -1032,6 +1281,32 @@ class EventAddAttributeResourceTest(BaseTest):
         response = self.client.post(self.resource_url, json=events)
         self.assertEqual(expected_response, response.json)
 
+    @mock.patch("timesketch.api.v1.resources.OpenSearchDataStore", MockDataStore)
+    def test_add_attributes_field_catalog(self):
+        """Test that added attributes are added to the field catalogs."""
+        self.login()
+
+        events = {
+            "events": [
+                {
+                    "_id": "1",
+                    "_type": "_doc",
+                    "_index": self.searchindex.index_name,
+                    "attributes": [{"attr_name": "foo", "attr_value": "bar"}],
+                }
+            ]
+        }
+        with mock.patch(
+            "timesketch.api.v1.resources.event.field_catalog.add_fields",
+            return_value=[],
+        ) as mock_add_fields:
+            response = self.client.post(self.resource_url, json=events)
+
+        self.assertEqual(HTTP_STATUS_CODE_OK, response.status_code)
+        _, timelines, fields = mock_add_fields.call_args[0]
+        self.assertEqual(timelines, [self.timeline])
+        self.assertEqual(fields, {"foo"})
+
     @mock.patch("timesketch.api.v1.resources.OpenSearchDataStore", MockDataStore)
     def test_incorrect_content_type(self):
         """Test that a content-type other than application/json is handled."""
@@ -1403,6 +1678,74 @@ class EventAnnotationResourceTest(BaseTest):
             self.assertIsInstance(response.json, dict)
             self.assertEqual(response.status_code, HTTP_STATUS_CODE_CREATED)
 
+    @mock.patch("timesketch.api.v1.resources.OpenSearchDataStore", MockDataStore)
+    def test_post_annotate_validates_all_events(self):
+        """No event is annotated if one of the events is invalid."""
+        self.login()
+        data = {
+            "annotation": "__ts_star",
+            "annotation_type": "label",
+            "events": [
+                {"_index": "test", "_id": "valid"},
+                {"_index": "invalid_searchindex", "_id": "invalid"},
+            ],
+        }
+        with mock.patch.object(MockDataStore, "bulk_label_events") as mock_bulk:
+            response = self.client.post(
+                self.resource_url,
+                data=json.dumps(data),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, HTTP_STATUS_CODE_BAD_REQUEST)
+        mock_bulk.assert_not_called()
+        self.assertIsNone(Event.query.filter_by(document_id="valid").first())
+
+    @mock.patch("timesketch.api.v1.resources.OpenSearchDataStore", MockDataStore)
+    def test_post_annotate_toggles_duplicates(self):
+        """Events listed twice are toggled twice, which leaves them as is."""
+        self.login()
+        data = {
+            "annotation": "__ts_star",
+            "annotation_type": "label",
+            "events": [
+                {"_index": "test", "_id": "twice"},
+                {"_index": "test", "_id": "once"},
+                {"_index": "test", "_id": "twice"},
+            ],
+        }
+        with mock.patch.object(MockDataStore, "bulk_label_events") as mock_bulk:
+            mock_bulk.return_value = {"total": 1, "updated": 1, "noop": 0, "failed": 0}
+            response = self.client.post(
+                self.resource_url,
+                data=json.dumps(data),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, HTTP_STATUS_CODE_CREATED)
+        self.assertEqual(mock_bulk.call_args.kwargs["action"], "toggle")
+        self.assertEqual(mock_bulk.call_args.kwargs["events"], [("test", "once")])
+
+    @mock.patch("timesketch.api.v1.resources.OpenSearchDataStore", MockDataStore)
+    def test_post_annotate_datastore_failure(self):
+        """Events that fail to update in the datastore are reported."""
+        self.login()
+        data = {
+            "annotation": "__ts_star",
+            "annotation_type": "label",
+            "events": [
+                {"_index": "test", "_id": "first"},
+                {"_index": "test", "_id": "second"},
+            ],
+        }
+        with mock.patch.object(MockDataStore, "bulk_label_events") as mock_bulk:
+            mock_bulk.return_value = {"total": 2, "updated": 1, "noop": 0, "failed": 1}
+            response = self.client.post(
+                self.resource_url,
+                data=json.dumps(data),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, HTTP_STATUS_CODE_INTERNAL_SERVER_ERROR)
+        self.assertIn(b"1 out of 2 events", response.data)
+
     def test_post_annotate_invalid_index_resource(self):
         """
         Authenticated request to create an annotation, but in the wrong index.
@@ -1469,6 +1812,96 @@ class TimelineListResourceTest(BaseTest):
         self.assertEqual(response.status_code, HTTP_STATUS_CODE_CREATED)
 
 
+class TimelineFieldsResourceTest(BaseTest):
+    """Test TimelineFieldsResource."""
+
+    resource_url = "/api/v1/sketches/1/timelines/1/fields/"
+
+    @mock.patch("timesketch.api.v1.resources.OpenSearchDataStore", MockDataStore)
+    def test_fields_from_catalog(self):
+        """Fields are read from the catalog without querying the datastore."""
+        catalog = field_catalog.FieldCatalog()
+        catalog.add_event(
+            {
+                "message": "foo",
+                "data_type": "fs:stat",
+                "datetime": "2026-01-01T00:00:00",
+                "timestamp": 1,
+                "__ts_timeline_id": 1,
+            }
+        )
+        self.timeline.set_field_catalog(catalog.to_dict())
+        self._commit_to_database(self.timeline)
+
+        self.login()
+        with mock.patch.object(MockDataStore, "search") as mock_search:
+            response = self.client.get(self.resource_url)
+            mock_search.assert_not_called()
+        self.assert200(response)
+        self.assertEqual(response.json["objects"], ["data_type", "message"])
+
+
+class SketchProgressResourceTest(BaseTest):
+    """Test SketchProgressResource."""
+
+    resource_url = "/api/v1/sketches/1/progress/"
+
+    def test_progress_disabled(self):
+        """Without a Redis URL clients are told to keep polling."""
+        self.login()
+        with mock.patch.object(
+            progress, "get_channel", return_value=progress.ProgressChannel()
+        ):
+            response = self.client.get(self.resource_url)
+        self.assert200(response)
+        self.assertFalse(response.json["meta"]["enabled"])
+
+    def test_progress_long_poll(self):
+        """Events after the given event ID are returned."""
+        channel = mock.Mock()
+        channel.enabled = True
+        channel.read.return_value = {
+            "events": [{"event_id": "2-0", "status": "ready"}],
+            "last_event_id": "2-0",
+            "reset": False,
+        }
+        self.login()
+        with mock.patch.object(progress, "get_channel", return_value=channel):
+            response = self.client.get(self.resource_url + "?since=1-0&wait=60")
+            invalid = self.client.get(self.resource_url + "?wait=soon")
+        self.assert200(response)
+        self.assertEqual(response.json["meta"]["last_event_id"], "2-0")
+        self.assertEqual(response.json["objects"][0]["status"], "ready")
+        channel.read.assert_called_once_with(
+            1, since="1-0", wait=progress.DEFAULT_MAX_WAIT
+        )
+        self.assert400(invalid)
+
+    def test_progress_stream_min_wait(self):
+        """Event streams block on reads, even if no wait is requested."""
+        channel = mock.Mock()
+        channel.enabled = True
+        channel.read.return_value = {
+            "events": [],
+            "last_event_id": "1-0",
+            "reset": False,
+        }
+        self.login()
+        with mock.patch.object(
+            progress, "get_channel", return_value=channel
+        ), mock.patch("timesketch.api.v1.resources.progress.time") as mock_time:
+            # The stream is started, reads once and then reaches its end.
+            mock_time.time.side_effect = [0, 0, 1000]
+            response = self.client.get(
+                self.resource_url + "?since=1-0&wait=0",
+                headers={"Accept": "text/event-stream"},
+            )
+            data = response.get_data(as_text=True)
+        self.assert200(response)
+        self.assertIn(": keepalive", data)
+        channel.read.assert_called_once_with(1, since="1-0", wait=1)
+
+
 class SigmaRuleResourceTest(BaseTest):
     """Test Sigma Rule resource."""
 
@@ -2497,6 +2930,24 @@ class ExportStreamListResourceTest(BaseTest):
         # Verify we hit the specific abort for empty indices_for_pit
         self.assertIn("No valid search indices", response.json["message"])
 
+    def test_export_invalid_format(self):
+        """Test export with an unsupported format."""
+        self.login()
+        response = self.client.post(self.resource_url, json={"format": "xml"})
+        self.assertEqual(response.status_code, HTTP_STATUS_CODE_BAD_REQUEST)
+        self.assertIn("Unsupported export format", response.json["message"])
+
+    @mock.patch(
+        "timesketch.api.v1.resources.exportstream.columnar_export.ARROW_AVAILABLE",
+        False,
+    )
+    def test_export_arrow_unavailable(self):
+        """Test that columnar formats are rejected without pyarrow."""
+        self.login()
+        response = self.client.post(self.resource_url, json={"format": "arrow"})
+        self.assertEqual(response.status_code, HTTP_STATUS_CODE_BAD_REQUEST)
+        self.assertIn("pyarrow is not installed", response.json["message"])
+
 
 class UploadFileResourceTest(BaseTest):
     """Test UploadFileResource."""
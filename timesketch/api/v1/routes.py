@@ -43,6 +43,7 @@ from .resources.event import MarkEventsWithTimelineIdentifier
 from .resources.sketch import SketchResource
 from .resources.sketch import SketchListResource
 from .resources.archive import SketchArchiveResource
+from .resources.archive import SketchArchiveExportResource
 from .resources.information import VersionResource
 from .resources.view import ViewResource
 from .resources.view import ViewListResource
@@ -51,6 +52,7 @@ from .resources.searchtemplate import SearchTemplateParseResource
 from .resources.searchtemplate import SearchTemplateListResource
 from .resources.upload import UploadFileResource
 from .resources.task import TaskResource
+from .resources.progress import SketchProgressResource
 from .resources.story import StoryListResource
 from .resources.story import StoryResource
 from .resources.explore import QueryResource
@@ -100,6 +102,7 @@ API_ROUTES = [
     (SketchListResource, "/sketches/"),
     (SketchResource, "/sketches/<int:sketch_id>/"),
     (SketchArchiveResource, "/sketches/<int:sketch_id>/archive/"),
+    (SketchArchiveExportResource, "/sketches/<int:sketch_id>/archive/export/"),
     (
         AnalysisResource,
         "/sketches/<int:sketch_id>/timelines/<int:timeline_id>/analysis/",
@@ -113,6 +116,7 @@ API_ROUTES = [
         AnalyzerSessionResource,
         "/sketches/<int:sketch_id>/analyzer/sessions/<int:session_id>/",
     ),
+    (SketchProgressResource, "/sketches/<int:sketch_id>/progress/"),
     (AggregationListResource, "/sketches/<int:sketch_id>/aggregation/"),
     (
         AggregationGroupResource,
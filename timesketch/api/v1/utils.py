@@ -13,6 +13,7 @@
 # limitations under the License.
 """This module holds utility functions for the version 1 of the API."""
 
+import functools
 import logging
 import json
 import time
@@ -39,6 +40,15 @@ from timesketch.models.sketch import View
 logger = logging.getLogger("timesketch.api_utils")
 
 
+@functools.lru_cache(maxsize=None)
+def get_celery_app():
+    """Returns the Celery app, created once per process."""
+    # pylint: disable=import-outside-toplevel
+    from timesketch.app import create_celery_app
+
+    return create_celery_app()
+
+
 def bad_request(message):
     """Function to set custom error message for HTTP 400 requests.
 
@@ -36,6 +36,7 @@ class TestApiUtils(BaseTest):
         """Test invalid index name."""
         invalid_index_name = "/invalid/index/name"
         self.assertFalse(utils.is_valid_index_name(invalid_index_name))
+        self.assertFalse(utils.is_valid_index_name("timesketch_shared_plaso_000001"))
 
     def test_invalid_upload_path(self):
         """Test invalid upload path.
@@ -0,0 +1,205 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Result cache for aggregations run through the explore API.
+
+Results are keyed on the sketch, the write generation of the aggregated
+indices and the normalized aggregation parameters. Any write to an index,
+including label and attribute updates, changes its generation and makes old
+entries unreachable, while the TTL bounds how long those entries are kept.
+"""
+
+import collections
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Optional
+
+from flask import current_app
+
+logger = logging.getLogger("timesketch.aggregator_cache")
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 256
+KEY_PREFIX = "timesketch:aggregation:"
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_index_generation(datastore, indices: list) -> Optional[str]:
+    """Returns a string that changes every time one of the indices is written.
+
+    Args:
+        datastore (OpenSearchDataStore): The datastore.
+        indices: List of index names.
+
+    Returns:
+        A string with the generation of the indices, or None if it could not
+        be determined, in which case results should not be cached.
+    """
+    if not indices:
+        return None
+    try:
+        stats = datastore.client.indices.stats(
+            index=",".join(sorted(indices)), metric="indexing,docs"
+        )
+    except Exception as e:  # pylint: disable=broad-except
+        logger.warning("Unable to get index stats for the aggregation cache: %s", e)
+        return None
+
+    generations = []
+    for index_name in sorted(indices):
+        primaries = stats.get("indices", {}).get(index_name, {}).get("primaries", {})
+        indexing = primaries.get("indexing", {})
+        docs = primaries.get("docs", {})
+        generations.append(
+            "{0:s}:{1:d}:{2:d}:{3:d}:{4:d}".format(
+                index_name,
+                indexing.get("index_total", 0),
+                indexing.get("delete_total", 0),
+                docs.get("count", 0),
+                docs.get("deleted", 0),
+            )
+        )
+    return ",".join(generations)
+
+
+def build_cache_key(
+    sketch_id: int, generation: str, name: str, parameters: dict
+) -> str:
+    """Returns the cache key for an aggregation.
+
+    Args:
+        sketch_id: ID of the sketch.
+        generation: Generation of the indices, see get_index_generation.
+        name: Name of the aggregator, or a marker for raw aggregation DSL.
+        parameters: Dictionary with all parameters of the aggregation.
+
+    Returns:
+        A string with the cache key.
+    """
+    normalized = json.dumps(
+        [sketch_id, generation, name, parameters], sort_keys=True, default=str
+    )
+    return KEY_PREFIX + hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class AggregationCache:
+    """Cache for aggregation results, in process or backed by Redis."""
+
+    def __init__(
+        self,
+        ttl: int = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        redis_url: str = "",
+    ):
+        """Initialize the cache.
+
+        Args:
+            ttl: Number of seconds a result is cached. Zero disables the cache.
+            max_entries: Maximum number of results kept by the in process
+                cache.
+            redis_url: Optional Redis URL, used to share the cache between
+                web workers and Celery workers.
+        """
+        self.ttl = ttl
+        self._max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        if redis_url and ttl:
+            # pylint: disable=import-outside-toplevel
+            import redis
+
+            self._redis = redis.from_url(redis_url)
+
+    @property
+    def enabled(self) -> bool:
+        """Returns True if results are cached."""
+        return self.ttl > 0
+
+    def get(self, key: str) -> Optional[dict]:
+        """Returns a cached result, or None if there is none.
+
+        Args:
+            key: Cache key as returned by build_cache_key.
+        """
+        if not self.enabled:
+            return None
+
+        if self._redis is not None:
+            try:
+                value = self._redis.get(key)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("Unable to read from the aggregation cache: %s", e)
+                return None
+            return json.loads(value) if value else None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            expires, value = entry
+            if expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict):
+        """Stores a result in the cache.
+
+        Args:
+            key: Cache key as returned by build_cache_key.
+            value: JSON serializable result.
+        """
+        if not self.enabled:
+            return
+
+        if self._redis is not None:
+            try:
+                self._redis.setex(key, self.ttl, json.dumps(value))
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("Unable to write to the aggregation cache: %s", e)
+            return
+
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Removes all entries from the in process cache."""
+        with self._lock:
+            self._entries.clear()
+
+
+def get_cache() -> AggregationCache:
+    """Returns the aggregation cache configured for this process."""
+    global _CACHE  # pylint: disable=global-statement
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = AggregationCache(
+                ttl=int(current_app.config.get("AGGREGATION_CACHE_TTL", DEFAULT_TTL)),
+                max_entries=int(
+                    current_app.config.get(
+                        "AGGREGATION_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES
+                    )
+                ),
+                redis_url=current_app.config.get("AGGREGATION_CACHE_REDIS_URL", ""),
+            )
+        return _CACHE
@@ -0,0 +1,73 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the aggregation result cache."""
+
+from unittest import mock
+
+from timesketch.lib.testlib import BaseTest
+from timesketch.lib.aggregators import cache
+
+
+class TestAggregationCache(BaseTest):
+    """Tests for the aggregation cache."""
+
+    def test_cache_key(self):
+        """Test that keys do not depend on the order of parameters."""
+        first = cache.build_cache_key(1, "gen", "term", {"a": 1, "b": 2})
+        second = cache.build_cache_key(1, "gen", "term", {"b": 2, "a": 1})
+        self.assertEqual(first, second)
+        self.assertNotEqual(
+            first, cache.build_cache_key(1, "gen2", "term", {"a": 1, "b": 2})
+        )
+        self.assertNotEqual(
+            first, cache.build_cache_key(2, "gen", "term", {"a": 1, "b": 2})
+        )
+
+    def test_expiry_and_eviction(self):
+        """Test that entries expire and old entries are evicted."""
+        result_cache = cache.AggregationCache(ttl=10, max_entries=2)
+        with mock.patch.object(cache.time, "time", return_value=100):
+            result_cache.set("a", {"value": 1})
+            result_cache.set("b", {"value": 2})
+            self.assertEqual(result_cache.get("a"), {"value": 1})
+            result_cache.set("c", {"value": 3})
+            self.assertIsNone(result_cache.get("b"))
+            self.assertEqual(result_cache.get("a"), {"value": 1})
+
+        with mock.patch.object(cache.time, "time", return_value=111):
+            self.assertIsNone(result_cache.get("a"))
+
+        disabled_cache = cache.AggregationCache(ttl=0)
+        disabled_cache.set("a", {"value": 1})
+        self.assertIsNone(disabled_cache.get("a"))
+
+    def test_index_generation(self):
+        """Test that the generation changes with writes to the indices."""
+        datastore = mock.Mock()
+        datastore.client.indices.stats.return_value = {
+            "indices": {
+                "index": {
+                    "primaries": {
+                        "indexing": {"index_total": 5, "delete_total": 1},
+                        "docs": {"count": 4, "deleted": 1},
+                    }
+                }
+            }
+        }
+        self.assertEqual(
+            cache.get_index_generation(datastore, ["index"]), "index:5:1:4:1"
+        )
+
+        datastore.client.indices.stats.side_effect = Exception("closed")
+        self.assertIsNone(cache.get_index_generation(datastore, ["index"]))
@@ -19,7 +19,9 @@ import logging
 import opensearchpy
 import pandas
 
+from timesketch.lib import index_placement
 from timesketch.lib.charts import manager as chart_manager
+from timesketch.lib.datastores import mapping_cache
 from timesketch.lib.datastores.opensearch import OpenSearchDataStore
 from timesketch.models.sketch import Sketch as SQLSketch
 
@@ -208,8 +210,8 @@ class BaseAggregator:
             indices: Optional list of OpenSearch index names. If not provided
                 the default behavior is to include all the indices in a sketch.
             timeline_ids: Optional list of timeline IDs, if not provided the
-                default behavior is to query all the data in the provided
-                search indices.
+                default behavior is to query all the data of the sketch in
+                the provided search indices.
         """
         if not sketch_id and not indices:
             raise RuntimeError("Need at least sketch_id or index")
@@ -232,9 +234,23 @@ class BaseAggregator:
             if not self.indices:
                 self.indices = [t.searchindex.index_name for t in active_timelines]
 
+            # Shared indices hold events of other sketches.
+            sketch_indices = {t.searchindex.index_name for t in active_timelines}
+            self.indices = [
+                index_name
+                for index_name in self.indices
+                if index_name in sketch_indices
+                or not index_placement.is_shared_index(index_name)
+            ]
+
             if timeline_ids:
                 valid_ids = [t.id for t in active_timelines]
                 self.timeline_ids = [t for t in timeline_ids if t in valid_ids]
+            else:
+                self.timeline_ids = (
+                    index_placement.get_timeline_ids(active_timelines, self.indices)
+                    or None
+                )
 
     @property
     def chart_title(self):
@@ -365,47 +381,15 @@ class BaseAggregator:
         Returns:
             Field name as string formatted after mapping type.
         """
-        # Default field format is just the name unchanged.
-        field_format = field_name
-        field_type = None
-
-        indices = self.indices
-        if isinstance(indices, (list, tuple)):
-            indices = ",".join(indices)
-
-        # Get the mapping for the field.
+        # The mapping is cached per process and shared by all aggregators,
+        # so charts in the same run do not fetch it again.
         try:
-            mapping = self.opensearch.client.indices.get_field_mapping(
-                index=indices, fields=field_name
+            return mapping_cache.get_cache().get_aggregation_field(
+                self.opensearch.client, self.indices, field_name
             )
         except opensearchpy.NotFoundError:
-            mapping = {}
-
-        # The returned structure is nested so we need to unpack it.
-        # Example:
-        # {'<INDEX NAME>': {
-        #     'mappings': {
-        #         'inode': {
-        #             'full_name': 'inode',
-        #             'mapping': {
-        #                 'inode': {
-        #                     'type': 'long'
-        #                 }
-        #             }
-        #         }
-        #     }
-        # }}
-        for value in mapping.values():
-            mappings = value.get("mappings", {})
-            mapping = mappings.get(field_name, {}).get("mapping", {})
-            field_type = mapping.get(field_name, {}).get("type", None)
-            if field_type:
-                break
-
-        if field_type == "text":
-            field_format = f"{field_name}.keyword"
-
-        return field_format
+            # Default field format is just the name unchanged.
+            return field_name
 
     def opensearch_aggregation(self, aggregation_spec):
         """Helper method to execute aggregation in OpenSearch.
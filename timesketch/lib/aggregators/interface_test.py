@@ -146,3 +146,25 @@ class TestBaseAggregator(unittest.TestCase):
         self.assertEqual(agg.indices, ["index1"])
         # pylint: disable=protected-access
         self.assertEqual(agg._sketch_url, "/sketch/1/explore")
+
+    @mock.patch("timesketch.lib.aggregators.interface.OpenSearchDataStore")
+    @mock.patch("timesketch.lib.aggregators.interface.SQLSketch")
+    def test_init_shared_index(self, mock_sketch, _mock_ds):
+        """Test that shared indices are limited to the sketch timelines."""
+        mock_sketch_obj = mock.Mock()
+        mock_t1 = mock.Mock()
+        mock_t1.searchindex.index_name = "timesketch_shared_plaso_000001"
+        mock_t1.id = 1
+        mock_sketch_obj.active_timelines = [mock_t1]
+        mock_sketch.get_by_id.return_value = mock_sketch_obj
+
+        agg = interface.BaseAggregator(sketch_id=1)
+        self.assertEqual(agg.indices, ["timesketch_shared_plaso_000001"])
+        self.assertEqual(agg.timeline_ids, [1])
+
+        # Shared indices the sketch has no timelines in are dropped.
+        agg = interface.BaseAggregator(
+            sketch_id=1, indices=["index1", "timesketch_shared_plaso_000002"]
+        )
+        self.assertEqual(agg.indices, ["index1"])
+        self.assertIsNone(agg.timeline_ids)
@@ -0,0 +1,171 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Runs explore aggregations, shared by the API and the Celery workers."""
+
+import copy
+import json
+import time
+from typing import Optional
+
+from timesketch.lib.aggregators import apex
+from timesketch.lib.aggregators import manager as aggregator_manager
+
+# Fields of a raw OpenSearch response that are not returned to the client.
+REMOVE_FIELDS = frozenset(["_shards", "hits", "timed_out", "took"])
+
+# Name used in cache keys for aggregations run from raw DSL.
+DSL_AGGREGATION_NAME = "__aggregation_dsl__"
+
+
+def run_aggregator(
+    sketch_id: int,
+    indices: list,
+    timeline_ids: list,
+    aggregator_name: str,
+    aggregator_parameters: Optional[dict] = None,
+) -> dict:
+    """Runs a registered aggregator.
+
+    Args:
+        sketch_id: ID of the sketch.
+        indices: List of validated index names.
+        timeline_ids: List of validated timeline IDs.
+        aggregator_name: Name of the aggregator.
+        aggregator_parameters: Dictionary with the aggregator parameters,
+            including the legacy chart settings.
+
+    Returns:
+        A dictionary with "meta" and "objects", as returned by the API.
+
+    Raises:
+        KeyError: If the aggregator does not exist.
+        ValueError: If the aggregator parameters are invalid.
+        NotFoundError: If one of the indices does not exist.
+        RequestError: If the datastore rejects the aggregation.
+    """
+    agg_class = aggregator_manager.AggregatorManager.get_aggregator(aggregator_name)
+    if not agg_class:
+        raise KeyError(f"Aggregator {aggregator_name} not found")
+
+    aggregator_parameters = copy.deepcopy(aggregator_parameters or {})
+    aggregator = agg_class(
+        sketch_id=sketch_id, indices=indices, timeline_ids=timeline_ids
+    )
+    aggregator_description = aggregator.describe
+
+    # legacy chart settings
+    chart_type = aggregator_parameters.pop("supported_charts", None)
+
+    time_before = time.time()
+    result_obj = aggregator.run(**aggregator_parameters)
+    time_after = time.time()
+
+    buckets = result_obj.to_dict()
+    buckets["buckets"] = buckets.pop("values")
+    if "labels" in buckets:
+        buckets["labels"] = buckets.pop("labels")
+    if "chart_options" in buckets:
+        buckets["chart_options"] = buckets.pop("chart_options")
+
+    result = {"aggregation_result": {aggregator_name: buckets}}
+    meta = {
+        "method": "aggregator_run",
+        "aggregator_class": (
+            "apex" if isinstance(aggregator, apex.ApexAggregation) else "legacy"
+        ),
+        "chart_type": chart_type,
+        "name": aggregator_description.get("name"),
+        "description": aggregator_description.get("description"),
+        "es_time": time_after - time_before,
+    }
+
+    if chart_type:
+        chart_color = aggregator_parameters.pop("chart_color", "")
+        chart_title = aggregator_parameters.pop("chart_title", None)
+        chart_spec = result_obj.to_chart(
+            chart_name=chart_type, chart_title=chart_title, color=chart_color
+        )
+        if chart_spec:
+            meta["vega_spec"] = chart_spec
+            if not chart_title:
+                chart_title = aggregator.chart_title
+            meta["vega_chart_title"] = chart_title
+
+    return _to_schema(result, meta)
+
+
+def run_aggregation_dsl(
+    datastore, indices: list, aggregation_dsl, timeline_ids: Optional[list] = None
+) -> dict:
+    """Runs a raw aggregation DSL against the datastore.
+
+    Args:
+        datastore (OpenSearchDataStore): The datastore.
+        indices: List of index names.
+        aggregation_dsl (dict or str): The aggregation DSL, as a dict or JSON
+            string.
+        timeline_ids: Optional list of timeline IDs to limit the aggregation
+            to, events without a timeline ID are always included.
+
+    Returns:
+        A dictionary with "meta" and "objects", as returned by the API.
+
+    Raises:
+        RequestError: If the datastore rejects the aggregation.
+        ValueError: If the aggregation DSL is not valid JSON.
+    """
+    if timeline_ids:
+        if isinstance(aggregation_dsl, str):
+            aggregation_dsl = json.loads(aggregation_dsl)
+        aggregation_dsl = dict(aggregation_dsl)
+        aggregation_dsl["query"] = {
+            "bool": {
+                "must": [aggregation_dsl.get("query") or {"match_all": {}}],
+                "filter": [
+                    {
+                        "bool": {
+                            "should": [
+                                {"terms": {"__ts_timeline_id": timeline_ids}},
+                                {
+                                    "bool": {
+                                        "must_not": [
+                                            {"exists": {"field": "__ts_timeline_id"}}
+                                        ]
+                                    }
+                                },
+                            ]
+                        }
+                    }
+                ],
+            }
+        }
+    # pylint: disable=unexpected-keyword-arg
+    result = datastore.client.search(
+        index=",".join(indices), body=aggregation_dsl, size=0
+    )
+    meta = {
+        "es_time": result.get("took", 0),
+        "es_total_count": result.get("hits", {}).get("total", 0),
+        "timed_out": result.get("timed_out", False),
+        "method": "aggregator_query",
+        "max_score": result.get("hits", {}).get("max_score", 0.0),
+    }
+    return _to_schema(result, meta)
+
+
+def _to_schema(result: dict, meta: dict) -> dict:
+    """Returns the API response for an aggregation result."""
+    result_keys = set(result.keys()) - REMOVE_FIELDS
+    objects = [result[key] for key in result_keys]
+    return {"meta": meta, "objects": objects}
@@ -276,7 +276,7 @@ class SSHBruteForceAnalyzer(BaseAnalyzer):
             return
 
         # Generate the event IDs for tagging
-        event_ids = []
+        event_ids = set()
 
         for authsummary in self.output.result_attributes["bruteforce"]:
             log.debug(
@@ -292,9 +292,9 @@ class SSHBruteForceAnalyzer(BaseAnalyzer):
                 continue
 
             for login in authsummary.summary["bruteforce"]:
-                session_df = self.brute_force_analyzer.df[
-                    self.brute_force_analyzer.df["session_id"] == login.session_id
-                ]
+                session_df = self.brute_force_analyzer.get_session_dataframe(
+                    login.session_id
+                )
                 if session_df.empty:
                     log.debug(
                         "[%s] No session ID %s in dataframe",
@@ -303,10 +303,9 @@ class SSHBruteForceAnalyzer(BaseAnalyzer):
                     )
                     continue
 
-                for _, row in session_df.iterrows():
-                    event_id = row.get("event_id", "")
-                    if event_id:
-                        event_ids.append(event_id)
+                event_ids.update(
+                    event_id for event_id in session_df["event_id"] if event_id
+                )
 
         if not event_ids:
             log.debug("[%s] No events to annotate", self.NAME)
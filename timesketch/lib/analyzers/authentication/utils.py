@@ -19,6 +19,7 @@ from typing import List, Tuple, Optional
 import copy
 import logging
 
+import numpy as np
 import pandas as pd
 
 from timesketch.lib.analyzers.interface import AnalyzerOutput
@@ -190,6 +191,11 @@ class BaseAuthenticationUtils:
         """Initialize analyzer."""
 
         self.df = pd.DataFrame()
+        self._indexed_df = None
+        self._ip_rows = {}
+        self._session_rows = {}
+        self._session_success_ts = {}
+        self._session_disconnect_ts = {}
 
     def set_dataframe(self, df: pd.DataFrame) -> None:
         """Set base class datafame.
@@ -250,6 +256,97 @@ class BaseAuthenticationUtils:
             return False
         return True
 
+    def _build_indexes(self) -> None:
+        """Builds lookup indexes for the current dataframe.
+
+        The indexes map source IPs and session IDs to their rows, and session
+        IDs to sorted arrays of successful login and disconnection timestamps.
+        They are rebuilt whenever the dataframe is replaced.
+        """
+
+        if self._indexed_df is self.df:
+            return
+
+        df = self.df
+        self._ip_rows = {}
+        self._session_rows = {}
+        self._session_success_ts = {}
+        self._session_disconnect_ts = {}
+        self._indexed_df = df
+
+        if df.empty:
+            return
+
+        if "source_ip" in df.columns:
+            self._ip_rows = df.groupby("source_ip", sort=False).indices
+        if "session_id" not in df.columns:
+            return
+        self._session_rows = df.groupby("session_id", sort=False).indices
+
+        success_df = df[df["authentication_result"] == "success"]
+        for session_id, timestamps in success_df.groupby("session_id", sort=False)[
+            "timestamp"
+        ]:
+            self._session_success_ts[session_id] = np.sort(timestamps.to_numpy())
+
+        if "event_type" in df.columns:
+            disconnect_df = df[df["event_type"] == "disconnection"]
+            for session_id, timestamps in disconnect_df.groupby(
+                "session_id", sort=False
+            )["timestamp"]:
+                self._session_disconnect_ts[session_id] = np.sort(timestamps.to_numpy())
+
+    @staticmethod
+    def _first_at_or_after(timestamps: Optional[np.ndarray], timestamp: int):
+        """Returns the first timestamp at or after a given timestamp.
+
+        Args:
+            timestamps (np.ndarray): Sorted array of timestamps or None.
+            timestamp (int): The timestamp to search from.
+
+        Returns:
+            The first matching timestamp or None if there is none.
+        """
+
+        if timestamps is None:
+            return None
+        position = np.searchsorted(timestamps, timestamp, side="left")
+        if position >= len(timestamps):
+            return None
+        return timestamps[position]
+
+    def get_ip_dataframe(self, source_ip: str) -> pd.DataFrame:
+        """Returns the rows of the dataframe for a source IP.
+
+        Args:
+            source_ip (str): The source IP to look up.
+
+        Returns:
+            pd.DataFrame: Rows for the source IP, sorted by timestamp.
+        """
+
+        self._build_indexes()
+        rows = self._ip_rows.get(source_ip)
+        if rows is None:
+            return self.df.iloc[0:0]
+        return self.df.iloc[rows]
+
+    def get_session_dataframe(self, session_id: str) -> pd.DataFrame:
+        """Returns the rows of the dataframe for a session ID.
+
+        Args:
+            session_id (str): The session ID to look up.
+
+        Returns:
+            pd.DataFrame: Rows for the session ID, sorted by timestamp.
+        """
+
+        self._build_indexes()
+        rows = self._session_rows.get(session_id)
+        if rows is None:
+            return self.df.iloc[0:0]
+        return self.df.iloc[rows]
+
     def calculate_session_duration(self, session_id: str, timestamp: int) -> int:
         """Calculates session duration for a session ID.
 
@@ -263,9 +360,9 @@ class BaseAuthenticationUtils:
                 found.
         """
 
-        if not session_id or timestamp == 0:
+        if not session_id or not timestamp:
             log.debug(
-                "[BaseAuthenticationUtils] Session ID (%s) or timestamp (%d) is"
+                "[BaseAuthenticationUtils] Session ID (%s) or timestamp (%s) is"
                 " empty",
                 session_id,
                 timestamp,
@@ -275,37 +372,27 @@ class BaseAuthenticationUtils:
         if self.df.empty:
             log.debug("[BaseAuthenticationUtils] Dataframe is empty")
             return -1
-        df = self.df
+        self._build_indexes()
 
-        session_start_timestamp = 0
-        try:
-            session_start_timestamp = df[
-                (df["session_id"] == session_id)
-                & (df["authentication_result"] == "success")
-                & (df["timestamp"] >= timestamp)
-            ].iloc[0]["timestamp"]
-        except (KeyError, ValueError, IndexError) as e:
+        session_start_timestamp = self._first_at_or_after(
+            self._session_success_ts.get(session_id), timestamp
+        )
+        if session_start_timestamp is None:
             log.debug(
-                "[BaseAuthenticationUtils] Error getting session start timestamp for"
-                " session ID %s. %s",
+                "[BaseAuthenticationUtils] No session start timestamp for"
+                " session ID %s",
                 session_id,
-                str(e),
             )
             return -1
 
-        session_end_timestamp = 0
-        try:
-            session_end_timestamp = df[
-                (df["session_id"] == session_id)
-                & (df["event_type"] == "disconnection")
-                & (df["timestamp"] >= timestamp)
-            ].iloc[0]["timestamp"]
-        except (KeyError, ValueError, IndexError) as e:
+        session_end_timestamp = self._first_at_or_after(
+            self._session_disconnect_ts.get(session_id), timestamp
+        )
+        if session_end_timestamp is None:
             log.debug(
-                "[BaseAuthenticationUtils] Error getting session end timestamp for"
-                " session ID %s. %s",
+                "[BaseAuthenticationUtils] No session end timestamp for"
+                " session ID %s",
                 session_id,
-                str(e),
             )
             return -1
 
@@ -326,8 +413,7 @@ class BaseAuthenticationUtils:
             return None
 
         # Find all events for IP address
-        df = self.df
-        ip_df = df[df["source_ip"] == source_ip]
+        ip_df = self.get_ip_dataframe(source_ip)
         if ip_df.empty:
             log.debug("[BaseAuthenticationUtils] No data for the IP %s", source_ip)
             return None
@@ -560,11 +646,10 @@ class BaseAuthenticationUtils:
             log.debug("[BaseAuthenticationUtils] Dataframe is empty")
             return None
 
-        df = self.df
+        df = self.get_session_dataframe(session_id)
 
         ip_df = df[
             (df["source_ip"] == source_ip)
-            & (df["session_id"] == session_id)
             & (df["username"] == username)
             & (df["domain"] == domain)
         ]
@@ -751,90 +836,63 @@ class BruteForceUtils(BaseAuthenticationUtils):
         if self.df.empty:
             log.debug("[BruteForceUtils] Dataframe is empty")
             return None
-        df = self.df
 
         # Get the dataframe for the given IP address
-        ip_df = df[df["source_ip"] == source_ip]
+        ip_df = self.get_ip_dataframe(source_ip)
         if ip_df.empty:
             log.debug("[BruteForceUtils] No records for %s in dataframe", source_ip)
             return None
 
         # Get the successful events for the given IP address
-        success_df = ip_df[ip_df["authentication_result"] == "success"]
-        if success_df.empty:
+        is_success = (ip_df["authentication_result"] == "success").to_numpy()
+        if not is_success.any():
             log.debug(
                 "[BruteForceUtils] No successful authentication events for %s",
                 source_ip,
             )
             return None
+        is_failure = (ip_df["authentication_result"] == "failure").to_numpy()
+
+        # Count the failed and successful events in the brute force window before
+        # each successful login using prefix sums over the sorted timestamps.
+        timestamps = ip_df["timestamp"].to_numpy()
+        success_cumsum = np.concatenate(([0], np.cumsum(is_success)))
+        failure_cumsum = np.concatenate(([0], np.cumsum(is_failure)))
+
+        success_df = ip_df[is_success]
+        login_timestamps = timestamps[is_success]
+        window_start = np.searchsorted(
+            timestamps, login_timestamps - self.BRUTE_FORCE_WINDOW, side="left"
+        )
+        window_end = np.searchsorted(timestamps, login_timestamps, side="right")
+        success_counts = success_cumsum[window_end] - success_cumsum[window_start]
+        failure_counts = failure_cumsum[window_end] - failure_cumsum[window_start]
+
+        candidates = (
+            (login_timestamps != 0)
+            & (success_counts > 0)
+            & (success_counts <= self.success_threshold)
+            & (failure_counts >= self.BRUTE_FORCE_MIN_FAILED_EVENT)
+        )
+        log.debug(
+            "[BruteForceUtils] %d of %d successful logins from %s follow brute"
+            " force activity",
+            int(candidates.sum()),
+            len(success_df.index),
+            source_ip,
+        )
 
         bruteforce_logins = []
-
-        for _, row in success_df.iterrows():
-            login_ts = int(row.get("timestamp", 0))
-            session_id = row.get("session_id", "")
-
-            if login_ts == 0:
-                log.warning(
-                    "[BruteForceUtils] Unable to get timestamp for session %s",
-                    session_id,
-                )
-                continue
-
-            # Get the brute force window start and end timestamp
-            bruteforce_window_start = login_ts - self.BRUTE_FORCE_WINDOW
-            bruteforce_window_end = login_ts
-
-            # Get the dataframe for the brute force window
-            bruteforce_window_df = ip_df[
-                (ip_df["timestamp"] >= bruteforce_window_start)
-                & (ip_df["timestamp"] <= bruteforce_window_end)
-                & (ip_df["source_ip"] == source_ip)
-            ]
-
-            log.debug(
-                "[BruteForceUtils] %d records for %s between %s and %s",
-                len(bruteforce_window_df.index),
-                source_ip,
-                human_timestamp(bruteforce_window_start),
-                human_timestamp(bruteforce_window_end),
-            )
-
-            if bruteforce_window_df.empty:
-                continue
-
-            # Get the number of failed and successful authentication events in the brute
-            # force window
-            failure_count = len(
-                bruteforce_window_df[
-                    bruteforce_window_df["authentication_result"] == "failure"
-                ].index
-            )
-            success_count = len(
-                bruteforce_window_df[
-                    bruteforce_window_df["authentication_result"] == "success"
-                ].index
-            )
-            log.debug(
-                "[BruteForceUtils] success_count: %d, failure_count: %d for %s",
-                success_count,
-                failure_count,
-                source_ip,
+        for row in success_df[candidates].to_dict("records"):
+            login = self.get_login_record(
+                source_ip=source_ip,
+                username=row.get("username", ""),
+                domain=row.get("domain", ""),
+                session_id=row.get("session_id", ""),
             )
-
-            if (
-                0 < success_count <= self.success_threshold
-                and failure_count >= self.BRUTE_FORCE_MIN_FAILED_EVENT
-            ):
-                login = self.get_login_record(
-                    source_ip=source_ip,
-                    username=row.get("username", ""),
-                    domain=row.get("domain", ""),
-                    session_id=row.get("session_id", ""),
-                )
-                if login:
-                    login.source_hostname = row.get("source_hostname", "")
-                    bruteforce_logins.append(login)
+            if login:
+                login.source_hostname = row.get("source_hostname", "")
+                bruteforce_logins.append(login)
 
         if not bruteforce_logins:
             log.debug("[BruteForceUtils] No brute force activity from %s", source_ip)
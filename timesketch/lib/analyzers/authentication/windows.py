@@ -328,7 +328,7 @@ class WindowsLoginBruteForceAnalyzer(BaseAnalyzer):
             return
 
         # Generate the event IDs for tagging
-        event_ids = []
+        event_ids = set()
 
         for authsummary in self.output.result_attributes["bruteforce"]:
             log.debug(
@@ -344,9 +344,9 @@ class WindowsLoginBruteForceAnalyzer(BaseAnalyzer):
                 continue
 
             for login in authsummary.summary["bruteforce"]:
-                session_df = self.brute_force_analyzer.df[
-                    self.brute_force_analyzer.df["session_id"] == login.session_id
-                ]
+                session_df = self.brute_force_analyzer.get_session_dataframe(
+                    login.session_id
+                )
                 if session_df.empty:
                     log.debug(
                         "[%s] No session ID %s in dataframe",
@@ -358,11 +358,12 @@ class WindowsLoginBruteForceAnalyzer(BaseAnalyzer):
                 # We only want to tag brute force login and logout events.
                 # We don't want to tag failed authentication events before the
                 # successful login event.
-                for _, row in session_df.iterrows():
-                    event_id = row.get("event_id", "")
-                    event_identifier = row.get("eid")
-                    if event_id and (event_identifier in [4624, 4634]):
-                        event_ids.append(event_id)
+                if "eid" not in session_df.columns:
+                    continue
+                login_logout_df = session_df[session_df["eid"].isin([4624, 4634])]
+                event_ids.update(
+                    event_id for event_id in login_logout_df["event_id"] if event_id
+                )
 
         if not event_ids:
             log.debug("[%s] No events to annotate", self.NAME)
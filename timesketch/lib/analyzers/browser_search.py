@@ -110,6 +110,11 @@ class BrowserSearchSketchPlugin(interface.BaseAnalyzer):
         ]
     )
 
+    # Matches any URL that at least one of the filters above matches.
+    _URL_FILTER_PREFILTER = re.compile(
+        "|".join(f"(?:{expression.pattern})" for _, expression, _, _ in _URL_FILTERS)
+    )
+
     def _decode_url(self, url):
         """Decodes the URL, replaces %XX to their corresponding characters.
 
@@ -231,6 +236,11 @@ class BrowserSearchSketchPlugin(interface.BaseAnalyzer):
             if url is None:
                 continue
 
+            # Most URLs do not belong to any search engine, skip those with a
+            # single combined expression.
+            if not self._URL_FILTER_PREFILTER.search(url):
+                continue
+
             for engine, expression, method_name, parameter in self._URL_FILTERS:
                 callback_method = getattr(self, method_name, None)
                 if not callback_method:
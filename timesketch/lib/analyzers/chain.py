@@ -2,6 +2,9 @@
 
 import collections
 import uuid
+from concurrent import futures
+
+from flask import current_app
 
 from timesketch.lib import emojis
 from timesketch.lib.analyzers import interface
@@ -48,6 +51,108 @@ class ChainSketchPlugin(interface.BaseAnalyzer):
         self._chain_plugins = chain_manager.ChainPluginsManager.get_plugins(self)
         super().__init__(index_name, sketch_id, timeline_id=timeline_id)
 
+    def _get_base_events(self, chain_plugin):
+        """Yields the base events of a chain plugin.
+
+        Args:
+            chain_plugin (BaseChainPlugin): the chain plugin.
+
+        Yields:
+            Base events (instance of Event) that should start a chain.
+        """
+        if chain_plugin.SEARCH_QUERY_DSL:
+            search_dsl = chain_plugin.SEARCH_QUERY_DSL
+            search_string = None
+        else:
+            search_dsl = None
+            search_string = chain_plugin.SEARCH_QUERY
+
+        return_fields = list(chain_plugin.EVENT_FIELDS)
+        events = self.event_stream(
+            query_string=search_string,
+            query_dsl=search_dsl,
+            return_fields=return_fields,
+        )
+        for event in events:
+            if chain_plugin.process_chain(event):
+                yield event
+
+    def _discover_chains(self, chain_plugin):
+        """Returns the chains found by a chain plugin.
+
+        Plugins that declare a join key have their chained events looked up
+        for batches of distinct keys, and joined to the base events in
+        memory. Other plugins are asked for the chained events of every base
+        event.
+
+        Args:
+            chain_plugin (BaseChainPlugin): the chain plugin.
+
+        Returns:
+            A list of tuples with the base event, the chain ID and the list
+            of chained events as returned by build_chain.
+        """
+        chains = []
+        if not chain_plugin.USE_JOIN_KEYS:
+            for event in self._get_base_events(chain_plugin):
+                chain_id = uuid.uuid4().hex
+                chained_events = chain_plugin.build_chain(
+                    base_event=event, chain_id=chain_id
+                )
+                chains.append((event, chain_id, chained_events))
+            return chains
+
+        keyed_events = []
+        for event in self._get_base_events(chain_plugin):
+            join_key = chain_plugin.get_join_key(event)
+            if join_key:
+                keyed_events.append((event, join_key))
+
+        join_keys = sorted({join_key for _, join_key in keyed_events})
+        chained_by_key = {}
+        batch_size = chain_plugin.JOIN_KEY_BATCH_SIZE
+        for start in range(0, len(join_keys), batch_size):
+            chained_by_key.update(
+                chain_plugin.get_chained_events_for_keys(
+                    join_keys[start : start + batch_size]
+                )
+            )
+
+        for event, join_key in keyed_events:
+            chain_id = uuid.uuid4().hex
+            chained_events = chain_plugin.build_chain_from_events(
+                chained_by_key.get(join_key, []), chain_id
+            )
+            chains.append((event, chain_id, chained_events))
+        return chains
+
+    def _discover_all_chains(self):
+        """Returns the chains of all plugins, running them concurrently if set.
+
+        The number of plugins run at the same time is set with
+        CHAIN_ANALYZER_MAX_WORKERS, by default plugins run one after another.
+
+        Returns:
+            A list of tuples with the chain plugin and the list of chains
+            returned by _discover_chains.
+        """
+        max_workers = int(current_app.config.get("CHAIN_ANALYZER_MAX_WORKERS", 1))
+        if max_workers <= 1 or len(self._chain_plugins) <= 1:
+            return [
+                (chain_plugin, self._discover_chains(chain_plugin))
+                for chain_plugin in self._chain_plugins
+            ]
+
+        app = current_app._get_current_object()  # pylint: disable=protected-access
+
+        def _discover_with_context(chain_plugin):
+            with app.app_context():
+                return self._discover_chains(chain_plugin)
+
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = pool.map(_discover_with_context, self._chain_plugins)
+            return list(zip(self._chain_plugins, results))
+
     def run(self):
         """Entry point for the analyzer.
 
@@ -61,32 +166,10 @@ class ChainSketchPlugin(interface.BaseAnalyzer):
         counter = collections.Counter()
         events_to_update = {}
 
-        # TODO: Have each plugin run in a separate task.
         # TODO: Add a time limit for each plugins run to prevent it from
         #       holding everything up.
-        for chain_plugin in self._chain_plugins:
-            if chain_plugin.SEARCH_QUERY_DSL:
-                search_dsl = chain_plugin.SEARCH_QUERY_DSL
-                search_string = None
-            else:
-                search_dsl = None
-                search_string = chain_plugin.SEARCH_QUERY
-
-            return_fields = chain_plugin.EVENT_FIELDS
-            events = self.event_stream(
-                query_string=search_string,
-                query_dsl=search_dsl,
-                return_fields=return_fields,
-            )
-
-            for event in events:
-                if not chain_plugin.process_chain(event):
-                    continue
-                chain_id = uuid.uuid4().hex
-
-                chained_events = chain_plugin.build_chain(
-                    base_event=event, chain_id=chain_id
-                )
+        for chain_plugin, chains in self._discover_all_chains():
+            for event, chain_id, chained_events in chains:
                 number_chained_events = len(chained_events)
                 if not number_chained_events:
                     continue
@@ -118,6 +201,7 @@ class ChainSketchPlugin(interface.BaseAnalyzer):
                 events_to_update[event.event_id]["chains"].append(chain)
                 number_of_chains += 1
 
+        # Updates are queued in the datastore and sent as bulk requests.
         for event_update in events_to_update.values():
             event = event_update.get("event")
             attributes = {"chains": event_update.get("chains")}
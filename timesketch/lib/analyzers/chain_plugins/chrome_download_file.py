@@ -1,5 +1,7 @@
 """Plugin for chaining Chrome downloads to filesystem and execution events."""
 
+import collections
+
 from timesketch.lib.analyzers.chain_plugins import interface
 from timesketch.lib.analyzers.chain_plugins import manager
 
@@ -15,48 +17,99 @@ class ChromeDownloadFilesystemChainPlugin(interface.BaseChainPlugin):
 
     SEARCH_QUERY = 'data_type:"chrome:history:file_downloaded"'
     EVENT_FIELDS = ["full_path"]
+    USE_JOIN_KEYS = True
 
-    def get_chained_events(self, base_event: object):
-        """Yields an event that is chained or linked to the base event.
+    @staticmethod
+    def _basename(path):
+        """Returns the last path segment of a Windows or POSIX path."""
+        if "\\" in path:
+            separator = "\\"
+        else:
+            separator = "/"
+        return path.split(separator)[-1]
+
+    def get_join_key(self, base_event: object):
+        """Returns the name of the downloaded file.
 
         Args:
-            base_event: the base event of the chain, used to construct further
-                queries (instance of Event).
+            base_event: the base event of the chain (instance of Event).
 
-        Yields:
-            An event (instance of Event) object that is linked or chained to
-            the base event, according to the plugin.
+        Returns:
+            A string with the file name, or None if there is none.
         """
         target = base_event.source.get("full_path", "")
         if not target:
-            return
-            yield  # pylint: disable=W0101
+            return None
+        return self._basename(target) or None
 
-        if "\\" in target:
-            separator = "\\"
-        else:
-            separator = "/"
+    def get_chained_events_for_keys(self, join_keys):
+        """Returns filesystem and execution events for downloaded file names.
+
+        Args:
+            join_keys (list): a list of distinct file names.
+
+        Returns:
+            A dict mapping file names to a list of events (instance of Event)
+            that refer to a file with that name.
+        """
+        keys_by_name = collections.defaultdict(list)
+        for key in join_keys:
+            keys_by_name[key.lower()].append(key)
+        chained_events = {key: [] for key in join_keys}
 
-        target = target.split(separator)[-1]
         # TODO: Add more checks here, eg; USB, generic execution, etc.
+        filename_terms = " OR ".join(
+            interface.quote_query_value(f"*{key:s}") for key in join_keys
+        )
+        name_terms = " OR ".join(interface.quote_query_value(key) for key in join_keys)
         search_query = (
-            '(data_type:"fs:stat" AND filename:"*{0:s}") OR '
-            '(data_type:"fs:stat:ntfs" AND name:"{0:s}")'
-        ).format(target)
-        return_fields = ["filename", "path_hints"]
+            f'(data_type:"fs:stat" AND filename:({filename_terms:s})) OR '
+            f'(data_type:"fs:stat:ntfs" AND name:({name_terms:s}))'
+        )
+        return_fields = ["filename", "path_hints", "name", "data_type"]
 
         events = self.analyzer_object.event_stream(
             search_query, return_fields=return_fields, scroll=False
         )
-        yield from events
+        for event in events:
+            if event.source.get("data_type") == "fs:stat:ntfs":
+                name = event.source.get("name", "")
+            else:
+                name = self._basename(event.source.get("filename", ""))
+            for key in keys_by_name.get(str(name).lower(), []):
+                chained_events[key].append(event)
 
-        exec_query = f'executable:"*{target:s}"'
+        executable_terms = " OR ".join(
+            interface.quote_query_value(f"*{key:s}") for key in join_keys
+        )
+        exec_query = f"executable:({executable_terms:s})"
         return_fields = ["executable", "chains"]
 
         events = self.analyzer_object.event_stream(
             exec_query, return_fields=return_fields, scroll=False
         )
-        yield from events
+        for event in events:
+            name = self._basename(event.source.get("executable", ""))
+            for key in keys_by_name.get(name.lower(), []):
+                chained_events[key].append(event)
+
+        return chained_events
+
+    def get_chained_events(self, base_event: object):
+        """Yields an event that is chained or linked to the base event.
+
+        Args:
+            base_event: the base event of the chain, used to construct further
+                queries (instance of Event).
+
+        Yields:
+            An event (instance of Event) object that is linked or chained to
+            the base event, according to the plugin.
+        """
+        target = self.get_join_key(base_event)
+        if not target:
+            return
+        yield from self.get_chained_events_for_keys([target]).get(target, [])
 
 
 manager.ChainPluginsManager.register_plugin(ChromeDownloadFilesystemChainPlugin)
@@ -5,6 +5,19 @@ import abc
 from timesketch.lib import emojis
 
 
+def quote_query_value(value):
+    """Returns a value quoted for use in a query string.
+
+    Args:
+        value: the string value to quote.
+
+    Returns:
+        The value in double quotes, with quotes and backslashes escaped.
+    """
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
 class BaseChainPlugin:
     """A base plugin for the chain analyzer.
 
@@ -28,6 +41,15 @@ class BaseChainPlugin:
     # event object.
     EVENT_FIELDS = []
 
+    # Plugins that can derive a join key from a base event set this to True
+    # and implement get_join_key and get_chained_events_for_keys. Chained
+    # events are then looked up for batches of distinct keys and joined to
+    # the base events in memory, instead of running queries per base event.
+    USE_JOIN_KEYS = False
+
+    # Maximum number of join keys looked up in a single query.
+    JOIN_KEY_BATCH_SIZE = 250
+
     _EMOJIS = [emojis.get_emoji("LINK")]
 
     def __init__(self, analyzer_object):
@@ -60,17 +82,64 @@ class BaseChainPlugin:
         Returns:
             A list of dicts with the chain and event attached.
         """
-        events = []
-        for event in self.get_chained_events(base_event):
+        return self.build_chain_from_events(
+            self.get_chained_events(base_event), chain_id
+        )
+
+    def build_chain_from_events(self, events, chain_id):
+        """Returns a chain from already discovered chained events.
+
+        Args:
+            events: an iterable of events (instance of Event) that are
+                chained to the base event.
+            chain_id: a string with the chain UUID value.
+
+        Returns:
+            A list of dicts with the chain and event attached.
+        """
+        chain_events = []
+        for event in events:
             chain = {"chain_id": chain_id, "plugin": self.NAME, "is_base": False}
-            events.append(
+            chain_events.append(
                 {
                     "event_id": event.event_id,
                     "event": event,
                     "chain": chain,
                 }
             )
-        return events
+        return chain_events
+
+    # pylint: disable=unused-argument
+    def get_join_key(self, base_event):
+        """Returns the key that joins a base event to its chained events.
+
+        Only used if USE_JOIN_KEYS is set, plugins that set it override this.
+        By default no base event starts a chain.
+
+        Args:
+            base_event: the base event of the chain (instance of Event).
+
+        Returns:
+            A string with the join key, or None if the base event can not
+            start a chain.
+        """
+        return None
+
+    # pylint: disable=unused-argument
+    def get_chained_events_for_keys(self, join_keys):
+        """Returns the chained events for a batch of join keys.
+
+        Only used if USE_JOIN_KEYS is set, plugins that set it override this.
+        The number of keys is at most JOIN_KEY_BATCH_SIZE.
+
+        Args:
+            join_keys (list): a list of distinct join keys.
+
+        Returns:
+            A dict mapping join keys to a list of events (instance of Event)
+            that are chained to base events with that key.
+        """
+        return {}
 
     @abc.abstractmethod
     def get_chained_events(self, base_event):
@@ -15,6 +15,12 @@ class WinPrefetchChainPlugin(interface.BaseChainPlugin):
 
     SEARCH_QUERY = 'data_type:"windows:prefetch:execution"'
     EVENT_FIELDS = ["executable"]
+    USE_JOIN_KEYS = True
+
+    def __init__(self, analyzer_object):
+        """Initialize the plugin."""
+        super().__init__(analyzer_object)
+        self._lnk_events = None
 
     def process_chain(self, base_event):
         """Determine if the extracted event fits the criteria of the plugin.
@@ -29,43 +35,82 @@ class WinPrefetchChainPlugin(interface.BaseChainPlugin):
         target = base_event.source.get("executable", "")
         return target.lower().endswith(".exe")
 
-    def get_chained_events(self, base_event: object):
-        """Yields an event that is chained or linked to the base event.
+    def get_join_key(self, base_event):
+        """Returns the lower case name of the executed file.
 
         Args:
-            base_event: the base event of the chain, used to construct further
-                queries (instance of Event).
+            base_event: the base event of the chain (instance of Event).
 
-        Yields:
-            An event (instance of Event) object that is linked or chained to
-            the base event, according to the plugin.
+        Returns:
+            A string with the executable, or None if there is none.
         """
         target = base_event.source.get("executable", "")
         if not target:
-            return
-            yield  # pylint: disable=W0101
+            return None
+        return target.lower()
+
+    def _get_lnk_events(self):
+        """Returns all LNK events, fetched once per analyzer run."""
+        if self._lnk_events is None:
+            lnk_query = "parser:lnk"
+            return_fields = ["link_target"]
+            self._lnk_events = list(
+                self.analyzer_object.event_stream(
+                    lnk_query, return_fields=return_fields, scroll=False
+                )
+            )
+        return self._lnk_events
+
+    def get_chained_events_for_keys(self, join_keys):
+        """Returns download and LNK events for executed files.
+
+        Args:
+            join_keys (list): a list of distinct lower case executables.
+
+        Returns:
+            A dict mapping executables to a list of events (instance of Event)
+            with a URL or link target that contains the executable.
+        """
+        chained_events = {key: [] for key in join_keys}
 
-        search_query = f'url:"*{target:s}*"'
+        url_terms = " OR ".join(
+            interface.quote_query_value(f"*{key:s}*") for key in join_keys
+        )
+        search_query = f"url:({url_terms:s})"
         return_fields = ["url"]
 
         events = self.analyzer_object.event_stream(
             search_query, return_fields=return_fields, scroll=False
         )
         for event in events:
-            url = event.source.get("url", "")
-            if target.lower() in url.lower():
-                yield event
+            url = event.source.get("url", "").lower()
+            for key in join_keys:
+                if key in url:
+                    chained_events[key].append(event)
 
-        lnk_query = "parser:lnk"
-        return_fields = ["link_target"]
+        for event in self._get_lnk_events():
+            link_target = event.source.get("link_target", "").lower()
+            for key in join_keys:
+                if key in link_target:
+                    chained_events[key].append(event)
 
-        events = self.analyzer_object.event_stream(
-            lnk_query, return_fields=return_fields, scroll=False
-        )
-        for event in events:
-            link_target = event.source.get("link_target", "")
-            if target.lower() in link_target.lower():
-                yield event
+        return chained_events
+
+    def get_chained_events(self, base_event: object):
+        """Yields an event that is chained or linked to the base event.
+
+        Args:
+            base_event: the base event of the chain, used to construct further
+                queries (instance of Event).
+
+        Yields:
+            An event (instance of Event) object that is linked or chained to
+            the base event, according to the plugin.
+        """
+        target = self.get_join_key(base_event)
+        if not target:
+            return
+        yield from self.get_chained_events_for_keys([target]).get(target, [])
 
 
 manager.ChainPluginsManager.register_plugin(WinPrefetchChainPlugin)
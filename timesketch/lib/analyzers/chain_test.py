@@ -110,6 +110,30 @@ class FakeChainPlugin(interface.BaseChainPlugin):
             yield from events
 
 
+class FakeJoinChainPlugin(interface.BaseChainPlugin):
+    """Fake chain plugin that declares a join key."""
+
+    NAME = "fake_join_chain"
+    DESCRIPTION = "Fake plugin for set based chains."
+    SEARCH_QUERY = "give me all the data"
+    USE_JOIN_KEYS = True
+    JOIN_KEY_BATCH_SIZE = 1
+
+    def __init__(self, analyzer_object):
+        super().__init__(analyzer_object)
+        self.lookups = []
+
+    def get_join_key(self, base_event):
+        return base_event.source.get("url")
+
+    def get_chained_events_for_keys(self, join_keys):
+        self.lookups.append(join_keys)
+        return {key: [FakeEvent({"domain": key})] for key in join_keys}
+
+    def get_chained_events(self, base_event):
+        raise AssertionError("Chained events should be looked up by key.")
+
+
 class TestChainAnalyzer(testlib.BaseTest):
     """Tests the functionality of the analyzer."""
 
@@ -151,3 +175,31 @@ class TestChainAnalyzer(testlib.BaseTest):
             event_emojis = event.emojis
             self.assertEqual(len(event_emojis), 1)
             self.assertEqual(event_emojis[0], link_emoji)
+
+    @mock.patch(
+        "timesketch.lib.analyzers.interface.OpenSearchDataStore", testlib.MockDataStore
+    )
+    def test_get_chains_by_join_key(self):
+        """Test that chains are resolved for batches of distinct keys."""
+        for plugin in manager.ChainPluginsManager.get_plugins(None):
+            manager.ChainPluginsManager.deregister_plugin(plugin)
+
+        manager.ChainPluginsManager.register_plugin(FakeJoinChainPlugin)
+        self.addCleanup(
+            manager.ChainPluginsManager.deregister_plugin, FakeJoinChainPlugin
+        )
+
+        analyzer = FakeAnalyzer("test_index", sketch_id=1)
+        analyzer.datastore.client = mock.Mock()
+
+        analyzer_result = analyzer.run()
+        expected_result = (
+            "3 base events annotated with a chain UUID for 3 chains "
+            "for a total of 3 events. [fake_join_chain] 3"
+        )
+        self.assertEqual(analyzer_result, expected_result)
+        plugin = getattr(analyzer, "_chain_plugins")[0]
+        self.assertEqual(
+            plugin.lookups,
+            [["N/A"], ["http://minsida.biz"], ["http://onnursida.biz"]],
+        )
@@ -60,7 +60,7 @@ class DomainSketchPlugin(interface.BaseAnalyzer):
             domains.setdefault(domain, [])
             domains[domain].append(event)
 
-            tld = ".".join(domain.split(".")[-2:])
+            tld = utils.get_tld_from_domain(domain)
             tld_counter[tld] += 1
 
         # Exit early if there are no domains in the data set to analyze.
@@ -1,16 +1,19 @@
 """Sessionizing sketch analyzer plugins for sessions based on the Windows EVTX
 log."""
 
-import re
+import logging
 from typing import Generator
 import opensearchpy.exceptions
+from flask import current_app
 
+from timesketch.lib import evtx
 from timesketch.lib.analyzers import manager
 from timesketch.lib.analyzers.sessionizer import SessionizerSketchPlugin
 
+logger = logging.getLogger("timesketch.analyzers.evtx_sessionizers")
+
 # number of event record ids to keep when checking for duplicates
 EVENT_HISTORY_LENGTH = 5
-EVENT_DATA_RE = re.compile(r"<EventData>[\s\S]+<\/EventData>")
 
 
 class WinEVTXSessionizerSketchPlugin(SessionizerSketchPlugin):
@@ -18,6 +21,53 @@ class WinEVTXSessionizerSketchPlugin(SessionizerSketchPlugin):
     Windows EVTX logs, where a session begins with some defined start event and
     ends with some defined end event or a startup event."""
 
+    # Names of the EventData values the sessionizer reads.
+    event_data_fields = []
+
+    # Name of the view with all sessions, used instead of a view per session.
+    session_view_name = "Sessions"
+
+    # Whether a view is added for every session.
+    view_per_session = True
+
+    def _has_events_without_event_data(self):
+        """Returns True if matching events lack the EventData fields.
+
+        These events were indexed without EVTX_EVENTDATA_ENRICHMENT, or with
+        fields the sessionizer reads left out of EVTX_EVENTDATA_FIELDS, their
+        values are parsed from the XML representation of the record. Only
+        start and end events are checked, startup events carry no EventData.
+        """
+        if not self.event_data_fields:
+            return True
+        enabled_fields = evtx.get_enabled_fields()
+        if any(name not in enabled_fields for name in self.event_data_fields):
+            return True
+
+        filters = [
+            {"query_string": {"query": self.query_template % 0}},
+            {"terms": {"event_identifier": self.start_events + self.end_events}},
+        ]
+        if self.timeline_id:
+            filters.append({"term": {"__ts_timeline_id": self.timeline_id}})
+        query = {
+            "query": {
+                "bool": {
+                    "filter": filters,
+                    "must_not": [
+                        {"exists": {"field": evtx.get_field_name(name)}}
+                        for name in self.event_data_fields
+                    ],
+                }
+            }
+        }
+        try:
+            result = self.datastore.client.count(index=self.index_name, body=query)
+        except opensearchpy.exceptions.OpenSearchException as e:
+            logger.warning("Unable to count events without EventData: %s", e)
+            return True
+        return result.get("count") != 0
+
     def run(self):
         """Entry point for the analyzer. Create sessions consisting of a start
         and end event.
@@ -27,20 +77,28 @@ class WinEVTXSessionizerSketchPlugin(SessionizerSketchPlugin):
         """
         return_fields = [
             "timestamp",
-            "xml_string",
             "event_identifier",
             "record_number",
             "session_id",
         ]
+        return_fields.extend(
+            evtx.get_field_name(name) for name in self.event_data_fields
+        )
+        if self._has_events_without_event_data():
+            return_fields.append("xml_string")
+
+        self.view_per_session = current_app.config.get(
+            "EVTX_SESSIONIZER_VIEW_PER_SESSION", True
+        )
         last_login_time = 0
         session_num = 0
         login_events = {}
         processed = False
 
         while not processed:
-            query_string = self.query_template.format(last_login_time)
+            query_string = self.query_template % last_login_time
             events = self.event_stream(
-                query_string=query_string, return_fields=return_fields
+                query_string=query_string, return_fields=list(return_fields)
             )
             (
                 last_login_time,
@@ -49,6 +107,13 @@ class WinEVTXSessionizerSketchPlugin(SessionizerSketchPlugin):
                 processed,
             ) = self.processSessions(events, session_num, login_events)
 
+        if session_num and not self.view_per_session:
+            self.sketch.add_view(
+                self.session_view_name,
+                self.NAME,
+                query_string=f"session_id.{self.session_type:s}:*",
+            )
+
         msg = "Sessionizing completed, number of sessions created: {0:d}"
         return msg.format(session_num)
 
@@ -86,14 +151,20 @@ class WinEVTXSessionizerSketchPlugin(SessionizerSketchPlugin):
 
                 if event_id in self.start_events:
                     logon_id = self.getLogonId(event, event_id)
+                    if logon_id is None:
+                        # Without a logon ID the session can't be ended.
+                        continue
                     session_id = self.getSessionId(event, session_num)
                     self.annotateEvent(event, [session_id])
                     start_events[logon_id] = session_id
 
-                    view_query = 'session_id.{:s}:"{:s}"'.format(
-                        self.session_type, session_id
-                    )
-                    self.sketch.add_view(session_id, self.NAME, query_string=view_query)
+                    if self.view_per_session:
+                        view_query = 'session_id.{:s}:"{:s}"'.format(
+                            self.session_type, session_id
+                        )
+                        self.sketch.add_view(
+                            session_id, self.NAME, query_string=view_query, defer=True
+                        )
                     session_num += 1
 
                 elif event_id in self.end_events:
@@ -120,16 +191,20 @@ class WinEVTXSessionizerSketchPlugin(SessionizerSketchPlugin):
         """Retrieves the desired value from the EventData section of a Windows
         EVTX record.
 
+        The value is read from the field added at ingest time, or parsed from
+        the XML representation of the record if the field is missing.
+
         Args:
             event: The event to retrieve the attribute for.
+            name: The name of the value.
 
         Returns:
             The value contained in the attribute.
         """
-        event_data = EVENT_DATA_RE.search(event.source.get("xml_string")).group()
-        data_name_re = re.compile(r'<Data Name="%s">([^<>]+)<\/Data>' % name)
-        text = data_name_re.search(event_data).group(1)
-        return text
+        value = event.source.get(evtx.get_field_name(name))
+        if value is not None:
+            return value
+        return evtx.parse_event_data(event.source.get("xml_string")).get(name)
 
 
 class LogonSessionizerSketchPlugin(WinEVTXSessionizerSketchPlugin):
@@ -143,8 +218,10 @@ class LogonSessionizerSketchPlugin(WinEVTXSessionizerSketchPlugin):
         "4624 OR 4778 OR 4634 OR 4647 OR 4779 OR 6005) AND timestamp:[%d TO *]"
     )
 
+    session_view_name = "Logon sessions"
     start_events = [4624, 4778]
     end_events = [4634, 4647, 4779]
+    event_data_fields = ["TargetLogonId", "LogonID", "TargetUserName", "AccountName"]
 
     def getLogonId(self, event, event_id):
         """Retrieves the logon ID for an event."""
@@ -174,8 +251,10 @@ class UnlockSessionizerSketchPlugin(WinEVTXSessionizerSketchPlugin):
         "(4801 OR 4800 OR 4634 OR 4647 OR 4779 OR 6005) AND timestamp:"
         "[%d TO *]"
     )
+    session_view_name = "Unlock sessions"
     start_events = [4801]
     end_events = [4800, 4802, 4634, 4647, 4779]
+    event_data_fields = ["TargetLogonId", "LogonID", "TargetUserName"]
 
     def getLogonId(self, event, event_id):
         """Retrieves the logon ID for an event."""
@@ -6,6 +6,7 @@ import copy
 from unittest import mock
 from typing import Optional
 
+from timesketch.lib import evtx
 from timesketch.lib.analyzers.evtx_sessionizers import LogonSessionizerSketchPlugin
 from timesketch.lib.analyzers.evtx_sessionizers import UnlockSessionizerSketchPlugin
 
@@ -33,6 +34,12 @@ xml_string3 = (
     '<Data Name="TargetLogonId">0x0000000000000003</Data></EventData></Event>'
 )
 
+xml_string_no_logon_id = (
+    '<Event xmlns="http://schemas.microsoft.com/win/2004/08/events'
+    '/event"><EventData><Data Name="TargetUserName">USER_4</Data>'
+    "</EventData></Event>"
+)
+
 
 class TestWinEXTXSessionizerPlugin(BaseTest):
     """Tests for Windows EVTX log sessionizers listed in analyzer_classes. New
@@ -80,6 +87,117 @@ class TestWinEXTXSessionizerPlugin(BaseTest):
             self.assertEqual(username, "USER_1")
             self.assertEqual(logon_id, "0x0000000000000001")
 
+    @mock.patch("timesketch.lib.analyzers.interface.OpenSearchDataStore", MockDataStore)
+    def test_get_event_data_from_fields(self):
+        """Test getEventData prefers the EventData fields added at ingest."""
+        user = User(username="test_user", name="test user")
+        sketch = Sketch(name="test_sketch", description="description", user=user)
+
+        for analyzer_class in self.analyzer_classes:
+            analyzer = analyzer_class["class"]("test_index", 1)
+            event_dict = copy.deepcopy(MockDataStore.event_dict)
+            event_dict["_source"].update(
+                {"evtx.TargetUserName": "USER_2", "evtx.TargetLogonId": "0x2"}
+            )
+            event_obj = Event(event_dict, analyzer.datastore, sketch)
+
+            self.assertEqual(
+                analyzer.getEventData(event_obj, "TargetUserName"), "USER_2"
+            )
+            self.assertEqual(analyzer.getEventData(event_obj, "TargetLogonId"), "0x2")
+            self.assertIsNone(analyzer.getEventData(event_obj, "LogonID"))
+
+    @mock.patch("timesketch.lib.analyzers.interface.OpenSearchDataStore", MockDataStore)
+    def test_return_fields(self):
+        """Test that the XML is only fetched for events without the fields."""
+        for analyzer_class in self.analyzer_classes:
+            analyzer = analyzer_class["class"]("test_index", 1)
+            analyzer.datastore.client = mock.Mock()
+            analyzer.datastore.client.count.return_value = {"count": 0}
+
+            with mock.patch.object(
+                analyzer, "event_stream", return_value=iter([])
+            ) as mock_stream:
+                analyzer.run()
+            return_fields = mock_stream.call_args.kwargs["return_fields"]
+            self.assertIn("evtx.TargetLogonId", return_fields)
+            self.assertNotIn("xml_string", return_fields)
+            self.assertNotIn("%d", mock_stream.call_args.kwargs["query_string"])
+
+            analyzer.datastore.client.count.return_value = {"count": 1}
+            with mock.patch.object(
+                analyzer, "event_stream", return_value=iter([])
+            ) as mock_stream:
+                analyzer.run()
+            self.assertIn("xml_string", mock_stream.call_args.kwargs["return_fields"])
+
+    @mock.patch("timesketch.lib.analyzers.interface.OpenSearchDataStore", MockDataStore)
+    def test_events_without_event_data_query(self):
+        """Test that every EventData field is checked within the timeline."""
+        # pylint: disable=protected-access
+        analyzer = LogonSessionizerSketchPlugin("test_index", 1, timeline_id=2)
+        analyzer.datastore.client = mock.Mock()
+        analyzer.datastore.client.count.return_value = {"count": 0}
+
+        self.assertFalse(analyzer._has_events_without_event_data())
+        query = analyzer.datastore.client.count.call_args.kwargs["body"]["query"]
+        self.assertIn({"term": {"__ts_timeline_id": 2}}, query["bool"]["filter"])
+        self.assertEqual(
+            query["bool"]["must_not"],
+            [
+                {"exists": {"field": evtx.get_field_name(name)}}
+                for name in analyzer.event_data_fields
+            ],
+        )
+
+        # Fields left out at ingest time are always parsed from the XML.
+        self.app.config["EVTX_EVENTDATA_FIELDS"] = ["TargetLogonId"]
+        self.assertTrue(analyzer._has_events_without_event_data())
+        analyzer.datastore.client.count.assert_called_once()
+
+    @mock.patch("timesketch.lib.analyzers.interface.OpenSearchDataStore", MockDataStore)
+    def test_single_session_view(self):
+        """Test that one view is added for all sessions if configured."""
+        self.app.config["EVTX_SESSIONIZER_VIEW_PER_SESSION"] = False
+
+        for analyzer_class in self.analyzer_classes:
+            analyzer = analyzer_class["class"]("test_index", 1)
+            analyzer.datastore.client = mock.Mock()
+            _create_mock_event(
+                analyzer.datastore,
+                0,
+                4,
+                source_attrs=[
+                    {
+                        "xml_string": xml_string1,
+                        "event_identifier": analyzer_class["start_event_id"],
+                    },
+                    {
+                        "xml_string": xml_string2,
+                        "event_identifier": analyzer_class["start_event_id"],
+                    },
+                    {
+                        "xml_string": xml_string1,
+                        "event_identifier": analyzer_class["end_event_id"],
+                    },
+                    {
+                        "xml_string": xml_string2,
+                        "event_identifier": analyzer_class["end_event_id"],
+                    },
+                ],
+            )
+
+            with mock.patch.object(analyzer.sketch, "add_view") as mock_add_view:
+                message = analyzer.run()
+            self.assertEqual(
+                message, "Sessionizing completed, number of sessions created: 2"
+            )
+            mock_add_view.assert_called_once_with(
+                analyzer.session_view_name,
+                analyzer.NAME,
+                query_string=f"session_id.{analyzer.session_type}:*",
+            )
+
     @mock.patch("timesketch.lib.analyzers.interface.OpenSearchDataStore", MockDataStore)
     def test_one_session(self):
         """Test the behaviour of the analyzer given one start and one end
@@ -465,6 +583,40 @@ class TestWinEXTXSessionizerPlugin(BaseTest):
                 or event3["_source"]["session_id"].get(analyzer.session_type) is None
             )
 
+    @mock.patch("timesketch.lib.analyzers.interface.OpenSearchDataStore", MockDataStore)
+    def test_no_logon_id(self):
+        """Test that start events without a logon ID start no session."""
+        index = "test_index"
+        sketch_id = 1
+
+        for analyzer_class in self.analyzer_classes:
+            analyzer = analyzer_class["class"](index, sketch_id)
+            analyzer.datastore.client = mock.Mock()
+            datastore = analyzer.datastore
+
+            _create_mock_event(
+                datastore,
+                0,
+                2,
+                source_attrs=[
+                    {
+                        "xml_string": xml_string_no_logon_id,
+                        "event_identifier": analyzer_class["start_event_id"],
+                    },
+                    {
+                        "xml_string": xml_string_no_logon_id,
+                        "event_identifier": analyzer_class["end_event_id"],
+                    },
+                ],
+            )
+
+            message = analyzer.run()
+            self.assertEqual(
+                message, "Sessionizing completed, number of sessions created: 0"
+            )
+            for event in datastore.event_store.values():
+                self.assertIsNone(event["_source"].get("session_id"))
+
     @mock.patch("timesketch.lib.analyzers.interface.OpenSearchDataStore", MockDataStore)
     def test_zero_events(self):
         """Test the behaviour of the analyzer given an empty event stream."""
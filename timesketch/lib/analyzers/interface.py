@@ -31,6 +31,8 @@ import pandas
 from timesketch.api.v1 import utils as api_utils
 
 from timesketch.lib import definitions
+from timesketch.lib import field_catalog
+from timesketch.lib import progress
 from timesketch.lib import telemetry
 from timesketch.lib.datastores.opensearch import OpenSearchDataStore
 from timesketch.models import db_session
@@ -42,6 +44,7 @@ from timesketch.models.sketch import Event as SQLEvent
 from timesketch.models.sketch import Sketch as SQLSketch
 from timesketch.models.sketch import Story as SQLStory
 from timesketch.models.sketch import SearchIndex
+from timesketch.models.sketch import Timeline
 from timesketch.models.sketch import View
 from timesketch.models.sketch import Analysis
 
@@ -68,6 +71,7 @@ def _flush_datastore_decorator(func):
             event.commit({"__ts_emojis": emojis})
 
         self.datastore.flush_queued_events()
+        self.update_field_catalogs()
         return func_return
 
     return wrapper
@@ -319,6 +323,11 @@ class Event:
 class Sketch:
     """Sketch object with helper methods.
 
+    Objects added to the sketch are written to the database session, but not
+    committed. The analyzer commits them once, when it has finished. Views
+    added with defer=True are not written until then either, so that the
+    views of a run are inserted together.
+
     Attributes:
         id: Sketch ID.
         sql_sketch: Instance of a SQLAlchemy Sketch object.
@@ -333,10 +342,70 @@ class Sketch:
         self.id = sketch_id
         self.sql_sketch = SQLSketch.get_by_id(sketch_id)
         self._analyzer = analyzer
+        self._analyzer_views = None
+        self._deferred_views = []
 
         if not self.sql_sketch:
             raise RuntimeError("No such sketch")
 
+    @staticmethod
+    def _get_or_add(model, **kwargs):
+        """Returns a database object, adding it to the session if missing.
+
+        Unlike get_or_create, the new object is not committed.
+
+        Args:
+            model: The SQLAlchemy model class.
+            kwargs: The attributes to look up the object by.
+
+        Returns:
+            A model instance.
+        """
+        instance = model.query.filter_by(**kwargs).first()
+        if not instance:
+            instance = model(**kwargs)
+            db_session.add(instance)
+        return instance
+
+    def _get_analyzer_views(self):
+        """Returns the views of the sketch that were created by analyzers.
+
+        The views are looked up once and cached for the rest of the run.
+
+        Returns:
+            A dict with (name, description) tuples as keys and View
+            objects as values.
+        """
+        if self._analyzer_views is None:
+            self._analyzer_views = {}
+            views = (
+                View.query.filter_by(sketch=self.sql_sketch, user=None)
+                .filter(View.description.like("analyzer: %"))
+                .order_by(View.id)
+            )
+            for view in views:
+                self._analyzer_views.setdefault((view.name, view.description), view)
+        return self._analyzer_views
+
+    def commit(self):
+        """Writes the pending objects of the sketch to the database.
+
+        Deferred views are inserted together and added to the list of saved
+        views in the analyzer output.
+        """
+        if self._deferred_views:
+            db_session.flush()
+            if self._analyzer:
+                for view in self._deferred_views:
+                    self._analyzer.output.add_saved_view(view.id)
+            self._deferred_views = []
+        db_session.commit()
+
+    def rollback(self):
+        """Discards the objects of the sketch that were not written yet."""
+        self._deferred_views = []
+        db_session.rollback()
+
     def add_apex_aggregation(
         self,
         name: str,
@@ -374,7 +443,8 @@ class Sketch:
             raise ValueError("Aggregator name not specified")
         aggregator = params["aggregator_name"]
 
-        aggregation = Aggregation.get_or_create(
+        aggregation = self._get_or_add(
+            Aggregation,
             agg_type=aggregator,
             chart_type=chart_type,
             description=description,
@@ -388,7 +458,7 @@ class Sketch:
         if label:
             aggregation.add_label(label)
         db_session.add(aggregation)
-        db_session.commit()
+        db_session.flush()
 
         return aggregation
 
@@ -428,7 +498,8 @@ class Sketch:
             agg_params["supported_charts"] = chart_type
 
         agg_json = json.dumps(agg_params)
-        aggregation = Aggregation.get_or_create(
+        aggregation = self._get_or_add(
+            Aggregation,
             name=name,
             description=description,
             agg_type=agg_name,
@@ -442,7 +513,7 @@ class Sketch:
         if label:
             aggregation.add_label(label)
         db_session.add(aggregation)
-        db_session.commit()
+        db_session.flush()
         return aggregation
 
     def add_aggregation_group(
@@ -467,7 +538,8 @@ class Sketch:
         if not description:
             description = "Created by an analyzer"
 
-        aggregation_group = SQLAggregationGroup.get_or_create(
+        aggregation_group = self._get_or_add(
+            SQLAggregationGroup,
             name=name,
             description=description,
             user=None,
@@ -475,7 +547,7 @@ class Sketch:
             view=view,
         )
         db_session.add(aggregation_group)
-        db_session.commit()
+        db_session.flush()
 
         return AggregationGroup(aggregation_group)
 
@@ -487,6 +559,7 @@ class Sketch:
         query_dsl: Optional[Dict] = None,
         query_filter: Optional[Dict] = None,
         additional_fields: Optional[List] = None,
+        defer: bool = False,
     ):
         """Add saved view to the Sketch.
 
@@ -498,6 +571,9 @@ class Sketch:
             query_filter: Dictionary with OpenSearch filters.
             additional_fields: A list with field names to include in the
                 view output.
+            defer: If True, the view is inserted together with the other
+                deferred views once the analyzer has finished. The returned
+                view has no ID until then.
 
         Raises:
             ValueError: If both query_string an query_dsl are missing.
@@ -514,18 +590,33 @@ class Sketch:
             query_filter["fields"] = [{"field": x.strip()} for x in additional_fields]
 
         description = f"analyzer: {analyzer_name:s}"
-        view = View.get_or_create(
-            name=view_name, description=description, sketch=self.sql_sketch, user=None
-        )
-        view.description = description
+        analyzer_views = self._get_analyzer_views()
+        view = analyzer_views.get((view_name, description))
+        if view is None:
+            view = View(
+                name=view_name,
+                description=description,
+                sketch=self.sql_sketch,
+                user=None,
+            )
+            analyzer_views[(view_name, description)] = view
         view.query_string = query_string
         view.query_filter = view.validate_filter(query_filter)
         view.query_dsl = query_dsl
         view.searchtemplate = None
-        view.set_status(status="new")
-
+        if view.id:
+            view.set_status(status="new")
+        else:
+            # New views need no row lock, their status is written with them.
+            view.status = [view.Status(user=None, status="new")]
         db_session.add(view)
-        db_session.commit()
+
+        if defer:
+            if view not in self._deferred_views:
+                self._deferred_views.append(view)
+            return view
+
+        db_session.flush()
 
         # Add new view to the list of saved_views in the analyzer output object
         if self._analyzer:
@@ -553,21 +644,17 @@ class Sketch:
                 user=None, sketch=self.sql_sketch, name=name, ontology=ontology
             )
             db_session.add(attribute)
-            db_session.commit()
 
         if overwrite:
             attribute.values = []
 
         for value in values:
-            attribute_value = AttributeValue(
-                user=None, attribute=attribute, value=value
+            attribute.values.append(
+                AttributeValue(user=None, attribute=attribute, value=value)
             )
-            attribute.values.append(attribute_value)
-            db_session.add(attribute_value)
-            db_session.commit()
 
         db_session.add(attribute)
-        db_session.commit()
+        db_session.flush()
 
     def get_sketch_attributes(self, name):
         """Get attributes from a sketch.
@@ -602,11 +689,11 @@ class Sketch:
         if story:
             return Story(story)
 
-        story = SQLStory.get_or_create(
-            title=title, content="[]", sketch=self.sql_sketch, user=None
+        story = self._get_or_add(
+            SQLStory, title=title, content="[]", sketch=self.sql_sketch, user=None
         )
         db_session.add(story)
-        db_session.commit()
+        db_session.flush()
 
         # Add new story to the analyzer output object.
         if self._analyzer:
@@ -760,7 +847,7 @@ class Story:
         return block
 
     def _commit(self, block):
-        """Commit the Story to database.
+        """Add a block and write the Story to the database session.
 
         Args:
             block (dict): Block to add.
@@ -769,7 +856,7 @@ class Story:
         story_blocks.append(block)
         self.story.content = json.dumps(story_blocks)
         db_session.add(self.story)
-        db_session.commit()
+        db_session.flush()
 
     def add_text(self, text, skip_if_exists=False):
         """Add a text block to the Story.
@@ -839,6 +926,10 @@ class Story:
         Args:
             view (View): Saved view to add to the story.
         """
+        if view.id is None:
+            # Deferred views get their ID when they are written.
+            db_session.flush()
+
         block = self._create_new_block()
         block["componentName"] = "TsViewEventList"
         block["componentProps"]["view"] = {"id": view.id, "name": view.name}
@@ -1096,6 +1187,52 @@ class BaseAnalyzer:
                     )
                     raise
 
+    def _set_analysis_status(self, analysis, status):
+        """Sets the status of an analysis and publishes the transition.
+
+        Args:
+            analysis: Instance of timesketch.models.sketch.Analysis.
+            status: The new status, e.g. STARTED, DONE or ERROR.
+        """
+        analysis.set_status(status)
+        progress.publish(
+            analysis.sketch_id,
+            progress.OBJECT_ANALYSIS,
+            analysis.id,
+            status,
+            session_id=analysis.analysissession_id,
+            timeline_id=analysis.timeline_id,
+            analyzer_name=self.name,
+        )
+
+    def update_field_catalogs(self):
+        """Adds the fields written by the analyzer to the field catalogs."""
+        fields = set(self.output.platform_meta_data.get("created_attributes", []))
+        if self.tagged_events:
+            fields.add("tag")
+        if self.emoji_events:
+            fields.add("__ts_emojis")
+        if not fields:
+            return
+
+        if self.timeline_id:
+            timelines = [Timeline.get_by_id(self.timeline_id)]
+        elif self.sketch.sql_sketch:
+            timelines = [
+                timeline
+                for timeline in self.sketch.sql_sketch.active_timelines
+                if timeline.searchindex.index_name == self.index_name
+            ]
+        else:
+            timelines = []
+
+        changed = field_catalog.add_fields(
+            self.datastore.client, [t for t in timelines if t], fields
+        )
+        if changed:
+            db_session.add_all(changed)
+            db_session.commit()
+
     @_flush_datastore_decorator
     def run_wrapper(self, analysis_id):
         """A wrapper method to run the analyzer.
@@ -1107,7 +1244,7 @@ class BaseAnalyzer:
             Return value of the run method.
         """
         analysis = Analysis.get_by_id(analysis_id)
-        analysis.set_status("STARTED")
+        self._set_analysis_status(analysis, "STARTED")
 
         timeline = analysis.timeline
         self.timeline_name = timeline.name
@@ -1154,13 +1291,17 @@ class BaseAnalyzer:
             telemetry.add_event_to_current_span(f"Starting analyzer: {self.name}")
 
             result = self.run()
-            analysis.set_status("DONE")
+            # Write the views, stories and other objects the analyzer added.
+            self.sketch.commit()
+            self._set_analysis_status(analysis, "DONE")
 
             telemetry.add_attribute_to_current_span("status", "success")
             telemetry.set_status_on_current_span("OK")
             telemetry.add_event_to_current_span(f"Analyzer {self.name} completed")
         except Exception as e:  # pylint: disable=broad-except
-            analysis.set_status("ERROR")
+            # Don't write the partial results of the run with the status.
+            self.sketch.rollback()
+            self._set_analysis_status(analysis, "ERROR")
             result = traceback.format_exc()
             logger.error(
                 "Analyzer %s (ID:%d) in sketch (ID:%d): failed with error: %s",
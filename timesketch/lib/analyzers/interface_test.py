@@ -14,10 +14,12 @@
 """Tests for analysis interface."""
 
 import json
+from unittest import mock
 
 from timesketch.lib.testlib import BaseTest
 from timesketch.lib.testlib import MockDataStore
 from timesketch.lib.analyzers import interface
+from timesketch.models.sketch import Analysis
 from timesketch.models.sketch import Sketch
 from timesketch.models.sketch import Story
 from timesketch.models.sketch import View
@@ -66,6 +68,40 @@ class TestAnalysisSketch(BaseTest):
         )
         self.assertIsInstance(view, View)
 
+    def test_add_deferred_views(self):
+        """Test that deferred views are written when the sketch is committed."""
+        analyzer = mock.Mock()
+        sketch = interface.Sketch(sketch_id=self.SKETCH_ID, analyzer=analyzer)
+        views = [
+            sketch.add_view(
+                view_name=f"Session {i:d}",
+                analyzer_name="Test",
+                query_string=f"session:{i:d}",
+                defer=True,
+            )
+            for i in range(3)
+        ]
+        self.assertTrue(all(view.id is None for view in views))
+        analyzer.output.add_saved_view.assert_not_called()
+
+        sketch.commit()
+        self.assertTrue(all(view.id for view in views))
+        self.assertEqual(analyzer.output.add_saved_view.call_count, 3)
+        self.assertEqual(views[0].get_status.status, "new")
+
+        # Views are updated, not duplicated, when the analyzer runs again.
+        rerun_sketch = interface.Sketch(sketch_id=self.SKETCH_ID)
+        view = rerun_sketch.add_view(
+            view_name="Session 0", analyzer_name="Test", query_string="session:new"
+        )
+        rerun_sketch.commit()
+        self.assertEqual(view.id, views[0].id)
+        self.assertEqual(view.query_string, "session:new")
+        self.assertEqual(
+            View.query.filter_by(name="Session 0", sketch_id=self.SKETCH_ID).count(),
+            1,
+        )
+
     def test_add_story(self):
         """Test adding a story to a sketch."""
         sketch = interface.Sketch(sketch_id=self.SKETCH_ID)
@@ -91,3 +127,62 @@ class TestAnalysisSketch(BaseTest):
         self.assertIsInstance(indices, list)
         self.assertEqual(len(indices), 1)
         self.assertEqual(indices[0], "test")
+
+
+class TestBaseAnalyzer(BaseTest):
+    """Tests for the functionality of the BaseAnalyzer class."""
+
+    SKETCH_ID = 1
+
+    @mock.patch("timesketch.lib.analyzers.interface.OpenSearchDataStore", MockDataStore)
+    def test_update_field_catalogs(self):
+        """Test that fields written by an analyzer are added to the catalogs."""
+        analyzer = interface.BaseAnalyzer("test", self.SKETCH_ID, timeline_id=1)
+        with mock.patch.object(
+            interface.field_catalog, "add_fields", return_value=[]
+        ) as mock_add_fields:
+            analyzer.update_field_catalogs()
+            mock_add_fields.assert_not_called()
+
+            analyzer.output.add_created_attributes(["session_id"])
+            analyzer.tagged_events["1"] = {"event": mock.Mock(), "tags": ["foo"]}
+            analyzer.update_field_catalogs()
+
+        _, timelines, fields = mock_add_fields.call_args[0]
+        self.assertEqual([timeline.id for timeline in timelines], [1])
+        self.assertEqual(fields, {"session_id", "tag"})
+
+    @mock.patch("timesketch.lib.analyzers.interface.OpenSearchDataStore", MockDataStore)
+    def test_run_wrapper_error(self):
+        """Test that a failed run does not write its partial results."""
+
+        class FailingAnalyzer(interface.BaseAnalyzer):
+            """Analyzer that fails after adding a view."""
+
+            NAME = "failing"
+
+            def run(self):
+                self.sketch.add_view(
+                    view_name="Deferred",
+                    analyzer_name=self.NAME,
+                    query_string="*",
+                    defer=True,
+                )
+                raise ValueError("failed")
+
+        self.searchindex.set_status("ready")
+        analysis = Analysis(
+            name="failing",
+            analyzer_name="failing",
+            user=self.user1,
+            sketch=self.sketch1,
+            timeline=self.timeline,
+        )
+        self._commit_to_database(analysis)
+
+        analyzer = FailingAnalyzer("test", self.SKETCH_ID, timeline_id=1)
+        result = analyzer.run_wrapper(analysis.id)
+
+        self.assertIn("ValueError: failed", result)
+        self.assertEqual(analysis.get_status.status, "ERROR")
+        self.assertEqual(View.query.filter_by(name="Deferred").count(), 0)
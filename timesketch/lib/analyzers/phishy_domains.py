@@ -4,8 +4,11 @@ import collections
 import difflib
 
 import logging
+from typing import Optional
 
 from flask import current_app
+from datasketch.lean_minhash import LeanMinHash
+from datasketch.lsh import MinHashLSH
 from datasketch.minhash import MinHash
 
 from timesketch.lib import emojis
@@ -16,6 +19,32 @@ from timesketch.lib.analyzers import utils
 
 logger = logging.getLogger("timesketch.analyzers.phishy_domains")
 
+# Weights for false positives and false negatives used when tuning the LSH
+# index. All LSH candidates are verified afterwards, so false negatives are
+# more costly than false positives.
+LSH_WEIGHTS = (0.2, 0.8)
+
+
+def minhashes_from_domain_parts(domain_parts):
+    """Calculate MinHash values for domain parts in bulk.
+
+    A MinHash is created from every character in a domain part.
+
+    Args:
+        domain_parts: iterable of domain parts, without the TLD extension.
+
+    Returns:
+        A dict with domain parts as keys and LeanMinHash objects as values.
+    """
+    domain_parts = list(set(domain_parts))
+    minhashes = MinHash.bulk(
+        [[char.encode("utf8") for char in part] for part in domain_parts],
+        num_perm=similarity.DEFAULT_PERMUTATIONS,
+    )
+    return {
+        part: LeanMinHash(minhash) for part, minhash in zip(domain_parts, minhashes)
+    }
+
 
 class PhishyDomainsSketchPlugin(interface.BaseAnalyzer):
     """Analyzer for phishy domains."""
@@ -75,8 +104,23 @@ class PhishyDomainsSketchPlugin(interface.BaseAnalyzer):
                 "DOMAIN_ANALYZER_WHITELISTED_DOMAINS", []
             )
 
+        self._exclude_matcher = utils.DomainSuffixMatcher(
+            self.domain_scoring_exclude_domains
+        )
+        self._watched_matcher = None
+        self._watched_matcher_source = None
+
+    # Cache of MinHash values of watched domains, kept across analyzer runs.
+    _WATCHED_MINHASH_CACHE = {}
+    _WATCHED_MINHASH_CACHE_MAX_SIZE = 10000
+
     @staticmethod
-    def _get_minhash_from_domain(domain):
+    def _get_domain_part(domain):
+        """Returns the domain without the TLD extension."""
+        return ".".join(domain.split(".")[:-1])
+
+    @classmethod
+    def _get_minhash_from_domain(cls, domain):
         """Get the Minhash value from a domain name.
 
         This function takes a domain, removes the TLD extension
@@ -90,18 +134,70 @@ class PhishyDomainsSketchPlugin(interface.BaseAnalyzer):
           domain: string with a full domain, eg. www.google.com
 
         Returns:
-            A minhash (instance of datasketch.minhash.MinHash)
+            A minhash (instance of datasketch.lean_minhash.LeanMinHash)
         """
-        domain_items = domain.split(".")
-        domain_part = ".".join(domain_items[:-1])
+        domain_part = cls._get_domain_part(domain)
+        return minhashes_from_domain_parts([domain_part])[domain_part]
 
-        minhash = MinHash(similarity.DEFAULT_PERMUTATIONS)
-        for char in domain_part:
-            minhash.update(char.encode("utf8"))
+    def _get_watched_domains(self, watched_domains_list):
+        """Returns MinHash values and depths for watched domains.
 
-        return minhash
+        MinHash values are calculated in bulk and cached across runs.
 
-    def _get_similar_domains(self, domain: str, domain_dict: dict):
+        Args:
+            watched_domains_list: list of watched domain names.
+
+        Returns:
+            A dict with domain names as keys and dicts with the MinHash
+            ("hash") and depth ("depth") of the domain as values.
+        """
+        cache = self._WATCHED_MINHASH_CACHE
+        missing = [domain for domain in watched_domains_list if domain not in cache]
+        if missing:
+            if len(cache) + len(missing) > self._WATCHED_MINHASH_CACHE_MAX_SIZE:
+                cache.clear()
+            minhashes = minhashes_from_domain_parts(
+                self._get_domain_part(domain) for domain in missing
+            )
+            for domain in missing:
+                cache[domain] = minhashes[self._get_domain_part(domain)]
+
+        return {
+            domain: {"hash": cache[domain], "depth": len(domain.split("."))}
+            for domain in watched_domains_list
+        }
+
+    def _build_lsh_indexes(self, domain_dict):
+        """Builds LSH indexes over watched domains, one per domain depth.
+
+        Args:
+            domain_dict: dict with domain names (keys) and dicts with the
+                MinHash and depth of the domains (values).
+
+        Returns:
+            A dict with domain depths as keys and MinHashLSH objects as values.
+        """
+        lsh_indexes = {}
+        for watched_domain, watched_item in domain_dict.items():
+            depth = watched_item.get("depth")
+            lsh = lsh_indexes.get(depth)
+            if lsh is None:
+                lsh = MinHashLSH(
+                    threshold=self.domain_scoring_threshold,
+                    num_perm=similarity.DEFAULT_PERMUTATIONS,
+                    weights=LSH_WEIGHTS,
+                )
+                lsh_indexes[depth] = lsh
+            lsh.insert(watched_domain, watched_item.get("hash"))
+        return lsh_indexes
+
+    def _get_similar_domains(
+        self,
+        domain: str,
+        domain_dict: dict,
+        lsh_indexes: Optional[dict] = None,
+        minhash_cache: Optional[dict] = None,
+    ):
         """Compare a domain to a list of domains and return similar domains.
 
         This function takes a domain and a dict object that contains
@@ -111,6 +207,9 @@ class PhishyDomainsSketchPlugin(interface.BaseAnalyzer):
         the Jaccard distance between all domains in the dict and the supplied
         domain (removing the TLD extension from all domains).
 
+        If LSH indexes are supplied only the candidate domains returned by the
+        index of the matching depth are compared.
+
         If the Jaccard distance between the supplied domain and one or more of
         the domains in the domain dict is higher than the configured threshold
         the domain is further tested to see if there are overlapping substrings
@@ -122,6 +221,10 @@ class PhishyDomainsSketchPlugin(interface.BaseAnalyzer):
             domain: string with a full domain, eg. www.google.com
             domain_dict: dict with domain names (keys) and MinHash objects
                 (values) for all domains to compare against.
+            lsh_indexes: optional dict with domain depths as keys and
+                MinHashLSH indexes over the domain_dict as values.
+            minhash_cache: optional dict with precomputed MinHash values for
+                domain parts.
 
         Returns:
             a list of tuples (score, similar_domain_name) with the names of
@@ -137,7 +240,12 @@ class PhishyDomainsSketchPlugin(interface.BaseAnalyzer):
         if domain in domain_dict:
             return similar
 
-        if any(domain.endswith(f".{x:s}") for x in domain_dict):
+        if self._watched_matcher_source is not domain_dict:
+            self._watched_matcher = utils.DomainSuffixMatcher(
+                f".{x:s}" for x in domain_dict
+            )
+            self._watched_matcher_source = domain_dict
+        if domain in self._watched_matcher:
             return similar
 
         # We want to get rid of the TLD extension of the domain.
@@ -147,13 +255,30 @@ class PhishyDomainsSketchPlugin(interface.BaseAnalyzer):
         domain_depth = len(domain_items)
         domain_part = ".".join(domain_items[:-1])
 
-        minhashes = {}
-        for index in range(0, domain_depth - 1):
-            minhashes[domain_depth - index] = self._get_minhash_from_domain(
-                ".".join(domain_items[index:])
-            )
-
-        for watched_domain, watched_item in iter(domain_dict.items()):
+        parts = {
+            domain_depth - index: self._get_domain_part(".".join(domain_items[index:]))
+            for index in range(0, domain_depth - 1)
+        }
+        if minhash_cache is None:
+            minhash_cache = {}
+        missing = [part for part in parts.values() if part not in minhash_cache]
+        if missing:
+            minhash_cache.update(minhashes_from_domain_parts(missing))
+        minhashes = {depth: minhash_cache[part] for depth, part in parts.items()}
+
+        if lsh_indexes is None:
+            candidates = domain_dict.items()
+        else:
+            candidate_names = set()
+            for depth, minhash in minhashes.items():
+                lsh = lsh_indexes.get(depth)
+                if lsh:
+                    candidate_names.update(lsh.query(minhash))
+            # Sorted, so that the order of the matches does not depend on the
+            # order the index returns them in.
+            candidates = [(name, domain_dict[name]) for name in sorted(candidate_names)]
+
+        for watched_domain, watched_item in candidates:
             watched_hash = watched_item.get("hash")
             watched_depth = watched_item.get("depth")
 
@@ -166,8 +291,7 @@ class PhishyDomainsSketchPlugin(interface.BaseAnalyzer):
             if score < self.domain_scoring_threshold:
                 continue
 
-            watched_domain_items = watched_domain.split(".")
-            watched_domain_part = ".".join(watched_domain_items[:-1])
+            watched_domain_part = self._get_domain_part(watched_domain)
 
             # Check if there are also any overlapping strings.
             sequence = difflib.SequenceMatcher(None, domain_part, watched_domain_part)
@@ -243,19 +367,26 @@ class PhishyDomainsSketchPlugin(interface.BaseAnalyzer):
         watched_domains_list_temp = set(watched_domains_list)
         watched_domains_list = []
         for domain in watched_domains_list_temp:
-            if domain in self.domain_scoring_exclude_domains:
-                continue
-            if any(domain.endswith(x) for x in self.domain_scoring_exclude_domains):
+            if domain in self._exclude_matcher:
                 continue
 
             if "." not in domain:
                 continue
             watched_domains_list.append(domain)
 
-        watched_domains = {}
-        for domain in watched_domains_list:
-            minhash = self._get_minhash_from_domain(domain)
-            watched_domains[domain] = {"hash": minhash, "depth": len(domain.split("."))}
+        watched_domains = self._get_watched_domains(watched_domains_list)
+        lsh_indexes = self._build_lsh_indexes(watched_domains)
+
+        # Calculate the MinHash values of all observed domains and their
+        # parent domains in one go.
+        minhash_cache = {}
+        domain_parts = set()
+        for domain in domain_counter:
+            domain_items = utils.strip_www_from_domain(domain).split(".")
+            for index in range(0, len(domain_items) - 1):
+                domain_parts.add(".".join(domain_items[index:-1]))
+        if domain_parts:
+            minhash_cache = minhashes_from_domain_parts(domain_parts)
 
         similar_domain_counter = 0
         allowlist_encountered = False
@@ -266,7 +397,12 @@ class PhishyDomainsSketchPlugin(interface.BaseAnalyzer):
             tags_to_add = []
             text = None
 
-            similar_domains = self._get_similar_domains(domain, watched_domains)
+            similar_domains = self._get_similar_domains(
+                domain,
+                watched_domains,
+                lsh_indexes=lsh_indexes,
+                minhash_cache=minhash_cache,
+            )
 
             if similar_domains:
                 similar_domain_counter += 1
@@ -280,7 +416,7 @@ class PhishyDomainsSketchPlugin(interface.BaseAnalyzer):
                 text = "Domain {:s} is similar to {:s}".format(
                     domain, ", ".join(similar_text_list)
                 )
-                if any(domain.endswith(x) for x in self.domain_scoring_exclude_domains):
+                if domain in self._exclude_matcher:
                     tags_to_add.append("known-domain")
                     allowlist_encountered = True
 
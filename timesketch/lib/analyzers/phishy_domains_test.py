@@ -62,3 +62,30 @@ class TestDomainsPlugin(BaseTest):
         # pylint: disable=protected-access
         similar = analyzer._get_similar_domains("www.google.com", domain_dict)
         self.assertEqual(len(similar), 0)
+
+    # Mock the OpenSearch datastore.
+    @mock.patch("timesketch.lib.analyzers.interface.OpenSearchDataStore", MockDataStore)
+    def test_get_similar_domains_lsh(self):
+        """Test get_similar_domains function with LSH indexes."""
+        analyzer = phishy_domains.PhishyDomainsSketchPlugin("test_index", 1)
+        # pylint: disable=protected-access
+        domain_dict = analyzer._get_watched_domains(
+            ["login.stortmbl.is", "google.com", "facebook.com"]
+        )
+        lsh_indexes = analyzer._build_lsh_indexes(domain_dict)
+        self.assertEqual(sorted(lsh_indexes), [2, 3])
+
+        minhash_cache = {}
+        similar = analyzer._get_similar_domains(
+            "login.stortmbi.is",
+            domain_dict,
+            lsh_indexes=lsh_indexes,
+            minhash_cache=minhash_cache,
+        )
+        self.assertEqual([name for name, _ in similar], ["login.stortmbl.is"])
+        self.assertIn("login.stortmbi", minhash_cache)
+
+        similar = analyzer._get_similar_domains(
+            "www.evil.com", domain_dict, lsh_indexes=lsh_indexes
+        )
+        self.assertEqual(len(similar), 0)
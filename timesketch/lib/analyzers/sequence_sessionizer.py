@@ -44,10 +44,18 @@ class SequenceSessionizerSketchPlugin(sessionizer.SessionizerSketchPlugin):
         if self.return_fields is not None:
             self.build_return_fields()
 
+        query_string = self.query
+        if self.incremental:
+            watermark, self.session_num = self.get_watermark()
+            if watermark is not None:
+                query_string = f"({self.query}) AND timestamp:>{watermark:d}"
+        # Sessions of earlier runs are continued, not created by this run.
+        first_session = self.session_num
+
         # event_stream returns an ordered generator of events (by time)
         # therefore no further sorting is needed.
         events = self.event_stream(
-            query_string=self.query, return_fields=self.return_fields
+            query_string=query_string, return_fields=self.return_fields
         )
 
         last_timestamp = None
@@ -68,7 +76,7 @@ class SequenceSessionizerSketchPlugin(sessionizer.SessionizerSketchPlugin):
 
         return (
             "Sessionizing completed, number of {:s} sessions created:"
-            " {:d}".format(self.session_type, self.session_num)
+            " {:d}".format(self.session_type, self.session_num - first_session)
         )
 
     def process_event(self, event):
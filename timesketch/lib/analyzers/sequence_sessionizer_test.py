@@ -529,6 +529,35 @@ class TestOneEventSequenceSessionizerPlugin(BaseTest):
                 ),
             )
 
+    @mock.patch("timesketch.lib.analyzers.interface.OpenSearchDataStore", MockDataStore)
+    def test_incremental(self):
+        """Test that an incremental run only reports its own sessions."""
+        sessionizer = OneEventSequenceSessionizer("test_index", 1, incremental=True)
+        sessionizer.datastore.client = mock.Mock()
+        sessionizer.datastore.build_query = mock.Mock(
+            return_value={"query": {"match_all": {}}, "sort": {}}
+        )
+        sessionizer.datastore.client.search.return_value = {
+            "aggregations": {
+                "watermark": {"value": 1410895419859000},
+                "last_session": {"value": 7},
+            }
+        }
+        datastore = sessionizer.datastore
+        _create_mock_event(
+            datastore, 0, 1, OneEventSequenceSessionizer.event_seq, time_diffs=[1]
+        )
+
+        message = sessionizer.run()
+        self.assertEqual(
+            message,
+            "Sessionizing completed, number of {:s} sessions created: 1".format(
+                sessionizer.session_type
+            ),
+        )
+        event = datastore.event_store["0"]
+        self.assertEqual(event["_source"]["session_id"][sessionizer.session_type], 8)
+
 
 def _create_mock_event(
     datastore: MockDataStore,
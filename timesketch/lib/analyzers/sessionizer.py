@@ -1,8 +1,66 @@
 """Sessionizing sketch analyzer plugin."""
 
+import array
+import logging
+
+import numpy as np
+
 from timesketch.lib.analyzers import interface
 from timesketch.lib.analyzers import manager
 
+logger = logging.getLogger("timesketch.analyzers.sessionizer")
+
+# Painless script that assigns a session ID to an event given the sorted start
+# timestamps of a batch of consecutive sessions.
+SESSION_RANGE_SCRIPT = """
+long ts = ((Number) ctx._source.timestamp).longValue();
+int lo = 0;
+int hi = params.starts.size() - 1;
+while (lo < hi) {
+    int mid = (lo + hi + 1) / 2;
+    if (((Number) params.starts.get(mid)).longValue() <= ts) {
+        lo = mid;
+    } else {
+        hi = mid - 1;
+    }
+}
+if (ctx._source.session_id == null) {
+    ctx._source.session_id = new HashMap();
+}
+ctx._source.session_id[params.session_type] = params.first_session + lo;
+"""
+
+
+def compute_sessions(
+    timestamps, max_time_diff, previous_timestamp=None, previous_session=0
+):
+    """Computes session numbers for a sorted array of timestamps.
+
+    A new session starts whenever the time difference to the previous event
+    is larger than max_time_diff.
+
+    Args:
+        timestamps (numpy.ndarray): Sorted array of timestamps.
+        max_time_diff (int): Maximum time difference between two events in
+            the same session.
+        previous_timestamp (int): Optional timestamp of the last event
+            processed by an earlier run, used to continue its session.
+        previous_session (int): Session number of the last event processed by
+            an earlier run.
+
+    Returns:
+        Numpy array with the session number of each timestamp.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if not timestamps.size:
+        return np.zeros(0, dtype=np.int64)
+
+    prepend = timestamps[0] if previous_timestamp is None else previous_timestamp
+    new_session = np.diff(timestamps, prepend=prepend) > max_time_diff
+    if previous_timestamp is None:
+        new_session[0] = True
+    return np.cumsum(new_session, dtype=np.int64) + previous_session
+
 
 class SessionizerSketchPlugin(interface.BaseAnalyzer):
     """Sessionizing analyzer.
@@ -32,38 +90,214 @@ class SessionizerSketchPlugin(interface.BaseAnalyzer):
     query = "*"
     session_type = "all_events"
 
+    # Above this number of events session IDs are written with one
+    # update_by_query per batch of sessions instead of one update per event.
+    RANGE_UPDATE_MIN_EVENTS = 10000
+
+    # Maximum number of sessions written by a single update_by_query.
+    RANGE_UPDATE_BATCH_SIZE = 1000
+
+    # Number of times a batch is written when events fail to update, e.g.
+    # because of version conflicts with a concurrent update.
+    RANGE_UPDATE_MAX_ATTEMPTS = 3
+
+    def __init__(self, index_name, sketch_id, timeline_id=None, incremental=False):
+        """Initialize the sessionizer.
+
+        Args:
+            index_name: OpenSearch index name.
+            sketch_id: The ID of the sketch.
+            timeline_id: The ID of the timeline.
+            incremental: If True only events newer than the last sessionized
+                event are processed, continuing the existing session numbers.
+        """
+        super().__init__(index_name, sketch_id, timeline_id=timeline_id)
+        self.incremental = incremental
+
     def run(self):
         """Entry point for the analyzer. Allocates each event a session_id
         attribute.
         Returns:
             String containing the number of sessions created.
         """
-        return_fields = ["timestamp"]
+        query_string = self.query
+        watermark = None
+        last_session = 0
+        if self.incremental:
+            watermark, last_session = self.get_watermark()
+            if watermark is not None:
+                query_string = f"({self.query}) AND timestamp:>{watermark:d}"
 
         # event_stream returns an ordered generator of events (by time)
         # therefore no further sorting is needed.
-        events = self.event_stream(query_string=self.query, return_fields=return_fields)
-        session_num = 0
-
-        try:
-            first_event = next(events)
-            last_timestamp = first_event.source.get("timestamp")
-            session_num = 1
-            self.annotateEvent(first_event, session_num)
-
-            for event in events:
-                curr_timestamp = event.source.get("timestamp")
-                if curr_timestamp - last_timestamp > self.max_time_diff_micros:
-                    session_num += 1
-                self.annotateEvent(event, session_num)
-                last_timestamp = curr_timestamp
-
-        except StopIteration:
-            pass
-
-        return "Sessionizing completed, number of session created:" " {:d}".format(
+        events = []
+        timestamps = array.array("q")
+        for event in self.event_stream(
+            query_string=query_string, return_fields=["timestamp"]
+        ):
+            timestamps.append(int(event.source.get("timestamp")))
+            # Only keep the events around while they may still be updated
+            # one by one.
+            if events is not None:
+                events.append(event)
+                if len(events) > self.RANGE_UPDATE_MIN_EVENTS:
+                    events = None
+
+        timestamps = np.frombuffer(timestamps, dtype=np.int64)
+        sessions = compute_sessions(
+            timestamps,
+            self.max_time_diff_micros,
+            previous_timestamp=watermark,
+            previous_session=last_session,
+        )
+
+        failed_events = 0
+        if events is not None:
+            for event, session_num in zip(events, sessions):
+                self.annotateEvent(event, int(session_num))
+        else:
+            failed_events = self.update_session_ranges(
+                query_string, timestamps, sessions
+            )
+
+        session_num = int(sessions[-1]) - last_session if sessions.size else 0
+        message = "Sessionizing completed, number of session created:" " {:d}".format(
             session_num
         )
+        if failed_events:
+            message += f", unable to add a session ID to {failed_events:d} events"
+        return message
+
+    def _build_session_query(self, query_string):
+        """Builds the query matching the events this sessionizer annotates.
+
+        Args:
+            query_string: The query string used to select events.
+
+        Returns:
+            OpenSearch query DSL (without sort) as a dictionary.
+        """
+        timeline_ids = [self.timeline_id] if self.timeline_id else None
+        query_dsl = self.datastore.build_query(
+            sketch_id=self.sketch.id,
+            query_string=query_string,
+            query_filter={},
+            timeline_ids=timeline_ids,
+        )
+        return query_dsl["query"]
+
+    def get_watermark(self):
+        """Gets the newest event that has already been sessionized.
+
+        Returns:
+            Tuple with the timestamp of the newest sessionized event (or None
+            if no event has been sessionized yet) and the highest session
+            number assigned so far.
+        """
+        session_field = f"session_id.{self.session_type:s}"
+        query_dsl = {
+            "query": {
+                "bool": {
+                    "must": [self._build_session_query(self.query)],
+                    "filter": [{"exists": {"field": session_field}}],
+                }
+            },
+            "size": 0,
+            "aggs": {
+                "watermark": {"max": {"field": "timestamp"}},
+                "last_session": {"max": {"field": session_field}},
+            },
+        }
+        result = self.datastore.client.search(index=self.index_name, body=query_dsl)
+        aggregations = result.get("aggregations", {})
+        watermark = aggregations.get("watermark", {}).get("value")
+        if watermark is None:
+            return None, 0
+        last_session = aggregations.get("last_session", {}).get("value") or 0
+        return int(watermark), int(last_session)
+
+    def update_session_ranges(self, query_string, timestamps, sessions):
+        """Writes session IDs using timestamp range based update_by_query.
+
+        Consecutive sessions never overlap in time, so every session maps to
+        the events of the query within the time range of its first and last
+        event.
+
+        Args:
+            query_string (str): The query string used to select events.
+            timestamps (numpy.ndarray): Sorted array of event timestamps.
+            sessions (numpy.ndarray): Session number of each event.
+
+        Returns:
+            The number of events that could not be updated.
+        """
+        if not sessions.size:
+            return 0
+
+        starts = np.flatnonzero(np.diff(sessions, prepend=sessions[0] - 1))
+        ends = np.append(starts[1:] - 1, sessions.size - 1)
+        session_query = self._build_session_query(query_string)
+
+        failed_events = 0
+        for i in range(0, starts.size, self.RANGE_UPDATE_BATCH_SIZE):
+            batch_starts = starts[i : i + self.RANGE_UPDATE_BATCH_SIZE]
+            batch_ends = ends[i : i + self.RANGE_UPDATE_BATCH_SIZE]
+            body = {
+                "query": {
+                    "bool": {
+                        "must": [session_query],
+                        "filter": [
+                            {
+                                "range": {
+                                    "timestamp": {
+                                        "gte": int(timestamps[batch_starts[0]]),
+                                        "lte": int(timestamps[batch_ends[-1]]),
+                                    }
+                                }
+                            }
+                        ],
+                    }
+                },
+                "script": {
+                    "lang": "painless",
+                    "source": SESSION_RANGE_SCRIPT,
+                    "params": {
+                        "session_type": self.session_type,
+                        "first_session": int(sessions[batch_starts[0]]),
+                        "starts": [int(x) for x in timestamps[batch_starts]],
+                    },
+                },
+            }
+            # The script always sets the same session ID, so a batch with
+            # conflicts or failures is written again as a whole.
+            for attempt in range(1, self.RANGE_UPDATE_MAX_ATTEMPTS + 1):
+                # pylint: disable=unexpected-keyword-arg
+                response = self.datastore.client.update_by_query(
+                    index=self.index_name,
+                    body=body,
+                    conflicts="proceed",
+                    slices="auto",
+                    wait_for_completion=True,
+                )
+                not_updated = response.get("version_conflicts", 0) + len(
+                    response.get("failures", [])
+                )
+                if not not_updated:
+                    break
+                logger.warning(
+                    "Sessionizer %s (index %s): %d events of sessions %d to %d "
+                    "were not updated, attempt %d of %d",
+                    self.NAME,
+                    self.index_name,
+                    not_updated,
+                    int(sessions[batch_starts[0]]),
+                    int(sessions[batch_ends[-1]]),
+                    attempt,
+                    self.RANGE_UPDATE_MAX_ATTEMPTS,
+                )
+            failed_events += not_updated
+        self.datastore.client.indices.refresh(index=self.index_name)
+        return failed_events
 
     def annotateEvent(self, event, session_num):
         """Annotate an event with a session ID. Store IDs as dictionary entries
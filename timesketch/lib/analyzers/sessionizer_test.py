@@ -3,7 +3,10 @@
 import unittest
 from unittest import mock
 
+import numpy as np
+
 from timesketch.lib.analyzers.sessionizer import SessionizerSketchPlugin
+from timesketch.lib.analyzers.sessionizer import compute_sessions
 from timesketch.lib.analyzers.base_sessionizer_test import _create_mock_event
 from timesketch.lib.analyzers.base_sessionizer_test import check_surrounding_events
 from timesketch.lib.testlib import BaseTest
@@ -99,6 +102,105 @@ class TestSessionizerPlugin(BaseTest):
         event1 = datastore.event_store["0"]
         self.assertEqual(event1["_source"]["session_id"], {"all_events": 1})
 
+    def test_compute_sessions(self):
+        """Test vectorized session boundary computation."""
+        timestamps = np.array([0, 10, 100, 105, 300])
+        sessions = compute_sessions(timestamps, 50)
+        self.assertEqual(sessions.tolist(), [1, 1, 2, 2, 3])
+
+        # Continue the last session of a previous run.
+        sessions = compute_sessions(
+            timestamps + 1000, 50, previous_timestamp=990, previous_session=4
+        )
+        self.assertEqual(sessions.tolist(), [4, 4, 5, 5, 6])
+
+        self.assertEqual(compute_sessions(np.array([]), 50).size, 0)
+
+    @mock.patch("timesketch.lib.analyzers.interface.OpenSearchDataStore", MockDataStore)
+    def test_range_updates(self):
+        """Test that large result sets are written with update_by_query."""
+        analyzer = SessionizerSketchPlugin("test_index", 1)
+        analyzer.RANGE_UPDATE_MIN_EVENTS = 1
+        analyzer.datastore.client = mock.Mock()
+        analyzer.datastore.build_query = mock.Mock(
+            return_value={"query": {"match_all": {}}, "sort": {}}
+        )
+        datastore = analyzer.datastore
+        datastore.client.update_by_query.return_value = {
+            "updated": 3,
+            "version_conflicts": 0,
+            "failures": [],
+        }
+
+        _create_mock_event(datastore, 0, 3, time_diffs=[3000, 400000000])
+
+        message = analyzer.run()
+        self.assertEqual(
+            message, "Sessionizing completed, number of session created: 2"
+        )
+        self.assertNotIn("session_id", datastore.event_store["0"]["_source"])
+
+        update_call = datastore.client.update_by_query.call_args
+        body = update_call.kwargs["body"]
+        params = body["script"]["params"]
+        self.assertEqual(params["session_type"], "all_events")
+        self.assertEqual(params["first_session"], 1)
+        self.assertEqual(len(params["starts"]), 2)
+        timestamp_range = body["query"]["bool"]["filter"][0]["range"]["timestamp"]
+        self.assertEqual(timestamp_range["gte"], params["starts"][0])
+
+    @mock.patch("timesketch.lib.analyzers.interface.OpenSearchDataStore", MockDataStore)
+    def test_range_update_conflicts(self):
+        """Test that batches with conflicts are retried and reported."""
+        analyzer = SessionizerSketchPlugin("test_index", 1)
+        analyzer.RANGE_UPDATE_MIN_EVENTS = 1
+        analyzer.datastore.client = mock.Mock()
+        analyzer.datastore.build_query = mock.Mock(
+            return_value={"query": {"match_all": {}}, "sort": {}}
+        )
+        datastore = analyzer.datastore
+        datastore.client.update_by_query.side_effect = [
+            {"updated": 1, "version_conflicts": 2, "failures": []},
+            {"updated": 2, "version_conflicts": 0, "failures": [{"id": "1"}]},
+            {"updated": 2, "version_conflicts": 0, "failures": [{"id": "1"}]},
+        ]
+
+        _create_mock_event(datastore, 0, 3, time_diffs=[3000, 400000000])
+
+        message = analyzer.run()
+        self.assertEqual(datastore.client.update_by_query.call_count, 3)
+        self.assertEqual(
+            message,
+            "Sessionizing completed, number of session created: 2, "
+            "unable to add a session ID to 1 events",
+        )
+
+    @mock.patch("timesketch.lib.analyzers.interface.OpenSearchDataStore", MockDataStore)
+    def test_incremental(self):
+        """Test that an incremental run continues from the watermark."""
+        analyzer = SessionizerSketchPlugin("test_index", 1, incremental=True)
+        analyzer.datastore.client = mock.Mock()
+        analyzer.datastore.build_query = mock.Mock(
+            return_value={"query": {"match_all": {}}, "sort": {}}
+        )
+        analyzer.datastore.client.search.return_value = {
+            "aggregations": {
+                "watermark": {"value": 1410895419859000},
+                "last_session": {"value": 7},
+            }
+        }
+        datastore = analyzer.datastore
+        _create_mock_event(datastore, 0, 2, time_diffs=[400000000])
+
+        message = analyzer.run()
+        self.assertEqual(
+            message, "Sessionizing completed, number of session created: 1"
+        )
+        event1 = datastore.event_store["0"]
+        self.assertEqual(event1["_source"]["session_id"], {"all_events": 7})
+        event2 = datastore.event_store["101"]
+        self.assertEqual(event2["_source"]["session_id"], {"all_events": 8})
+
 
 if __name__ == "__main__":
     unittest.main()
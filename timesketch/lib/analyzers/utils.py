@@ -13,6 +13,7 @@
 # limitations under the License.
 """This file contains utilities for analyzers."""
 
+import functools
 import logging
 import re
 from urllib import parse as urlparse
@@ -180,6 +181,93 @@ KNOWN_CDN_DOMAINS = {
 }
 
 
+class DomainSuffixMatcher:
+    """Matches domains against a set of domain suffixes.
+
+    The suffixes are compiled into a trie of reversed domain labels, so a
+    lookup costs one step per label of the domain instead of one string
+    comparison per suffix.
+
+    A suffix that starts with a dot (eg. ".akamai.net") only matches
+    subdomains of that domain, a suffix without it (eg. "akamai.net") matches
+    the domain itself and all of its subdomains. Matching is case insensitive.
+    """
+
+    # Key used to store the values of a suffix in its trie node.
+    _VALUES = None
+
+    def __init__(self, suffixes=None):
+        """Initialize the matcher.
+
+        Args:
+            suffixes: Optional iterable of suffixes, or a dict with suffixes
+                as keys and the value to return for each suffix as values.
+        """
+        self._trie = {}
+        if suffixes is None:
+            return
+        if isinstance(suffixes, dict):
+            items = suffixes.items()
+        else:
+            items = ((suffix, suffix) for suffix in suffixes)
+        for suffix, value in items:
+            self.add(suffix, value)
+
+    @staticmethod
+    def _labels(domain):
+        """Returns the labels of a domain, starting with the TLD."""
+        return reversed(domain.lower().strip(".").split("."))
+
+    def add(self, suffix, value=None):
+        """Adds a suffix to the matcher.
+
+        Args:
+            suffix: Domain suffix, eg. ".akamai.net" or "google.com".
+            value: Optional value to return when the suffix matches. Defaults
+                to the suffix itself.
+        """
+        if not suffix or not suffix.strip("."):
+            return
+        node = self._trie
+        for label in self._labels(suffix):
+            node = node.setdefault(label, {})
+        subdomains_only = suffix.startswith(".")
+        node.setdefault(self._VALUES, []).append(
+            (subdomains_only, suffix if value is None else value)
+        )
+
+    def matches(self, domain):
+        """Returns the values of all suffixes that match a domain.
+
+        Args:
+            domain: Domain name to check, eg. foo.akamai.net
+
+        Returns:
+            List of values of the matching suffixes.
+        """
+        values = []
+        if not domain:
+            return values
+        labels = list(self._labels(domain))
+        node = self._trie
+        for depth, label in enumerate(labels, start=1):
+            node = node.get(label)
+            if node is None:
+                break
+            is_subdomain = depth < len(labels)
+            for subdomains_only, value in node.get(self._VALUES, []):
+                if is_subdomain or not subdomains_only:
+                    values.append(value)
+        return values
+
+    def __contains__(self, domain):
+        return bool(self.matches(domain))
+
+
+# Matches the network location of URLs with a scheme, as urlparse would.
+_URL_NETLOC_RE = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*://([^/?#]*)")
+
+
 def get_domain_from_url(url):
     """Extract domain from URL.
 
@@ -189,13 +277,16 @@ def get_domain_from_url(url):
     Returns:
         String with domain from URL.
     """
-    # TODO: See if we can optimize this because it is rather slow.
-    domain_parsed = urlparse.urlparse(url)
-    domain_full = domain_parsed.netloc
+    match = _URL_NETLOC_RE.match(url)
+    if match and not any(char in url for char in "\t\r\n"):
+        domain_full = match.group(1)
+    else:
+        domain_full = urlparse.urlparse(url).netloc
     domain, _, _ = domain_full.partition(":")
     return domain
 
 
+@functools.lru_cache(maxsize=65536)
 def get_tld_from_domain(domain):
     """Get the top level domain from a domain string.
 
@@ -223,6 +314,10 @@ def strip_www_from_domain(domain):
     return domain
 
 
+_CDN_MATCHER = DomainSuffixMatcher(KNOWN_CDN_DOMAINS)
+
+
+@functools.lru_cache(maxsize=65536)
 def get_cdn_provider(domain):
     """Return name of CDN provider if domain is recognized as a CDN.
 
@@ -233,10 +328,7 @@ def get_cdn_provider(domain):
         String of names of CDN providers or empty string if not found.
 
     """
-    cdn_providers = [
-        v for k, v in iter(KNOWN_CDN_DOMAINS.items()) if domain.endswith(k.lower())
-    ]
-    return " ".join(set(cdn_providers))
+    return " ".join(set(_CDN_MATCHER.matches(domain)))
 
 
 def _fix_np_nan(source_dict, attribute, replace_with=None):
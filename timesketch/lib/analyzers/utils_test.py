@@ -64,6 +64,24 @@ class TestAnalyzerUtils(BaseTest):
         self.assertIsInstance(provider, str)
         self.assertEqual(provider, "")
 
+    def test_domain_suffix_matcher(self):
+        """Test the DomainSuffixMatcher class."""
+        matcher = utils.DomainSuffixMatcher(
+            {".akamai.net": "Akamai", "ytimg.com": "YouTube"}
+        )
+        self.assertEqual(matcher.matches("a248.e.Akamai.net"), ["Akamai"])
+        self.assertEqual(matcher.matches("akamai.net"), [])
+        self.assertEqual(matcher.matches("fakeakamai.net"), [])
+        self.assertIn("ytimg.com", matcher)
+        self.assertIn("i.ytimg.com", matcher)
+        self.assertNotIn("notytimg.com", matcher)
+        self.assertNotIn("", matcher)
+
+        matcher = utils.DomainSuffixMatcher(["google.com", ".google.com"])
+        self.assertEqual(
+            matcher.matches("mail.google.com"), ["google.com", ".google.com"]
+        )
+
     def test_get_events_from_data_frame(self):
         """Test getting all events from data frame."""
         lines = [
@@ -18,7 +18,7 @@ except ImportError:
     YETI_AVAILABLE = False
 
 
-from timesketch.lib import emojis, sigma_util
+from timesketch.lib import bloom, emojis, sigma_util
 from timesketch.lib.analyzers import interface, manager
 
 logger = logging.getLogger("timesketch.analyzers.yetiindicators")
@@ -710,6 +710,13 @@ class YetiBloomChecker(YetiBaseAnalyzer):
     DISPLAY_NAME = "Yeti Bloom filter checker"
     DESCRIPTION = "Check if hashes in the timeline are present in Yeti's bloom filter."
 
+    # Number of hashes per terms query when fetching events to tag.
+    TERMS_CHUNK_SIZE = 500
+
+    # Sizing of the local cache of hashes without bloom hits.
+    NEGATIVE_CACHE_CAPACITY = 2000000
+    NEGATIVE_CACHE_ERROR_RATE = 0.00001
+
     def run_composite_aggregation(
         self, hashmap: set[str], after_key: dict[str, Any] = None
     ) -> tuple[set[str], Union[Dict, None]]:
@@ -758,6 +765,65 @@ class YetiBloomChecker(YetiBaseAnalyzer):
 
         return hashmap, after_key
 
+    def _load_negative_cache(self) -> Optional[bloom.BloomFilter]:
+        """Loads the local cache of hashes known to have no bloom hits.
+
+        Returns:
+            A BloomFilter with previously checked hashes, or None if the cache
+            is disabled.
+        """
+        cache_path = current_app.config.get("YETI_BLOOM_NEGATIVE_CACHE_PATH")
+        if not cache_path:
+            return None
+        ttl_hours = current_app.config.get("YETI_BLOOM_NEGATIVE_CACHE_TTL_HOURS", 24)
+        return bloom.BloomFilter.load(
+            cache_path,
+            max_age=ttl_hours * 3600,
+            capacity=self.NEGATIVE_CACHE_CAPACITY,
+            error_rate=self.NEGATIVE_CACHE_ERROR_RATE,
+        )
+
+    def _save_negative_cache(self, negative_cache: bloom.BloomFilter):
+        """Persists the local cache of hashes known to have no bloom hits."""
+        cache_path = current_app.config.get("YETI_BLOOM_NEGATIVE_CACHE_PATH")
+        try:
+            negative_cache.save(cache_path)
+        except OSError as e:
+            logger.warning("Unable to save the negative hash cache: %s", e)
+
+    def tag_matching_events(self, hit_dict: Dict[str, List[str]]) -> int:
+        """Tags events whose hash matched a bloom filter.
+
+        Only events with a matching hash are fetched, using chunked terms
+        queries, instead of streaming every event that has a hash.
+
+        Args:
+            hit_dict: Dictionary mapping a hash to the list of bloom filters
+                it was found in.
+
+        Returns:
+            The number of tagged events.
+        """
+        tagged = 0
+        hashes = sorted(hit_dict)
+        for i in range(0, len(hashes), self.TERMS_CHUNK_SIZE):
+            chunk = hashes[i : i + self.TERMS_CHUNK_SIZE]
+            query_dsl = {
+                "query": {
+                    "bool": {"filter": [{"terms": {"sha256_hash.keyword": chunk}}]}
+                }
+            }
+            for event in self.event_stream(
+                query_dsl=query_dsl, return_fields=["sha256_hash"]
+            ):
+                sha256_hash = event.source.get("sha256_hash")
+                if sha256_hash not in hit_dict:
+                    continue
+                tagged += 1
+                event.add_tags([f"bloom:{tag}" for tag in hit_dict[sha256_hash]])
+                event.commit()
+        return tagged
+
     def run(self):
         hashmap = set()
         after = None
@@ -766,29 +832,41 @@ class YetiBloomChecker(YetiBaseAnalyzer):
             if not after:
                 break
 
-        try:
-            bloom_hits = self.api.search_bloom(list(hashmap))
-        except yeti_errors.YetiApiError as e:
-            return f"Error getting bloom hits from Yeti: {e}"
-        except RuntimeError as exception:
-            return str(exception)
+        negative_cache = self._load_negative_cache()
+        to_check = hashmap
+        if negative_cache is not None:
+            to_check = {h for h in hashmap if h not in negative_cache}
+
+        bloom_hits = []
+        if to_check:
+            try:
+                bloom_hits = self.api.search_bloom(list(to_check))
+            except yeti_errors.YetiApiError as e:
+                return f"Error getting bloom hits from Yeti: {e}"
+            except RuntimeError as exception:
+                return str(exception)
         hit_dict = {hit["value"]: hit["hits"] for hit in bloom_hits}
 
-        tagged = 0
-        for event in self.event_stream(
-            query_string="_exists_:sha256_hash", return_fields=["sha256_hash"]
-        ):
-            sha256_hash = event.source.get("sha256_hash")
-            if sha256_hash in hit_dict:
-                tagged += 1
-                tags = hit_dict[sha256_hash]
-                event.add_tags([f"bloom:{tag}" for tag in tags])
-                event.commit()
+        if negative_cache is not None:
+            negatives = [h for h in to_check if h not in hit_dict]
+            if negative_cache.count + len(negatives) > negative_cache.capacity:
+                # Past its capacity the false positive rate of the filter
+                # grows quickly, start over with an empty one.
+                negative_cache = bloom.BloomFilter(
+                    capacity=max(self.NEGATIVE_CACHE_CAPACITY, len(negatives)),
+                    error_rate=self.NEGATIVE_CACHE_ERROR_RATE,
+                )
+            negative_cache.update(negatives)
+            self._save_negative_cache(negative_cache)
+
+        tagged = self.tag_matching_events(hit_dict)
 
         msg = (
             f"Bloom filter check completed. {len(hashmap)} hashes checked,"
             f" {len(hit_dict)} hits found, {tagged} events tagged."
         )
+        if len(to_check) != len(hashmap):
+            msg += f" {len(hashmap) - len(to_check)} hashes skipped as known negatives."
         self.output.result_summary = msg
         self.output.result_status = "SUCCESS"
         return str(self.output)
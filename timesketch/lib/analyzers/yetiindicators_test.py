@@ -1,10 +1,13 @@
 """Tests for ThreatintelPlugin."""
 
 import json
+import os
+import tempfile
 from unittest import mock
 
 from flask import current_app
 
+from timesketch.lib import bloom
 from timesketch.lib.analyzers import yetiindicators
 from timesketch.lib.testlib import BaseTest
 from timesketch.lib.testlib import MockDataStore
@@ -454,3 +457,72 @@ tags:
         self.assertEqual(
             message["platform_meta_data"]["created_tags"], ["bloom:hitsource1"]
         )
+
+    @mock.patch("timesketch.lib.analyzers.interface.OpenSearchDataStore", MockDataStore)
+    @mock.patch("timesketch.lib.analyzers.yetiindicators.YetiApi")
+    def test_bloomanalyzer_negative_cache(self, mock_yeti_api_class):
+        """Tests that known negative hashes are not sent to Yeti again."""
+        mock_api = mock_yeti_api_class.return_value
+        mock_api.search_bloom.return_value = []
+
+        # pylint: disable=unused-argument
+        def agg_mock(hashset, after_key=None):
+            """Mock for the composite aggregation."""
+            hashset.update({"hash1", "hash2"})
+            return hashset, None
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            current_app.config["YETI_BLOOM_NEGATIVE_CACHE_PATH"] = os.path.join(
+                temp_dir, "negatives.bloom"
+            )
+            try:
+                analyzer = yetiindicators.YetiBloomChecker("test_index", 1, 123)
+                analyzer.run_composite_aggregation = agg_mock
+                analyzer.run()
+                self.assertEqual(mock_api.search_bloom.call_count, 1)
+
+                analyzer = yetiindicators.YetiBloomChecker("test_index", 1, 123)
+                analyzer.run_composite_aggregation = agg_mock
+                message = json.loads(analyzer.run())
+            finally:
+                current_app.config["YETI_BLOOM_NEGATIVE_CACHE_PATH"] = ""
+
+        self.assertEqual(mock_api.search_bloom.call_count, 1)
+        self.assertEqual(
+            message["result_summary"],
+            (
+                "Bloom filter check completed. 2 hashes checked, 0 hits "
+                "found, 0 events tagged. 2 hashes skipped as known negatives."
+            ),
+        )
+
+    @mock.patch("timesketch.lib.analyzers.interface.OpenSearchDataStore", MockDataStore)
+    @mock.patch("timesketch.lib.analyzers.yetiindicators.YetiApi")
+    def test_bloomanalyzer_negative_cache_capacity(self, mock_yeti_api_class):
+        """Tests that a negative cache that would overflow is started over."""
+        mock_api = mock_yeti_api_class.return_value
+        mock_api.search_bloom.return_value = []
+        hashes = [{"hash1", "hash2"}, {"hash3"}]
+
+        # pylint: disable=unused-argument
+        def agg_mock(hashset, after_key=None):
+            """Mock for the composite aggregation."""
+            hashset.update(hashes.pop(0))
+            return hashset, None
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_path = os.path.join(temp_dir, "negatives.bloom")
+            current_app.config["YETI_BLOOM_NEGATIVE_CACHE_PATH"] = cache_path
+            try:
+                for _ in range(2):
+                    analyzer = yetiindicators.YetiBloomChecker("test_index", 1, 123)
+                    analyzer.NEGATIVE_CACHE_CAPACITY = 2
+                    analyzer.run_composite_aggregation = agg_mock
+                    analyzer.run()
+                negative_cache = bloom.BloomFilter.load(cache_path)
+            finally:
+                current_app.config["YETI_BLOOM_NEGATIVE_CACHE_PATH"] = ""
+
+        self.assertEqual(negative_cache.count, 1)
+        self.assertIn("hash3", negative_cache)
+        self.assertNotIn("hash1", negative_cache)
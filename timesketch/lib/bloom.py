@@ -0,0 +1,222 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A small, serializable Bloom filter used for local lookup caches."""
+
+import hashlib
+import logging
+import math
+import os
+import struct
+import tempfile
+import time
+from typing import Iterable, Optional
+
+logger = logging.getLogger("timesketch.bloom")
+
+# Magic bytes and version used in the on-disk representation.
+_MAGIC = b"TSBF"
+_VERSION = 2
+_HEADER = struct.Struct(">4sBIIdQQ")
+
+
+class BloomFilter:
+    """Space efficient probabilistic set membership.
+
+    The filter never reports false negatives, but may report false positives
+    with a probability close to the configured error rate, as long as no more
+    than `capacity` items have been added. Callers compare count to capacity
+    and start over with a new filter before it is exceeded.
+
+    Attributes:
+        capacity: Expected maximum number of items in the filter.
+        count: Number of distinct items added, false positives on insert
+            are not counted.
+        num_bits: Number of bits in the filter.
+        num_hashes: Number of hash functions used per item.
+        created: Epoch time in seconds when the filter was created.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1000000,
+        error_rate: float = 0.0001,
+        num_bits: Optional[int] = None,
+        num_hashes: Optional[int] = None,
+        created: Optional[float] = None,
+        count: int = 0,
+    ):
+        """Initialize the Bloom filter.
+
+        Args:
+            capacity: Expected maximum number of items in the filter.
+            error_rate: Acceptable false positive rate.
+            num_bits: Optional explicit number of bits, overrides capacity.
+            num_hashes: Optional explicit number of hashes, overrides
+                error_rate.
+            created: Optional creation time, used when loading a filter.
+            count: Number of items already added, used when loading a filter.
+
+        Raises:
+            ValueError: If capacity or error_rate are out of range.
+        """
+        if not num_bits:
+            if capacity <= 0:
+                raise ValueError("Capacity must be a positive integer.")
+            if not 0 < error_rate < 1:
+                raise ValueError("Error rate must be between 0 and 1.")
+            num_bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        if not num_hashes:
+            num_hashes = max(1, int(round(num_bits / capacity * math.log(2))))
+
+        self.capacity = capacity
+        self.count = count
+        self.num_bits = max(8, num_bits)
+        self.num_hashes = num_hashes
+        self.created = created or time.time()
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str):
+        """Yields the bit positions for an item using double hashing."""
+        digest = hashlib.sha256(item.encode("utf-8")).digest()
+        first, second = struct.unpack(">QQ", digest[:16])
+        for i in range(self.num_hashes):
+            yield (first + i * second) % self.num_bits
+
+    def add(self, item: str):
+        """Adds an item to the filter.
+
+        Args:
+            item: String to add.
+        """
+        added = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not self._bits[position >> 3] & mask:
+                self._bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+
+    def update(self, items: Iterable[str]):
+        """Adds all items from an iterable to the filter.
+
+        Args:
+            items: Iterable of strings to add.
+        """
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    def age(self) -> float:
+        """Returns the age of the filter in seconds."""
+        return time.time() - self.created
+
+    def to_bytes(self) -> bytes:
+        """Serializes the filter into bytes."""
+        header = _HEADER.pack(
+            _MAGIC,
+            _VERSION,
+            self.num_bits,
+            self.num_hashes,
+            self.created,
+            self.capacity,
+            self.count,
+        )
+        return header + bytes(self._bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BloomFilter":
+        """Deserializes a filter previously created with to_bytes.
+
+        Args:
+            data: Bytes as returned by to_bytes.
+
+        Returns:
+            A BloomFilter instance.
+
+        Raises:
+            ValueError: If the data is not a serialized Bloom filter.
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError("Data is too short to be a Bloom filter.")
+        magic, version, num_bits, num_hashes, created, capacity, count = _HEADER.unpack(
+            data[: _HEADER.size]
+        )
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Data is not a serialized Bloom filter.")
+        bloom = cls(
+            capacity=capacity,
+            num_bits=num_bits,
+            num_hashes=num_hashes,
+            created=created,
+            count=count,
+        )
+        bits = data[_HEADER.size :]
+        if len(bits) != len(bloom._bits):
+            raise ValueError("Bloom filter data is truncated.")
+        bloom._bits = bytearray(bits)
+        return bloom
+
+    def save(self, path: str):
+        """Atomically writes the filter to disk.
+
+        Args:
+            path: Path to the file to write.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as fh:
+            fh.write(self.to_bytes())
+            temp_path = fh.name
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        max_age: Optional[float] = None,
+        capacity: int = 1000000,
+        error_rate: float = 0.0001,
+    ) -> "BloomFilter":
+        """Loads a filter from disk, or creates a new one.
+
+        A new, empty filter is returned if the file does not exist, cannot be
+        parsed or is older than max_age seconds.
+
+        Args:
+            path: Path to the file to read.
+            max_age: Optional maximum age of the filter in seconds.
+            capacity: Capacity used if a new filter needs to be created.
+            error_rate: Error rate used if a new filter needs to be created.
+
+        Returns:
+            A BloomFilter instance.
+        """
+        try:
+            with open(path, "rb") as fh:
+                bloom = cls.from_bytes(fh.read())
+        except FileNotFoundError:
+            return cls(capacity=capacity, error_rate=error_rate)
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning("Unable to load Bloom filter from %s: %s", path, e)
+            return cls(capacity=capacity, error_rate=error_rate)
+
+        if max_age and bloom.age() > max_age:
+            return cls(capacity=capacity, error_rate=error_rate)
+        return bloom
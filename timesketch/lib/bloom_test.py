@@ -0,0 +1,65 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the Bloom filter library."""
+
+import os
+import tempfile
+
+from timesketch.lib import bloom
+from timesketch.lib.testlib import BaseTest
+
+
+class TestBloomFilter(BaseTest):
+    """Tests for the BloomFilter class."""
+
+    def test_membership(self):
+        """Test that added items are found and others mostly are not."""
+        bloom_filter = bloom.BloomFilter(capacity=1000, error_rate=0.001)
+        bloom_filter.update(f"item{i}" for i in range(1000))
+        for i in range(1000):
+            self.assertIn(f"item{i}", bloom_filter)
+
+        false_positives = sum(1 for i in range(1000) if f"other{i}" in bloom_filter)
+        self.assertLess(false_positives, 10)
+
+    def test_serialization(self):
+        """Test that a filter survives a round trip to disk."""
+        bloom_filter = bloom.BloomFilter(capacity=100)
+        bloom_filter.add("foobar")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "test.bloom")
+            bloom_filter.save(path)
+            loaded = bloom.BloomFilter.load(path)
+            self.assertIn("foobar", loaded)
+            self.assertEqual(loaded.num_bits, bloom_filter.num_bits)
+
+            # An expired filter is replaced by an empty one.
+            expired = bloom.BloomFilter.load(path, max_age=-1)
+            self.assertNotIn("foobar", expired)
+
+    def test_count(self):
+        """Test that distinct items are counted and serialized."""
+        bloom_filter = bloom.BloomFilter(capacity=3)
+        bloom_filter.update(["foo", "bar", "foo"])
+        self.assertEqual(bloom_filter.count, 2)
+
+        loaded = bloom.BloomFilter.from_bytes(bloom_filter.to_bytes())
+        self.assertEqual(loaded.count, 2)
+        self.assertEqual(loaded.capacity, 3)
+
+    def test_invalid_data(self):
+        """Test that invalid data raises a ValueError."""
+        with self.assertRaises(ValueError):
+            bloom.BloomFilter.from_bytes(b"garbage")
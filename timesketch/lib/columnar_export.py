@@ -0,0 +1,314 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Columnar (Apache Arrow and Parquet) serialization of exported events.
+
+Events are grouped into record batches with a schema that is derived from the
+mapping of the exported indices, so that every batch of an export has the
+same schema, regardless of which fields are set in the events of the batch.
+Numeric and boolean fields keep their type, all other fields are exported as
+strings, with objects and lists encoded as JSON.
+"""
+
+import fnmatch
+import json
+from typing import Iterable, Iterator, Optional
+
+try:
+    import pyarrow
+    from pyarrow import parquet
+
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+from timesketch.lib.datastores.mapping_cache import find_field_mapping
+
+FORMAT_JSONL = "jsonl"
+FORMAT_ARROW = "arrow"
+FORMAT_PARQUET = "parquet"
+COLUMNAR_FORMATS = frozenset([FORMAT_ARROW, FORMAT_PARQUET])
+
+MIMETYPES = {
+    FORMAT_JSONL: "application/x-json-stream",
+    FORMAT_ARROW: "application/vnd.apache.arrow.stream",
+    FORMAT_PARQUET: "application/vnd.apache.parquet",
+}
+
+# Number of events in each record batch.
+DEFAULT_BATCH_SIZE = 10000
+
+# Columns that are added to every exported event.
+METADATA_COLUMNS = ("_id", "_index")
+
+TYPE_STRING = "string"
+TYPE_INT64 = "int64"
+TYPE_FLOAT64 = "float64"
+TYPE_BOOL = "bool"
+
+# Mapping types with a column type other than string.
+MAPPING_TYPES = {
+    "long": TYPE_INT64,
+    "integer": TYPE_INT64,
+    "short": TYPE_INT64,
+    "byte": TYPE_INT64,
+    "unsigned_long": TYPE_INT64,
+    "double": TYPE_FLOAT64,
+    "float": TYPE_FLOAT64,
+    "half_float": TYPE_FLOAT64,
+    "scaled_float": TYPE_FLOAT64,
+    "boolean": TYPE_BOOL,
+}
+
+
+def _mapped_fields(properties: dict, prefix: str = "") -> Iterator[str]:
+    """Yields the names of all leaf fields in mapping properties."""
+    for name, mapping in properties.items():
+        if not isinstance(mapping, dict):
+            continue
+        field_name = f"{prefix}{name}"
+        if isinstance(mapping.get("properties"), dict):
+            yield from _mapped_fields(mapping["properties"], f"{field_name}.")
+        else:
+            yield field_name
+
+
+def get_column_types(properties_per_index: dict, fields: Iterable[str]) -> dict:
+    """Returns the column types of exported fields.
+
+    Args:
+        properties_per_index: Dictionary with index names and the "properties"
+            of their mapping.
+        fields: Names of the exported fields, wildcards are expanded to all
+            matching mapped fields.
+
+    Returns:
+        An ordered dictionary with column names and type names. Fields with a
+        different type in one of the indices, or that are not mapped, are
+        exported as strings.
+    """
+    all_fields = None
+    columns = []
+    for field_name in fields:
+        if "*" not in field_name:
+            columns.append(field_name)
+            continue
+        if all_fields is None:
+            all_fields = sorted(
+                {
+                    name
+                    for properties in properties_per_index.values()
+                    for name in _mapped_fields(properties or {})
+                }
+            )
+        columns.extend(fnmatch.filter(all_fields, field_name))
+    columns.extend(METADATA_COLUMNS)
+
+    column_types = {}
+    for column in columns:
+        if column in column_types:
+            continue
+        if column in METADATA_COLUMNS:
+            column_types[column] = TYPE_STRING
+            continue
+        types = set()
+        for properties in properties_per_index.values():
+            mapping = find_field_mapping(properties, column)
+            if mapping:
+                types.add(MAPPING_TYPES.get(mapping.get("type"), TYPE_STRING))
+        column_types[column] = types.pop() if len(types) == 1 else TYPE_STRING
+    return column_types
+
+
+def convert_value(value, column_type: str):
+    """Returns a value converted to the type of its column.
+
+    Args:
+        value (object): The value from the event source.
+        column_type (str): Type name as returned by get_column_types.
+
+    Returns:
+        The converted value, or None if it can not be converted.
+    """
+    if value is None:
+        return None
+    if column_type == TYPE_STRING:
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, sort_keys=True)
+        return str(value)
+    if isinstance(value, list):
+        value = value[0] if len(value) == 1 else None
+    try:
+        if column_type == TYPE_INT64:
+            return int(value)
+        if column_type == TYPE_FLOAT64:
+            return float(value)
+        if column_type == TYPE_BOOL:
+            if isinstance(value, str):
+                return {"true": True, "false": False}.get(value.lower())
+            return bool(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return value
+
+
+def _get_value(event: dict, column: str):
+    """Returns the value of a possibly nested field of an event."""
+    if column in event:
+        return event[column]
+    value = event
+    for part in column.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def build_schema(column_types: dict):
+    """Returns the Arrow schema for column types.
+
+    Args:
+        column_types: Dictionary as returned by get_column_types.
+
+    Returns:
+        A pyarrow.Schema.
+    """
+    arrow_types = {
+        TYPE_STRING: pyarrow.string(),
+        TYPE_INT64: pyarrow.int64(),
+        TYPE_FLOAT64: pyarrow.float64(),
+        TYPE_BOOL: pyarrow.bool_(),
+    }
+    return pyarrow.schema(
+        [
+            pyarrow.field(column, arrow_types[column_type])
+            for column, column_type in column_types.items()
+        ]
+    )
+
+
+def iter_record_batches(
+    events: Iterable[dict],
+    column_types: dict,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+):
+    """Groups events into record batches.
+
+    Args:
+        events: Iterable of event dictionaries.
+        column_types: Dictionary as returned by get_column_types.
+        batch_size: Maximum number of events in a batch.
+
+    Yields:
+        pyarrow.RecordBatch objects, all with the same schema.
+    """
+    schema = build_schema(column_types)
+    columns = {column: [] for column in column_types}
+    row_count = 0
+    for event in events:
+        for column, column_type in column_types.items():
+            columns[column].append(
+                convert_value(_get_value(event, column), column_type)
+            )
+        row_count += 1
+        if row_count >= batch_size:
+            yield pyarrow.RecordBatch.from_pydict(columns, schema=schema)
+            columns = {column: [] for column in column_types}
+            row_count = 0
+    if row_count:
+        yield pyarrow.RecordBatch.from_pydict(columns, schema=schema)
+
+
+class _ChunkSink:
+    """Write only file object that hands out everything written to it."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        """Buffers data until the next call to pop."""
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        """Returns the number of bytes written so far."""
+        return self._position
+
+    def flush(self):
+        """Nothing to flush, data is handed out by pop."""
+
+    def close(self):
+        """Marks the sink as closed."""
+        self.closed = True
+
+    def pop(self) -> bytes:
+        """Returns and removes all buffered data."""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_events(
+    events: Iterable[dict],
+    column_types: dict,
+    export_format: str = FORMAT_ARROW,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[bytes]:
+    """Serializes events as an Arrow IPC stream or a Parquet file.
+
+    Data is handed out after every record batch, so an export never holds
+    more than one batch of events in memory.
+
+    Args:
+        events: Iterable of event dictionaries.
+        column_types: Dictionary as returned by get_column_types.
+        export_format: Either FORMAT_ARROW or FORMAT_PARQUET.
+        batch_size: Maximum number of events in a record batch, which is also
+            the size of the row groups in a Parquet file.
+
+    Yields:
+        Chunks of bytes of the serialized events.
+
+    Raises:
+        ValueError: If the format is not supported or pyarrow is not installed.
+    """
+    if not ARROW_AVAILABLE:
+        raise ValueError("Columnar export requires pyarrow to be installed.")
+    if export_format not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    schema = build_schema(column_types)
+    sink = _ChunkSink()
+    if export_format == FORMAT_ARROW:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+    else:
+        writer = parquet.ParquetWriter(sink, schema)
+
+    for batch in iter_record_batches(events, column_types, batch_size=batch_size):
+        writer.write_batch(batch)
+        data = sink.pop()
+        if data:
+            yield data
+    writer.close()
+    data = sink.pop()
+    if data:
+        yield data
+
+
+def get_mimetype(export_format: str) -> Optional[str]:
+    """Returns the mimetype of an export format, or None if it is unknown."""
+    return MIMETYPES.get(export_format)
@@ -0,0 +1,109 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the columnar export."""
+
+import io
+import unittest
+
+from timesketch.lib import columnar_export
+from timesketch.lib.testlib import BaseTest
+
+PROPERTIES = {
+    "index_a": {
+        "message": {"type": "text"},
+        "timestamp": {"type": "long"},
+        "score": {"type": "float"},
+        "user": {"properties": {"name": {"type": "keyword"}}},
+        "port": {"type": "long"},
+    },
+    "index_b": {
+        "message": {"type": "text"},
+        "timestamp": {"type": "long"},
+        "port": {"type": "keyword"},
+    },
+}
+
+
+class TestColumnarExport(BaseTest):
+    """Tests for the columnar export functionality."""
+
+    def test_get_column_types(self):
+        """Test that column types are derived from the mappings."""
+        column_types = columnar_export.get_column_types(
+            PROPERTIES, ["message", "timestamp", "score", "port", "missing"]
+        )
+        self.assertEqual(
+            column_types,
+            {
+                "message": "string",
+                "timestamp": "int64",
+                "score": "float64",
+                "port": "string",
+                "missing": "string",
+                "_id": "string",
+                "_index": "string",
+            },
+        )
+
+        column_types = columnar_export.get_column_types(PROPERTIES, ["user.*"])
+        self.assertEqual(list(column_types), ["user.name", "_id", "_index"])
+
+    def test_convert_value(self):
+        """Test that values are converted to the type of their column."""
+        convert = columnar_export.convert_value
+        self.assertEqual(convert("12", "int64"), 12)
+        self.assertIsNone(convert("twelve", "int64"))
+        self.assertEqual(convert([1.5], "float64"), 1.5)
+        self.assertIs(convert("false", "bool"), False)
+        self.assertEqual(convert(["a", "b"], "string"), '["a", "b"]')
+        self.assertEqual(convert(5, "string"), "5")
+        self.assertIsNone(convert(None, "string"))
+
+    @unittest.skipUnless(columnar_export.ARROW_AVAILABLE, "pyarrow not installed")
+    def test_stream_events(self):
+        """Test that events are streamed as Arrow batches with one schema."""
+        # pylint: disable=import-outside-toplevel
+        import pyarrow
+        from pyarrow import parquet
+
+        column_types = columnar_export.get_column_types(
+            PROPERTIES, ["message", "timestamp"]
+        )
+        events = [
+            {"_id": str(i), "_index": "index_a", "message": f"event {i}"}
+            for i in range(5)
+        ]
+        events[3]["timestamp"] = 1000
+
+        data = b"".join(
+            columnar_export.stream_events(events, column_types, batch_size=2)
+        )
+        reader = pyarrow.ipc.open_stream(data)
+        batches = list(reader)
+        self.assertEqual(len(batches), 3)
+        table = pyarrow.Table.from_batches(batches)
+        self.assertEqual(table.schema.field("timestamp").type, pyarrow.int64())
+        self.assertEqual(table.column("timestamp").to_pylist()[3], 1000)
+
+        data = b"".join(
+            columnar_export.stream_events(
+                events,
+                column_types,
+                export_format=columnar_export.FORMAT_PARQUET,
+                batch_size=2,
+            )
+        )
+        table = parquet.read_table(io.BytesIO(data))
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(table.column("_id").to_pylist(), ["0", "1", "2", "3", "4"])
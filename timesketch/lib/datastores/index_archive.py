@@ -0,0 +1,307 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Archiving of indices to a snapshot repository.
+
+With the default "close" backend, the indices of archived sketches are
+closed. Closed indices still occupy disk and shard slots and are part of
+the cluster state, which slows down cluster state updates once thousands
+of them accumulate.
+
+With the "snapshot" backend, an index is copied to a filesystem snapshot
+repository and then deleted from the cluster. It is restored from the
+snapshot when a sketch is unarchived. Both run as Celery tasks and publish
+their progress to the progress channel of the sketch. The repository is a
+local path, it has to be listed in the "path.repo" setting of all nodes.
+
+Each index gets its own snapshot, named after the index, so an index that
+is shared by several sketches can be restored by whichever sketch is
+unarchived first.
+"""
+
+import logging
+import time
+from typing import Callable, Iterable, Optional
+
+import prometheus_client
+from flask import current_app
+
+from timesketch.lib import index_placement
+from timesketch.lib.definitions import METRICS_NAMESPACE
+
+logger = logging.getLogger("timesketch.index_archive")
+
+BACKEND_CLOSE = "close"
+BACKEND_SNAPSHOT = "snapshot"
+
+DEFAULT_REPOSITORY = "timesketch_archive"
+SNAPSHOT_PREFIX = "timesketch_"
+
+# A new snapshot is taken under a temporary name and only replaces the
+# previous snapshot of the index once it succeeded.
+TEMPORARY_SNAPSHOT_SUFFIX = "_new"
+
+METRICS = {
+    "worker_index_archive_seconds": prometheus_client.Summary(
+        "worker_index_archive_seconds",
+        "Time to snapshot an index to the archive repository (in seconds)",
+        namespace=METRICS_NAMESPACE,
+    ),
+    "worker_index_restore_seconds": prometheus_client.Summary(
+        "worker_index_restore_seconds",
+        "Time to restore an index from the archive repository (in seconds)",
+        namespace=METRICS_NAMESPACE,
+    ),
+}
+
+
+def get_location() -> str:
+    """Returns the path to the snapshot repository, or an empty string."""
+    return current_app.config.get("ARCHIVE_SNAPSHOT_LOCATION", "") or ""
+
+
+def get_repository() -> str:
+    """Returns the name of the snapshot repository."""
+    return current_app.config.get("ARCHIVE_SNAPSHOT_REPOSITORY", DEFAULT_REPOSITORY)
+
+
+def is_snapshot_backend() -> bool:
+    """Returns True if indices are archived to snapshots."""
+    backend = current_app.config.get("ARCHIVE_BACKEND", BACKEND_CLOSE)
+    if backend != BACKEND_SNAPSHOT:
+        return False
+    if not get_location():
+        logger.error(
+            "ARCHIVE_BACKEND is set to snapshot, but ARCHIVE_SNAPSHOT_LOCATION "
+            "is not configured. Indices are closed instead."
+        )
+        return False
+    return True
+
+
+def get_snapshot_name(index_name: str) -> str:
+    """Returns the name of the snapshot of an index."""
+    return f"{SNAPSHOT_PREFIX}{index_name}"
+
+
+def _get_temporary_snapshot_name(index_name: str) -> str:
+    """Returns the name a new snapshot of an index is taken under."""
+    return f"{get_snapshot_name(index_name)}{TEMPORARY_SNAPSHOT_SUFFIX}"
+
+
+def _find_snapshot(datastore, index_name: str) -> Optional[str]:
+    """Returns the name of the successful snapshot of an index, if any.
+
+    Falls back to the temporary snapshot, which is the only one left if a
+    worker died while it replaced the previous snapshot.
+
+    Args:
+        datastore (OpenSearchDataStore): The datastore.
+        index_name (str): Name of the index.
+    """
+    repository = get_repository()
+    for snapshot_name in (
+        get_snapshot_name(index_name),
+        _get_temporary_snapshot_name(index_name),
+    ):
+        snapshot = datastore.get_snapshot(repository, snapshot_name)
+        if snapshot and snapshot.get("state") == "SUCCESS":
+            return snapshot_name
+    return None
+
+
+def can_archive_index(search_index) -> bool:
+    """Returns True if no active timeline uses an index.
+
+    Args:
+        search_index (SearchIndex): The search index.
+    """
+    # Shared indices hold the timelines of other sketches and stay open.
+    if index_placement.is_shared_index(search_index.index_name):
+        return False
+    return all(
+        timeline.get_status.status in ("archived", "deleted")
+        for timeline in search_index.timelines
+    )
+
+
+def has_snapshot(datastore, index_name: str) -> bool:
+    """Returns True if an archive snapshot of an index exists.
+
+    Args:
+        datastore (OpenSearchDataStore): The datastore.
+        index_name (str): Name of the index.
+    """
+    if not get_location():
+        return False
+    try:
+        return _find_snapshot(datastore, index_name) is not None
+    except Exception as e:  # pylint: disable=broad-except
+        logger.warning("Unable to look up the snapshot of %s: %s", index_name, e)
+        return False
+
+
+def _ensure_repository(datastore):
+    """Registers the snapshot repository, if it is not registered yet."""
+    repository = get_repository()
+    try:
+        datastore.client.snapshot.get_repository(repository=repository)
+        return
+    except Exception:  # pylint: disable=broad-except
+        pass
+    datastore.create_snapshot_repository(repository, get_location())
+
+
+def archive_index(
+    datastore, index_name: str, can_delete: Optional[Callable[[], bool]] = None
+) -> Optional[float]:
+    """Snapshots an index to the archive repository and deletes it.
+
+    The snapshot is taken under a temporary name and replaces the previous
+    snapshot of the index only once it succeeded. An index that does not
+    exist, e.g. because its restore has not finished yet, is skipped and its
+    previous snapshot is kept.
+
+    Args:
+        datastore (OpenSearchDataStore): The datastore.
+        index_name (str): Name of the index.
+        can_delete (Callable): Optional function that is called right before
+            the index is deleted. If it returns False, the index is in use
+            again: it is kept and the new snapshot is dropped.
+
+    Returns:
+        Number of seconds the snapshot took, or None if the index was not
+        archived.
+
+    Raises:
+        RuntimeError: If the snapshot did not succeed, the index is kept.
+    """
+    if not datastore.client.indices.exists(index=index_name):
+        logger.warning(
+            "Index %s does not exist, it is not archived and its previous "
+            "snapshot is kept.",
+            index_name,
+        )
+        return None
+
+    _ensure_repository(datastore)
+    repository = get_repository()
+    snapshot_name = get_snapshot_name(index_name)
+    temporary_name = _get_temporary_snapshot_name(index_name)
+
+    # Left over from an archiving that did not finish.
+    datastore.delete_snapshot(repository, temporary_name)
+
+    time_start = time.time()
+    snapshot = datastore.snapshot_index(repository, temporary_name, index_name)
+    duration = time.time() - time_start
+    if snapshot.get("state") != "SUCCESS":
+        datastore.delete_snapshot(repository, temporary_name)
+        raise RuntimeError(
+            f"Snapshot of index {index_name:s} ended in state "
+            f"{snapshot.get('state')!s}: {snapshot.get('failures')!s}"
+        )
+    METRICS["worker_index_archive_seconds"].observe(duration)
+
+    # The previous snapshot is out of date, replace it with the new one.
+    datastore.delete_snapshot(repository, snapshot_name)
+    datastore.clone_snapshot(repository, temporary_name, snapshot_name, index_name)
+    datastore.delete_snapshot(repository, temporary_name)
+
+    if can_delete is not None and not can_delete():
+        logger.info(
+            "Index %s is in use again, it is kept and its snapshot dropped.",
+            index_name,
+        )
+        datastore.delete_snapshot(repository, snapshot_name)
+        return None
+
+    datastore.client.indices.delete(index=index_name)
+    logger.info("Archived index %s to a snapshot in %.1fs", index_name, duration)
+    return duration
+
+
+def restore_index(datastore, index_name: str) -> float:
+    """Restores an index from the archive repository.
+
+    The snapshot is deleted once the index is restored.
+
+    Args:
+        datastore (OpenSearchDataStore): The datastore.
+        index_name (str): Name of the index.
+
+    Returns:
+        Number of seconds the restore took, 0 if the index already existed.
+
+    Raises:
+        RuntimeError: If there is no snapshot or shards failed to restore.
+    """
+    if datastore.client.indices.exists(index=index_name):
+        return 0.0
+
+    repository = get_repository()
+    snapshot_name = _find_snapshot(datastore, index_name)
+    if not snapshot_name:
+        raise RuntimeError(f"No snapshot of index {index_name:s} exists.")
+
+    time_start = time.time()
+    shards = datastore.restore_index_snapshot(repository, snapshot_name, index_name)
+    duration = time.time() - time_start
+    failed = shards.get("shards", {}).get("failed", 0)
+    if failed:
+        raise RuntimeError(
+            f"Unable to restore {failed:d} shards of index {index_name:s}."
+        )
+    METRICS["worker_index_restore_seconds"].observe(duration)
+
+    datastore.delete_snapshot(repository, snapshot_name)
+    logger.info("Restored index %s from a snapshot in %.1fs", index_name, duration)
+    return duration
+
+
+def schedule_archive(sketch_id: int, search_indices: Iterable):
+    """Starts a Celery task that archives indices to snapshots.
+
+    Args:
+        sketch_id: ID of the sketch the indices are archived for.
+        search_indices: Instances of timesketch.models.sketch.SearchIndex.
+
+    Returns:
+        The Celery AsyncResult of the task.
+    """
+    # Import here to avoid circular imports.
+    # pylint: disable=import-outside-toplevel
+    from timesketch.lib import tasks
+
+    return tasks.run_archive_indices.apply_async(
+        args=(sketch_id, sorted(search_index.id for search_index in search_indices))
+    )
+
+
+def schedule_restore(sketch_id: int, search_indices: Iterable):
+    """Starts a Celery task that restores indices from snapshots.
+
+    Args:
+        sketch_id: ID of the sketch the indices are restored for.
+        search_indices: Instances of timesketch.models.sketch.SearchIndex.
+
+    Returns:
+        The Celery AsyncResult of the task.
+    """
+    # Import here to avoid circular imports.
+    # pylint: disable=import-outside-toplevel
+    from timesketch.lib import tasks
+
+    return tasks.run_restore_indices.apply_async(
+        args=(sketch_id, sorted(search_index.id for search_index in search_indices))
+    )
@@ -0,0 +1,153 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for archiving indices to snapshots."""
+
+from unittest import mock
+
+from timesketch.lib.datastores import index_archive
+from timesketch.lib.testlib import BaseTest
+
+
+class TestIndexArchive(BaseTest):
+    """Tests for archiving indices to snapshots."""
+
+    def setUp(self):
+        super().setUp()
+        self.app.config["ARCHIVE_BACKEND"] = "snapshot"
+        self.app.config["ARCHIVE_SNAPSHOT_LOCATION"] = "/mnt/snapshots"
+
+    def test_is_snapshot_backend(self):
+        """Test that snapshots need a repository location."""
+        self.assertTrue(index_archive.is_snapshot_backend())
+        self.app.config["ARCHIVE_SNAPSHOT_LOCATION"] = ""
+        self.assertFalse(index_archive.is_snapshot_backend())
+        self.app.config["ARCHIVE_BACKEND"] = "close"
+        self.assertFalse(index_archive.is_snapshot_backend())
+
+    def test_archive_index(self):
+        """Test that an index is deleted only after a successful snapshot."""
+        datastore = mock.Mock()
+        datastore.client.indices.exists.return_value = True
+        datastore.client.snapshot.get_repository.side_effect = Exception("missing")
+        datastore.snapshot_index.return_value = {"state": "SUCCESS"}
+
+        index_archive.archive_index(datastore, "index")
+        datastore.create_snapshot_repository.assert_called_once_with(
+            "timesketch_archive", "/mnt/snapshots"
+        )
+        datastore.snapshot_index.assert_called_once_with(
+            "timesketch_archive", "timesketch_index_new", "index"
+        )
+        datastore.clone_snapshot.assert_called_once_with(
+            "timesketch_archive", "timesketch_index_new", "timesketch_index", "index"
+        )
+        self.assertEqual(
+            datastore.delete_snapshot.call_args_list,
+            [
+                mock.call("timesketch_archive", "timesketch_index_new"),
+                mock.call("timesketch_archive", "timesketch_index"),
+                mock.call("timesketch_archive", "timesketch_index_new"),
+            ],
+        )
+        datastore.client.indices.delete.assert_called_once_with(index="index")
+
+        datastore = mock.Mock()
+        datastore.client.indices.exists.return_value = True
+        datastore.snapshot_index.return_value = {"state": "PARTIAL"}
+        with self.assertRaises(RuntimeError):
+            index_archive.archive_index(datastore, "index")
+        datastore.create_snapshot_repository.assert_not_called()
+        datastore.clone_snapshot.assert_not_called()
+        for call in datastore.delete_snapshot.call_args_list:
+            self.assertEqual(call.args[1], "timesketch_index_new")
+        datastore.client.indices.delete.assert_not_called()
+
+    def test_archive_archived_index(self):
+        """Test that the snapshot of an index that is gone is kept."""
+        datastore = mock.Mock()
+        datastore.client.indices.exists.return_value = False
+        self.assertIsNone(index_archive.archive_index(datastore, "index"))
+        datastore.delete_snapshot.assert_not_called()
+        datastore.snapshot_index.assert_not_called()
+        datastore.client.indices.delete.assert_not_called()
+
+    def test_archive_index_in_use(self):
+        """Test that an index in use again is kept and its snapshot dropped."""
+        datastore = mock.Mock()
+        datastore.client.indices.exists.return_value = True
+        datastore.snapshot_index.return_value = {"state": "SUCCESS"}
+        self.assertIsNone(
+            index_archive.archive_index(datastore, "index", can_delete=lambda: False)
+        )
+        datastore.client.indices.delete.assert_not_called()
+        datastore.delete_snapshot.assert_called_with(
+            "timesketch_archive", "timesketch_index"
+        )
+
+    def test_restore_index(self):
+        """Test that an index is restored and its snapshot deleted."""
+        datastore = mock.Mock()
+        datastore.client.indices.exists.return_value = False
+        datastore.get_snapshot.return_value = {"state": "SUCCESS"}
+        datastore.restore_index_snapshot.return_value = {
+            "shards": {"total": 1, "failed": 0, "successful": 1}
+        }
+        index_archive.restore_index(datastore, "index")
+        datastore.restore_index_snapshot.assert_called_once_with(
+            "timesketch_archive", "timesketch_index", "index"
+        )
+        datastore.delete_snapshot.assert_called_once()
+
+        datastore.restore_index_snapshot.return_value = {"shards": {"failed": 1}}
+        with self.assertRaises(RuntimeError):
+            index_archive.restore_index(datastore, "index")
+
+        # Only the temporary snapshot is left if archiving was interrupted.
+        datastore = mock.Mock()
+        datastore.client.indices.exists.return_value = False
+        datastore.get_snapshot.side_effect = [None, {"state": "SUCCESS"}]
+        datastore.restore_index_snapshot.return_value = {"shards": {"failed": 0}}
+        index_archive.restore_index(datastore, "index")
+        datastore.restore_index_snapshot.assert_called_once_with(
+            "timesketch_archive", "timesketch_index_new", "index"
+        )
+
+        datastore = mock.Mock()
+        datastore.client.indices.exists.return_value = True
+        self.assertEqual(index_archive.restore_index(datastore, "index"), 0.0)
+        datastore.restore_index_snapshot.assert_not_called()
+
+    def test_has_snapshot(self):
+        """Test the lookup of the snapshot of an index."""
+        datastore = mock.Mock()
+        datastore.get_snapshot.return_value = {"state": "SUCCESS"}
+        self.assertTrue(index_archive.has_snapshot(datastore, "index"))
+        datastore.get_snapshot.return_value = None
+        self.assertFalse(index_archive.has_snapshot(datastore, "index"))
+        datastore.get_snapshot.side_effect = Exception("unavailable")
+        self.assertFalse(index_archive.has_snapshot(datastore, "index"))
+
+    def test_can_archive_index(self):
+        """Test that indices with active timelines are not archived."""
+        searchindex = self._create_searchindex("archive_index", self.user1)
+        timeline = self._create_timeline(
+            "timeline", self.sketch1, searchindex, self.user1
+        )
+        timeline.set_status("ready")
+        self.assertFalse(index_archive.can_archive_index(searchindex))
+        timeline.set_status("archived")
+        self.assertTrue(index_archive.can_archive_index(searchindex))
+
+        shared = self._create_searchindex("timesketch_shared_plaso_000001", self.user1)
+        self.assertFalse(index_archive.can_archive_index(shared))
@@ -0,0 +1,310 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Index settings lifecycle for bulk ingestion into timeline indices.
+
+While a large file is loaded into an index, refreshes are disabled, replicas
+are dropped, the translog is written asynchronously and merges are deferred.
+The events are not searchable until the ingestion ends anyway, and the
+source file can be imported again if a node fails. Once loading ends the
+serving settings of the index are restored, the index is refreshed and,
+optionally, force merged into a few segments.
+
+Only the ingestion that switched an index to the ingest settings restores
+them, so concurrent uploads into the same index do not flip the settings
+back and forth. That ingestion records its task ID, start time and the
+serving settings in the "_meta" field of the index mapping. If a worker dies
+before restoring the settings, a later ingestion into the index takes over
+once the record is older than INGEST_STALE_SECONDS and restores the recorded
+serving settings when it ends. Indices that are stuck without a record, e.g.
+an ingestion interrupted between the two requests, are fixed by hand:
+
+    PUT <index>/_settings
+    {"index.refresh_interval": null, "index.number_of_replicas": null,
+     "index.translog.durability": null,
+     "index.translog.flush_threshold_size": null,
+     "index.merge.policy.segments_per_tier": null}
+"""
+
+import logging
+import os
+import socket
+import time
+from typing import Optional
+
+import prometheus_client
+from flask import current_app
+
+from timesketch.lib import index_placement
+from timesketch.lib.definitions import METRICS_NAMESPACE
+
+logger = logging.getLogger("timesketch.index_lifecycle")
+
+# Files with fewer events are loaded with the serving settings, changing the
+# settings, and building replicas again, costs more than it saves.
+DEFAULT_MIN_EVENTS = 100000
+
+# Request timeout in seconds for the force merge.
+FORCE_MERGE_TIMEOUT = 3600
+
+# Age in seconds after which the ingest settings of an index are considered
+# left behind by a worker that died.
+DEFAULT_STALE_SECONDS = 86400
+
+# Key in the "_meta" field of the index mapping that records the ingestion
+# owning the ingest settings.
+META_KEY = "timesketch_ingest"
+
+INGEST_SETTINGS = {
+    "index.refresh_interval": "-1",
+    "index.number_of_replicas": 0,
+    "index.translog.durability": "async",
+    "index.translog.flush_threshold_size": "1gb",
+    "index.merge.policy.segments_per_tier": 30,
+}
+
+METRICS = {
+    "worker_ingest_events_per_second": prometheus_client.Summary(
+        "worker_ingest_events_per_second",
+        "Number of events ingested per second by a worker task",
+        ["mode"],
+        namespace=METRICS_NAMESPACE,
+    ),
+    "worker_post_ingest_query_seconds": prometheus_client.Summary(
+        "worker_post_ingest_query_seconds",
+        "Latency of a probe query on an index right after ingestion (in seconds)",
+        ["mode"],
+        namespace=METRICS_NAMESPACE,
+    ),
+}
+
+
+class IngestLifecycle:
+    """Switches an index between ingest and serving settings."""
+
+    def __init__(
+        self,
+        datastore,
+        index_name: str,
+        expected_events: int = 0,
+        owner: Optional[str] = None,
+    ):
+        """Initialize the lifecycle.
+
+        Args:
+            datastore (OpenSearchDataStore): Datastore the index is in.
+            index_name (str): Name of the index events are ingested into.
+            expected_events (int): Number of events that will be ingested,
+                used to decide whether the ingest settings are worth applying.
+            owner (str): ID of the task running the ingestion, defaults to
+                the host name and process ID.
+        """
+        self.datastore = datastore
+        self.index_name = index_name
+        self.expected_events = expected_events
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self._serving_settings = None
+        self._time_start = None
+        self._enabled = current_app.config.get("INGEST_OPTIMIZED_INDEXING", True)
+        self._min_events = int(
+            current_app.config.get("INGEST_OPTIMIZED_MIN_EVENTS", DEFAULT_MIN_EVENTS)
+        )
+        self._max_num_segments = int(
+            current_app.config.get("INGEST_FORCE_MERGE_SEGMENTS", 0)
+        )
+        self._stale_seconds = int(
+            current_app.config.get("INGEST_STALE_SECONDS", DEFAULT_STALE_SECONDS)
+        )
+
+    @property
+    def applied(self) -> bool:
+        """Returns True if the index was switched to the ingest settings."""
+        return self._serving_settings is not None
+
+    @property
+    def mode(self) -> str:
+        """Returns the name of the ingest mode, used as a metric label."""
+        return "optimized" if self.applied else "default"
+
+    def _get_settings(self) -> dict:
+        """Returns the flat settings of the index."""
+        settings = self.datastore.client.indices.get_settings(
+            index=self.index_name, flat_settings=True
+        )
+        return settings.get(self.index_name, {}).get("settings", {})
+
+    def _get_meta(self) -> dict:
+        """Returns the "_meta" field of the index mapping."""
+        mapping = self.datastore.client.indices.get_mapping(index=self.index_name)
+        meta = mapping.get(self.index_name, {}).get("mappings", {}).get("_meta", {})
+        return meta if isinstance(meta, dict) else {}
+
+    def _put_meta(self, record: Optional[dict]):
+        """Records the owning ingestion in the index mapping.
+
+        Args:
+            record (dict): The ingestion record, or None to remove it.
+        """
+        meta = {
+            key: value for key, value in self._get_meta().items() if key != META_KEY
+        }
+        if record is not None:
+            meta[META_KEY] = record
+        self.datastore.client.indices.put_mapping(
+            index=self.index_name, body={"_meta": meta}
+        )
+
+    def _take_over(self) -> Optional[dict]:
+        """Returns the serving settings left behind by a stale ingestion.
+
+        Returns:
+            The recorded serving settings if the ingestion that applied the
+            ingest settings is older than INGEST_STALE_SECONDS, else None.
+        """
+        record = self._get_meta().get(META_KEY)
+        if not isinstance(record, dict):
+            logger.warning(
+                "Index [%s] has ingest settings without a record of the owning "
+                "ingestion, restore its settings by hand if no ingestion is "
+                "running.",
+                self.index_name,
+            )
+            return None
+        age = time.time() - record.get("started", 0)
+        if age < self._stale_seconds:
+            logger.info(
+                "Index [%s] is already being loaded by [%s], keeping its settings.",
+                self.index_name,
+                record.get("owner"),
+            )
+            return None
+        logger.warning(
+            "Taking over stale ingest settings of index [%s] from [%s], applied "
+            "%d seconds ago.",
+            self.index_name,
+            record.get("owner"),
+            age,
+        )
+        return record.get("serving_settings") or {}
+
+    def start(self):
+        """Applies the ingest settings, if enabled and worth it.
+
+        Errors are logged and ingestion continues with the current settings.
+        """
+        self._time_start = time.time()
+        if not self._enabled or self.expected_events < self._min_events:
+            return
+        if index_placement.is_shared_index(self.index_name):
+            # Other timelines in a shared index are being searched.
+            return
+
+        try:
+            current_settings = self._get_settings()
+            if current_settings.get("index.refresh_interval") == "-1":
+                serving_settings = self._take_over()
+                if serving_settings is None:
+                    return
+            else:
+                serving_settings = {
+                    key: current_settings.get(key) for key in INGEST_SETTINGS
+                }
+            # Record the owner first, a worker dying after the settings are
+            # changed then leaves enough behind to recover the index.
+            self._put_meta(
+                {
+                    "owner": self.owner,
+                    "started": self._time_start,
+                    "serving_settings": serving_settings,
+                }
+            )
+            self.datastore.client.indices.put_settings(
+                index=self.index_name, body=INGEST_SETTINGS
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning(
+                "Unable to apply ingest settings to index [%s]: %s",
+                self.index_name,
+                e,
+            )
+            return
+
+        self._serving_settings = serving_settings
+        logger.info("Applied ingest settings to index [%s]", self.index_name)
+
+    def finish(self, event_count: Optional[int] = None):
+        """Restores the serving settings and optimizes the index.
+
+        This never raises, so it can be called while handling an error.
+
+        Args:
+            event_count: Number of ingested events, used to report the
+                throughput. If None, nothing is reported.
+        """
+        if self.applied:
+            try:
+                # Settings that were not set explicitly are reset to default.
+                self.datastore.client.indices.put_settings(
+                    index=self.index_name, body=self._serving_settings
+                )
+                self.datastore.client.indices.refresh(index=self.index_name)
+                self._put_meta(None)
+                logger.info("Restored serving settings of index [%s]", self.index_name)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error(
+                    "Unable to restore serving settings of index [%s]: %s",
+                    self.index_name,
+                    e,
+                )
+            else:
+                self._force_merge()
+
+        if event_count and self._time_start:
+            elapsed = max(time.time() - self._time_start, 0.001)
+            METRICS["worker_ingest_events_per_second"].labels(mode=self.mode).observe(
+                event_count / elapsed
+            )
+            self._probe_query()
+        self._serving_settings = None
+
+    def _force_merge(self):
+        """Merges the index into a few segments, if configured."""
+        if self._max_num_segments <= 0:
+            return
+        try:
+            self.datastore.client.indices.forcemerge(
+                index=self.index_name,
+                max_num_segments=self._max_num_segments,
+                request_timeout=FORCE_MERGE_TIMEOUT,
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("Unable to force merge index [%s]: %s", self.index_name, e)
+
+    def _probe_query(self):
+        """Reports the latency of the first page of the timeline."""
+        body = {
+            "query": {"match_all": {}},
+            "size": 40,
+            "sort": [{"datetime": "asc"}],
+        }
+        try:
+            # pylint: disable=unexpected-keyword-arg
+            result = self.datastore.client.search(
+                index=self.index_name, body=body, request_cache=False
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            logger.debug("Unable to probe index [%s]: %s", self.index_name, e)
+            return
+        METRICS["worker_post_ingest_query_seconds"].labels(mode=self.mode).observe(
+            result.get("took", 0) / 1000
+        )
@@ -0,0 +1,120 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the ingest index lifecycle."""
+
+import time
+from unittest import mock
+
+from timesketch.lib.datastores import index_lifecycle
+from timesketch.lib.testlib import BaseTest
+
+
+class TestIngestLifecycle(BaseTest):
+    """Tests for the ingest index lifecycle."""
+
+    def _get_datastore(self, settings, meta=None):
+        datastore = mock.Mock()
+        datastore.client.indices.get_settings.return_value = {
+            "index": {"settings": settings}
+        }
+        datastore.client.indices.get_mapping.return_value = {
+            "index": {"mappings": {"_meta": meta or {}}}
+        }
+        datastore.client.search.return_value = {"took": 5}
+        return datastore
+
+    def test_ingest_and_restore(self):
+        """Test that ingest settings are applied and serving settings restored."""
+        self.app.config["INGEST_FORCE_MERGE_SEGMENTS"] = 1
+        datastore = self._get_datastore({"index.number_of_replicas": "2"})
+        lifecycle = index_lifecycle.IngestLifecycle(
+            datastore, "index", expected_events=500000, owner="task-1"
+        )
+        lifecycle.start()
+        self.assertTrue(lifecycle.applied)
+        datastore.client.indices.put_settings.assert_called_once_with(
+            index="index", body=index_lifecycle.INGEST_SETTINGS
+        )
+        meta = datastore.client.indices.put_mapping.call_args.kwargs["body"]["_meta"]
+        record = meta[index_lifecycle.META_KEY]
+        self.assertEqual(record["owner"], "task-1")
+        self.assertEqual(record["serving_settings"]["index.number_of_replicas"], "2")
+
+        lifecycle.finish(500000)
+        restored = datastore.client.indices.put_settings.call_args.kwargs["body"]
+        self.assertEqual(restored["index.number_of_replicas"], "2")
+        self.assertIsNone(restored["index.refresh_interval"])
+        datastore.client.indices.refresh.assert_called_once_with(index="index")
+        datastore.client.indices.forcemerge.assert_called_once()
+        datastore.client.search.assert_called_once()
+        self.assertFalse(lifecycle.applied)
+        meta = datastore.client.indices.put_mapping.call_args.kwargs["body"]["_meta"]
+        self.assertNotIn(index_lifecycle.META_KEY, meta)
+
+    def test_keep_settings(self):
+        """Test that settings are kept for small or concurrent ingests."""
+        datastore = self._get_datastore({})
+        lifecycle = index_lifecycle.IngestLifecycle(
+            datastore, "index", expected_events=10
+        )
+        lifecycle.start()
+        lifecycle.finish(10)
+        datastore.client.indices.put_settings.assert_not_called()
+
+        record = {"owner": "task-1", "started": time.time(), "serving_settings": {}}
+        datastore = self._get_datastore(
+            {"index.refresh_interval": "-1"}, {index_lifecycle.META_KEY: record}
+        )
+        lifecycle = index_lifecycle.IngestLifecycle(
+            datastore, "index", expected_events=500000
+        )
+        lifecycle.start()
+        self.assertFalse(lifecycle.applied)
+        lifecycle.finish(None)
+        datastore.client.indices.put_settings.assert_not_called()
+        datastore.client.indices.refresh.assert_not_called()
+
+    def test_take_over_stale_settings(self):
+        """Test that ingest settings left by a dead worker are recovered."""
+        record = {
+            "owner": "task-1",
+            "started": time.time() - index_lifecycle.DEFAULT_STALE_SECONDS - 1,
+            "serving_settings": {"index.number_of_replicas": "2"},
+        }
+        datastore = self._get_datastore(
+            {"index.refresh_interval": "-1"},
+            {"other": "value", index_lifecycle.META_KEY: record},
+        )
+        lifecycle = index_lifecycle.IngestLifecycle(
+            datastore, "index", expected_events=500000, owner="task-2"
+        )
+        lifecycle.start()
+        self.assertTrue(lifecycle.applied)
+        meta = datastore.client.indices.put_mapping.call_args.kwargs["body"]["_meta"]
+        self.assertEqual(meta["other"], "value")
+        self.assertEqual(meta[index_lifecycle.META_KEY]["owner"], "task-2")
+
+        lifecycle.finish(None)
+        datastore.client.indices.put_settings.assert_called_with(
+            index="index", body={"index.number_of_replicas": "2"}
+        )
+
+        # Without a record the settings are left alone.
+        datastore = self._get_datastore({"index.refresh_interval": "-1"})
+        lifecycle = index_lifecycle.IngestLifecycle(
+            datastore, "index", expected_events=500000
+        )
+        lifecycle.start()
+        self.assertFalse(lifecycle.applied)
+        datastore.client.indices.put_settings.assert_not_called()
@@ -0,0 +1,366 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Process wide cache of OpenSearch index mappings.
+
+Mappings are cached per index together with the mapping version OpenSearch
+keeps for every index, which is increased on each mapping update, including
+fields added by dynamic mapping while ingesting. Cached mappings are trusted
+for a few seconds, after which a single lightweight request checks the
+versions of all requested indices and only changed mappings are fetched
+again. If the version can not be determined nothing is cached.
+
+Both the mappings and the field formats are kept in least recently used
+order and the oldest entries are dropped once the cache is full. Field
+formats of an index are dropped as soon as its mapping version changes.
+"""
+
+import collections
+import logging
+import threading
+import time
+from typing import Iterable, Optional
+
+logger = logging.getLogger("timesketch.mapping_cache")
+
+# Number of seconds cached mappings are used without checking their version.
+DEFAULT_REVALIDATE_INTERVAL = 10
+
+# Maximum number of index mappings kept in the cache.
+DEFAULT_MAX_INDICES = 1000
+
+# Maximum number of aggregation field formats kept in the cache.
+DEFAULT_MAX_FIELD_FORMATS = 10000
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def _index_list(indices) -> list:
+    """Returns a sorted list of index names from a string or an iterable."""
+    if isinstance(indices, str):
+        indices = indices.split(",")
+    return sorted({index for index in indices if index})
+
+
+def get_mapping_versions(client, indices: list) -> Optional[dict]:
+    """Returns the mapping version of indices.
+
+    Args:
+        client (OpenSearch): OpenSearch client.
+        indices: List of index names.
+
+    Returns:
+        A dictionary with index names and their mapping version, or None if
+        the versions could not be determined.
+    """
+    try:
+        state = client.cluster.state(
+            metric="metadata",
+            index=",".join(indices),
+            filter_path="metadata.indices.*.mapping_version",
+        )
+    except Exception as e:  # pylint: disable=broad-except
+        logger.debug("Unable to get mapping versions: %s", e)
+        return None
+
+    if not isinstance(state, dict):
+        return None
+    index_states = state.get("metadata", {}).get("indices", {})
+    if not isinstance(index_states, dict):
+        return None
+
+    versions = {}
+    for index_name in indices:
+        version = index_states.get(index_name, {}).get("mapping_version")
+        if not isinstance(version, int):
+            return None
+        versions[index_name] = version
+    return versions
+
+
+def find_field_mapping(properties: dict, field_name: str) -> Optional[dict]:
+    """Returns the mapping of a field from the properties of an index.
+
+    Args:
+        properties: The "properties" dictionary of an index mapping.
+        field_name: Name of the field, object fields and multi-fields are
+            separated with dots, e.g. "user.name" or "message.keyword".
+
+    Returns:
+        The mapping of the field, or None if it is not mapped.
+    """
+    if not isinstance(properties, dict):
+        return None
+    mapping = properties.get(field_name)
+    if isinstance(mapping, dict):
+        return mapping
+
+    current = properties
+    mapping = None
+    for part in field_name.split("."):
+        if not isinstance(current, dict):
+            return None
+        mapping = current.get(part)
+        if not isinstance(mapping, dict):
+            return None
+        current = mapping.get("properties", mapping.get("fields"))
+    return mapping
+
+
+class FieldMappingCache:
+    """Caches index mappings and field formats for aggregations."""
+
+    def __init__(
+        self,
+        revalidate_interval: int = DEFAULT_REVALIDATE_INTERVAL,
+        max_indices: int = DEFAULT_MAX_INDICES,
+        max_field_formats: int = DEFAULT_MAX_FIELD_FORMATS,
+    ):
+        """Initialize the cache.
+
+        Args:
+            revalidate_interval: Number of seconds cached mappings are used
+                without checking their version.
+            max_indices: Maximum number of index mappings to keep.
+            max_field_formats: Maximum number of field formats to keep.
+        """
+        self._revalidate_interval = revalidate_interval
+        self._max_indices = max_indices
+        self._max_field_formats = max_field_formats
+        self._entries = collections.OrderedDict()
+        self._field_formats = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _put(cache: collections.OrderedDict, key, value, max_size: int):
+        """Adds a value to a cache and drops the least recently used ones.
+
+        Needs to be called with the lock held.
+        """
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+
+    def _drop_field_formats(self, index_names: set):
+        """Drops the field formats of indices whose mapping changed.
+
+        Needs to be called with the lock held.
+        """
+        for key in list(self._field_formats):
+            versions, _ = key
+            if any(index_name in index_names for index_name, _ in versions):
+                del self._field_formats[key]
+
+    def _get_mappings(self, client, index_names: list) -> tuple:
+        """Returns the mapping properties and versions of indices.
+
+        Args:
+            client (OpenSearch): OpenSearch client.
+            index_names: Sorted list of index names.
+
+        Returns:
+            A tuple with a dictionary of index names and their mapping
+            properties, and a tuple of (index name, version) pairs, which is
+            None if the mappings were not cached.
+        """
+        now = time.time()
+        with self._lock:
+            entries = [self._entries.get(index_name) for index_name in index_names]
+            if all(
+                entry and now - entry["checked"] < self._revalidate_interval
+                for entry in entries
+            ):
+                for index_name in index_names:
+                    self._entries.move_to_end(index_name)
+                return (
+                    {
+                        index_name: entry["properties"]
+                        for index_name, entry in zip(index_names, entries)
+                    },
+                    tuple(
+                        (index_name, entry["version"])
+                        for index_name, entry in zip(index_names, entries)
+                    ),
+                )
+
+        versions = get_mapping_versions(client, index_names)
+        if versions is None:
+            return self._fetch_properties(client, index_names), None
+
+        with self._lock:
+            stale = [
+                index_name
+                for index_name in index_names
+                if self._entries.get(index_name, {}).get("version")
+                != versions[index_name]
+            ]
+        fetched = self._fetch_properties(client, stale) if stale else {}
+
+        with self._lock:
+            changed = {name for name in stale if name in self._entries}
+            if changed:
+                self._drop_field_formats(changed)
+            for index_name in stale:
+                self._put(
+                    self._entries,
+                    index_name,
+                    {
+                        "version": versions[index_name],
+                        "properties": fetched.get(index_name, {}),
+                        "checked": now,
+                    },
+                    self._max_indices,
+                )
+            entries = [self._entries.get(index_name) for index_name in index_names]
+            if all(entries):
+                properties = {}
+                for index_name, entry in zip(index_names, entries):
+                    entry["checked"] = now
+                    properties[index_name] = entry["properties"]
+        if not all(entries):
+            # Entries were invalidated while the mappings were fetched.
+            return self._fetch_properties(client, index_names), None
+        return properties, tuple(
+            (index_name, versions[index_name]) for index_name in index_names
+        )
+
+    def get_properties(self, client, indices) -> dict:
+        """Returns the mapping properties of indices.
+
+        Args:
+            client (OpenSearch): OpenSearch client.
+            indices (list or str): Index names, as a list or a comma separated
+                string.
+
+        Returns:
+            A dictionary with index names and their mapping properties.
+
+        Raises:
+            NotFoundError: If one of the indices does not exist.
+        """
+        index_names = _index_list(indices)
+        if not index_names:
+            return {}
+        properties, _ = self._get_mappings(client, index_names)
+        return properties
+
+    @staticmethod
+    def _fetch_properties(client, index_names: list) -> dict:
+        """Fetches the mapping properties of indices from the datastore."""
+        mappings = client.indices.get_mapping(index=index_names)
+        return {
+            index_name: mappings.get(index_name, {})
+            .get("mappings", {})
+            .get("properties", {})
+            for index_name in index_names
+        }
+
+    def get_field_type(self, client, indices, field_name: str) -> Optional[str]:
+        """Returns the mapped type of a field in indices.
+
+        Args:
+            client (OpenSearch): OpenSearch client.
+            indices (list or str): Index names, as a list or a comma separated
+                string.
+            field_name: Name of the field.
+
+        Returns:
+            The type of the field in the first index it is mapped in, or None.
+        """
+        for properties in self.get_properties(client, indices).values():
+            mapping = find_field_mapping(properties, field_name)
+            if mapping and mapping.get("type"):
+                return mapping["type"]
+        return None
+
+    def get_aggregation_field(self, client, indices, field_name: str) -> str:
+        """Returns the name to aggregate a field on.
+
+        Text fields are not available to aggregations, so the keyword
+        subfield is used instead. The decision is kept for every combination
+        of indices and field until the mapping of one of the indices changes.
+
+        Args:
+            client (OpenSearch): OpenSearch client.
+            indices (list or str): Index names, as a list or a comma separated
+                string.
+            field_name: Name of the field.
+
+        Returns:
+            The field name, with .keyword appended for text fields.
+
+        Raises:
+            NotFoundError: If one of the indices does not exist.
+        """
+        index_names = _index_list(indices)
+        if not index_names:
+            return field_name
+        properties, versions = self._get_mappings(client, index_names)
+        key = (versions, field_name)
+        if versions is not None:
+            with self._lock:
+                field_format = self._field_formats.get(key)
+                if field_format is not None:
+                    self._field_formats.move_to_end(key)
+            if field_format is not None:
+                return field_format
+
+        field_format = field_name
+        for index_properties in properties.values():
+            mapping = find_field_mapping(index_properties, field_name)
+            field_type = mapping.get("type") if mapping else None
+            if field_type:
+                if field_type == "text":
+                    field_format = f"{field_name}.keyword"
+                break
+
+        if versions is not None:
+            with self._lock:
+                self._put(
+                    self._field_formats, key, field_format, self._max_field_formats
+                )
+        return field_format
+
+    def invalidate(self, indices: Optional[Iterable[str]] = None):
+        """Removes cached mappings, e.g. after ingestion or a mapping update.
+
+        Args:
+            indices: Optional index names, all mappings are removed if None.
+        """
+        with self._lock:
+            if indices is None:
+                self._entries.clear()
+            else:
+                for index_name in _index_list(indices):
+                    self._entries.pop(index_name, None)
+            self._field_formats.clear()
+
+
+def get_cache() -> FieldMappingCache:
+    """Returns the mapping cache of this process."""
+    global _CACHE  # pylint: disable=global-statement
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = FieldMappingCache()
+        return _CACHE
+
+
+def invalidate(indices: Optional[Iterable[str]] = None):
+    """Removes cached mappings of indices from the cache of this process.
+
+    Args:
+        indices: Optional index names, all mappings are removed if None.
+    """
+    get_cache().invalidate(indices)
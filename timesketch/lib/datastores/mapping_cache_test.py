@@ -0,0 +1,126 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the index mapping cache."""
+
+from unittest import mock
+
+from timesketch.lib.testlib import BaseTest
+from timesketch.lib.datastores import mapping_cache
+
+PROPERTIES = {
+    "message": {
+        "type": "text",
+        "fields": {"keyword": {"type": "keyword"}},
+    },
+    "inode": {"type": "long"},
+    "user": {"properties": {"name": {"type": "text"}}},
+}
+
+
+def _mock_client(versions):
+    """Returns a mock client for indices with the given mapping versions."""
+    client = mock.Mock()
+    client.cluster.state.side_effect = lambda **kwargs: {
+        "metadata": {
+            "indices": {
+                index_name: {"mapping_version": versions[index_name]}
+                for index_name in kwargs["index"].split(",")
+            }
+        }
+    }
+    client.indices.get_mapping.side_effect = lambda index: {
+        index_name: {"mappings": {"properties": PROPERTIES}} for index_name in index
+    }
+    return client
+
+
+class TestFieldMappingCache(BaseTest):
+    """Tests for the FieldMappingCache class."""
+
+    def test_find_field_mapping(self):
+        """Test that object fields and multi-fields are found."""
+        self.assertEqual(
+            mapping_cache.find_field_mapping(PROPERTIES, "inode"), {"type": "long"}
+        )
+        self.assertEqual(
+            mapping_cache.find_field_mapping(PROPERTIES, "user.name"),
+            {"type": "text"},
+        )
+        self.assertEqual(
+            mapping_cache.find_field_mapping(PROPERTIES, "message.keyword"),
+            {"type": "keyword"},
+        )
+        self.assertIsNone(mapping_cache.find_field_mapping(PROPERTIES, "missing"))
+
+    def test_aggregation_field(self):
+        """Test that mappings are fetched once and refreshed on new versions."""
+        versions = {"index_1": 1, "index_2": 1}
+        client = _mock_client(versions)
+        cache = mapping_cache.FieldMappingCache(revalidate_interval=10)
+
+        with mock.patch.object(mapping_cache.time, "time", return_value=100):
+            self.assertEqual(
+                cache.get_aggregation_field(client, ["index_1", "index_2"], "message"),
+                "message.keyword",
+            )
+            self.assertEqual(
+                cache.get_aggregation_field(client, "index_1,index_2", "inode"),
+                "inode",
+            )
+        self.assertEqual(client.indices.get_mapping.call_count, 1)
+        self.assertEqual(client.cluster.state.call_count, 1)
+
+        # After the interval only the index with a new version is fetched.
+        versions["index_2"] = 2
+        with mock.patch.object(mapping_cache.time, "time", return_value=111):
+            cache.get_aggregation_field(client, ["index_1", "index_2"], "message")
+        self.assertEqual(client.cluster.state.call_count, 2)
+        client.indices.get_mapping.assert_called_with(index=["index_2"])
+
+        with mock.patch.object(mapping_cache.time, "time", return_value=112):
+            cache.invalidate(["index_1"])
+            cache.get_aggregation_field(client, ["index_1", "index_2"], "message")
+        client.indices.get_mapping.assert_called_with(index=["index_1"])
+
+    def test_unknown_version(self):
+        """Test that mappings are not cached without a mapping version."""
+        client = _mock_client({})
+        client.cluster.state.side_effect = Exception("Not supported")
+        cache = mapping_cache.FieldMappingCache()
+
+        cache.get_aggregation_field(client, ["index_1"], "message")
+        cache.get_aggregation_field(client, ["index_1"], "message")
+        self.assertEqual(client.indices.get_mapping.call_count, 2)
+
+    def test_eviction(self):
+        """Test that the cache is bounded and drops formats of old versions."""
+        versions = {"index_1": 1, "index_2": 1, "index_3": 1}
+        client = _mock_client(versions)
+        cache = mapping_cache.FieldMappingCache(
+            revalidate_interval=0, max_indices=2, max_field_formats=2
+        )
+
+        cache.get_aggregation_field(client, ["index_1"], "message")
+        cache.get_aggregation_field(client, ["index_2"], "message")
+        cache.get_aggregation_field(client, ["index_3"], "message")
+        # pylint: disable=protected-access
+        self.assertEqual(list(cache._entries), ["index_2", "index_3"])
+        self.assertEqual(len(cache._field_formats), 2)
+
+        versions["index_3"] = 2
+        cache.get_aggregation_field(client, ["index_3"], "inode")
+        self.assertEqual(
+            list(cache._field_formats),
+            [((("index_2", 1),), "message"), ((("index_3", 2),), "inode")],
+        )
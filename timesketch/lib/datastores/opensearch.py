@@ -45,6 +45,8 @@ import prometheus_client
 from timesketch.lib.definitions import HTTP_STATUS_CODE_NOT_FOUND
 from timesketch.lib.definitions import METRICS_NAMESPACE
 from timesketch.lib import errors
+from timesketch.lib.datastores import mapping_cache
+from timesketch.lib.datastores import wildcard_routing
 from timesketch.lib import telemetry
 
 # Setup logging
@@ -102,6 +104,36 @@ if (!removedLabel) {
 }
 """
 
+# Single script used for bulk label updates, params.action is one of "add",
+# "remove" or "toggle". Documents that do not change are reported as noop.
+BULK_LABEL_SCRIPT = """
+if (ctx._source.timesketch_label == null) {
+    ctx._source.timesketch_label = new ArrayList()
+}
+if (params.action == 'add') {
+    if (ctx._source.timesketch_label.contains(params.timesketch_label)) {
+        ctx.op = 'noop';
+    } else {
+        ctx._source.timesketch_label.add(params.timesketch_label);
+    }
+} else {
+    boolean removedLabel = ctx._source.timesketch_label.removeIf(label -> label.name == params.timesketch_label.name && label.sketch_id == params.timesketch_label.sketch_id);
+    if (!removedLabel) {
+        if (params.action == 'toggle') {
+            ctx._source.timesketch_label.add(params.timesketch_label);
+        } else {
+            ctx.op = 'noop';
+        }
+    }
+}
+"""
+
+REMOVE_TAGS_SCRIPT = """
+if (!(ctx._source.tag instanceof List) || !ctx._source.tag.removeAll(params.tags)) {
+    ctx.op = 'noop';
+}
+"""
+
 # Default sort order for PIT exports if not specified, ensuring stable pagination.
 # _doc is generally recommended for performance with slicing.
 _DEFAULT_PIT_SORT_CRITERIA = [{"_id": "asc"}]
@@ -120,6 +152,10 @@ class OpenSearchDataStore:
     DEFAULT_FLUSH_BYTE_SIZE = 52428800
     DEFAULT_EVENT_IMPORT_TIMEOUT = 180  # Timeout value in seconds for importing events.
 
+    DEFAULT_BULK_UPDATE_CHUNK_SIZE = 1000  # Documents per bulk update request.
+    BULK_UPDATE_POLL_INTERVAL = 2  # Seconds between update by query progress checks.
+    LABEL_ACTIONS = frozenset(["add", "remove", "toggle"])
+
     DEFAULT_INDEX_WAIT_TIMEOUT = 10  # Seconds to wait for an index to become ready
     DEFAULT_MINIMUM_HEALTH = (
         "yellow"  # Minimum health status required ('yellow' or 'green')
@@ -611,7 +647,9 @@ class OpenSearchDataStore:
             use_wildcard_fields: If True, compiles the query string strictly into
                 case-insensitive native wildcard queries.
             wildcard_fields: Optional set of active field names mapped with a
-                wildcard type.
+                wildcard type. If use_wildcard_fields is False, leading
+                wildcard terms on these fields in the query string are routed
+                to their wildcard subfield.
 
         Returns:
             OpenSearch DSL query as a dictionary
@@ -674,6 +712,10 @@ class OpenSearchDataStore:
                 )
                 query_dsl["query"]["bool"]["must"].append({"bool": wildcard_bool})
             else:
+                if wildcard_fields:
+                    query_string = wildcard_routing.route_query_string(
+                        query_string, wildcard_fields
+                    )
                 query_dsl["query"]["bool"]["must"].append(
                     {"query_string": {"query": query_string, "default_operator": "AND"}}
                 )
@@ -821,7 +863,13 @@ class OpenSearchDataStore:
 
         if mappings is None:
             try:
-                mappings = self.client.indices.get_mapping(index=indices)
+                properties = mapping_cache.get_cache().get_properties(
+                    self.client, indices
+                )
+                mappings = {
+                    index_name: {"mappings": {"properties": index_properties}}
+                    for index_name, index_properties in properties.items()
+                }
             except Exception as e:  # pylint: disable=broad-exception-caught
                 os_logger.warning(
                     "Failed to query index mappings in get_wildcard_fields: %s", e
@@ -883,6 +931,49 @@ class OpenSearchDataStore:
 
         return list(wildcard_fields) if wildcard_fields else []
 
+    def get_routing_wildcard_fields(
+        self, indices: list, query_string: str
+    ) -> Optional[set]:
+        """Returns the fields to route leading wildcard terms for.
+
+        Only fields with a wildcard subfield in all of the indices are
+        returned. Fields that are mapped with the wildcard type themselves are
+        searched as is.
+
+        Args:
+            indices (list): List of index names the query is run on.
+            query_string (str): The query string of the search.
+
+        Returns:
+            A set of field names with a wildcard subfield, or None if the query
+            string has no leading wildcard terms, routing is disabled or no
+            field has a wildcard subfield in all indices.
+        """
+        if not wildcard_routing.has_leading_wildcard(query_string):
+            return None
+        if not current_app.config.get("OPENSEARCH_ROUTE_WILDCARD_QUERIES", True):
+            return None
+        if not indices:
+            return None
+
+        try:
+            properties = mapping_cache.get_cache().get_properties(
+                self.client, list(indices)
+            )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            os_logger.warning("Unable to get the mappings to route wildcards: %s", e)
+            return None
+
+        # A field is only routed if every index has the wildcard subfield,
+        # the query on the subfield would not match events of other indices.
+        fields = None
+        for index_properties in properties.values():
+            if not isinstance(index_properties, dict):
+                return None
+            index_fields = wildcard_routing.get_subfield_fields(index_properties)
+            fields = index_fields if fields is None else fields & index_fields
+        return fields or None
+
     def _compile_term_to_dsl(self, token: str, wildcard_fields: set) -> dict:
         """Compiles a single search token into a native OpenSearch query node.
 
@@ -1135,6 +1226,7 @@ class OpenSearchDataStore:
         enable_scroll: bool = False,
         timeline_ids: Optional[list] = None,
         use_wildcard_fields: bool = False,
+        wildcard_fields: Optional[set] = None,
     ) -> Union[Dict, int]:
         """Executes a search query against OpenSearch indices.
 
@@ -1170,6 +1262,9 @@ class OpenSearchDataStore:
                 be queried as part of the search.
             use_wildcard_fields: If True, compiles the query_string strictly into
                 case-insensitive native wildcard queries. Defaults to False.
+            wildcard_fields: Optional set of fields that support wildcard
+                searches, e.g. from the timeline field catalogs. If not
+                provided, the fields are looked up in the index mappings.
 
         Returns:
             A dictionary containing the raw response from the OpenSearch search
@@ -1210,9 +1305,15 @@ class OpenSearchDataStore:
                 if event["index"] in indices
             }
 
-        wildcard_fields = None
-        if use_wildcard_fields:
-            wildcard_fields = set(self.get_wildcard_fields(list(indices)))
+        if not use_wildcard_fields:
+            wildcard_fields = None
+            if not query_dsl:
+                wildcard_fields = self.get_routing_wildcard_fields(
+                    indices, query_string
+                )
+        else:
+            if wildcard_fields is None:
+                wildcard_fields = set(self.get_wildcard_fields(list(indices)))
             if not wildcard_fields:
                 raise ValueError(
                     "The selected timelines do not support wildcard search mode. "
@@ -1675,7 +1776,7 @@ class OpenSearchDataStore:
                         "user_id": user_id,
                         "sketch_id": sketch_id,
                     },
-                    remove: remove,
+                    "remove": remove,
                 },
             }
         }
@@ -1691,25 +1792,247 @@ class OpenSearchDataStore:
                 "params": script["params"],
             }
 
-        doc = self.client.get(index=searchindex_id, id=event_id)
-        try:
-            doc["_source"]["timesketch_label"]
-        except KeyError:
-            doc = {"doc": {"timesketch_label": []}}
-            self.client.update(index=searchindex_id, id=event_id, body=doc)
-
-        self.client.update(index=searchindex_id, id=event_id, body=update_body)
+        action = "add"
+        if toggle:
+            action = "toggle"
+        elif remove:
+            action = "remove"
+        self.bulk_label_events(
+            sketch_id=sketch_id,
+            user_id=user_id,
+            label=label,
+            action=action,
+            events=[(searchindex_id, event_id)],
+        )
 
         return None
 
+    def bulk_label_events(
+        self,
+        sketch_id: int,
+        user_id: int,
+        label: str,
+        action: str = "add",
+        events: Optional[list] = None,
+        indices: Optional[list] = None,
+        query_dsl: Optional[Dict] = None,
+        progress_callback=None,
+        chunk_size: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """Adds, removes or toggles a label on many events.
+
+        Events are either given as (index name, event ID) pairs, which are
+        updated with chunked bulk scripted updates, or selected by a query,
+        which is applied with a single update by query per request.
+
+        Args:
+            sketch_id: Integer of sketch primary key.
+            user_id: Integer of user primary key.
+            label: String with the name of the label.
+            action: One of "add", "remove" or "toggle".
+            events: Optional list of (index name, event ID) tuples.
+            indices: List of index names, used together with query_dsl.
+            query_dsl: Optional OpenSearch query selecting the events, used
+                if no events are provided.
+            progress_callback (callable): Optional function called with the number of
+                processed and the total number of events while updating.
+            chunk_size: Optional number of events per bulk request.
+
+        Returns:
+            Dict with the number of "total", "updated", "noop" and "failed"
+            events.
+
+        Raises:
+            ValueError: If the action is unknown or no events are selected.
+        """
+        if action not in self.LABEL_ACTIONS:
+            raise ValueError(f"Unknown label action: {action!s}")
+
+        script = {
+            "lang": "painless",
+            "source": BULK_LABEL_SCRIPT,
+            "params": {
+                "action": action,
+                "timesketch_label": {
+                    "name": str(label),
+                    "user_id": user_id,
+                    "sketch_id": sketch_id,
+                },
+            },
+        }
+
+        if events is not None:
+            return self._bulk_script_update(
+                events, script, progress_callback, chunk_size
+            )
+        if query_dsl and indices:
+            return self._update_by_query_script(
+                indices, query_dsl, script, progress_callback
+            )
+        raise ValueError("Either events or indices and a query need to be provided.")
+
+    def bulk_remove_tags(
+        self,
+        events: list,
+        tags: list,
+        progress_callback=None,
+        chunk_size: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """Removes tags from many events with chunked bulk scripted updates.
+
+        Args:
+            events: List of (index name, event ID) tuples.
+            tags: List of tags to remove.
+            progress_callback (callable): Optional function called with the number of
+                processed and the total number of events while updating.
+            chunk_size: Optional number of events per bulk request.
+
+        Returns:
+            Dict with the number of "total", "updated", "noop" and "failed"
+            events.
+        """
+        script = {
+            "lang": "painless",
+            "source": REMOVE_TAGS_SCRIPT,
+            "params": {"tags": list(tags)},
+        }
+        return self._bulk_script_update(events, script, progress_callback, chunk_size)
+
+    def _bulk_script_update(
+        self,
+        events: list,
+        script: Dict,
+        progress_callback=None,
+        chunk_size: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """Runs a scripted update on a list of events using the bulk API.
+
+        Args:
+            events: List of (index name, event ID) tuples.
+            script: Dict with the painless script and its params.
+            progress_callback (callable): Optional function called with the number of
+                processed and the total number of events.
+            chunk_size: Optional number of events per bulk request.
+
+        Returns:
+            Dict with the number of "total", "updated", "noop" and "failed"
+            events.
+        """
+        chunk_size = chunk_size or self.DEFAULT_BULK_UPDATE_CHUNK_SIZE
+        events = list(dict.fromkeys(tuple(event) for event in events))
+        counts = {"total": len(events), "updated": 0, "noop": 0, "failed": 0}
+
+        for start in range(0, len(events), chunk_size):
+            body = []
+            for index_name, event_id in events[start : start + chunk_size]:
+                body.append(
+                    {
+                        "update": {
+                            "_index": index_name,
+                            "_id": event_id,
+                            "retry_on_conflict": 3,
+                        }
+                    }
+                )
+                body.append({"script": script})
+
+            response = self.client.bulk(body=body)
+            first_error = None
+            for item in response.get("items", []):
+                result = item.get("update", {})
+                if result.get("status", 500) >= 300:
+                    counts["failed"] += 1
+                    first_error = first_error or result.get("error")
+                elif result.get("result") == "noop":
+                    counts["noop"] += 1
+                else:
+                    counts["updated"] += 1
+
+            if first_error:
+                os_logger.error("Unable to update events, first error: %s", first_error)
+
+            if progress_callback:
+                progress_callback(min(start + chunk_size, len(events)), len(events))
+
+        return counts
+
+    def _update_by_query_script(
+        self,
+        indices: list,
+        query_dsl: Dict,
+        script: Dict,
+        progress_callback=None,
+    ) -> Dict[str, int]:
+        """Runs a scripted update by query, optionally reporting progress.
+
+        Args:
+            indices: List of index names.
+            query_dsl: OpenSearch query selecting the events.
+            script: Dict with the painless script and its params.
+            progress_callback (callable): Optional function called with the number of
+                processed and the total number of events. If provided the
+                update runs as a datastore task that is polled for progress.
+
+        Returns:
+            Dict with the number of "total", "updated", "noop" and "failed"
+            events.
+        """
+        body = {"query": query_dsl.get("query", query_dsl), "script": script}
+        index = ",".join(indices)
+
+        if not progress_callback:
+            # pylint: disable=unexpected-keyword-arg
+            response = self.client.update_by_query(
+                index=index, body=body, conflicts="proceed", slices="auto"
+            )
+            return self._update_by_query_counts(response)
+
+        # pylint: disable=unexpected-keyword-arg
+        response = self.client.update_by_query(
+            index=index,
+            body=body,
+            conflicts="proceed",
+            slices="auto",
+            wait_for_completion=False,
+        )
+        task_id = response.get("task")
+        while True:
+            task = self.client.tasks.get(task_id=task_id)
+            status = task.get("task", {}).get("status", {})
+            processed = (
+                status.get("updated", 0)
+                + status.get("noops", 0)
+                + status.get("version_conflicts", 0)
+            )
+            progress_callback(processed, status.get("total", 0))
+            if task.get("completed"):
+                return self._update_by_query_counts(task.get("response", status))
+            time.sleep(self.BULK_UPDATE_POLL_INTERVAL)
+
+    @staticmethod
+    def _update_by_query_counts(response: Dict) -> Dict[str, int]:
+        """Returns update counts from an update by query response."""
+        return {
+            "total": response.get("total", 0),
+            "updated": response.get("updated", 0),
+            "noop": response.get("noops", 0),
+            "failed": len(response.get("failures", []))
+            + response.get("version_conflicts", 0),
+        }
+
     def create_index(
-        self, index_name: str = uuid4().hex, mappings: Optional[Dict] = None
+        self,
+        index_name: str = uuid4().hex,
+        mappings: Optional[Dict] = None,
+        settings: Optional[Dict] = None,
     ):
         """Create index with Timesketch settings.
 
         Args:
             index_name: Name of the index. Default is a generated UUID.
             mappings: Optional dict with the document mapping for OpenSearch.
+            settings: Optional dict with index settings, e.g. the number of
+                shards.
 
         Returns:
             Index name in string format.
@@ -1725,11 +2048,13 @@ class OpenSearchDataStore:
                 }
             }
 
+        body = {"mappings": _document_mapping}
+        if settings:
+            body["settings"] = settings
+
         if not self.client.indices.exists(index_name):
             try:
-                self.client.indices.create(
-                    index=index_name, body={"mappings": _document_mapping}
-                )
+                self.client.indices.create(index=index_name, body=body)
             except ConnectionError as e:
                 raise errors.DatastoreConnectionError(
                     "Unable to connect to Timesketch backend when creating "
@@ -1764,6 +2089,130 @@ class OpenSearchDataStore:
                     f"Unable to connect to Timesketch backend: {e}"
                 ) from e
 
+    def delete_timeline_events(self, index_name: str, timeline_id: int):
+        """Delete all events of a timeline from an index.
+
+        The deletion runs as a background task in OpenSearch, so that large
+        timelines do not time out the request.
+
+        Args:
+            index_name: Name of the index the timeline is stored in.
+            timeline_id: ID of the timeline.
+
+        Returns:
+            The ID of the OpenSearch task that deletes the events.
+        """
+        body = {"query": {"term": {"__ts_timeline_id": timeline_id}}}
+        # pylint: disable=unexpected-keyword-arg
+        result = self.client.delete_by_query(
+            index=index_name,
+            body=body,
+            conflicts="proceed",
+            wait_for_completion=False,
+        )
+        return result.get("task")
+
+    def create_snapshot_repository(self, repository: str, location: str):
+        """Registers a filesystem snapshot repository.
+
+        Args:
+            repository: Name of the repository.
+            location: Path to the repository, it has to be listed in the
+                "path.repo" setting of all OpenSearch nodes.
+        """
+        self.client.snapshot.create_repository(
+            repository=repository,
+            body={"type": "fs", "settings": {"location": location, "compress": True}},
+        )
+
+    def snapshot_index(self, repository: str, snapshot: str, index_name: str) -> dict:
+        """Creates a snapshot of a single index and waits for it to finish.
+
+        Args:
+            repository: Name of the snapshot repository.
+            snapshot: Name of the snapshot.
+            index_name: Name of the index.
+
+        Returns:
+            Dictionary with information about the snapshot.
+        """
+        # pylint: disable=unexpected-keyword-arg
+        result = self.client.snapshot.create(
+            repository=repository,
+            snapshot=snapshot,
+            body={"indices": index_name, "include_global_state": False},
+            wait_for_completion=True,
+        )
+        return result.get("snapshot", {})
+
+    def restore_index_snapshot(
+        self, repository: str, snapshot: str, index_name: str
+    ) -> dict:
+        """Restores a single index from a snapshot and waits for it to finish.
+
+        Args:
+            repository: Name of the snapshot repository.
+            snapshot: Name of the snapshot.
+            index_name: Name of the index.
+
+        Returns:
+            Dictionary with information about the restored shards.
+        """
+        # pylint: disable=unexpected-keyword-arg
+        result = self.client.snapshot.restore(
+            repository=repository,
+            snapshot=snapshot,
+            body={"indices": index_name, "include_global_state": False},
+            wait_for_completion=True,
+        )
+        return result.get("snapshot", {})
+
+    def clone_snapshot(
+        self, repository: str, snapshot: str, target: str, index_name: str
+    ):
+        """Copies the index of a snapshot to a new snapshot.
+
+        Args:
+            repository: Name of the snapshot repository.
+            snapshot: Name of the source snapshot.
+            target: Name of the new snapshot.
+            index_name: Name of the index to copy.
+        """
+        self.client.snapshot.clone(
+            repository=repository,
+            snapshot=snapshot,
+            target_snapshot=target,
+            body={"indices": index_name},
+        )
+
+    def get_snapshot(self, repository: str, snapshot: str) -> Optional[dict]:
+        """Returns information about a snapshot, or None if it doesn't exist.
+
+        Args:
+            repository: Name of the snapshot repository.
+            snapshot: Name of the snapshot.
+        """
+        try:
+            result = self.client.snapshot.get(repository=repository, snapshot=snapshot)
+        except NotFoundError:
+            return None
+        snapshots = result.get("snapshots", [])
+        if not snapshots:
+            return None
+        return snapshots[0]
+
+    def delete_snapshot(self, repository: str, snapshot: str):
+        """Deletes a snapshot, if it exists.
+
+        Args:
+            repository: Name of the snapshot repository.
+            snapshot: Name of the snapshot.
+        """
+        try:
+            self.client.snapshot.delete(repository=repository, snapshot=snapshot)
+        except NotFoundError:
+            pass
+
     def import_event(
         self,
         index_name: str,
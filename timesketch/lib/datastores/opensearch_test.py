@@ -19,6 +19,7 @@ from unittest import mock
 from opensearchpy.exceptions import ConnectionTimeout
 from opensearchpy.exceptions import TransportError
 
+from timesketch.lib.datastores import mapping_cache
 from timesketch.lib.datastores.opensearch import OpenSearchDataStore
 from timesketch.lib.testlib import BaseTest
 from timesketch.lib.errors import DatastoreTimeoutError
@@ -222,6 +223,82 @@ class OpenSearchDataStoreTest(BaseTest):
         self.assertCountEqual(fields_prefetched, ["msg", "xml", "nested_obj.sub_field"])
         mock_es.indices.get_mapping.assert_not_called()
 
+    @mock.patch("timesketch.lib.datastores.opensearch.OpenSearch")
+    def test_search_routes_leading_wildcards(self, mock_client):
+        """Test that classic searches route leading wildcards to subfields."""
+        mock_es = mock_client.return_value
+        mock_es.info.return_value = {"version": {"number": "7.0.0"}}
+        mock_es.search.return_value = {"hits": {"hits": [], "total": 0}}
+        mock_es.indices.get_mapping.return_value = {
+            "test": {
+                "mappings": {
+                    "properties": {
+                        "message": {
+                            "type": "text",
+                            "fields": {"wildcard": {"type": "wildcard"}},
+                        },
+                        "xml": {"type": "wildcard"},
+                    }
+                }
+            }
+        }
+        mapping_cache.invalidate()
+        ds = OpenSearchDataStore(host="127.0.0.1", port=9200)
+        ds.client = mock_es
+
+        ds.search(sketch_id=1, indices=["test"], query_string="message:*evil*")
+        query_dsl = mock_es.search.call_args.kwargs["body"]
+        query = query_dsl["query"]["bool"]["must"][0]["query_string"]["query"]
+        self.assertEqual(query, "message.wildcard:/.*[eE][vV][iI][lL].*/")
+
+        # Fields with the wildcard type have no subfield to route to.
+        ds.search(sketch_id=1, indices=["test"], query_string="xml:*evil*")
+        query_dsl = mock_es.search.call_args.kwargs["body"]
+        query = query_dsl["query"]["bool"]["must"][0]["query_string"]["query"]
+        self.assertEqual(query, "xml:*evil*")
+
+        mock_es.indices.get_mapping.reset_mock()
+        mapping_cache.invalidate()
+        ds.search(sketch_id=1, indices=["test"], query_string="message:evil")
+        mock_es.indices.get_mapping.assert_not_called()
+
+        self.app.config["OPENSEARCH_ROUTE_WILDCARD_QUERIES"] = False
+        ds.search(sketch_id=1, indices=["test"], query_string="message:*evil*")
+        query_dsl = mock_es.search.call_args.kwargs["body"]
+        query = query_dsl["query"]["bool"]["must"][0]["query_string"]["query"]
+        self.assertEqual(query, "message:*evil*")
+
+    @mock.patch("timesketch.lib.datastores.opensearch.OpenSearch")
+    def test_get_routing_wildcard_fields(self, mock_client):
+        """Test that only fields routable in all indices are routed."""
+        mock_es = mock_client.return_value
+        mock_es.info.return_value = {"version": {"number": "7.0.0"}}
+        wildcard_text = {
+            "type": "text",
+            "fields": {"wildcard": {"type": "wildcard"}},
+        }
+        mock_es.indices.get_mapping.return_value = {
+            "new": {
+                "mappings": {
+                    "properties": {"message": wildcard_text, "path": wildcard_text}
+                }
+            },
+            "old": {"mappings": {"properties": {"message": wildcard_text}}},
+            "legacy": {"mappings": {"properties": {"message": {"type": "text"}}}},
+        }
+        mapping_cache.invalidate()
+        ds = OpenSearchDataStore(host="127.0.0.1", port=9200)
+        ds.client = mock_es
+
+        self.assertEqual(
+            ds.get_routing_wildcard_fields(["new", "old"], "message:*evil*"),
+            {"message"},
+        )
+        self.assertIsNone(
+            ds.get_routing_wildcard_fields(["new", "legacy"], "path:*evil*")
+        )
+        mapping_cache.invalidate()
+
     @mock.patch("timesketch.lib.datastores.opensearch.OpenSearch")
     def test_build_wildcard_query_dsl_global_search(self, mock_client):
         """Test global wildcard query dsl generation."""
@@ -420,3 +497,76 @@ class OpenSearchDataStoreTest(BaseTest):
 
         ds = OpenSearchDataStore(host="127.0.0.1", port=9200)
         self.assertEqual(ds.version, "2.19.5")
+
+    @mock.patch("timesketch.lib.datastores.opensearch.OpenSearch")
+    def test_bulk_label_events(self, mock_client):
+        """Test that labels are changed with chunked bulk scripted updates."""
+        ds = OpenSearchDataStore(host="127.0.0.1", port=9200)
+        mock_es_instance = mock_client.return_value
+        mock_es_instance.bulk.side_effect = [
+            {
+                "items": [
+                    {"update": {"status": 200, "result": "updated"}},
+                    {"update": {"status": 200, "result": "noop"}},
+                ]
+            },
+            {"items": [{"update": {"status": 404, "error": "missing"}}]},
+        ]
+        progress = []
+
+        counts = ds.bulk_label_events(
+            sketch_id=1,
+            user_id=2,
+            label="__ts_star",
+            action="toggle",
+            events=[("index", "1"), ("index", "2"), ("index", "1"), ("other", "3")],
+            progress_callback=lambda done, total: progress.append((done, total)),
+            chunk_size=2,
+        )
+
+        self.assertEqual(counts, {"total": 3, "updated": 1, "noop": 1, "failed": 1})
+        self.assertEqual(progress, [(2, 3), (3, 3)])
+        self.assertEqual(mock_es_instance.bulk.call_count, 2)
+        first_body = mock_es_instance.bulk.call_args_list[0][1]["body"]
+        self.assertEqual(first_body[0]["update"]["_id"], "1")
+        self.assertEqual(first_body[1]["script"]["params"]["action"], "toggle")
+        self.assertEqual(
+            first_body[1]["script"]["params"]["timesketch_label"],
+            {"name": "__ts_star", "user_id": 2, "sketch_id": 1},
+        )
+        mock_es_instance.get.assert_not_called()
+
+        with self.assertRaises(ValueError):
+            ds.bulk_label_events(1, 2, "foo", action="rename", events=[])
+
+    @mock.patch("timesketch.lib.datastores.opensearch.time.sleep")
+    @mock.patch("timesketch.lib.datastores.opensearch.OpenSearch")
+    def test_bulk_label_events_by_query(self, mock_client, _):
+        """Test that labels can be changed for a query with progress."""
+        ds = OpenSearchDataStore(host="127.0.0.1", port=9200)
+        mock_es_instance = mock_client.return_value
+        mock_es_instance.update_by_query.return_value = {"task": "node:1"}
+        mock_es_instance.tasks.get.side_effect = [
+            {"completed": False, "task": {"status": {"total": 10, "updated": 4}}},
+            {
+                "completed": True,
+                "task": {"status": {"total": 10, "updated": 9, "noops": 1}},
+                "response": {"total": 10, "updated": 9, "noops": 1, "failures": []},
+            },
+        ]
+        progress = []
+
+        counts = ds.bulk_label_events(
+            sketch_id=1,
+            user_id=2,
+            label="foo",
+            indices=["index"],
+            query_dsl={"query": {"term": {"data_type": "bar"}}},
+            progress_callback=lambda done, total: progress.append((done, total)),
+        )
+
+        self.assertEqual(counts, {"total": 10, "updated": 9, "noop": 1, "failed": 0})
+        self.assertEqual(progress, [(4, 10), (10, 10)])
+        call_kwargs = mock_es_instance.update_by_query.call_args[1]
+        self.assertFalse(call_kwargs["wait_for_completion"])
+        self.assertEqual(call_kwargs["body"]["query"], {"term": {"data_type": "bar"}})
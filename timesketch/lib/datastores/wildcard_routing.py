@@ -0,0 +1,224 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Routes leading wildcard terms of query strings to wildcard subfields.
+
+A query string term like message:*evil* is run by OpenSearch as a scan of
+the whole term dictionary of the field. Fields that have a "wildcard"
+subfield can answer the same question from their n-gram index instead, so
+such terms are rewritten to a regular expression on the subfield, e.g.
+message.wildcard:/.*[eE][vV][iI][lL].*/. The regular expression keeps the
+match case insensitive, like the analyzed text field the user searched on.
+
+Only "contains" terms, which start and end with an asterisk, are rewritten:
+for those, a match on one of the tokens of the text field is also a match on
+the whole value. The rest of the query string, including its operators,
+grouping, phrases and ranges, is kept as is.
+"""
+
+import re
+
+# Name of the subfield with the wildcard type in the Timesketch mappings.
+WILDCARD_SUBFIELD = "wildcard"
+
+_FIELD_RE = re.compile(r"([A-Za-z0-9_@][\w.@-]*):")
+
+# Characters that end a term in the query string syntax.
+_TERM_END = frozenset("()")
+
+# Characters that change the meaning of a term, e.g. boost or fuzziness.
+_TERM_MODIFIERS = frozenset("~^:")
+
+
+def get_subfield_fields(properties: dict, prefix: str = "") -> set:
+    """Returns the fields with a wildcard subfield in an index mapping.
+
+    Fields that are mapped with the wildcard type themselves, e.g. "xml", are
+    not returned: they have no subfield and already match wildcard terms on
+    the whole value.
+
+    Args:
+        properties (dict): The "properties" dictionary of an index mapping.
+        prefix (str): Prefix of the field names, for object fields.
+
+    Returns:
+        A set of field names, e.g. {"message", "user.name"}.
+    """
+    fields = set()
+    for name, mapping in properties.items():
+        if not isinstance(mapping, dict):
+            continue
+        subfield = (mapping.get("fields") or {}).get(WILDCARD_SUBFIELD)
+        if isinstance(subfield, dict) and subfield.get("type") == "wildcard":
+            fields.add(f"{prefix}{name}")
+        if isinstance(mapping.get("properties"), dict):
+            fields.update(
+                get_subfield_fields(mapping["properties"], f"{prefix}{name}.")
+            )
+    return fields
+
+
+def has_leading_wildcard(query_string: str) -> bool:
+    """Returns True if a query string may contain a routable term."""
+    return bool(query_string) and ":*" in query_string
+
+
+def _skip_delimited(query_string: str, start: int, closing: str) -> int:
+    """Returns the position after a quoted phrase, regexp or range.
+
+    Args:
+        query_string: The query string.
+        start: Position of the opening character.
+        closing: Characters that close the phrase, regexp or range.
+
+    Returns:
+        The position after the closing character, or the length of the query
+        string if it is not closed.
+    """
+    position = start + 1
+    while position < len(query_string):
+        char = query_string[position]
+        if char == "\\":
+            position += 2
+            continue
+        if char in closing:
+            return position + 1
+        position += 1
+    return len(query_string)
+
+
+def _term_end(query_string: str, start: int) -> int:
+    """Returns the position after the term that starts at a position."""
+    position = start
+    while position < len(query_string):
+        char = query_string[position]
+        if char == "\\":
+            position += 2
+            continue
+        if char.isspace() or char in _TERM_END:
+            break
+        position += 1
+    return min(position, len(query_string))
+
+
+def _unescape(value: str) -> list:
+    """Returns the characters of a term as (character, is_literal) tuples."""
+    characters = []
+    position = 0
+    while position < len(value):
+        char = value[position]
+        if char == "\\" and position + 1 < len(value):
+            characters.append((value[position + 1], True))
+            position += 2
+            continue
+        characters.append((char, False))
+        position += 1
+    return characters
+
+
+def _is_contains_term(characters: list) -> bool:
+    """Returns True if a term is a leading and trailing wildcard pattern."""
+    if len(characters) < 3:
+        return False
+    if characters[0] != ("*", False) or characters[-1] != ("*", False):
+        return False
+    if any(char in _TERM_MODIFIERS and not literal for char, literal in characters):
+        return False
+    return any(literal or char not in "*?" for char, literal in characters)
+
+
+def wildcard_to_regexp(characters: list) -> str:
+    """Returns a case insensitive regular expression for a wildcard term.
+
+    Args:
+        characters: List of (character, is_literal) tuples of the term.
+
+    Returns:
+        A Lucene regular expression, delimited with slashes so that it can be
+        used in a query string.
+    """
+    parts = []
+    for char, literal in characters:
+        if not literal and char == "*":
+            parts.append(".*")
+        elif not literal and char == "?":
+            parts.append(".")
+        elif char.lower() != char.upper():
+            parts.append(f"[{char.lower()}{char.upper()}]")
+        elif char.isalnum():
+            parts.append(char)
+        else:
+            # Lucene regular expressions accept any escaped character.
+            parts.append(f"\\{char}")
+    return "/{0:s}/".format("".join(parts))
+
+
+def route_query_string(query_string: str, wildcard_fields) -> str:
+    """Rewrites leading wildcard terms to use wildcard subfields.
+
+    Args:
+        query_string (str): The query string, in the OpenSearch query string
+            syntax.
+        wildcard_fields (set): Set of field names with a wildcard subfield.
+
+    Returns:
+        The query string, with all "contains" terms on fields with a wildcard
+        subfield rewritten to regular expressions on the subfield.
+    """
+    if not wildcard_fields or not has_leading_wildcard(query_string):
+        return query_string
+
+    output = []
+    position = 0
+    length = len(query_string)
+    while position < length:
+        char = query_string[position]
+        if char.isspace() or char in _TERM_END or char in "+-!":
+            output.append(char)
+            position += 1
+            continue
+
+        if char in '"/[{':
+            # Phrases, regular expressions and ranges are kept as is. Ranges
+            # may be closed with either bracket type.
+            closing = "]}" if char in "[{" else char
+            end = _skip_delimited(query_string, position, closing)
+            output.append(query_string[position:end])
+            position = end
+            continue
+
+        match = _FIELD_RE.match(query_string, position)
+        if not match:
+            end = _term_end(query_string, position)
+            output.append(query_string[position:end])
+            position = end
+            continue
+
+        field_name = match.group(1)
+        position = match.end()
+        if position >= length or query_string[position] in '"/[{(':
+            output.append(match.group(0))
+            continue
+
+        end = _term_end(query_string, position)
+        value = query_string[position:end]
+        characters = _unescape(value)
+        if field_name in wildcard_fields and _is_contains_term(characters):
+            output.append(f"{field_name}.{WILDCARD_SUBFIELD}:")
+            output.append(wildcard_to_regexp(characters))
+        else:
+            output.append(match.group(0))
+            output.append(value)
+        position = end
+
+    return "".join(output)
@@ -0,0 +1,86 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the wildcard subfield routing of query strings."""
+
+from timesketch.lib.datastores import wildcard_routing
+from timesketch.lib.testlib import BaseTest
+
+WILDCARD_FIELDS = {"message", "filename"}
+
+
+class TestWildcardRouting(BaseTest):
+    """Tests for the wildcard routing functionality."""
+
+    def _route(self, query_string):
+        return wildcard_routing.route_query_string(query_string, WILDCARD_FIELDS)
+
+    def test_route_contains_terms(self):
+        """Test that contains terms are routed to the wildcard subfield."""
+        self.assertEqual(
+            self._route("message:*Evil.exe*"),
+            r"message.wildcard:/.*[eE][vV][iI][lL]\.[eE][xX][eE].*/",
+        )
+        self.assertEqual(
+            self._route(r"(filename:*a\/b* OR filename:*c?d*) AND data_type:x"),
+            r"(filename.wildcard:/.*[aA]\/[bB].*/ OR "
+            r"filename.wildcard:/.*[cC].[dD].*/) AND data_type:x",
+        )
+        self.assertEqual(self._route("-message:*42*"), "-message.wildcard:/.*42.*/")
+
+    def test_keep_other_terms(self):
+        """Test that other terms are not changed."""
+        for query_string in (
+            "message:*evil",
+            "message:evil*",
+            'message:"*evil*"',
+            "message:*evil*^2",
+            "message:*",
+            "xml:*evil*",
+            "*evil*",
+            "filename:[*a* TO *b*]",
+            "message:/.*evil.*/",
+        ):
+            self.assertEqual(self._route(query_string), query_string)
+
+        self.assertEqual(
+            wildcard_routing.route_query_string("message:*evil*", set()),
+            "message:*evil*",
+        )
+
+    def test_get_subfield_fields(self):
+        """Test that only fields with a wildcard subfield are routed."""
+        properties = {
+            "message": {
+                "type": "text",
+                "fields": {
+                    "keyword": {"type": "keyword"},
+                    "wildcard": {"type": "wildcard"},
+                },
+            },
+            "xml": {"type": "wildcard"},
+            "user": {
+                "properties": {
+                    "name": {
+                        "type": "text",
+                        "fields": {"wildcard": {"type": "wildcard"}},
+                    }
+                }
+            },
+            "tag": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
+        }
+        fields = wildcard_routing.get_subfield_fields(properties)
+        self.assertEqual(fields, {"message", "user.name"})
+        self.assertEqual(
+            wildcard_routing.route_query_string("xml:*evil*", fields), "xml:*evil*"
+        )
@@ -0,0 +1,312 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Process-wide cache of the DFIQ catalog.
+
+Building the catalog parses every YAML file under DFIQ_PATH, optionally
+downloads all DFIQ objects from Yeti, and builds the graph of components.
+The cache keeps the merged catalog and only rebuilds it when the files on
+disk or the templates from Yeti change.
+
+Files are compared by name, modification time and size. The Yeti API does
+not expose an ETag for DFIQ objects, so the downloaded templates are kept
+for a TTL and the catalog is only rebuilt if their content changed. The
+templates can be written to a snapshot file, so that all web workers and
+Celery workers on a host share a single download per TTL.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, List, Optional
+
+from timesketch.lib.dfiq import DFIQCatalog
+
+logger = logging.getLogger("timesketch.dfiq_cache")
+
+# Number of seconds between checks of the files for changes.
+DEFAULT_CHECK_INTERVAL = 5
+
+# Number of seconds templates downloaded from Yeti are used.
+DEFAULT_YETI_TTL = 900
+
+# Number of seconds before a failed download from Yeti is retried.
+YETI_RETRY_INTERVAL = 60
+
+DFIQ_TYPE_DIRECTORIES = ("scenarios", "facets", "questions")
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_files_fingerprint(dfiq_path: str) -> Optional[str]:
+    """Returns a fingerprint of the DFIQ YAML files in a directory.
+
+    Args:
+        dfiq_path: Path to the DFIQ directory.
+
+    Returns:
+        A hex digest that changes when a file is added, removed or modified,
+        or None if the path is not a directory.
+    """
+    if not dfiq_path or not os.path.isdir(dfiq_path):
+        return None
+
+    entries = []
+    for dfiq_type in DFIQ_TYPE_DIRECTORIES:
+        type_path = os.path.join(dfiq_path, dfiq_type)
+        try:
+            with os.scandir(type_path) as directory:
+                for entry in directory:
+                    if not entry.name.endswith(".yaml"):
+                        continue
+                    stat = entry.stat()
+                    entries.append(
+                        (dfiq_type, entry.name, stat.st_mtime_ns, stat.st_size)
+                    )
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+
+    return hashlib.sha256(json.dumps(sorted(entries)).encode("utf-8")).hexdigest()
+
+
+def _get_yaml_fingerprint(yaml_strings: List[str]) -> str:
+    """Returns a fingerprint of a list of YAML strings."""
+    digest = hashlib.sha256()
+    for yaml_string in sorted(yaml_strings):
+        digest.update(hashlib.sha256(yaml_string.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+def read_snapshot(path: str) -> Optional[dict]:
+    """Reads a snapshot of templates downloaded from Yeti.
+
+    Args:
+        path: Path to the snapshot file.
+
+    Returns:
+        A dict with the time of the download and the list of YAML strings,
+        or None if the file does not exist or can't be parsed.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            snapshot = json.load(fh)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Unable to read the DFIQ snapshot %s: %s", path, e)
+        return None
+
+    if not isinstance(snapshot, dict) or not isinstance(snapshot.get("yaml"), list):
+        return None
+    try:
+        snapshot["fetched_at"] = float(snapshot.get("fetched_at", 0))
+    except (TypeError, ValueError):
+        return None
+    return snapshot
+
+
+def write_snapshot(path: str, yaml_strings: List[str], fetched_at: float):
+    """Atomically writes a snapshot of templates downloaded from Yeti.
+
+    Args:
+        path: Path to the snapshot file.
+        yaml_strings: List of DFIQ YAML strings.
+        fetched_at: Time of the download, in seconds since the epoch.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        with tempfile.NamedTemporaryFile(
+            "w", dir=directory, delete=False, encoding="utf-8"
+        ) as fh:
+            json.dump({"fetched_at": fetched_at, "yaml": yaml_strings}, fh)
+            temp_path = fh.name
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.warning("Unable to write the DFIQ snapshot %s: %s", path, e)
+
+
+def build_catalog(
+    dfiq_path: Optional[str], yeti_yaml: Optional[List[str]] = None
+) -> Optional[DFIQCatalog]:
+    """Builds a DFIQ catalog from files and templates downloaded from Yeti.
+
+    Templates from Yeti overwrite templates from files with the same UUID.
+
+    Args:
+        dfiq_path: Path to the DFIQ directory, or None to skip files.
+        yeti_yaml: List of DFIQ YAML strings downloaded from Yeti.
+
+    Returns:
+        The DFIQ catalog, or None if there are no templates.
+    """
+    dfiq_from_files = None
+    if dfiq_path:
+        try:
+            dfiq_from_files = DFIQCatalog(dfiq_path)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error("Error loading DFIQ from path %s: %s", dfiq_path, str(e))
+
+    dfiq_from_yeti = None
+    if yeti_yaml:
+        dfiq_from_yeti = DFIQCatalog.from_yaml_list(yeti_yaml)
+
+    if not dfiq_from_files:
+        return dfiq_from_yeti
+    if not dfiq_from_yeti:
+        return dfiq_from_files
+
+    # Create a new, empty DFIQ object to hold the merged results.
+    final_dfiq = DFIQCatalog()
+
+    # Merge components from both sources.
+    merged_components = dfiq_from_files.components.copy()
+    merged_components.update(dfiq_from_yeti.components)
+
+    final_dfiq.components = merged_components
+
+    final_dfiq.id_to_uuid_map = {
+        c.id: c.uuid for c in final_dfiq.components.values() if c.id
+    }
+
+    # Rebuild the graph from the final, merged set of components.
+    if final_dfiq.components:
+        final_dfiq.graph = final_dfiq._build_graph()  # pylint: disable=protected-access
+
+    return final_dfiq
+
+
+class DFIQCatalogCache:
+    """Keeps the DFIQ catalog until its sources change.
+
+    The catalog is shared by all requests of a process and must be treated
+    as read-only.
+    """
+
+    def __init__(self):
+        """Initialize the cache."""
+        self._lock = threading.Lock()
+        self._catalog = None
+        self._key = None
+        self._sources = None
+        self._checked_at = 0.0
+        self._yeti_yaml = None
+        self._yeti_fetched_at = 0.0
+
+    def clear(self):
+        """Drops the cached catalog and templates."""
+        with self._lock:
+            self._catalog = None
+            self._key = None
+            self._sources = None
+            self._checked_at = 0.0
+            self._yeti_yaml = None
+            self._yeti_fetched_at = 0.0
+
+    def _get_yeti_yaml(
+        self,
+        yeti_loader: Callable[[], Optional[List[str]]],
+        ttl: float,
+        snapshot_path: str,
+        now: float,
+    ) -> List[str]:
+        """Returns the templates from Yeti, downloading them if expired."""
+        if self._yeti_yaml is not None and now - self._yeti_fetched_at < ttl:
+            return self._yeti_yaml
+
+        if snapshot_path:
+            snapshot = read_snapshot(snapshot_path)
+            if snapshot and now - snapshot["fetched_at"] < ttl:
+                self._yeti_yaml = snapshot["yaml"]
+                self._yeti_fetched_at = snapshot["fetched_at"]
+                return self._yeti_yaml
+
+        yaml_strings = yeti_loader()
+        if yaml_strings is None:
+            # Keep the previous templates, if any, and retry later instead of
+            # contacting Yeti on every request while it is unavailable.
+            if self._yeti_yaml is None:
+                self._yeti_yaml = []
+            self._yeti_fetched_at = now - ttl + min(YETI_RETRY_INTERVAL, ttl)
+            return self._yeti_yaml
+
+        self._yeti_yaml = yaml_strings
+        self._yeti_fetched_at = now
+        if snapshot_path:
+            write_snapshot(snapshot_path, yaml_strings, now)
+        return self._yeti_yaml
+
+    def get_catalog(
+        self,
+        dfiq_path: Optional[str],
+        yeti_loader: Optional[Callable[[], Optional[List[str]]]] = None,
+        yeti_ttl: float = DEFAULT_YETI_TTL,
+        snapshot_path: str = "",
+        check_interval: float = DEFAULT_CHECK_INTERVAL,
+    ) -> Optional[DFIQCatalog]:
+        """Returns the DFIQ catalog, rebuilding it if its sources changed.
+
+        Args:
+            dfiq_path: Path to the DFIQ directory.
+            yeti_loader: Optional callable that downloads the DFIQ YAML
+                strings from Yeti, returning None on errors.
+            yeti_ttl: Number of seconds downloaded templates are used.
+            snapshot_path: Optional path to a snapshot file that shares the
+                downloaded templates between processes.
+            check_interval: Number of seconds between checks for changes.
+
+        Returns:
+            The DFIQ catalog, or None if there are no templates.
+        """
+        sources = (dfiq_path, yeti_loader is not None, snapshot_path)
+        with self._lock:
+            now = time.time()
+            if sources == self._sources and now - self._checked_at < check_interval:
+                return self._catalog
+
+            fingerprint = get_files_fingerprint(dfiq_path)
+            if fingerprint is None:
+                logger.info(
+                    "No DFIQ_PATH configured or path is invalid, "
+                    "skipping file-based loading."
+                )
+            yeti_yaml = []
+            if yeti_loader is not None:
+                yeti_yaml = self._get_yeti_yaml(
+                    yeti_loader, yeti_ttl, snapshot_path, now
+                )
+
+            key = (dfiq_path, fingerprint, _get_yaml_fingerprint(yeti_yaml))
+            if key != self._key:
+                logger.debug("Building the DFIQ catalog.")
+                self._catalog = build_catalog(
+                    dfiq_path if fingerprint else None, yeti_yaml
+                )
+                self._key = key
+
+            self._sources = sources
+            self._checked_at = now
+            return self._catalog
+
+
+def get_cache() -> DFIQCatalogCache:
+    """Returns the DFIQ catalog cache of this process."""
+    global _CACHE  # pylint: disable=global-statement
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = DFIQCatalogCache()
+        return _CACHE
@@ -0,0 +1,130 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the DFIQ catalog cache."""
+
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from timesketch.lib import dfiq_cache
+from timesketch.lib.testlib import BaseTest
+
+
+class TestDFIQCatalogCache(BaseTest):
+    """Tests for the DFIQ catalog cache."""
+
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.dfiq_path = os.path.join(self.temp_dir, "dfiq")
+        shutil.copytree("./tests/test_data/dfiq/", self.dfiq_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        super().tearDown()
+
+    def _read_yaml(self, dfiq_type):
+        type_path = os.path.join(self.dfiq_path, dfiq_type)
+        yaml_strings = []
+        for name in sorted(os.listdir(type_path)):
+            with open(os.path.join(type_path, name), "r", encoding="utf-8") as fh:
+                yaml_strings.append(fh.read())
+        return yaml_strings
+
+    def test_files_fingerprint(self):
+        """Test that the fingerprint changes with the files."""
+        self.assertIsNone(dfiq_cache.get_files_fingerprint(""))
+        self.assertIsNone(
+            dfiq_cache.get_files_fingerprint(os.path.join(self.temp_dir, "missing"))
+        )
+
+        fingerprint = dfiq_cache.get_files_fingerprint(self.dfiq_path)
+        self.assertEqual(fingerprint, dfiq_cache.get_files_fingerprint(self.dfiq_path))
+
+        scenario_path = os.path.join(self.dfiq_path, "scenarios")
+        scenario_file = os.path.join(scenario_path, os.listdir(scenario_path)[0])
+        with open(scenario_file, "a", encoding="utf-8") as fh:
+            fh.write("\n")
+        self.assertNotEqual(
+            fingerprint, dfiq_cache.get_files_fingerprint(self.dfiq_path)
+        )
+
+    def test_catalog_from_files(self):
+        """Test that the catalog is only rebuilt when the files change."""
+        cache = dfiq_cache.DFIQCatalogCache()
+        catalog = cache.get_catalog(self.dfiq_path, check_interval=0)
+        self.assertTrue(catalog.scenarios)
+        self.assertIs(catalog, cache.get_catalog(self.dfiq_path, check_interval=0))
+
+        shutil.rmtree(os.path.join(self.dfiq_path, "questions"))
+        self.assertIs(catalog, cache.get_catalog(self.dfiq_path))
+        rebuilt = cache.get_catalog(self.dfiq_path, check_interval=0)
+        self.assertIsNot(catalog, rebuilt)
+        self.assertFalse(rebuilt.questions)
+
+        self.assertIsNone(cache.get_catalog(os.path.join(self.temp_dir, "missing")))
+
+    def test_catalog_from_yeti(self):
+        """Test that templates from Yeti are downloaded once per TTL."""
+        yaml_strings = self._read_yaml("questions")
+        loader = mock.Mock(return_value=yaml_strings)
+        cache = dfiq_cache.DFIQCatalogCache()
+
+        catalog = cache.get_catalog(None, yeti_loader=loader, check_interval=0)
+        self.assertEqual(len(catalog.questions), len(yaml_strings))
+        self.assertIs(
+            catalog, cache.get_catalog(None, yeti_loader=loader, check_interval=0)
+        )
+        loader.assert_called_once()
+
+        merged = cache.get_catalog(self.dfiq_path, yeti_loader=loader, check_interval=0)
+        self.assertTrue(merged.scenarios)
+        self.assertEqual(len(merged.questions), len(yaml_strings))
+        loader.assert_called_once()
+
+        # A failed download keeps the previous templates.
+        loader.return_value = None
+        stale = cache.get_catalog(
+            None, yeti_loader=loader, yeti_ttl=0, check_interval=0
+        )
+        self.assertEqual(loader.call_count, 2)
+        self.assertEqual(
+            [q.uuid for q in catalog.questions], [q.uuid for q in stale.questions]
+        )
+
+    def test_yeti_snapshot(self):
+        """Test that a snapshot shares the downloaded templates."""
+        snapshot_path = os.path.join(self.temp_dir, "dfiq_yeti.json")
+        yaml_strings = self._read_yaml("scenarios")
+        loader = mock.Mock(return_value=yaml_strings)
+
+        catalog = dfiq_cache.DFIQCatalogCache().get_catalog(
+            None, yeti_loader=loader, snapshot_path=snapshot_path
+        )
+        self.assertEqual(dfiq_cache.read_snapshot(snapshot_path)["yaml"], yaml_strings)
+
+        other_process_loader = mock.Mock(return_value=[])
+        other_catalog = dfiq_cache.DFIQCatalogCache().get_catalog(
+            None, yeti_loader=other_process_loader, snapshot_path=snapshot_path
+        )
+        other_process_loader.assert_not_called()
+        self.assertEqual(
+            [s.uuid for s in catalog.scenarios],
+            [s.uuid for s in other_catalog.scenarios],
+        )
+
+        with open(snapshot_path, "w", encoding="utf-8") as fh:
+            fh.write("not json")
+        self.assertIsNone(dfiq_cache.read_snapshot(snapshot_path))
@@ -0,0 +1,179 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Extraction of the EventData section of Windows EVTX records.
+
+Windows EVTX records carry their event specific values in the EventData
+section of the "xml_string" attribute. Analyzers that need one of these
+values would otherwise fetch and scan the full XML of every event.
+
+When EVTX_EVENTDATA_ENRICHMENT is enabled, the values are parsed once at
+ingest time and stored as flat fields, e.g. "evtx.TargetLogonId". These are
+mapped as keywords, so analyzers can fetch and filter on them directly.
+"""
+
+import html
+import logging
+import re
+from typing import Dict, Iterable, List, Optional
+
+from flask import current_app
+from opensearchpy import helpers
+
+logger = logging.getLogger("timesketch.evtx")
+
+DATA_TYPE = "windows:evtx:record"
+FIELD_PREFIX = "evtx."
+
+# EventData values that are extracted if EVTX_EVENTDATA_FIELDS is not set.
+# A short list keeps the number of fields in the index mapping low.
+DEFAULT_FIELDS = (
+    "AccountName",
+    "IpAddress",
+    "IpPort",
+    "LogonID",
+    "LogonProcessName",
+    "LogonType",
+    "ProcessName",
+    "SubjectLogonId",
+    "SubjectUserName",
+    "TargetDomainName",
+    "TargetLogonId",
+    "TargetUserName",
+    "WorkstationName",
+)
+
+EVENT_DATA_RE = re.compile(r"<EventData>([\s\S]*?)</EventData>")
+DATA_RE = re.compile(r'<Data Name="([^"]+)"\s*(?:/>|>([^<]*)</Data>)')
+
+
+def get_field_name(name: str) -> str:
+    """Returns the name of the field an EventData value is stored in."""
+    return f"{FIELD_PREFIX}{name}"
+
+
+def is_enabled() -> bool:
+    """Returns True if EventData is extracted at ingest time."""
+    return bool(current_app.config.get("EVTX_EVENTDATA_ENRICHMENT", False))
+
+
+def get_enabled_fields() -> List[str]:
+    """Returns the names of the EventData values that are extracted."""
+    return list(current_app.config.get("EVTX_EVENTDATA_FIELDS") or DEFAULT_FIELDS)
+
+
+def parse_event_data(xml_string: Optional[str]) -> Dict[str, str]:
+    """Parses the EventData section of a Windows EVTX record.
+
+    Args:
+        xml_string: The XML representation of the record.
+
+    Returns:
+        A dict with the names and values of the Data elements.
+    """
+    if not xml_string:
+        return {}
+    match = EVENT_DATA_RE.search(xml_string)
+    if not match:
+        return {}
+    return {
+        name: html.unescape(value or "")
+        for name, value in DATA_RE.findall(match.group(1))
+    }
+
+
+def get_event_data_fields(
+    xml_string: Optional[str], fields: Optional[Iterable[str]] = None
+) -> Dict[str, str]:
+    """Returns the flattened EventData fields of a Windows EVTX record.
+
+    Args:
+        xml_string: The XML representation of the record.
+        fields: Names of the values to extract, all values if None.
+
+    Returns:
+        A dict with the field names and values, e.g. "evtx.TargetLogonId".
+    """
+    event_data = parse_event_data(xml_string)
+    if fields is not None:
+        event_data = {
+            name: value for name, value in event_data.items() if name in fields
+        }
+    return {get_field_name(name): value for name, value in event_data.items()}
+
+
+def enrich_event(event: dict, fields: Optional[Iterable[str]] = None) -> dict:
+    """Adds the EventData fields to an event about to be indexed.
+
+    Events that are not Windows EVTX records are returned unchanged.
+
+    Args:
+        event: The event dict.
+        fields: Names of the values to extract, all values if None.
+
+    Returns:
+        The event dict.
+    """
+    if event.get("data_type") != DATA_TYPE:
+        return event
+    event.update(get_event_data_fields(event.get("xml_string"), fields))
+    return event
+
+
+def enrich_index(
+    datastore,
+    index_name: str,
+    timeline_id: Optional[int] = None,
+    fields: Optional[Iterable[str]] = None,
+) -> int:
+    """Adds the EventData fields to Windows EVTX records already indexed.
+
+    Used for Plaso files, where events are written to the datastore by psort
+    and never pass through Timesketch.
+
+    Args:
+        datastore (OpenSearchDataStore): Datastore the index is in.
+        index_name (str): Name of the index.
+        timeline_id (int): Optional ID of the timeline to limit the update to.
+        fields (Iterable[str]): Names of the values to extract, all values if
+            None.
+
+    Returns:
+        The number of updated events.
+    """
+    filters = [
+        {"query_string": {"query": f'data_type:"{DATA_TYPE}"'}},
+        {"exists": {"field": "xml_string"}},
+    ]
+    if timeline_id:
+        filters.append({"term": {"__ts_timeline_id": timeline_id}})
+    query = {"query": {"bool": {"filter": filters}}}
+
+    if fields is not None:
+        fields = set(fields)
+
+    updated = 0
+    for hit in helpers.scan(
+        datastore.client, query=query, index=index_name, _source=["xml_string"]
+    ):
+        event_data = get_event_data_fields(
+            hit.get("_source", {}).get("xml_string"), fields
+        )
+        if not event_data:
+            continue
+        datastore.import_event(index_name, event=event_data, event_id=hit["_id"])
+        updated += 1
+
+    datastore.flush_queued_events()
+    logger.info("Added EventData fields to %d events in %s", updated, index_name)
+    return updated
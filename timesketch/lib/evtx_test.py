@@ -0,0 +1,85 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the extraction of EVTX EventData."""
+
+from unittest import mock
+
+from timesketch.lib import evtx
+from timesketch.lib.testlib import BaseTest
+
+XML_STRING = (
+    '<Event xmlns="http://schemas.microsoft.com/win/2004/08/events/event">'
+    '<System><Data Name="Ignored">system</Data></System><EventData>'
+    '<Data Name="TargetUserName">USER&amp;1</Data>'
+    '<Data Name="TargetLogonId">0x0000000000000001</Data>'
+    '<Data Name="IpAddress">-</Data><Data Name="LogonGuid" />'
+    "</EventData></Event>"
+)
+
+
+class TestEvtx(BaseTest):
+    """Tests for the extraction of EVTX EventData."""
+
+    def test_parse_event_data(self):
+        """Test parsing the EventData section."""
+        self.assertEqual(
+            evtx.parse_event_data(XML_STRING),
+            {
+                "TargetUserName": "USER&1",
+                "TargetLogonId": "0x0000000000000001",
+                "IpAddress": "-",
+                "LogonGuid": "",
+            },
+        )
+        self.assertEqual(evtx.parse_event_data(None), {})
+        self.assertEqual(evtx.parse_event_data("<Event></Event>"), {})
+
+    def test_enrich_event(self):
+        """Test that only EVTX records are enriched with the enabled fields."""
+        event = {"data_type": "windows:evtx:record", "xml_string": XML_STRING}
+        evtx.enrich_event(event, ["TargetLogonId", "LogonID"])
+        self.assertEqual(event["evtx.TargetLogonId"], "0x0000000000000001")
+        self.assertNotIn("evtx.TargetUserName", event)
+
+        event = {"data_type": "syslog:line", "xml_string": XML_STRING}
+        evtx.enrich_event(event)
+        self.assertNotIn("evtx.TargetLogonId", event)
+
+    def test_enabled_fields(self):
+        """Test the configuration of the extraction."""
+        self.assertFalse(evtx.is_enabled())
+        self.assertEqual(evtx.get_enabled_fields(), list(evtx.DEFAULT_FIELDS))
+        self.app.config["EVTX_EVENTDATA_FIELDS"] = ["LogonType"]
+        self.assertEqual(evtx.get_enabled_fields(), ["LogonType"])
+
+    @mock.patch("timesketch.lib.evtx.helpers.scan")
+    def test_enrich_index(self, mock_scan):
+        """Test that indexed events are updated with the EventData fields."""
+        mock_scan.return_value = [
+            {"_id": "1", "_source": {"xml_string": XML_STRING}},
+            {"_id": "2", "_source": {"xml_string": "<Event></Event>"}},
+        ]
+        datastore = mock.Mock()
+        updated = evtx.enrich_index(
+            datastore, "index", timeline_id=3, fields=["TargetLogonId"]
+        )
+        self.assertEqual(updated, 1)
+        datastore.import_event.assert_called_once_with(
+            "index", event={"evtx.TargetLogonId": "0x0000000000000001"}, event_id="1"
+        )
+        datastore.flush_queued_events.assert_called_once()
+        query = mock_scan.call_args.kwargs["query"]
+        self.assertIn(
+            {"term": {"__ts_timeline_id": 3}}, query["query"]["bool"]["filter"]
+        )
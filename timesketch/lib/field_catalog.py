@@ -0,0 +1,507 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Per timeline catalog of the fields seen while indexing events.
+
+The catalog records, for every field in a timeline, the data types it was
+seen in, its type and an approximate number of distinct values. It is built
+at ingest time and stored on the Timeline model, so that views listing
+fields do not have to sample the datastore. Fields that analyzers or users
+add to events later on are added to the catalog with add_fields.
+"""
+
+import logging
+from typing import Iterable, Optional
+
+from opensearchpy.exceptions import OpenSearchException
+
+from timesketch.lib.datastores import mapping_cache
+
+logger = logging.getLogger("timesketch.field_catalog")
+
+CATALOG_VERSION = 1
+
+# Number of distinct values tracked per field before the cardinality is
+# reported as capped.
+DEFAULT_MAX_DISTINCT_VALUES = 1000
+
+# Number of sample events per data type used when building the catalog from
+# an already indexed timeline.
+DEFAULT_SAMPLES_PER_DATA_TYPE = 10
+
+# Maximum number of data types to sample, mirrors the field_bucket limit.
+MAX_DATA_TYPES = 10000
+
+
+def _observed_type(value) -> str:
+    """Returns a mapping-like type name for a Python value."""
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "long"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, dict):
+        return "object"
+    return "text"
+
+
+def _flatten_event(event: dict, prefix: str = "") -> dict:
+    """Returns the fields of an event with object fields in dotted form.
+
+    Uses the same names as _flatten_properties, so that catalogs built from
+    events and from index mappings agree on the names of object fields.
+
+    Args:
+        event (dict): The event, or an object field of it.
+        prefix (str): Name of the object field the values belong to.
+
+    Returns:
+        A dictionary with field names and their values.
+    """
+    fields = {}
+    for name, value in event.items():
+        field = f"{prefix}{name}"
+        if isinstance(value, dict) and value:
+            fields.update(_flatten_event(value, f"{field}."))
+        else:
+            fields[field] = value
+    return fields
+
+
+def _has_wildcard(mapping: dict) -> bool:
+    """Returns True if a field mapping is, or has a subfield, of type wildcard."""
+    if mapping.get("type") == "wildcard":
+        return True
+    subfields = mapping.get("fields", {})
+    if not isinstance(subfields, dict):
+        return False
+    return any(
+        isinstance(subfield, dict) and subfield.get("type") == "wildcard"
+        for subfield in subfields.values()
+    )
+
+
+class FieldCatalog:
+    """Collects field statistics for a single timeline."""
+
+    def __init__(self, max_distinct_values: int = DEFAULT_MAX_DISTINCT_VALUES):
+        """Initialize the catalog.
+
+        Args:
+            max_distinct_values: Number of distinct values to track per field
+                before the cardinality is considered capped.
+        """
+        self._max_distinct_values = max_distinct_values
+        self._fields = {}
+
+    def __contains__(self, field: str) -> bool:
+        return field in self._fields
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def _get_entry(self, field: str) -> dict:
+        """Returns the entry for a field, creating it if needed."""
+        entry = self._fields.get(field)
+        if entry is None:
+            entry = {
+                "data_types": set(),
+                "type": "",
+                "values": set(),
+                "cardinality": 0,
+                "cardinality_capped": False,
+                "wildcard": False,
+            }
+            self._fields[field] = entry
+        return entry
+
+    def add_field(self, field: str):
+        """Adds a field to the catalog without any observed values.
+
+        Args:
+            field: Name of the field.
+        """
+        self._get_entry(field)
+
+    def add_event(self, event: dict):
+        """Adds the fields of a single event to the catalog.
+
+        Object fields are added with the dotted names of their subfields.
+
+        Args:
+            event: Dictionary with the event as it is sent to the datastore.
+        """
+        data_type = event.get("data_type")
+        if not isinstance(data_type, str):
+            data_type = ""
+
+        for field, value in _flatten_event(event).items():
+            entry = self._get_entry(field)
+            if data_type:
+                entry["data_types"].add(data_type)
+            if value is None:
+                continue
+
+            if not entry["type"]:
+                if isinstance(value, (list, tuple)):
+                    if value:
+                        entry["type"] = _observed_type(value[0])
+                else:
+                    entry["type"] = _observed_type(value)
+
+            if entry["cardinality_capped"]:
+                continue
+            try:
+                entry["values"].add(hash(value))
+            except TypeError:
+                entry["values"].add(hash(str(value)))
+            if len(entry["values"]) > self._max_distinct_values:
+                entry["cardinality_capped"] = True
+                entry["cardinality"] = self._max_distinct_values
+                entry["values"] = set()
+            else:
+                entry["cardinality"] = len(entry["values"])
+
+    def add_events(self, events: Iterable[dict]):
+        """Adds the fields of multiple events to the catalog.
+
+        Args:
+            events: Iterable of event dictionaries.
+        """
+        for event in events:
+            self.add_event(event)
+
+    def merge_mapping(self, properties: dict):
+        """Updates field types from the datastore mapping of the index.
+
+        The mapping is authoritative for the type of a field, the types
+        observed in the events are only kept for fields that are not mapped.
+        Fields in the mapping that are not part of this timeline are ignored,
+        since an index can be shared by multiple timelines.
+
+        Args:
+            properties: The "properties" dictionary of an index mapping,
+                either as returned by the datastore or already flattened.
+        """
+        if not isinstance(properties, dict):
+            return
+        properties = _flatten_properties(properties)
+        for field, entry in self._fields.items():
+            mapping = properties.get(field)
+            if not isinstance(mapping, dict):
+                continue
+            if mapping.get("type"):
+                entry["type"] = mapping["type"]
+            entry["wildcard"] = _has_wildcard(mapping)
+
+    def set_cardinality(self, field: str, cardinality: int, capped: bool = False):
+        """Sets the cardinality of a field, e.g. from a datastore aggregation.
+
+        Args:
+            field: Name of the field.
+            cardinality: Approximate number of distinct values.
+            capped: Whether the value is a lower bound.
+        """
+        if field not in self._fields:
+            return
+        entry = self._fields[field]
+        entry["values"] = set()
+        entry["cardinality"] = int(cardinality)
+        entry["cardinality_capped"] = capped
+
+    def merge(self, other: "FieldCatalog"):
+        """Merges another catalog of the same timeline into this one.
+
+        Distinct values are not kept in serialized catalogs, so the merged
+        cardinality is the largest of the two, which is a lower bound.
+
+        Args:
+            other: The FieldCatalog to merge.
+        """
+        # pylint: disable=protected-access
+        for field, other_entry in other._fields.items():
+            entry = self._get_entry(field)
+            entry["data_types"].update(other_entry["data_types"])
+            if not entry["type"]:
+                entry["type"] = other_entry["type"]
+            entry["wildcard"] = entry["wildcard"] or other_entry["wildcard"]
+            if entry["values"] and other_entry["values"]:
+                entry["values"].update(other_entry["values"])
+                entry["cardinality"] = len(entry["values"])
+            else:
+                entry["values"] = set()
+                entry["cardinality"] = max(
+                    entry["cardinality"], other_entry["cardinality"]
+                )
+            entry["cardinality_capped"] = (
+                entry["cardinality_capped"] or other_entry["cardinality_capped"]
+            )
+
+    @property
+    def fields(self) -> list:
+        """Returns a sorted list of all field names in the catalog."""
+        return sorted(self._fields)
+
+    @property
+    def wildcard_fields(self) -> set:
+        """Returns the set of fields that support wildcard searches."""
+        return {field for field, entry in self._fields.items() if entry["wildcard"]}
+
+    def to_dict(self) -> dict:
+        """Returns a JSON serializable representation of the catalog."""
+        fields = {}
+        for field in sorted(self._fields):
+            entry = self._fields[field]
+            fields[field] = {
+                "data_types": sorted(entry["data_types"]),
+                "type": entry["type"] or "n/a",
+                "cardinality": entry["cardinality"],
+                "cardinality_capped": entry["cardinality_capped"],
+                "wildcard": entry["wildcard"],
+            }
+        return {"version": CATALOG_VERSION, "fields": fields}
+
+    @classmethod
+    def from_dict(cls, catalog_dict: Optional[dict]) -> "FieldCatalog":
+        """Creates a catalog from the output of to_dict.
+
+        Args:
+            catalog_dict: Dictionary as returned by to_dict.
+
+        Returns:
+            A FieldCatalog instance, empty if the dictionary is not valid.
+        """
+        catalog = cls()
+        if not isinstance(catalog_dict, dict):
+            return catalog
+        if catalog_dict.get("version") != CATALOG_VERSION:
+            return catalog
+
+        for field, values in catalog_dict.get("fields", {}).items():
+            entry = catalog._get_entry(field)  # pylint: disable=protected-access
+            entry["data_types"] = set(values.get("data_types", []))
+            field_type = values.get("type", "")
+            entry["type"] = "" if field_type == "n/a" else field_type
+            entry["cardinality"] = values.get("cardinality", 0)
+            entry["cardinality_capped"] = values.get("cardinality_capped", False)
+            entry["wildcard"] = values.get("wildcard", False)
+        return catalog
+
+
+def _aggregatable_field(field: str, mapping: dict) -> Optional[str]:
+    """Returns the name to aggregate a field on, or None if not possible."""
+    field_type = mapping.get("type")
+    if field_type in ("text", None):
+        if "keyword" in mapping.get("fields", {}):
+            return f"{field}.keyword"
+        return None
+    if field_type in ("object", "nested", "wildcard"):
+        return None
+    return field
+
+
+def _flatten_properties(properties: dict, prefix: str = "") -> dict:
+    """Returns the mapped fields of an index with their full dotted names.
+
+    Args:
+        properties (dict): The "properties" dictionary of an index mapping.
+        prefix (str): Name of the object field the properties belong to.
+
+    Returns:
+        A dictionary with field names and their mapping.
+    """
+    fields = {}
+    if not isinstance(properties, dict):
+        return fields
+    for name, mapping in properties.items():
+        if not isinstance(mapping, dict):
+            continue
+        field = f"{prefix}{name}"
+        if isinstance(mapping.get("properties"), dict):
+            fields.update(_flatten_properties(mapping["properties"], f"{field}."))
+        else:
+            fields[field] = mapping
+    return fields
+
+
+def build_from_datastore(
+    datastore,
+    index_name: str,
+    timeline_id: int,
+    samples_per_data_type: int = DEFAULT_SAMPLES_PER_DATA_TYPE,
+) -> FieldCatalog:
+    """Builds a catalog for a timeline that was indexed by an external tool.
+
+    Used for Plaso files, where events are written to the datastore by psort
+    and never pass through Timesketch. The fields are taken from the index
+    mapping, since sample events miss fields that only some events of a data
+    type carry. A single aggregation fetches sample events for every data
+    type, which are only used to attribute fields to data types, and a
+    second one checks which mapped fields exist in the timeline along with
+    their cardinality. The index can be shared by multiple timelines, so
+    mapped fields without any event in this timeline are left out.
+
+    Args:
+        datastore (OpenSearchDataStore): Datastore the timeline is stored in.
+        index_name (str): Name of the index the timeline is stored in.
+        timeline_id (int): ID of the timeline.
+        samples_per_data_type (int): Number of events to sample per data type.
+
+    Returns:
+        A FieldCatalog instance.
+    """
+    catalog = FieldCatalog()
+    properties = (
+        mapping_cache.get_cache()
+        .get_properties(datastore.client, [index_name])
+        .get(index_name, {})
+    )
+    mapped_fields = _flatten_properties(properties)
+    timeline_filter = {"term": {"__ts_timeline_id": timeline_id}}
+
+    data_type_field = _aggregatable_field(
+        "data_type", mapped_fields.get("data_type", {"type": "keyword"})
+    )
+    sample_query = {
+        "size": 0,
+        "query": timeline_filter,
+        "aggs": {
+            "data_types": {
+                "terms": {"field": data_type_field, "size": MAX_DATA_TYPES},
+                "aggs": {"samples": {"top_hits": {"size": samples_per_data_type}}},
+            }
+        },
+    }
+    # pylint: disable=unexpected-keyword-arg
+    result = datastore.client.search(index=index_name, body=sample_query)
+    buckets = result.get("aggregations", {}).get("data_types", {}).get("buckets", [])
+    for bucket in buckets:
+        for hit in bucket.get("samples", {}).get("hits", {}).get("hits", []):
+            catalog.add_event(hit.get("_source", {}))
+
+    field_aggs = {}
+    field_names = {}
+    for number, field in enumerate(sorted(mapped_fields)):
+        agg_name = f"field_{number}"
+        field_names[agg_name] = field
+        field_aggs[agg_name] = {"filter": {"exists": {"field": field}}}
+        agg_field = _aggregatable_field(field, mapped_fields[field])
+        if agg_field:
+            field_aggs[agg_name]["aggs"] = {
+                "cardinality": {"cardinality": {"field": agg_field}}
+            }
+
+    if field_aggs:
+        field_query = {
+            "size": 0,
+            "query": timeline_filter,
+            "aggs": field_aggs,
+        }
+        # pylint: disable=unexpected-keyword-arg
+        result = datastore.client.search(index=index_name, body=field_query)
+        for agg_name, agg_result in result.get("aggregations", {}).items():
+            field = field_names.get(agg_name)
+            if not field or not agg_result.get("doc_count", 0):
+                continue
+            catalog.add_field(field)
+            if "cardinality" in agg_result:
+                catalog.set_cardinality(
+                    field, agg_result["cardinality"].get("value", 0)
+                )
+
+    catalog.merge_mapping(mapped_fields)
+    return catalog
+
+
+def get_wildcard_fields(timelines: Iterable) -> Optional[set]:
+    """Returns the wildcard capable fields of timelines from their catalogs.
+
+    Args:
+        timelines: Iterable of Timeline objects.
+
+    Returns:
+        A set of field names, or None if any of the timelines lacks a catalog
+        and the index mappings need to be consulted instead.
+    """
+    wildcard_fields = set()
+    for timeline in timelines:
+        catalog_dict = timeline.get_field_catalog()
+        if not catalog_dict:
+            return None
+        wildcard_fields.update(FieldCatalog.from_dict(catalog_dict).wildcard_fields)
+    return wildcard_fields
+
+
+def add_fields(client, timelines: Iterable, fields: Iterable[str]) -> list:
+    """Adds fields that were written to already indexed events to catalogs.
+
+    Called after analyzers or API calls add attributes, tags or labels to
+    events, so that the catalogs do not miss fields added after ingest.
+    Object fields are added with the dotted names of their mapped subfields.
+    If the mapping can't be read the catalog is removed, so that readers fall
+    back to the index mappings rather than serve a stale catalog.
+
+    Args:
+        client (OpenSearch): Client used to read the index mappings.
+        timelines (Iterable): Timeline objects the events belong to.
+        fields (Iterable[str]): Names of the fields that were written.
+
+    Returns:
+        A list of the timelines that were changed, which the caller needs to
+        add to the database session and commit.
+    """
+    fields = set(fields)
+    changed = []
+    if not fields:
+        return changed
+
+    for timeline in timelines:
+        catalog_dict = timeline.get_field_catalog()
+        if not catalog_dict:
+            continue
+        index_name = timeline.searchindex.index_name
+        # The mapping of the index changed if the fields are new.
+        mapping_cache.invalidate([index_name])
+        try:
+            properties = (
+                mapping_cache.get_cache()
+                .get_properties(client, [index_name])
+                .get(index_name, {})
+            )
+        except OpenSearchException as e:
+            logger.warning(
+                "Unable to get the mapping of index %s, removing the field "
+                "catalog of timeline %d: %s",
+                index_name,
+                timeline.id,
+                e,
+            )
+            timeline.set_field_catalog(None)
+            changed.append(timeline)
+            continue
+
+        mapped_fields = _flatten_properties(properties)
+        catalog = FieldCatalog.from_dict(catalog_dict)
+        for field in fields:
+            subfields = [
+                name
+                for name in mapped_fields
+                if name == field or name.startswith(f"{field}.")
+            ]
+            for name in subfields or [field]:
+                catalog.add_field(name)
+        catalog.merge_mapping(mapped_fields)
+        timeline.set_field_catalog(catalog.to_dict())
+        changed.append(timeline)
+    return changed
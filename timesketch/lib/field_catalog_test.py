@@ -0,0 +1,227 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the field catalog library."""
+
+from unittest import mock
+
+from opensearchpy.exceptions import NotFoundError
+
+from timesketch.lib import field_catalog
+from timesketch.lib.datastores import mapping_cache
+from timesketch.lib.testlib import BaseTest
+
+MAPPING_PROPERTIES = {
+    "message": {
+        "type": "text",
+        "fields": {
+            "keyword": {"type": "keyword", "ignore_above": 256},
+            "wildcard": {"type": "wildcard"},
+        },
+    },
+    "data_type": {
+        "type": "text",
+        "fields": {"keyword": {"type": "keyword", "ignore_above": 256}},
+    },
+    "pid": {"type": "long"},
+    "other_timeline_field": {"type": "keyword"},
+}
+
+DATASTORE_PROPERTIES = dict(
+    MAPPING_PROPERTIES,
+    evtx={"properties": {"TargetLogonId": {"type": "keyword"}}},
+)
+
+
+class TestFieldCatalog(BaseTest):
+    """Tests for the FieldCatalog class."""
+
+    def test_add_event(self):
+        """Test that fields, data types and cardinality are collected."""
+        catalog = field_catalog.FieldCatalog(max_distinct_values=3)
+        for pid in range(5):
+            catalog.add_event({"data_type": "process", "pid": pid, "user": "root"})
+        catalog.add_event({"data_type": "file", "path": "/tmp", "user": None})
+
+        catalog_dict = catalog.to_dict()["fields"]
+        self.assertEqual(catalog.fields, ["data_type", "path", "pid", "user"])
+        self.assertEqual(catalog_dict["user"]["data_types"], ["file", "process"])
+        self.assertEqual(catalog_dict["pid"]["type"], "long")
+        self.assertEqual(catalog_dict["pid"]["cardinality"], 3)
+        self.assertTrue(catalog_dict["pid"]["cardinality_capped"])
+        self.assertEqual(catalog_dict["user"]["cardinality"], 1)
+        self.assertFalse(catalog_dict["user"]["cardinality_capped"])
+
+    def test_merge_mapping(self):
+        """Test that the mapping sets types and wildcard support."""
+        catalog = field_catalog.FieldCatalog()
+        catalog.add_event({"data_type": "process", "message": "foo", "pid": "1"})
+        catalog.merge_mapping(MAPPING_PROPERTIES)
+
+        catalog_dict = catalog.to_dict()["fields"]
+        self.assertEqual(catalog_dict["pid"]["type"], "long")
+        self.assertEqual(catalog.wildcard_fields, {"message"})
+        self.assertNotIn("other_timeline_field", catalog)
+
+    def test_object_fields(self):
+        """Test that events and mappings use the same names for object fields."""
+        catalog = field_catalog.FieldCatalog()
+        catalog.add_event({"data_type": "process", "evtx": {"TargetLogonId": "0x1"}})
+        catalog.merge_mapping(DATASTORE_PROPERTIES)
+
+        self.assertEqual(catalog.fields, ["data_type", "evtx.TargetLogonId"])
+        catalog_dict = catalog.to_dict()["fields"]
+        self.assertEqual(catalog_dict["evtx.TargetLogonId"]["type"], "keyword")
+        self.assertEqual(catalog_dict["evtx.TargetLogonId"]["data_types"], ["process"])
+
+    def test_serialization_and_merge(self):
+        """Test that catalogs survive a round trip and can be merged."""
+        first = field_catalog.FieldCatalog()
+        first.add_event({"data_type": "process", "pid": 1})
+        second = field_catalog.FieldCatalog()
+        second.add_event({"data_type": "file", "pid": 2, "path": "/tmp"})
+        second.add_event({"data_type": "file", "pid": 3, "path": "/tmp"})
+
+        catalog = field_catalog.FieldCatalog.from_dict(first.to_dict())
+        catalog.merge(second)
+        catalog_dict = catalog.to_dict()["fields"]
+        self.assertEqual(catalog_dict["pid"]["data_types"], ["file", "process"])
+        self.assertEqual(catalog_dict["pid"]["cardinality"], 2)
+        self.assertEqual(catalog_dict["path"]["cardinality"], 1)
+
+        self.assertEqual(len(field_catalog.FieldCatalog.from_dict({"foo": 1})), 0)
+
+    def test_build_from_datastore(self):
+        """Test that mapped fields are cataloged with a fixed number of requests."""
+        mapping_cache.invalidate()
+        datastore = mock.Mock()
+        datastore.client.indices.get_mapping.return_value = {
+            "index": {"mappings": {"properties": DATASTORE_PROPERTIES}}
+        }
+        datastore.client.search.side_effect = [
+            {
+                "aggregations": {
+                    "data_types": {
+                        "buckets": [
+                            {
+                                "key": "process",
+                                "samples": {
+                                    "hits": {
+                                        "hits": [
+                                            {
+                                                "_source": {
+                                                    "data_type": "process",
+                                                    "message": "foo",
+                                                }
+                                            }
+                                        ]
+                                    }
+                                },
+                            }
+                        ]
+                    }
+                }
+            },
+            {
+                "aggregations": {
+                    "field_0": {"doc_count": 5, "cardinality": {"value": 12}},
+                    "field_1": {"doc_count": 2, "cardinality": {"value": 3}},
+                    "field_2": {"doc_count": 5, "cardinality": {"value": 345}},
+                    "field_3": {"doc_count": 0, "cardinality": {"value": 0}},
+                    "field_4": {"doc_count": 4, "cardinality": {"value": 67}},
+                }
+            },
+        ]
+
+        catalog = field_catalog.build_from_datastore(datastore, "index", 1)
+        mapping_cache.invalidate()
+
+        self.assertEqual(datastore.client.search.call_count, 2)
+        sample_query = datastore.client.search.call_args_list[0][1]["body"]
+        self.assertEqual(
+            sample_query["aggs"]["data_types"]["terms"]["field"], "data_type.keyword"
+        )
+        field_query = datastore.client.search.call_args_list[1][1]["body"]
+        self.assertEqual(
+            field_query["aggs"]["field_1"]["filter"],
+            {"exists": {"field": "evtx.TargetLogonId"}},
+        )
+
+        # Fields missing from the samples are taken from the mapping, mapped
+        # fields of other timelines in the index are left out.
+        self.assertEqual(
+            catalog.fields, ["data_type", "evtx.TargetLogonId", "message", "pid"]
+        )
+        catalog_dict = catalog.to_dict()["fields"]
+        self.assertEqual(catalog_dict["message"]["data_types"], ["process"])
+        self.assertEqual(catalog_dict["message"]["cardinality"], 345)
+        self.assertEqual(catalog_dict["pid"]["data_types"], [])
+        self.assertEqual(catalog_dict["pid"]["type"], "long")
+        self.assertEqual(catalog_dict["pid"]["cardinality"], 67)
+        self.assertEqual(catalog_dict["evtx.TargetLogonId"]["type"], "keyword")
+        self.assertEqual(catalog.wildcard_fields, {"message"})
+
+    def test_add_fields(self):
+        """Test that fields added after ingest are added to the catalogs."""
+        mapping_cache.invalidate()
+        catalog = field_catalog.FieldCatalog()
+        catalog.add_event({"data_type": "process", "message": "foo"})
+        self.timeline.set_field_catalog(catalog.to_dict())
+        timeline_without_catalog = self._create_timeline(
+            "Timeline without catalog", self.sketch1, self.searchindex, self.user1
+        )
+        client = mock.Mock()
+        client.indices.get_mapping.return_value = {
+            "test": {"mappings": {"properties": DATASTORE_PROPERTIES}}
+        }
+
+        changed = field_catalog.add_fields(
+            client,
+            [self.timeline, timeline_without_catalog],
+            ["evtx", "pid", "unmapped"],
+        )
+        mapping_cache.invalidate()
+
+        self.assertEqual(changed, [self.timeline])
+        self.assertIsNone(timeline_without_catalog.get_field_catalog())
+        catalog = field_catalog.FieldCatalog.from_dict(
+            self.timeline.get_field_catalog()
+        )
+        self.assertEqual(
+            catalog.fields,
+            ["data_type", "evtx.TargetLogonId", "message", "pid", "unmapped"],
+        )
+        catalog_dict = catalog.to_dict()["fields"]
+        self.assertEqual(catalog_dict["pid"]["type"], "long")
+        self.assertEqual(catalog_dict["unmapped"]["type"], "n/a")
+
+    def test_add_fields_without_mapping(self):
+        """Test that a catalog is removed if the mapping can't be read."""
+        mapping_cache.invalidate()
+        catalog = field_catalog.FieldCatalog()
+        catalog.add_event({"data_type": "process", "message": "foo"})
+        self.timeline.set_field_catalog(catalog.to_dict())
+        client = mock.Mock()
+        client.indices.get_mapping.side_effect = NotFoundError(404, "missing")
+
+        changed = field_catalog.add_fields(client, [self.timeline], ["pid"])
+        mapping_cache.invalidate()
+
+        self.assertEqual(changed, [self.timeline])
+        self.assertIsNone(self.timeline.get_field_catalog())
+
+    def test_add_fields_no_fields(self):
+        """Test that catalogs are left alone if no fields were written."""
+        client = mock.Mock()
+        self.assertEqual(field_catalog.add_fields(client, [self.timeline], []), [])
+        client.indices.get_mapping.assert_not_called()
@@ -228,6 +228,9 @@ class AggregationExploreForm(BaseForm):
     include_processing_timelines = BooleanField(
         "Include processing timelines", validators=[Optional()], default=False
     )
+    run_async = BooleanField(
+        "Run as a background job", validators=[Optional()], default=False
+    )
 
 
 class AggregationLegacyForm(ExploreForm):
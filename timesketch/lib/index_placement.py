@@ -0,0 +1,313 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Placement of small timelines in shared indices.
+
+Every OpenSearch index carries a fixed overhead in shards, heap and cluster
+state, which adds up for deployments with many small triage timelines. When
+enabled, small Plaso uploads are placed in a shared index instead of an
+index of their own. Only Plaso files are placed, their events use the Plaso
+index mapping and a known set of attributes. CSV and JSONL files have headers
+of their own, which would add up in the mapping of a shared index, so they
+always get an index of their own. Shared indices are rolled over to a new
+index once they reach a size, document or field count bound.
+
+All events carry the __ts_timeline_id field. Searches and aggregations that
+only name indices are limited to the timelines of the sketch once one of the
+indices is shared, see get_timeline_ids, so a timeline in a shared index is
+used like any other timeline. Shared indices are never closed or deleted as
+a whole, the events of a timeline are deleted from them instead.
+"""
+
+import logging
+import re
+from typing import Iterable, Optional
+
+from flask import current_app
+from opensearchpy.exceptions import NotFoundError
+
+from timesketch.lib import field_catalog
+from timesketch.lib.datastores import mapping_cache
+from timesketch.models.sketch import SearchIndex
+from timesketch.models.sketch import Timeline
+
+logger = logging.getLogger("timesketch.index_placement")
+
+SHARED_INDEX_PREFIX = "timesketch_shared_"
+
+_SHARED_INDEX_RE = re.compile(
+    r"{0:s}([a-z0-9]+(?:_[a-z0-9]+)*)_(\d{{6}})$".format(SHARED_INDEX_PREFIX)
+)
+
+SOURCE_TYPE_PLASO = "plaso"
+
+# Types of source data that are placed in shared indices.
+SHARED_SOURCE_TYPES = frozenset([SOURCE_TYPE_PLASO])
+
+# Files up to this size (in bytes) are placed in a shared index.
+DEFAULT_MAX_FILE_SIZE = 50 * 1024 * 1024
+
+# Bounds of a shared index, a new index is started once one is reached.
+DEFAULT_MAX_DOCS = 20000000
+DEFAULT_MAX_SIZE = 20 * 1024 * 1024 * 1024
+
+# Number of mapped fields, including multi-fields, a Plaso timeline is
+# expected to add to an index, used until a timeline in the index has a
+# field catalog.
+DEFAULT_FIELDS_PER_TIMELINE = 400
+
+# Default of the index.mapping.total_fields.limit index setting.
+DEFAULT_TOTAL_FIELDS_LIMIT = 1000
+
+# Shared indices are bounded in size, a single primary shard keeps all events
+# of a timeline together and searches on a shared index on one shard.
+SHARED_INDEX_SETTINGS = {"index.number_of_shards": 1}
+
+
+def is_shared_index(index_name: str) -> bool:
+    """Returns True if an index name is the name of a shared index."""
+    return bool(index_name) and bool(_SHARED_INDEX_RE.match(index_name))
+
+
+def get_source_type(extension: str) -> Optional[str]:
+    """Returns the type of source data, or None if it is never shared."""
+    if extension in SHARED_SOURCE_TYPES:
+        return extension
+    return None
+
+
+def shared_index_name(source_type: str, sequence: int) -> str:
+    """Returns the name of a shared index.
+
+    Args:
+        source_type: Type of the source data, as returned by get_source_type.
+        sequence: Sequence number of the index.
+
+    Returns:
+        The name of the shared index.
+    """
+    return f"{SHARED_INDEX_PREFIX}{source_type}_{sequence:06d}"
+
+
+def get_timeline_ids(timelines: Iterable, index_names: Iterable[str]) -> list:
+    """Returns the timeline IDs to limit a search on indices to.
+
+    A shared index holds the events of timelines of other sketches, so a
+    search that names a shared index must be filtered on the timelines of
+    the sketch in it. Timelines in the other indices are included as well,
+    since the timeline filter applies to all indices of a search.
+
+    Args:
+        timelines (Iterable): Timeline objects of the sketch.
+        index_names (Iterable[str]): Names of the indices to search.
+
+    Returns:
+        A sorted list of timeline IDs, empty if none of the indices is shared
+        and the search does not need a timeline filter.
+    """
+    index_names = set(index_names)
+    if not any(is_shared_index(index_name) for index_name in index_names):
+        return []
+    return sorted(
+        {
+            timeline.id
+            for timeline in timelines
+            if timeline.searchindex.index_name in index_names
+        }
+    )
+
+
+def get_index_settings(index_name: str) -> Optional[dict]:
+    """Returns the settings to create an index with, or None for defaults."""
+    if is_shared_index(index_name):
+        return dict(SHARED_INDEX_SETTINGS)
+    return None
+
+
+def is_enabled() -> bool:
+    """Returns True if small timelines are placed in shared indices."""
+    return bool(current_app.config.get("SHARED_INDEX_PLACEMENT", False))
+
+
+def is_small_upload(extension: str, file_size: int) -> bool:
+    """Returns True if an upload is placed in a shared index.
+
+    Args:
+        extension (str): File extension of the upload, e.g. "plaso".
+        file_size (int): Size of the uploaded file in bytes, 0 if unknown.
+
+    Returns:
+        True if shared indices are enabled and the file is a small file of
+        a source type that is shared.
+    """
+    if not is_enabled() or not get_source_type(extension):
+        return False
+    max_file_size = int(
+        current_app.config.get("SHARED_INDEX_MAX_FILE_SIZE", DEFAULT_MAX_FILE_SIZE)
+    )
+    return 0 < file_size <= max_file_size
+
+
+def _get_latest_sequence(source_type: str) -> int:
+    """Returns the sequence number of the latest shared index, or 0."""
+    index_names = (
+        SearchIndex.query.with_entities(SearchIndex.index_name)
+        .filter(SearchIndex.index_name.startswith(SHARED_INDEX_PREFIX))
+        .distinct()
+        .all()
+    )
+    latest = 0
+    for (index_name,) in index_names:
+        match = _SHARED_INDEX_RE.match(index_name or "")
+        if match and match.group(1) == source_type:
+            latest = max(latest, int(match.group(2)))
+    return latest
+
+
+def count_mapped_fields(properties: dict) -> int:
+    """Returns the number of fields in the properties of an index mapping.
+
+    Fields are counted the way the index.mapping.total_fields.limit setting
+    counts them: object fields, their sub-fields and multi-fields, e.g.
+    "message.keyword", each count as a field.
+
+    Args:
+        properties (dict): The "properties" dictionary of an index mapping.
+
+    Returns:
+        The number of mapped fields.
+    """
+    count = 0
+    for mapping in properties.values():
+        count += 1
+        if not isinstance(mapping, dict):
+            continue
+        for key in ("properties", "fields"):
+            if isinstance(mapping.get(key), dict):
+                count += count_mapped_fields(mapping[key])
+    return count
+
+
+def _get_total_fields_limit(datastore, index_name: str) -> int:
+    """Returns the total_fields.limit setting of an index."""
+    settings = datastore.client.indices.get_settings(
+        index=index_name, name="index.mapping.total_fields.limit"
+    )
+    try:
+        return int(
+            settings[index_name]["settings"]["index"]["mapping"]["total_fields"][
+                "limit"
+            ]
+        )
+    except (KeyError, TypeError, ValueError):
+        return DEFAULT_TOTAL_FIELDS_LIMIT
+
+
+def _get_fields_per_timeline(index_name: str, properties: dict) -> int:
+    """Returns the largest number of mapped fields a timeline in an index uses.
+
+    Args:
+        index_name (str): Name of the shared index.
+        properties (dict): The "properties" dictionary of its mapping.
+
+    Returns:
+        The number of mapped fields, including multi-fields, of the fields in
+        the largest field catalog of the timelines in the index, or
+        DEFAULT_FIELDS_PER_TIMELINE if none of them has a catalog.
+    """
+    timelines = Timeline.query.join(SearchIndex).filter(
+        SearchIndex.index_name == index_name
+    )
+    largest = 0
+    for timeline in timelines:
+        catalog = field_catalog.FieldCatalog.from_dict(timeline.get_field_catalog())
+        count = 0
+        for field in catalog.fields:
+            mapping = mapping_cache.find_field_mapping(properties, field)
+            if not mapping:
+                continue
+            count += 1 + len(mapping.get("fields") or {})
+        largest = max(largest, count)
+    return largest or DEFAULT_FIELDS_PER_TIMELINE
+
+
+def is_full(datastore, index_name: str) -> bool:
+    """Returns True if a shared index reached one of its bounds.
+
+    Args:
+        datastore (OpenSearchDataStore): The datastore.
+        index_name (str): Name of the shared index.
+
+    Returns:
+        True if the index should not receive more timelines. An index that
+        does not exist yet, e.g. while its first upload is queued, is not
+        full.
+
+    Raises:
+        TransportError: If the index statistics can not be retrieved.
+    """
+    try:
+        stats = datastore.client.indices.stats(index=index_name, metric="docs,store")
+    except NotFoundError:
+        return False
+
+    totals = stats.get("indices", {}).get(index_name, {}).get("primaries", {})
+    doc_count = totals.get("docs", {}).get("count", 0)
+    size = totals.get("store", {}).get("size_in_bytes", 0)
+    max_docs = int(current_app.config.get("SHARED_INDEX_MAX_DOCS", DEFAULT_MAX_DOCS))
+    max_size = int(current_app.config.get("SHARED_INDEX_MAX_SIZE", DEFAULT_MAX_SIZE))
+    if doc_count >= max_docs or size >= max_size:
+        return True
+
+    # Plaso timelines mostly share their fields, but the next timeline must
+    # still fit if all of its fields are new to the index.
+    max_fields = _get_total_fields_limit(datastore, index_name)
+    configured_max_fields = current_app.config.get("SHARED_INDEX_MAX_FIELDS")
+    if configured_max_fields:
+        max_fields = min(max_fields, int(configured_max_fields))
+    properties = (
+        mapping_cache.get_cache()
+        .get_properties(datastore.client, [index_name])
+        .get(index_name, {})
+    )
+    fields_per_timeline = _get_fields_per_timeline(index_name, properties)
+    return count_mapped_fields(properties) + fields_per_timeline > max_fields
+
+
+def get_shared_index_name(datastore, source_type: str) -> Optional[str]:
+    """Returns the name of the shared index to place a timeline in.
+
+    Args:
+        datastore (OpenSearchDataStore): The datastore.
+        source_type (str): Type of the source data, as returned by
+            get_source_type.
+
+    Returns:
+        The name of the latest shared index of the source type, or of a new
+        one if it is full. None if the shared index can not be determined, in
+        which case the timeline should get an index of its own.
+    """
+    sequence = _get_latest_sequence(source_type)
+    if not sequence:
+        return shared_index_name(source_type, 1)
+
+    index_name = shared_index_name(source_type, sequence)
+    try:
+        if not is_full(datastore, index_name):
+            return index_name
+    except Exception as e:  # pylint: disable=broad-except
+        logger.warning("Unable to get the size of index [%s]: %s", index_name, e)
+        return None
+
+    logger.info("Shared index [%s] is full, rolling over.", index_name)
+    return shared_index_name(source_type, sequence + 1)
@@ -0,0 +1,217 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the placement of timelines in shared indices."""
+
+from unittest import mock
+
+from opensearchpy.exceptions import NotFoundError
+
+from timesketch.lib import field_catalog
+from timesketch.lib import index_placement
+from timesketch.lib.testlib import BaseTest
+
+
+class TestIndexPlacement(BaseTest):
+    """Tests for the placement of timelines in shared indices."""
+
+    def _get_datastore(self, doc_count=0, size=0, fields=1, total_limit=1000):
+        """Returns a mock datastore with the given index statistics."""
+        datastore = mock.Mock()
+        datastore.client.indices.stats.side_effect = lambda index, metric: {
+            "indices": {
+                index: {
+                    "primaries": {
+                        "docs": {"count": doc_count},
+                        "store": {"size_in_bytes": size},
+                    }
+                }
+            }
+        }
+        datastore.client.cluster.state.side_effect = Exception("no state")
+        datastore.client.indices.get_settings.side_effect = lambda index, name: {
+            index: {
+                "settings": {
+                    "index": {"mapping": {"total_fields": {"limit": total_limit}}}
+                }
+            }
+        }
+        datastore.client.indices.get_mapping.side_effect = lambda index: {
+            name: {
+                "mappings": {
+                    "properties": {
+                        f"field_{i}": {"type": "text"} for i in range(fields)
+                    }
+                }
+            }
+            for name in index
+        }
+        return datastore
+
+    def test_is_shared_index(self):
+        """Test the detection of shared index names."""
+        self.assertTrue(
+            index_placement.is_shared_index("timesketch_shared_plaso_000001")
+        )
+        self.assertTrue(
+            index_placement.is_shared_index("timesketch_shared_csv_jsonl_000012")
+        )
+        self.assertFalse(
+            index_placement.is_shared_index("a89933473b2a48948beee2c7e870209f")
+        )
+        self.assertFalse(index_placement.is_shared_index("timesketch_shared_plaso_1"))
+        self.assertFalse(index_placement.is_shared_index(""))
+        self.assertIsNone(index_placement.get_index_settings("index"))
+        self.assertEqual(
+            index_placement.get_index_settings("timesketch_shared_plaso_000001"),
+            {"index.number_of_shards": 1},
+        )
+
+    def test_is_small_upload(self):
+        """Test that only small Plaso uploads are placed when enabled."""
+        self.assertFalse(index_placement.is_small_upload("plaso", 1024))
+        self.app.config["SHARED_INDEX_PLACEMENT"] = True
+        self.app.config["SHARED_INDEX_MAX_FILE_SIZE"] = 2048
+        self.assertTrue(index_placement.is_small_upload("plaso", 1024))
+        self.assertFalse(index_placement.is_small_upload("plaso", 4096))
+        self.assertFalse(index_placement.is_small_upload("plaso", 0))
+        self.assertFalse(index_placement.is_small_upload("csv", 1024))
+        self.assertFalse(index_placement.is_small_upload("jsonl", 1024))
+
+    def test_count_mapped_fields(self):
+        """Test that object and multi-fields are counted."""
+        properties = {
+            "message": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
+            "user": {
+                "properties": {
+                    "name": {"type": "keyword"},
+                    "domain": {"type": "keyword"},
+                }
+            },
+            "datetime": {"type": "date"},
+        }
+        self.assertEqual(index_placement.count_mapped_fields(properties), 6)
+        self.assertEqual(index_placement.count_mapped_fields({}), 0)
+
+    def test_get_shared_index_name(self):
+        """Test that shared indices are reused until they are full."""
+        datastore = self._get_datastore()
+        self.assertEqual(
+            index_placement.get_shared_index_name(datastore, "plaso"),
+            "timesketch_shared_plaso_000001",
+        )
+
+        self._create_searchindex("timesketch_shared_plaso_000002", self.user1)
+        self._create_searchindex("timesketch_shared_other_000005", self.user1)
+        self.assertEqual(
+            index_placement.get_shared_index_name(datastore, "plaso"),
+            "timesketch_shared_plaso_000002",
+        )
+
+        self.app.config["SHARED_INDEX_MAX_DOCS"] = 100
+        datastore = self._get_datastore(doc_count=100)
+        self.assertEqual(
+            index_placement.get_shared_index_name(datastore, "plaso"),
+            "timesketch_shared_plaso_000003",
+        )
+
+        self.app.config["SHARED_INDEX_MAX_DOCS"] = 1000
+        self.assertEqual(
+            index_placement.get_shared_index_name(datastore, "plaso"),
+            "timesketch_shared_plaso_000002",
+        )
+
+    def test_get_shared_index_name_fields(self):
+        """Test that an index is full once another timeline may not fit."""
+        searchindex = self._create_searchindex(
+            "timesketch_shared_plaso_000002", self.user1
+        )
+        # Without a field catalog, a timeline is expected to add
+        # DEFAULT_FIELDS_PER_TIMELINE fields.
+        fields = 1000 - index_placement.DEFAULT_FIELDS_PER_TIMELINE
+        datastore = self._get_datastore(fields=fields)
+        self.assertEqual(
+            index_placement.get_shared_index_name(datastore, "plaso"),
+            "timesketch_shared_plaso_000002",
+        )
+        datastore = self._get_datastore(fields=fields + 1)
+        self.assertEqual(
+            index_placement.get_shared_index_name(datastore, "plaso"),
+            "timesketch_shared_plaso_000003",
+        )
+
+        # The largest timeline in the index sizes the room that is needed.
+        sketch = self._create_sketch("sketch", self.user1)
+        timeline = self._create_timeline("timeline", sketch, searchindex, self.user1)
+        catalog = field_catalog.FieldCatalog()
+        catalog.add_event({f"field_{i}": "value" for i in range(5)})
+        timeline.set_field_catalog(catalog.to_dict())
+        self._commit_to_database(timeline)
+        datastore = self._get_datastore(fields=995)
+        self.assertEqual(
+            index_placement.get_shared_index_name(datastore, "plaso"),
+            "timesketch_shared_plaso_000002",
+        )
+        datastore = self._get_datastore(fields=996)
+        self.assertEqual(
+            index_placement.get_shared_index_name(datastore, "plaso"),
+            "timesketch_shared_plaso_000003",
+        )
+
+        # SHARED_INDEX_MAX_FIELDS lowers the field limit of the index.
+        self.app.config["SHARED_INDEX_MAX_FIELDS"] = 100
+        datastore = self._get_datastore(fields=96)
+        self.assertEqual(
+            index_placement.get_shared_index_name(datastore, "plaso"),
+            "timesketch_shared_plaso_000003",
+        )
+        datastore = self._get_datastore(fields=95, total_limit=100)
+        self.assertEqual(
+            index_placement.get_shared_index_name(datastore, "plaso"),
+            "timesketch_shared_plaso_000002",
+        )
+
+    def test_get_timeline_ids(self):
+        """Test that searches on shared indices are limited to timelines."""
+        shared_index = self._create_searchindex(
+            "timesketch_shared_plaso_000001", self.user1
+        )
+        own_index = self._create_searchindex("own_index", self.user1)
+        sketch = self._create_sketch("sketch", self.user1)
+        other_sketch = self._create_sketch("other sketch", self.user1)
+        shared = self._create_timeline("shared", sketch, shared_index, self.user1)
+        own = self._create_timeline("own", sketch, own_index, self.user1)
+        self._create_timeline("other", other_sketch, shared_index, self.user1)
+
+        self.assertEqual(
+            index_placement.get_timeline_ids(sketch.timelines, ["own_index"]), []
+        )
+        self.assertEqual(
+            index_placement.get_timeline_ids(
+                sketch.timelines, ["own_index", shared_index.index_name]
+            ),
+            sorted([shared.id, own.id]),
+        )
+
+    def test_get_shared_index_name_missing_index(self):
+        """Test that an index that is not created yet is not full."""
+        self._create_searchindex("timesketch_shared_plaso_000001", self.user1)
+        datastore = mock.Mock()
+        datastore.client.indices.stats.side_effect = NotFoundError(404, "missing")
+        self.assertEqual(
+            index_placement.get_shared_index_name(datastore, "plaso"),
+            "timesketch_shared_plaso_000001",
+        )
+
+        datastore.client.indices.stats.side_effect = Exception("unavailable")
+        self.assertIsNone(index_placement.get_shared_index_name(datastore, "plaso"))
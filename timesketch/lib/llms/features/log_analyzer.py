@@ -16,7 +16,7 @@
 import json
 import logging
 import uuid
-from typing import Any, Dict, Optional, Generator
+from typing import Any, Dict, List, Optional, Generator
 
 from timesketch.models import db_session
 from timesketch.models.sketch import (
@@ -56,6 +56,9 @@ class LogAnalyzer(LLMFeatureInterface):
     SUPPORTS_STREAMING_OUTPUT = True
     RESPONSE_SCHEMA: Optional[Dict[str, Any]] = None
 
+    # Maximum number of document IDs resolved to their index in one query.
+    RESOLVE_CHUNK_SIZE = 1000
+
     def __init__(self):
         """Initialize the LogAnalyzer feature."""
         super().__init__()
@@ -63,6 +66,8 @@ class LogAnalyzer(LLMFeatureInterface):
         self._events_exported = 0
         self._findings_received = 0
         self._log_pretext = f"LogAnalyzer [{uuid.uuid4().hex[:8]}]:"
+        self._index_name_map = {}
+        self._index_name_map_sketch_id = None
 
     @property
     def datastore(self) -> OpenSearchDataStore:
@@ -401,33 +406,49 @@ class LogAnalyzer(LLMFeatureInterface):
             if len(unique_searchindex_ids) == 1:
                 single_searchindex_id = unique_searchindex_ids.pop()
 
-        # Process each record and collect all events
+        # Look up the events of all records at once, and create the missing
+        # ones in the same commit instead of one round trip per record.
+        record_ids = list(dict.fromkeys(record_ids))
+        existing_events = {}
+        for event in Event.query.filter(
+            Event.sketch_id == sketch.id, Event.document_id.in_(record_ids)
+        ):
+            existing_events.setdefault(event.document_id, event)
+
+        unresolved_ids = [
+            record_id
+            for record_id in record_ids
+            if not getattr(existing_events.get(record_id), "searchindex_id", None)
+        ]
+        if single_searchindex_id:
+            searchindex_ids = dict.fromkeys(unresolved_ids, single_searchindex_id)
+        else:
+            searchindex_ids = self._get_search_indices(sketch, unresolved_ids)
+
         events_to_link = []
         for record_id in record_ids:
-            event = Event.get_or_create(sketch_id=sketch.id, document_id=record_id)
-
-            # If newly created, find the event's searchindex
-            if not event.searchindex_id:
-                if single_searchindex_id:
-                    event.searchindex_id = single_searchindex_id
-                else:
-                    try:
-                        searchindex_db_id = self._get_search_index(sketch, record_id)
-                        event.searchindex_id = searchindex_db_id
-                    except ValueError as exception:
-                        logger.error(
-                            "%s Could not find Event for ID %s: %s",
-                            self._log_pretext,
-                            record_id,
-                            exception,
-                        )
-                        self._errors_encountered.append(
-                            f"Failed to find searchindex for event {record_id}"
-                        )
-                        continue  # Skip this event but continue with others
+            event = existing_events.get(record_id)
+            if not event or not event.searchindex_id:
+                searchindex_db_id = searchindex_ids.get(record_id)
+                if not searchindex_db_id:
+                    logger.error(
+                        "%s Could not find Event for ID %s",
+                        self._log_pretext,
+                        record_id,
+                    )
+                    self._errors_encountered.append(
+                        f"Failed to find searchindex for event {record_id}"
+                    )
+                    continue  # Skip this event but continue with others
+                if not event:
+                    event = Event(sketch_id=sketch.id, document_id=record_id)
+                event.searchindex_id = searchindex_db_id
 
             events_to_link.append(event)
 
+        # New events are written together with the rest of the finding.
+        db_session.add_all(events_to_link)
+
         if not events_to_link:
             return {
                 "status": "error",
@@ -583,6 +604,27 @@ class LogAnalyzer(LLMFeatureInterface):
             "linked_event_ids": record_ids,
         }
 
+    def _get_index_name_map(self, sketch: Sketch) -> Dict[str, int]:
+        """Gets a mapping of OpenSearch index names to SearchIndex IDs.
+
+        The mapping is built once per sketch and reused for every finding
+        of the analysis session.
+
+        Args:
+            sketch: The Timesketch Sketch ORM object.
+
+        Returns:
+            Dict[str, int]: Index names mapped to the database primary key of
+                the SearchIndex, for all active timelines of the sketch.
+        """
+        if self._index_name_map_sketch_id != sketch.id:
+            self._index_name_map = {
+                timeline.searchindex.index_name: timeline.searchindex.id
+                for timeline in sketch.active_timelines
+            }
+            self._index_name_map_sketch_id = sketch.id
+        return self._index_name_map
+
     def _get_search_index_by_name(self, sketch: Sketch, index_name: str) -> int:
         """Gets the database ID of a SearchIndex by its OpenSearch index name.
 
@@ -596,67 +638,67 @@ class LogAnalyzer(LLMFeatureInterface):
         Raises:
             ValueError: If the index is not found in the sketch's timelines.
         """
-        for timeline in sketch.active_timelines:
-            if timeline.searchindex.index_name == index_name:
-                return timeline.searchindex.id
-
-        raise ValueError(
-            f'Index "{index_name}" not found in active timelines of '
-            f"sketch {sketch.id}"
-        )
+        searchindex_id = self._get_index_name_map(sketch).get(index_name)
+        if searchindex_id is None:
+            raise ValueError(
+                f'Index "{index_name}" not found in active timelines of '
+                f"sketch {sketch.id}"
+            )
+        return searchindex_id
 
-    def _get_search_index(self, sketch: Sketch, document_id: str) -> int:
+    def _get_search_indices(
+        self, sketch: Sketch, document_ids: List[str]
+    ) -> Dict[str, int]:
         """
-        Gets the database primary key (ID) of the Timesketch SearchIndex
-        ORM object to which the given OpenSearch document_id belongs,
-        within the context of the provided sketch's active timelines.
+        Gets the database primary keys (IDs) of the Timesketch SearchIndex
+        ORM objects that the given OpenSearch document IDs belong to, within
+        the context of the provided sketch's active timelines.
+
+        All documents are resolved with a single ids query across the indices
+        of the sketch, split in chunks for very large findings.
 
         Args:
             sketch: The Timesketch Sketch ORM object.
-            document_id: The OpenSearch document ID (_id) of the event.
+            document_ids: List of OpenSearch document IDs (_id) of the events.
 
         Returns:
-            int: The database primary key (e.g., searchindex.id) of the
-                 Timesketch SearchIndex ORM object.
-
-        Raises:
-            ValueError: If the event cannot be found in any of the sketch's
-                        active timelines' associated OpenSearch indices.
+            Dict[str, int]: Document IDs mapped to the database primary key of
+                the SearchIndex they were found in. Documents that could not
+                be located are not included.
         """
-        for timeline in sketch.active_timelines:
-            searchindex_orm_object = timeline.searchindex
-            opensearch_index_name = searchindex_orm_object.index_name
-
+        index_name_map = self._get_index_name_map(sketch)
+        if not document_ids or not index_name_map:
+            return {}
+
+        datastore = self.datastore
+        searchindex_ids = {}
+        for start in range(0, len(document_ids), self.RESOLVE_CHUNK_SIZE):
+            chunk = document_ids[start : start + self.RESOLVE_CHUNK_SIZE]
             try:
-                count_response = self.datastore.client.count(
-                    index=opensearch_index_name,
-                    body={"query": {"term": {"_id": document_id}}},
+                # pylint: disable=unexpected-keyword-arg
+                response = datastore.client.search(
+                    index=",".join(index_name_map),
+                    body={
+                        "query": {"ids": {"values": chunk}},
+                        "_source": False,
+                        "size": len(chunk),
+                    },
+                    ignore_unavailable=True,
                 )
-
-                if count_response.get("count", 0) > 0:
-                    return searchindex_orm_object.id
-
             except Exception as exception:  # pylint: disable=broad-exception-caught
                 logger.warning(
-                    '%s Error checking event %s in index "%s": %s. '
-                    "Will try other indices.",
+                    "%s Error resolving the indices of %d events in sketch %s: %s",
                     self._log_pretext,
-                    document_id,
-                    opensearch_index_name,
+                    len(chunk),
+                    sketch.id,
                     exception,
                     exc_info=False,
                 )
                 continue
 
-        logger.error(
-            "%s: Event %s was not found in any OpenSearch indices "
-            "associated with active timelines for sketch %s.",
-            self._log_pretext,
-            document_id,
-            sketch.id,
-        )
-        raise ValueError(
-            f"Event (doc_id: {document_id}) could not be located in any of the "
-            "OpenSearch indices linked to the active timelines of "
-            f"sketch {sketch.id}."
-        )
+            for hit in response.get("hits", {}).get("hits", []):
+                searchindex_id = index_name_map.get(hit.get("_index"))
+                if searchindex_id is not None:
+                    searchindex_ids.setdefault(hit.get("_id"), searchindex_id)
+
+        return searchindex_ids
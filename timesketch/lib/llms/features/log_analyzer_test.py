@@ -136,3 +136,49 @@ class TestLogAnalyzerFeature(BaseTest):
         mock_provider.generate_stream_from_logs.assert_called_once()
         _, call_kwargs = mock_provider.generate_stream_from_logs.call_args
         self.assertEqual(call_kwargs.get("prompt"), custom_prompt)
+
+    @mock.patch("timesketch.lib.llms.features.log_analyzer.LogAnalyzer.datastore")
+    def test_process_response_resolves_indices_in_one_query(self, mock_datastore):
+        """Tests that events spread over multiple indices are resolved at once."""
+        self._create_timeline(
+            name="Timeline 2",
+            sketch=self.sketch1,
+            searchindex=self.searchindex2,
+            user=self.user1,
+        )
+        mock_datastore.client.search.return_value = {
+            "hits": {
+                "hits": [
+                    {"_id": "doc_1", "_index": "test"},
+                    {"_id": "doc_2", "_index": "test2"},
+                ]
+            }
+        }
+
+        feature = log_analyzer.LogAnalyzer()
+        result = feature.process_response(
+            llm_response={"record_ids": ["doc_1", "doc_2", "doc_3", "doc_1"]},
+            sketch=self.sketch1,
+        )
+
+        mock_datastore.client.search.assert_called_once()
+        _, call_kwargs = mock_datastore.client.search.call_args
+        self.assertEqual(call_kwargs["index"], "test,test2")
+        self.assertEqual(
+            call_kwargs["body"]["query"]["ids"]["values"], ["doc_1", "doc_2", "doc_3"]
+        )
+        self.assertEqual(result["status"], "success")
+
+        events = {
+            event.document_id: event.searchindex_id
+            for event in log_analyzer.Event.query.filter(
+                log_analyzer.Event.document_id.in_(["doc_1", "doc_2", "doc_3"])
+            )
+        }
+        self.assertEqual(
+            events, {"doc_1": self.searchindex.id, "doc_2": self.searchindex2.id}
+        )
+        self.assertEqual(
+            feature._errors_encountered,  # pylint: disable=protected-access
+            ["Failed to find searchindex for event doc_3"],
+        )
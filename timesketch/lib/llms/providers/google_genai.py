@@ -109,6 +109,13 @@ class GoogleGenAI(interface.LLMProvider):
             logger.error("Error generating content with Google GenAI: %s", e)
             raise ValueError(f"Error generating content: {e}") from e
 
+        usage_metadata = getattr(response, "usage_metadata", None)
+        if usage_metadata is not None:
+            self._set_usage(
+                getattr(usage_metadata, "prompt_token_count", None),
+                getattr(usage_metadata, "candidates_token_count", None),
+            )
+
         if response_schema:
             try:
                 if hasattr(response, "parsed") and response.parsed is not None:
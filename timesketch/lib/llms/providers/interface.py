@@ -14,6 +14,7 @@
 """Interface for LLM providers."""
 
 import string
+import threading
 from typing import Any, Optional
 
 DEFAULT_TEMPERATURE = 0.1
@@ -71,6 +72,29 @@ class LLMProvider:
             "location": location,
         }
         self.config.update(config)
+        self._usage = threading.local()
+
+    @property
+    def last_usage(self) -> dict[str, int]:
+        """Returns the token usage of the last response in this thread.
+
+        Returns:
+            A dictionary with "prompt_tokens" and "response_tokens", empty if
+            the provider does not report usage.
+        """
+        return getattr(self._usage, "value", {})
+
+    def _set_usage(self, prompt_tokens: Optional[int], response_tokens: Optional[int]):
+        """Records the token usage of a response, as reported by the provider.
+
+        Args:
+            prompt_tokens: Number of tokens in the prompt.
+            response_tokens: Number of tokens in the response.
+        """
+        self._usage.value = {
+            "prompt_tokens": prompt_tokens or 0,
+            "response_tokens": response_tokens or 0,
+        }
 
     def prompt_from_template(self, template: str, kwargs: dict) -> str:
         """Format a prompt from a template."""
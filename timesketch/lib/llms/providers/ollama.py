@@ -110,6 +110,9 @@ class Ollama(interface.LLMProvider):
             raise ValueError(f"Error generating text: {response.text}")
 
         response_data = response.json()
+        self._set_usage(
+            response_data.get("prompt_eval_count"), response_data.get("eval_count")
+        )
         text_response = response_data.get("message", {}).get("content", "").strip()
 
         if response_schema:
@@ -0,0 +1,366 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Provider agnostic prompt runner with a disk cache and bounded concurrency.
+
+Responses are cached on disk, keyed on the provider, the model, the
+generation config, the response schema and a hash of the prompt, so that
+re-running a feature on the same events does not send the same prompt to the
+provider again. Independent prompts, e.g. chunks of a large set of events,
+can be sent concurrently with a bounded number of requests in flight.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent import futures
+from typing import Any, Iterable, Optional
+
+import prometheus_client
+
+from timesketch.lib.definitions import METRICS_NAMESPACE
+from timesketch.lib.llms.providers.interface import LLMProvider
+
+logger = logging.getLogger("timesketch.llm.runner")
+
+DEFAULT_CACHE_TTL = 7 * 24 * 60 * 60
+DEFAULT_MAX_CONCURRENCY = 4
+
+# Provider config keys that change the generated response. Everything else,
+# such as credentials, is left out of the cache key.
+GENERATION_CONFIG_KEYS = (
+    "model",
+    "temperature",
+    "top_p",
+    "top_k",
+    "max_output_tokens",
+)
+
+METRICS = {
+    "llm_provider_requests_total": prometheus_client.Counter(
+        "llm_provider_requests_total",
+        "Total number of prompts handled by the prompt runner",
+        ["provider", "cache"],
+        namespace=METRICS_NAMESPACE,
+    ),
+    "llm_provider_errors_total": prometheus_client.Counter(
+        "llm_provider_errors_total",
+        "Total number of prompts that failed in the provider",
+        ["provider"],
+        namespace=METRICS_NAMESPACE,
+    ),
+    "llm_provider_latency_seconds": prometheus_client.Summary(
+        "llm_provider_latency_seconds",
+        "Time taken by the provider to generate a response (in seconds)",
+        ["provider"],
+        namespace=METRICS_NAMESPACE,
+    ),
+    "llm_provider_tokens_total": prometheus_client.Counter(
+        "llm_provider_tokens_total",
+        "Total number of tokens reported by the provider",
+        ["provider", "kind"],
+        namespace=METRICS_NAMESPACE,
+    ),
+}
+
+
+def build_cache_key(
+    provider: LLMProvider, prompt: str, response_schema: Optional[dict] = None
+) -> str:
+    """Returns the cache key for a prompt.
+
+    Args:
+        provider: The LLM provider instance.
+        prompt: The prompt string.
+        response_schema: Optional JSON schema of the response.
+
+    Returns:
+        A string with the cache key.
+    """
+    generation_config = {
+        key: provider.config.get(key) for key in GENERATION_CONFIG_KEYS
+    }
+    normalized = json.dumps(
+        [
+            provider.NAME,
+            generation_config,
+            response_schema,
+            hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Disk cache for LLM responses, shared between processes."""
+
+    def __init__(self, cache_dir: str, ttl: int = DEFAULT_CACHE_TTL):
+        """Initialize the cache.
+
+        Args:
+            cache_dir: Directory to store the cached responses in.
+            ttl: Number of seconds a response is cached.
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def _path(self, key: str) -> str:
+        """Returns the path of the file for a cache key."""
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        """Returns a cached entry, or None if there is none.
+
+        Args:
+            key: Cache key as returned by build_cache_key.
+
+        Returns:
+            A dictionary with the "response", or None.
+        """
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as file_handle:
+                entry = json.load(file_handle)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Unable to read cached LLM response %s: %s", path, e)
+            return None
+
+        if entry.get("created", 0) + self.ttl < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def set(self, key: str, response: Any):
+        """Stores a response in the cache.
+
+        The entry is written to a temporary file first and then moved in
+        place, so concurrent readers never see a partial entry.
+
+        Args:
+            key: Cache key as returned by build_cache_key.
+            response: JSON serializable response of the provider.
+        """
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            file_descriptor, temp_path = tempfile.mkstemp(
+                dir=os.path.dirname(path), suffix=".tmp"
+            )
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as file_handle:
+                json.dump({"created": time.time(), "response": response}, file_handle)
+            os.replace(temp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("Unable to cache LLM response: %s", e)
+
+
+class PromptRunner:
+    """Sends prompts to a provider through the cache, optionally concurrently."""
+
+    def __init__(
+        self,
+        provider: LLMProvider,
+        cache: Optional[ResponseCache] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ):
+        """Initialize the runner.
+
+        Args:
+            provider: The LLM provider instance.
+            cache: Optional ResponseCache, responses are not cached if None.
+            max_concurrency: Maximum number of prompts sent at the same time.
+        """
+        self.provider = provider
+        self.cache = cache
+        self.max_concurrency = max(1, max_concurrency)
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "cache_hits": 0,
+            "errors": 0,
+            "latency_seconds": 0.0,
+            "prompt_tokens": 0,
+            "response_tokens": 0,
+        }
+
+    @property
+    def stats(self) -> dict:
+        """Returns a copy of the counters of this runner."""
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, **values):
+        """Adds values to the counters of this runner."""
+        with self._lock:
+            for key, value in values.items():
+                self._stats[key] += value
+
+    def generate(self, prompt: str, response_schema: Optional[dict] = None) -> Any:
+        """Generates a response, using the cache if possible.
+
+        Args:
+            prompt: The prompt to generate a response for.
+            response_schema: An optional JSON schema to define the expected
+                response format.
+
+        Returns:
+            The response of the provider.
+
+        Raises:
+            Exception: Any error raised by the provider.
+        """
+        provider_name = self.provider.NAME
+        cache_key = None
+        if self.cache:
+            cache_key = build_cache_key(self.provider, prompt, response_schema)
+            entry = self.cache.get(cache_key)
+            if entry is not None:
+                self._count(requests=1, cache_hits=1)
+                METRICS["llm_provider_requests_total"].labels(
+                    provider=provider_name, cache="hit"
+                ).inc()
+                return entry.get("response")
+
+        METRICS["llm_provider_requests_total"].labels(
+            provider=provider_name, cache="miss"
+        ).inc()
+        time_before = time.time()
+        try:
+            response = self.provider.generate(prompt, response_schema=response_schema)
+        except Exception:
+            self._count(requests=1, errors=1)
+            METRICS["llm_provider_errors_total"].labels(provider=provider_name).inc()
+            raise
+        latency = time.time() - time_before
+
+        usage = getattr(self.provider, "last_usage", None) or {}
+        prompt_tokens = int(usage.get("prompt_tokens") or 0)
+        response_tokens = int(usage.get("response_tokens") or 0)
+        self._count(
+            requests=1,
+            latency_seconds=latency,
+            prompt_tokens=prompt_tokens,
+            response_tokens=response_tokens,
+        )
+        METRICS["llm_provider_latency_seconds"].labels(provider=provider_name).observe(
+            latency
+        )
+        METRICS["llm_provider_tokens_total"].labels(
+            provider=provider_name, kind="prompt"
+        ).inc(prompt_tokens)
+        METRICS["llm_provider_tokens_total"].labels(
+            provider=provider_name, kind="response"
+        ).inc(response_tokens)
+
+        if cache_key:
+            self.cache.set(cache_key, response)
+        return response
+
+    def generate_many(
+        self, prompts: Iterable[str], response_schema: Optional[dict] = None
+    ) -> list:
+        """Generates responses for independent prompts concurrently.
+
+        At most max_concurrency prompts are in flight, and prompts are only
+        taken from the iterable when a slot is free, so a generator of
+        prompts is never read ahead of the provider.
+
+        Args:
+            prompts: Iterable of prompts.
+            response_schema: An optional JSON schema to define the expected
+                response format.
+
+        Returns:
+            A list with the responses, in the order of the prompts.
+
+        Raises:
+            Exception: The first error raised by the provider. Prompts that
+                were not sent yet when the error occurred are skipped.
+        """
+        results = []
+        errors = []
+        slots = threading.BoundedSemaphore(self.max_concurrency)
+
+        def _done(future):
+            if future.exception() is not None:
+                errors.append(future.exception())
+            slots.release()
+
+        with futures.ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            for prompt in prompts:
+                slots.acquire()  # pylint: disable=consider-using-with
+                if errors:
+                    slots.release()
+                    break
+                future = pool.submit(self.generate, prompt, response_schema)
+                future.add_done_callback(_done)
+                results.append(future)
+
+        if errors:
+            raise errors[0]
+        return [future.result() for future in results]
+
+
+def get_cache_config(config: dict) -> dict:
+    """Returns the runner settings from the Timesketch configuration.
+
+    The result only holds primitives, so that it can be passed to the
+    subprocesses the LLM calls are made in.
+
+    Args:
+        config: The Flask app configuration.
+
+    Returns:
+        A dictionary with the cache directory, TTL and concurrency.
+    """
+    return {
+        "cache_dir": config.get("LLM_RESPONSE_CACHE_DIR", ""),
+        "cache_ttl": int(config.get("LLM_RESPONSE_CACHE_TTL", DEFAULT_CACHE_TTL)),
+        "max_concurrency": int(
+            config.get("LLM_MAX_CONCURRENT_PROMPTS", DEFAULT_MAX_CONCURRENCY)
+        ),
+    }
+
+
+def create_runner(
+    provider: LLMProvider, cache_config: Optional[dict] = None
+) -> PromptRunner:
+    """Creates a prompt runner for a provider.
+
+    Args:
+        provider: The LLM provider instance.
+        cache_config: Dictionary as returned by get_cache_config. The cache
+            is disabled if it is missing or has no cache directory.
+
+    Returns:
+        A PromptRunner instance.
+    """
+    cache_config = cache_config or {}
+    cache = None
+    if cache_config.get("cache_dir") and cache_config.get("cache_ttl", 0) > 0:
+        cache = ResponseCache(cache_config["cache_dir"], ttl=cache_config["cache_ttl"])
+    return PromptRunner(
+        provider,
+        cache=cache,
+        max_concurrency=cache_config.get("max_concurrency", DEFAULT_MAX_CONCURRENCY),
+    )
@@ -0,0 +1,124 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the LLM prompt runner."""
+
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from timesketch.lib.testlib import BaseTest
+from timesketch.lib.llms.providers import interface
+from timesketch.lib.llms.providers import runner
+
+
+class FakeProvider(interface.LLMProvider):
+    """A local provider that echoes prompts and tracks concurrency."""
+
+    NAME = "fake"
+
+    def __init__(self, config: dict, delay: float = 0.0, **kwargs):
+        super().__init__(config, **kwargs)
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, response_schema=None):
+        with self._lock:
+            self.calls.append(prompt)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        if prompt == "fail":
+            raise ValueError("Provider error")
+        self._set_usage(len(prompt), 2)
+        return {"summary": prompt.upper()}
+
+
+class TestPromptRunner(BaseTest):
+    """Tests for the PromptRunner class."""
+
+    def setUp(self):
+        super().setUp()
+        # The directory is removed by the cleanup below.
+        # pylint: disable-next=consider-using-with
+        self._cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._cache_dir.cleanup)
+
+    def test_cache(self):
+        """Test that identical prompts are only sent once."""
+        provider = FakeProvider({"model": "model"})
+        prompt_runner = runner.create_runner(
+            provider, {"cache_dir": self._cache_dir.name, "cache_ttl": 60}
+        )
+
+        self.assertEqual(prompt_runner.generate("foo"), {"summary": "FOO"})
+        self.assertEqual(prompt_runner.generate("foo"), {"summary": "FOO"})
+        self.assertEqual(provider.calls, ["foo"])
+
+        stats = prompt_runner.stats
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["cache_hits"], 1)
+        self.assertEqual(stats["prompt_tokens"], 3)
+        self.assertEqual(stats["response_tokens"], 2)
+
+        # A different model or schema is a different cache entry.
+        other_provider = FakeProvider({"model": "other"})
+        other_runner = runner.create_runner(
+            other_provider, {"cache_dir": self._cache_dir.name, "cache_ttl": 60}
+        )
+        other_runner.generate("foo")
+        prompt_runner.generate("foo", response_schema={"type": "object"})
+        self.assertEqual(other_provider.calls, ["foo"])
+        self.assertEqual(provider.calls, ["foo", "foo"])
+
+    def test_cache_expiry(self):
+        """Test that expired responses are generated again."""
+        provider = FakeProvider({"model": "model"})
+        prompt_runner = runner.PromptRunner(
+            provider, cache=runner.ResponseCache(self._cache_dir.name, ttl=10)
+        )
+        with mock.patch.object(runner.time, "time", return_value=100):
+            prompt_runner.generate("foo")
+        with mock.patch.object(runner.time, "time", return_value=111):
+            prompt_runner.generate("foo")
+        self.assertEqual(provider.calls, ["foo", "foo"])
+
+    def test_generate_many(self):
+        """Test that prompts run concurrently, bounded and in order."""
+        provider = FakeProvider({"model": "model"}, delay=0.05)
+        prompt_runner = runner.PromptRunner(provider, max_concurrency=2)
+
+        prompts = (f"prompt {number}" for number in range(6))
+        responses = prompt_runner.generate_many(prompts)
+
+        self.assertEqual(
+            [response["summary"] for response in responses],
+            [f"PROMPT {number}" for number in range(6)],
+        )
+        self.assertEqual(provider.max_in_flight, 2)
+
+    def test_generate_many_error(self):
+        """Test that an error stops sending new prompts."""
+        provider = FakeProvider({"model": "model"})
+        prompt_runner = runner.PromptRunner(provider, max_concurrency=1)
+
+        with self.assertRaises(ValueError):
+            prompt_runner.generate_many(["foo", "fail", "bar", "baz"])
+        self.assertNotIn("baz", provider.calls)
+        self.assertEqual(prompt_runner.stats["errors"], 1)
@@ -0,0 +1,252 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Progress channel for status transitions of timelines and analyzers.
+
+Celery workers publish every status transition of a timeline, data source
+or analysis to a Redis stream per sketch. Web clients read the stream from
+the last event they have seen, blocking until new events arrive, instead of
+polling the full state of all tasks and analyzer sessions.
+
+A client first reads the latest event ID, then fetches the current state
+through the regular API once and from then on only receives deltas. The
+stream is capped, a client that falls too far behind gets the "reset" flag
+and should fetch the full state again.
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Optional
+
+from flask import current_app
+
+logger = logging.getLogger("timesketch.progress")
+
+KEY_PREFIX = "timesketch:progress:sketch:"
+
+# Number of events kept per sketch.
+DEFAULT_MAX_EVENTS = 1000
+
+# Number of seconds a stream is kept after its last event.
+DEFAULT_TTL = 86400
+
+# Maximum number of seconds a read blocks waiting for new events.
+DEFAULT_MAX_WAIT = 25
+
+# Maximum number of events returned by a single read.
+MAX_READ_EVENTS = 500
+
+OBJECT_TIMELINE = "timeline"
+OBJECT_DATASOURCE = "datasource"
+OBJECT_ANALYSIS = "analysis"
+OBJECT_SEARCHINDEX = "searchindex"
+
+_CHANNEL = None
+_CHANNEL_LOCK = threading.Lock()
+
+
+def _decode(value) -> str:
+    """Returns a Redis value as a string."""
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    return value
+
+
+def _stream_id_tuple(event_id: str) -> tuple:
+    """Returns a stream ID as a tuple of integers, for comparisons."""
+    milliseconds, _, sequence = event_id.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+
+class ProgressChannel:
+    """Publishes and reads status transitions, backed by Redis streams."""
+
+    def __init__(
+        self,
+        redis_url: str = "",
+        max_events: int = DEFAULT_MAX_EVENTS,
+        ttl: int = DEFAULT_TTL,
+    ):
+        """Initialize the channel.
+
+        Args:
+            redis_url: Redis URL, the channel is disabled if empty.
+            max_events: Number of events kept per sketch.
+            ttl: Number of seconds a stream is kept after its last event.
+        """
+        self._max_events = max_events
+        self._ttl = ttl
+        self._redis = None
+        if redis_url:
+            # pylint: disable=import-outside-toplevel
+            import redis
+
+            self._redis = redis.from_url(redis_url)
+
+    @property
+    def enabled(self) -> bool:
+        """Returns True if progress events are published."""
+        return self._redis is not None
+
+    @staticmethod
+    def _key(sketch_id: int) -> str:
+        """Returns the Redis key of the stream of a sketch."""
+        return f"{KEY_PREFIX}{sketch_id:d}"
+
+    def publish(
+        self,
+        sketch_id: int,
+        object_type: str,
+        object_id: int,
+        status: str,
+        **details,
+    ) -> Optional[str]:
+        """Publishes a status transition.
+
+        This never raises, a failure to publish only delays clients until
+        they fetch the full state again.
+
+        Args:
+            sketch_id: ID of the sketch the object belongs to.
+            object_type: Type of the object, e.g. OBJECT_TIMELINE.
+            object_id: ID of the object.
+            status: The new status of the object.
+            details: Additional JSON serializable fields of the event, e.g.
+                the ID of the analyzer session.
+
+        Returns:
+            The ID of the published event, or None if it was not published.
+        """
+        if not self.enabled or not sketch_id:
+            return None
+
+        event = dict(details)
+        event.update(
+            {
+                "object_type": object_type,
+                "object_id": object_id,
+                "status": status,
+                "timestamp": time.time(),
+            }
+        )
+        key = self._key(sketch_id)
+        try:
+            pipeline = self._redis.pipeline()
+            pipeline.xadd(
+                key,
+                {"event": json.dumps(event, default=str)},
+                maxlen=self._max_events,
+                approximate=True,
+            )
+            pipeline.expire(key, self._ttl)
+            event_id, _ = pipeline.execute()
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("Unable to publish progress of sketch %d: %s", sketch_id, e)
+            return None
+        return _decode(event_id)
+
+    def get_last_event_id(self, sketch_id: int) -> str:
+        """Returns the ID of the latest event of a sketch, "0" if none."""
+        entries = self._redis.xrevrange(self._key(sketch_id), count=1)
+        if not entries:
+            return "0"
+        return _decode(entries[0][0])
+
+    def read(self, sketch_id: int, since: str = "", wait: float = 0) -> dict:
+        """Returns the events of a sketch after an event ID.
+
+        Args:
+            sketch_id: ID of the sketch.
+            since: ID of the last event the client has seen. If empty, no
+                events are returned, only the ID of the latest event.
+            wait: Number of seconds to wait for new events if there are none.
+
+        Returns:
+            A dictionary with the events, the ID of the last event, to use as
+            "since" in the next read, and a "reset" flag that is set if events
+            after "since" were dropped from the stream.
+
+        Raises:
+            ValueError: If "since" is not a valid event ID.
+            RedisError: If the stream can not be read.
+        """
+        if not since:
+            return {
+                "events": [],
+                "last_event_id": self.get_last_event_id(sketch_id),
+                "reset": False,
+            }
+        since_tuple = _stream_id_tuple(since)
+
+        key = self._key(sketch_id)
+        block = int(max(wait, 0) * 1000) or None
+        response = self._redis.xread({key: since}, count=MAX_READ_EVENTS, block=block)
+
+        events = []
+        last_event_id = since
+        for _, entries in response or []:
+            for event_id, fields in entries:
+                event_id = _decode(event_id)
+                data = fields.get(b"event", fields.get("event"))
+                try:
+                    event = json.loads(_decode(data))
+                except (TypeError, ValueError):
+                    continue
+                event["event_id"] = event_id
+                events.append(event)
+                last_event_id = event_id
+
+        reset = False
+        if since_tuple > (0, 0):
+            # The event the client saw last was trimmed from the stream,
+            # events after it may have been trimmed as well.
+            oldest = self._redis.xrange(key, count=1)
+            reset = bool(oldest) and _stream_id_tuple(_decode(oldest[0][0])) > (
+                since_tuple
+            )
+        return {"events": events, "last_event_id": last_event_id, "reset": reset}
+
+
+def get_channel() -> ProgressChannel:
+    """Returns the progress channel configured for this process."""
+    global _CHANNEL  # pylint: disable=global-statement
+    with _CHANNEL_LOCK:
+        if _CHANNEL is None:
+            _CHANNEL = ProgressChannel(
+                redis_url=current_app.config.get("PROGRESS_REDIS_URL", ""),
+                max_events=int(
+                    current_app.config.get("PROGRESS_MAX_EVENTS", DEFAULT_MAX_EVENTS)
+                ),
+                ttl=int(current_app.config.get("PROGRESS_TTL", DEFAULT_TTL)),
+            )
+        return _CHANNEL
+
+
+def publish(sketch_id: int, object_type: str, object_id: int, status: str, **details):
+    """Publishes a status transition on the channel of this process.
+
+    Args:
+        sketch_id: ID of the sketch the object belongs to.
+        object_type: Type of the object, e.g. OBJECT_TIMELINE.
+        object_id: ID of the object.
+        status: The new status of the object.
+        details: Additional JSON serializable fields of the event.
+    """
+    try:
+        channel = get_channel()
+    except Exception as e:  # pylint: disable=broad-except
+        logger.warning("Unable to get the progress channel: %s", e)
+        return
+    channel.publish(sketch_id, object_type, object_id, status, **details)
@@ -0,0 +1,84 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the progress channel."""
+
+import json
+from unittest import mock
+
+from timesketch.lib import progress
+from timesketch.lib.testlib import BaseTest
+
+
+class TestProgressChannel(BaseTest):
+    """Tests for the progress channel."""
+
+    def _get_channel(self):
+        channel = progress.ProgressChannel()
+        # pylint: disable=protected-access
+        channel._redis = mock.Mock()
+        return channel
+
+    def test_disabled(self):
+        """Test that nothing is published without a Redis URL."""
+        channel = progress.ProgressChannel()
+        self.assertFalse(channel.enabled)
+        self.assertIsNone(channel.publish(1, progress.OBJECT_TIMELINE, 2, "ready"))
+
+    def test_publish(self):
+        """Test that transitions are added to the stream of the sketch."""
+        channel = self._get_channel()
+        pipeline = channel._redis.pipeline.return_value  # pylint: disable=W0212
+        pipeline.execute.return_value = [b"1700000000000-0", True]
+
+        event_id = channel.publish(1, progress.OBJECT_ANALYSIS, 2, "DONE", session_id=3)
+        self.assertEqual(event_id, "1700000000000-0")
+        key, fields = pipeline.xadd.call_args.args
+        self.assertEqual(key, "timesketch:progress:sketch:1")
+        event = json.loads(fields["event"])
+        self.assertEqual(event["object_type"], "analysis")
+        self.assertEqual(event["status"], "DONE")
+        self.assertEqual(event["session_id"], 3)
+        pipeline.expire.assert_called_once()
+
+        pipeline.execute.side_effect = Exception("unavailable")
+        self.assertIsNone(channel.publish(1, progress.OBJECT_ANALYSIS, 2, "DONE"))
+
+    def test_read(self):
+        """Test reading the events after an event ID."""
+        channel = self._get_channel()
+        channel._redis.xrevrange.return_value = [  # pylint: disable=W0212
+            (b"5-0", {b"event": b"{}"})
+        ]
+        result = channel.read(1)
+        self.assertEqual(result["last_event_id"], "5-0")
+        self.assertEqual(result["events"], [])
+
+        event = {"object_type": "timeline", "object_id": 2, "status": "ready"}
+        channel._redis.xread.return_value = [  # pylint: disable=W0212
+            (b"key", [(b"6-0", {b"event": json.dumps(event).encode("utf-8")})])
+        ]
+        channel._redis.xrange.return_value = [(b"1-0", {})]  # pylint: disable=W0212
+        result = channel.read(1, since="5-0", wait=10)
+        self.assertEqual(result["last_event_id"], "6-0")
+        self.assertEqual(result["events"][0]["event_id"], "6-0")
+        self.assertEqual(result["events"][0]["status"], "ready")
+        self.assertFalse(result["reset"])
+        channel._redis.xread.assert_called_with(  # pylint: disable=W0212
+            {"timesketch:progress:sketch:1": "5-0"}, count=500, block=10000
+        )
+
+        channel._redis.xrange.return_value = [(b"6-0", {})]  # pylint: disable=W0212
+        self.assertTrue(channel.read(1, since="5-0")["reset"])
+        with self.assertRaises(ValueError):
+            channel.read(1, since="invalid")
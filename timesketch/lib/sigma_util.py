@@ -13,6 +13,9 @@
 # limitations under the License.
 """Timesketch Sigma lib functions."""
 
+import hashlib
+import importlib.metadata
+import json
 import re
 import os
 import logging
@@ -29,22 +32,21 @@ from sigma.backends import elasticsearch as sigma_es
 from sigma.parser import collection as sigma_collection
 from sigma.parser import exceptions as sigma_exceptions
 from sigma.config.exceptions import SigmaConfigParseError
+from timesketch.models import db_session
 from timesketch.models.sigma import SigmaRule
 
 logger = logging.getLogger("timesketch.lib.sigma")
 
 
-def get_sigma_config_file(config_file: Optional[str] = None):
-    """Get a sigma.configuration.SigmaConfiguration object.
+def _get_sigma_config_path(config_file: Optional[str] = None) -> str:
+    """Returns the path to the Sigma config file.
 
     Args:
         config_file: Optional path to a config file
-    Returns:
-        A sigma.configuration.SigmaConfiguration object
+
     Raises:
-        ValueError: If SIGMA_CONFIG is not found in the config file.
-            or the Sigma config file is not readabale.
-        SigmaConfigParseError: If config file could not be parsed.
+        ValueError: If the Sigma config file is not set, missing or not
+            readable.
     """
     if config_file:
         config_file_path = config_file
@@ -65,6 +67,23 @@ def get_sigma_config_file(config_file: Optional[str] = None):
             "read, please check permissions.".format(config_file_path)
         )
 
+    return config_file_path
+
+
+def get_sigma_config_file(config_file: Optional[str] = None):
+    """Get a sigma.configuration.SigmaConfiguration object.
+
+    Args:
+        config_file: Optional path to a config file
+    Returns:
+        A sigma.configuration.SigmaConfiguration object
+    Raises:
+        ValueError: If SIGMA_CONFIG is not found in the config file.
+            or the Sigma config file is not readabale.
+        SigmaConfigParseError: If config file could not be parsed.
+    """
+    config_file_path = _get_sigma_config_path(config_file)
+
     with open(config_file_path, encoding="utf-8") as config_file_read:
         sigma_config_file = config_file_read.read()
 
@@ -77,7 +96,91 @@ def get_sigma_config_file(config_file: Optional[str] = None):
     return sigma_config
 
 
-def enrich_sigma_rule_object(rule: SigmaRule, parse_yaml: bool = False):
+@lru_cache(maxsize=1)
+def _get_sigma_version() -> str:
+    """Returns the version of the installed Sigma library.
+
+    Returns:
+        The version string, or an empty string if it is not known.
+    """
+    try:
+        return importlib.metadata.version("sigmatools")
+    except importlib.metadata.PackageNotFoundError:
+        return ""
+
+
+def get_sigma_config_hash(config_file: Optional[str] = None) -> str:
+    """Returns the SHA256 hash of the Sigma config file and library version.
+
+    The hash is stored with parsed rules, so a change of either the config
+    or the Sigma library that parses the rules invalidates them.
+
+    Args:
+        config_file: Optional path to a config file
+
+    Returns:
+        The hex digest of the config file content and the library version.
+
+    Raises:
+        ValueError: If the Sigma config file is not set, missing or not
+            readable.
+    """
+    with open(_get_sigma_config_path(config_file), "rb") as config_file_read:
+        config_hash = hashlib.sha256(config_file_read.read())
+    config_hash.update(_get_sigma_version().encode("utf-8"))
+    return config_hash.hexdigest()
+
+
+def set_compiled_rule(rule: SigmaRule, parsed_rule: dict, config_hash: str):
+    """Stores a parsed rule on the database model of the rule.
+
+    The caller is responsible for committing the session.
+
+    Args:
+        rule: type SigmaRule.
+        parsed_rule: The rule as returned by parse_sigma_rule_by_text.
+        config_hash: Hash of the Sigma config the rule was parsed with.
+    """
+    rule.compiled_rule = json.dumps(parsed_rule, default=str)
+    rule.compiled_rule_hash = rule.rule_hash
+    rule.compiled_config_hash = config_hash
+
+
+def get_compiled_rule(
+    rule: SigmaRule, config_hash: str, sigma_config: object = None
+) -> dict:
+    """Returns the parsed rule, parsing it only if the stored one is stale.
+
+    The stored rule is used if it was parsed from the same rule text with the
+    same Sigma config. Otherwise the rule is parsed and stored on the model,
+    the caller is responsible for committing the session.
+
+    Args:
+        rule: type SigmaRule.
+        config_hash: Hash of the current Sigma config.
+        sigma_config: Optional Sigma config object used to parse the rule.
+
+    Returns:
+        The parsed rule as returned by parse_sigma_rule_by_text, with values
+        that are not JSON serializable, such as dates, as strings.
+    """
+    if rule.is_compiled(config_hash):
+        try:
+            return json.loads(rule.compiled_rule)
+        except ValueError:
+            logger.warning("Unable to load the parsed Sigma rule %s", rule.rule_uuid)
+
+    parsed_rule = parse_sigma_rule_by_text(rule.rule_yaml, sigma_config=sigma_config)
+    set_compiled_rule(rule, parsed_rule, config_hash)
+    return json.loads(rule.compiled_rule)
+
+
+def enrich_sigma_rule_object(
+    rule: SigmaRule,
+    parse_yaml: bool = False,
+    config_hash: Optional[str] = None,
+    sigma_config: object = None,
+):
     """Helper function: Returns an enriched Sigma object given a SigmaRule.
 
     It will extract the `status`, `created_at` and `updated_at` and make them
@@ -85,8 +188,12 @@ def enrich_sigma_rule_object(rule: SigmaRule, parse_yaml: bool = False):
 
     Args:
         rule: type SigmaRule.
-        parse_yaml: type bool. If set to True, the rule will be parsed from
-            the yaml (slower).
+        parse_yaml: type bool. If set to True, the parsed rule is added. It is
+            only parsed from the yaml (slower) if the rule or the Sigma config
+            changed since it was last parsed.
+        config_hash: Optional hash of the Sigma config, read from the config
+            file if not provided.
+        sigma_config: Optional Sigma config object used to parse the rule.
 
     Returns:
         Enriched Sigma dict.
@@ -97,7 +204,9 @@ def enrich_sigma_rule_object(rule: SigmaRule, parse_yaml: bool = False):
     # that information, so we only parse it if we need it.
 
     if parse_yaml:
-        parsed_rule = parse_sigma_rule_by_text(rule.rule_yaml)
+        if config_hash is None:
+            config_hash = get_sigma_config_hash()
+        parsed_rule = get_compiled_rule(rule, config_hash, sigma_config)
 
     parsed_rule["rule_uuid"] = parsed_rule.get("id", rule.rule_uuid)
     parsed_rule["id"] = parsed_rule.get("id", rule.rule_uuid)
@@ -117,18 +226,45 @@ def enrich_sigma_rule_object(rule: SigmaRule, parse_yaml: bool = False):
 def get_all_sigma_rules(parse_yaml: bool = False):
     """Returns all Sigma rules from the database.
 
+    Parsed rules are stored in the database, keyed by the hash of the rule
+    text and of the Sigma config, so only new or changed rules are parsed.
+
     Args:
-        parse_yaml: type bool. If set to True, the rule will be parsed from
-            the yaml (slower).
+        parse_yaml: type bool. If set to True, the parsed rules are added.
     Returns:
         A array of Sigma rules
 
 
     """
     sigma_rules = []
+    config_hash = None
+    sigma_config = None
+    if parse_yaml:
+        config_hash = get_sigma_config_hash()
 
+    stale_rules = []
     for rule in SigmaRule.query.all():
-        sigma_rules.append(enrich_sigma_rule_object(rule=rule, parse_yaml=parse_yaml))
+        if parse_yaml and not rule.is_compiled(config_hash):
+            # Read the config once for all rules that need to be parsed.
+            if sigma_config is None:
+                sigma_config = get_sigma_config_file()
+            stale_rules.append(rule)
+        sigma_rules.append(
+            enrich_sigma_rule_object(
+                rule=rule,
+                parse_yaml=parse_yaml,
+                config_hash=config_hash,
+                sigma_config=sigma_config,
+            )
+        )
+
+    if stale_rules:
+        try:
+            db_session.add_all(stale_rules)
+            db_session.commit()
+        except Exception as e:  # pylint: disable=broad-except
+            db_session.rollback()
+            logger.warning("Unable to store the parsed Sigma rules: %s", e)
 
     return sigma_rules
 
@@ -14,6 +14,7 @@
 """Tests for sigma_util score."""
 
 import datetime
+from unittest import mock
 
 from sigma.parser import exceptions as sigma_exceptions
 
@@ -151,6 +152,71 @@ class TestSigmaUtilLib(BaseTest):
             rule.get("search_query"),
         )
 
+    def test_get_all_sigma_rules_compiled(self):
+        """Test that parsed rules are stored and only parsed when stale."""
+        rule = self._create_sigma(
+            self.user1,
+            SIGMA_MOCK_RULE_TEST4,
+            "5af54681-df95-4c26-854f-2565e13cfab0",
+            "Login with WMI",
+            "Detection of logins performed with WMI",
+        )
+        config_hash = sigma_util.get_sigma_config_hash()
+        self.assertFalse(rule.is_compiled(config_hash))
+
+        rules = {r["id"]: r for r in sigma_util.get_all_sigma_rules(parse_yaml=True)}
+        parsed_rule = rules["5af54681-df95-4c26-854f-2565e13cfab0"]
+        self.assertIn("WmiPrvSE.exe", parsed_rule["search_query"])
+        self.assertTrue(rule.is_compiled(config_hash))
+
+        with mock.patch.object(
+            sigma_util, "parse_sigma_rule_by_text"
+        ) as mock_parse_rule:
+            rules = {
+                r["id"]: r for r in sigma_util.get_all_sigma_rules(parse_yaml=True)
+            }
+            mock_parse_rule.assert_not_called()
+            self.assertEqual(
+                rules["5af54681-df95-4c26-854f-2565e13cfab0"]["search_query"],
+                parsed_rule["search_query"],
+            )
+
+            # A changed rule or config is parsed again.
+            mock_parse_rule.return_value = {"id": rule.rule_uuid}
+            sigma_util.get_compiled_rule(rule, "other_config_hash")
+            mock_parse_rule.assert_called_once()
+            self.assertTrue(rule.is_compiled("other_config_hash"))
+
+            rule.rule_yaml = SIGMA_MOCK_RULE_TEST4 + "\n"
+            self.assertFalse(rule.is_compiled("other_config_hash"))
+
+    def test_get_compiled_rule_dates(self):
+        """Test that fresh and stored parsed rules hold the same date values."""
+        rule = self._create_sigma(
+            self.user1,
+            SIGMA_MOCK_RULE_TEST4.replace("date: 2019/12/04", "date: 2022-01-10"),
+            "5af54681-df95-4c26-854f-2565e13cfab0",
+            "Login with WMI",
+            "Detection of logins performed with WMI",
+        )
+        config_hash = sigma_util.get_sigma_config_hash()
+        parsed_rule = sigma_util.get_compiled_rule(rule, config_hash)
+        self.assertEqual(parsed_rule["date"], "2022-01-10")
+
+        with mock.patch.object(
+            sigma_util, "parse_sigma_rule_by_text"
+        ) as mock_parse_rule:
+            self.assertEqual(
+                sigma_util.get_compiled_rule(rule, config_hash), parsed_rule
+            )
+            mock_parse_rule.assert_not_called()
+
+    def test_get_sigma_config_hash_version(self):
+        """Test that the config hash changes with the Sigma library version."""
+        config_hash = sigma_util.get_sigma_config_hash()
+        with mock.patch.object(sigma_util, "_get_sigma_version", return_value="0.0.0"):
+            self.assertNotEqual(sigma_util.get_sigma_config_hash(), config_hash)
+
     def test_get_rule_by_text_zmap_rule(self):
         """Test getting sigma rule by text with endswith in detection."""
 
@@ -40,8 +40,17 @@ from timesketch.app import configure_logger
 from timesketch.app import create_celery_app
 from timesketch.lib import datafinder
 from timesketch.lib import errors
+from timesketch.lib import evtx
+from timesketch.lib import field_catalog
+from timesketch.lib import index_placement
+from timesketch.lib import progress
+from timesketch.lib.aggregators import cache as aggregator_cache
+from timesketch.lib.aggregators import runner as aggregator_runner
 from timesketch.lib.analyzers import manager
 from timesketch.lib.analyzers.dfiq_plugins.manager import DFIQAnalyzerManager
+from timesketch.lib.datastores import index_archive
+from timesketch.lib.datastores import index_lifecycle
+from timesketch.lib.datastores import mapping_cache
 from timesketch.lib.datastores.opensearch import OpenSearchDataStore
 from timesketch.lib.definitions import METRICS_NAMESPACE
 from timesketch.lib.utils import read_and_validate_csv
@@ -228,6 +237,14 @@ def _close_index(index_name, data_store, timeline_id):
         )
 
 
+def _to_int(value) -> int:
+    """Returns a value as an integer, or 0 if it is not a number."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
 def _set_timeline_status(timeline_id: int, status: Optional[str] = None):
     """Sets the status for a timeline and its related search index.
 
@@ -282,6 +299,7 @@ def _set_timeline_status(timeline_id: int, status: Optional[str] = None):
     db_session.commit()
 
     sketch_id = timeline.sketch.id if timeline.sketch else 0
+    progress.publish(sketch_id, progress.OBJECT_TIMELINE, timeline.id, status)
 
     logger.debug(
         "Status for timeline (ID: %d) in sketch (ID: %d) set to %s",
@@ -350,6 +368,14 @@ def _set_datasource_status(timeline_id, file_path, status, error_message=None):
                 datasource.set_error_message(error_message)
             db_session.add(timeline)
             db_session.commit()
+            progress.publish(
+                timeline.sketch_id,
+                progress.OBJECT_DATASOURCE,
+                datasource.id,
+                status,
+                timeline_id=timeline_id,
+                error_message=error_message,
+            )
             _set_timeline_status(timeline_id, status)
             return
 
@@ -365,6 +391,63 @@ def _set_datasource_total_events(timeline_id, file_path, total_file_events):
     raise KeyError(f"No datasource find in the timeline with file_path: {file_path}")
 
 
+def _add_evtx_event_data(datastore, index_name, timeline_id):
+    """Adds the EventData fields to the EVTX records of a Plaso timeline.
+
+    Runs while the index still has the ingest settings, so the updates are
+    written before the index is replicated and merged. The index is refreshed
+    first, psort's events are not searchable otherwise. Failures are logged
+    and never fail the indexing task.
+
+    Args:
+        datastore: Instance of OpenSearchDataStore.
+        index_name: Name of the index the timeline is stored in.
+        timeline_id: ID of the timeline.
+    """
+    if not evtx.is_enabled():
+        return
+    try:
+        datastore.client.indices.refresh(index=index_name)
+        evtx.enrich_index(
+            datastore,
+            index_name,
+            timeline_id=timeline_id,
+            fields=evtx.get_enabled_fields(),
+        )
+    except Exception as e:  # pylint: disable=broad-except
+        logger.warning(
+            "Unable to add EventData fields to timeline %s: %s", timeline_id, e
+        )
+
+
+def _update_timeline_field_catalog(timeline_id, catalog):
+    """Merges a field catalog into the catalog stored on a timeline.
+
+    A timeline can have multiple data sources, each of them adds to the
+    catalog. Failures are logged and never fail the indexing task, views
+    fall back to sampling the datastore for timelines without a catalog.
+
+    Args:
+        timeline_id: ID of the timeline.
+        catalog: Instance of field_catalog.FieldCatalog.
+    """
+    try:
+        timeline = Timeline.get_by_id(timeline_id)
+        existing_catalog = timeline.get_field_catalog()
+        if existing_catalog:
+            merged_catalog = field_catalog.FieldCatalog.from_dict(existing_catalog)
+            merged_catalog.merge(catalog)
+            catalog = merged_catalog
+        timeline.set_field_catalog(catalog.to_dict())
+        db_session.add(timeline)
+        db_session.commit()
+    except Exception as e:  # pylint: disable=broad-except
+        db_session.rollback()
+        logger.warning(
+            "Unable to store the field catalog for timeline %s: %s", timeline_id, e
+        )
+
+
 def _get_index_task_class(file_extension):
     """Get correct index task function for the supplied file type.
 
@@ -907,7 +990,9 @@ def run_plaso(
 
     try:
         os_index_name = opensearch.create_index(
-            index_name=index_name, mappings=mappings
+            index_name=index_name,
+            mappings=mappings,
+            settings=index_placement.get_index_settings(index_name),
         )
         if searchindex and os_index_name:
             searchindex.set_status("ready")
@@ -1072,7 +1157,16 @@ def run_plaso(
     if plaso_event_filter:
         cmd.append(plaso_event_filter)
 
+    lifecycle = index_lifecycle.IngestLifecycle(
+        opensearch,
+        index_name,
+        expected_events=total_file_events,
+        owner=run_plaso.request.id,
+    )
+    lifecycle.start()
+
     # Run psort.py
+    ingest_succeeded = False
     try:
         # Prepare the environment for the subprocess. We pass the OpenSearch
         # password via an environment variable to avoid exposing it in the
@@ -1086,6 +1180,8 @@ def run_plaso(
             cmd, stderr=subprocess.STDOUT, encoding="utf-8", env=subprocess_env
         )
         logger.info("Plaso cmd line: %s finish", cmd)
+        ingest_succeeded = True
+        _add_evtx_event_data(opensearch, index_name, timeline_id)
     except subprocess.CalledProcessError as e:
         # Mark the searchindex and timelines as failed and exit the task
         error_msg = f"Psort process failed for {file_path}: {e.output}"
@@ -1093,6 +1189,22 @@ def run_plaso(
         logger.error(error_msg)
         _set_datasource_status(timeline_id, file_path, "fail", error_message=error_msg)
         raise RuntimeError(error_msg) from e
+    finally:
+        # Restore the serving settings before the catalog samples the index.
+        lifecycle.finish(total_file_events if ingest_succeeded else None)
+
+    # Psort added new fields to the index mapping.
+    mapping_cache.invalidate([index_name])
+
+    try:
+        catalog = field_catalog.build_from_datastore(
+            OpenSearchDataStore(), index_name, timeline_id
+        )
+        _update_timeline_field_catalog(timeline_id, catalog)
+    except Exception as e:  # pylint: disable=broad-except
+        logger.warning(
+            "Unable to build the field catalog for timeline %s: %s", timeline_id, e
+        )
 
     # Mark the searchindex and timelines as ready
     _set_datasource_status(timeline_id, file_path, "ready")
@@ -1200,6 +1312,7 @@ def run_csv_jsonl(
     error_msg = ""
     error_count = 0
     unique_keys = set()
+    catalog = field_catalog.FieldCatalog()
     limit_buffer_percentage = float(
         current_app.config.get("OPENSEARCH_MAPPING_BUFFER", 0.1)
     )
@@ -1209,14 +1322,27 @@ def run_csv_jsonl(
 
     searchindex = SearchIndex.query.filter_by(index_name=index_name).first()
 
+    # Events sent by the API client are imported in small chunks, only files
+    # are worth switching the index settings for.
+    lifecycle = index_lifecycle.IngestLifecycle(
+        opensearch,
+        index_name,
+        expected_events=0 if events else _to_int(total_events),
+        owner=run_csv_jsonl.request.id,
+    )
+    ingest_succeeded = False
+
     try:
         os_index_name = opensearch.create_index(
-            index_name=index_name, mappings=mappings
+            index_name=index_name,
+            mappings=mappings,
+            settings=index_placement.get_index_settings(index_name),
         )
         if searchindex and os_index_name:
             searchindex.set_status("ready")
             db_session.add(searchindex)
             db_session.commit()
+        lifecycle.start()
         current_index_mapping_properties = (
             opensearch.client.indices.get_mapping(index=index_name)
             .get(index_name, {})
@@ -1234,11 +1360,15 @@ def run_csv_jsonl(
         except KeyError:
             current_limit = 1000
 
+        evtx_fields = evtx.get_enabled_fields() if evtx.is_enabled() else None
+
         for event in read_and_validate(
             file_handle=file_handle,
             headers_mapping=headers_mapping,
             delimiter=delimiter,
         ):
+            if evtx_fields is not None:
+                evtx.enrich_event(event, evtx_fields)
             unique_keys.update(event.keys())
             # Calculating the new limit. Each unique key is counted twice due to
             # the "keyword" type plus a percentage buffer (default 10%).
@@ -1278,10 +1408,19 @@ def run_csv_jsonl(
                 current_limit = new_limit
 
             opensearch.import_event(index_name, event, timeline_id=timeline_id)
+            catalog.add_event(event)
             final_counter += 1
 
         # Import the remaining events
         results = opensearch.flush_queued_events()
+        mapping_cache.invalidate([index_name])
+
+        catalog.merge_mapping(
+            opensearch.client.indices.get_mapping(index=index_name)
+            .get(index_name, {})
+            .get("mappings", {})
+            .get("properties", {})
+        )
 
         error_container = results.get("error_container", {})
         error_count = len(error_container.get(index_name, {}).get("errors", []))
@@ -1290,6 +1429,7 @@ def run_csv_jsonl(
             index_name=index_name,
             total_count=results.get("total_events", 0),
         )
+        ingest_succeeded = True
 
     except errors.DataIngestionError as e:
         _set_datasource_status(timeline_id, file_path, "fail", error_message=str(e))
@@ -1336,6 +1476,9 @@ def run_csv_jsonl(
             )
         return None
 
+    finally:
+        lifecycle.finish(final_counter if ingest_succeeded else None)
+
     METRICS["worker_events_added"].labels(
         index_name=index_name, timeline_id=timeline_id, source_type=source_type
     ).set(final_counter)
@@ -1357,6 +1500,8 @@ def run_csv_jsonl(
             )
         )
 
+    _update_timeline_field_catalog(timeline_id, catalog)
+
     # Set status to ready when done
     _set_datasource_status(
         timeline_id, file_path, "ready", error_message=str(error_msg)
@@ -1369,6 +1514,246 @@ def run_csv_jsonl(
     return index_name
 
 
+@celery.task(bind=True, track_started=True, base=SqlAlchemyTask)
+def run_explore_aggregation(
+    self,
+    sketch_id: int,
+    indices: list,
+    timeline_ids: Optional[list] = None,
+    aggregator_name: str = "",
+    aggregator_parameters: Optional[dict] = None,
+    aggregation_dsl: Optional[str] = None,
+    cache_key: str = "",
+):
+    """Runs an explore aggregation as a background job.
+
+    While running, the job is in the PROGRESS state with the time it was
+    started, clients poll the aggregation explore API for the result.
+
+    Args:
+        sketch_id: ID of the sketch.
+        indices: List of validated index names.
+        timeline_ids: List of validated timeline IDs.
+        aggregator_name: Name of the aggregator to run.
+        aggregator_parameters: Dictionary with the aggregator parameters.
+        aggregation_dsl: Raw aggregation DSL, used if no aggregator name is
+            provided.
+        cache_key: Optional key to store the result under in the
+            aggregation cache.
+
+    Returns:
+        Dictionary with the sketch ID, "meta" and "objects", or with the sketch
+        ID and an "error" if the aggregation failed.
+    """
+    time_start = time.time()
+    self.update_state(
+        state="PROGRESS", meta={"sketch_id": sketch_id, "started_at": time_start}
+    )
+
+    # Errors are returned with the sketch ID, the explore API only returns
+    # them for jobs of the sketch they were started for.
+    try:
+        if aggregator_name:
+            schema = aggregator_runner.run_aggregator(
+                sketch_id=sketch_id,
+                indices=indices,
+                timeline_ids=timeline_ids,
+                aggregator_name=aggregator_name,
+                aggregator_parameters=aggregator_parameters,
+            )
+        else:
+            schema = aggregator_runner.run_aggregation_dsl(
+                OpenSearchDataStore(), indices, aggregation_dsl, timeline_ids
+            )
+    except Exception as e:  # pylint: disable=broad-except
+        logger.error("Unable to run the aggregation: %s", e, exc_info=True)
+        return {"sketch_id": sketch_id, "error": str(e)}
+    schema["meta"]["total_time"] = time.time() - time_start
+
+    if cache_key:
+        aggregator_cache.get_cache().set(cache_key, schema)
+
+    schema["sketch_id"] = sketch_id
+    return schema
+
+
+@celery.task(bind=True, track_started=True, base=SqlAlchemyTask)
+def run_sketch_export(self, sketch_id: int, username: str):
+    """Exports the content of a sketch to a ZIP file in the export folder.
+
+    The file is written next to its final path and renamed once complete,
+    clients poll the archive export API for the state of the job and then
+    download the file.
+
+    Args:
+        sketch_id: ID of the sketch.
+        username: Name of the user that exports the sketch.
+
+    Returns:
+        Dictionary with the sketch ID, the size of the file and the time the
+        export took, or with the sketch ID and an "error" if the export failed.
+    """
+    # Import here to avoid circular imports.
+    # pylint: disable=import-outside-toplevel
+    from timesketch.api.v1 import export
+
+    time_start = time.time()
+    meta = {"sketch_id": sketch_id, "started_at": time_start}
+    self.update_state(state="PROGRESS", meta=meta)
+
+    def _progress(step):
+        self.update_state(state="PROGRESS", meta=dict(meta, step=step))
+
+    export.remove_expired_exports()
+    sketch = Sketch.get_by_id(sketch_id)
+    export_path = export.get_export_path(sketch_id, self.request.id)
+    partial_path = f"{export_path}.part"
+    try:
+        with open(partial_path, "wb") as fh:
+            export.SketchExporter(sketch, OpenSearchDataStore(), username).export(
+                fh, progress_callback=_progress
+            )
+        os.replace(partial_path, export_path)
+    except Exception as e:  # pylint: disable=broad-except
+        # Errors are returned with the sketch ID, the archive export API only
+        # returns them for jobs of the sketch they were started for.
+        logger.error("Unable to export sketch %d: %s", sketch_id, e, exc_info=True)
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        return {"sketch_id": sketch_id, "error": str(e)}
+
+    return {
+        "sketch_id": sketch_id,
+        "size": os.path.getsize(export_path),
+        "total_time": time.time() - time_start,
+    }
+
+
+@celery.task(track_started=True, base=SqlAlchemyTask)
+def run_archive_indices(sketch_id: int, searchindex_ids: list):
+    """Archives indices to snapshots and deletes them from the cluster.
+
+    An index is skipped if a timeline that uses it was unarchived since the
+    task was started, this is checked again right before the index is
+    deleted. An index that does not exist is skipped as well, e.g. when
+    its restore has not finished yet. If the snapshot fails, the index and
+    its status are kept, so the inconsistency can be found with tsctl.
+
+    Args:
+        sketch_id: ID of the sketch the indices are archived for.
+        searchindex_ids: List of SearchIndex IDs.
+    """
+    datastore = OpenSearchDataStore()
+    for searchindex_id in searchindex_ids:
+        searchindex = SearchIndex.get_by_id(searchindex_id)
+        if not searchindex:
+            continue
+        if not index_archive.can_archive_index(searchindex):
+            logger.info(
+                "Index %s is in use again, it is not archived.",
+                searchindex.index_name,
+            )
+            continue
+
+        progress.publish(
+            sketch_id, progress.OBJECT_SEARCHINDEX, searchindex.id, "archiving"
+        )
+
+        def _can_delete(searchindex=searchindex):
+            # The sketch may have been unarchived while the snapshot was taken.
+            db_session.expire_all()
+            return index_archive.can_archive_index(searchindex)
+
+        try:
+            duration = index_archive.archive_index(
+                datastore, searchindex.index_name, can_delete=_can_delete
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error(
+                "Unable to archive index %s: %s",
+                searchindex.index_name,
+                e,
+                exc_info=True,
+            )
+            progress.publish(
+                sketch_id,
+                progress.OBJECT_SEARCHINDEX,
+                searchindex.id,
+                "fail",
+                error=str(e),
+            )
+            continue
+
+        if duration is None:
+            progress.publish(
+                sketch_id, progress.OBJECT_SEARCHINDEX, searchindex.id, "skipped"
+            )
+            continue
+
+        searchindex.set_status("archived")
+        db_session.commit()
+        progress.publish(
+            sketch_id,
+            progress.OBJECT_SEARCHINDEX,
+            searchindex.id,
+            "archived",
+            duration=duration,
+        )
+
+
+@celery.task(track_started=True, base=SqlAlchemyTask)
+def run_restore_indices(sketch_id: int, searchindex_ids: list):
+    """Restores archived indices from snapshots.
+
+    Archived timelines of unarchived sketches that use a restored index are
+    set to ready. If an index can't be restored, the index and those
+    timelines are set to fail, as when unarchiving a closed index fails.
+
+    Args:
+        sketch_id: ID of the sketch the indices are restored for.
+        searchindex_ids: List of SearchIndex IDs.
+    """
+    datastore = OpenSearchDataStore()
+    for searchindex_id in searchindex_ids:
+        searchindex = SearchIndex.get_by_id(searchindex_id)
+        if not searchindex:
+            continue
+
+        progress.publish(
+            sketch_id, progress.OBJECT_SEARCHINDEX, searchindex.id, "restoring"
+        )
+        status = "ready"
+        details = {}
+        try:
+            details["duration"] = index_archive.restore_index(
+                datastore, searchindex.index_name
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error(
+                "Unable to restore index %s: %s",
+                searchindex.index_name,
+                e,
+                exc_info=True,
+            )
+            status = "fail"
+            details["error"] = str(e)
+
+        searchindex.set_status(status)
+        for timeline in searchindex.timelines:
+            if timeline.get_status.status != "archived":
+                continue
+            if not timeline.sketch or timeline.sketch.get_status.status == "archived":
+                continue
+            timeline.set_status(status)
+            progress.publish(
+                timeline.sketch.id, progress.OBJECT_TIMELINE, timeline.id, status
+            )
+        db_session.commit()
+        progress.publish(
+            sketch_id, progress.OBJECT_SEARCHINDEX, searchindex.id, status, **details
+        )
+
+
 @celery.task(track_started=True)
 def find_data_task(
     rule_name, sketch_id, start_date, end_date, timeline_ids=None, parameters=None
@@ -342,11 +342,26 @@ class MockDataStore:
         """Mock adding a label to an event."""
         return
 
+    # pylint: disable=unused-argument
+    def bulk_label_events(self, sketch_id, user_id, label, action="add", **kwargs):
+        """Mock changing a label on many events."""
+        events = kwargs.get("events") or []
+        return {"total": len(events), "updated": len(events), "noop": 0, "failed": 0}
+
+    def bulk_remove_tags(self, events, tags, **kwargs):
+        """Mock removing tags from many events."""
+        return {"total": len(events), "updated": len(events), "noop": 0, "failed": 0}
+
     # pylint: disable=unused-argument
     def create_index(self, *args, **kwargs):
         """Mock creating an index."""
         return
 
+    # pylint: disable=unused-argument
+    def delete_timeline_events(self, index_name, timeline_id):
+        """Mock deleting the events of a timeline."""
+        return None
+
     def import_event(self, index_name, event=None, event_id=None, flush_interval=None):
         """Mock adding the event to OpenSearch, instead add the event
         to event_store.
@@ -95,6 +95,24 @@ def query_results_to_dataframe(result, sketch):
         pd.DataFrame: a pandas DataFrame with the results from
             the query.
     """
+    lines = query_results_to_lines(result, sketch)
+    data_frame = pandas.DataFrame(lines)
+    del lines
+    return data_frame
+
+
+def query_results_to_lines(result, sketch):
+    """Returns the events of a OpenSearch query result dict as flat dicts.
+
+    Args:
+        result (dict): a dict that contains the response from a
+            OpenSearch datastore search.
+        sketch (timesketch.models.sketch.Sketch): a sketch object.
+
+    Returns:
+        list: a dict per event, with the labels of the sketch in the "label"
+            field and the tags joined to a string.
+    """
     lines = []
     for event in result["hits"]["hits"]:
         line = event["_source"]
@@ -114,9 +132,7 @@ def query_results_to_dataframe(result, sketch):
             pass
 
         lines.append(line)
-    data_frame = pandas.DataFrame(lines)
-    del lines
-    return data_frame
+    return lines
 
 
 def _scrub_special_tags(dict_obj):
@@ -668,8 +684,14 @@ def get_validated_indices(
     Returns:
         Tuple of two items:
           List of indices with those removed that is not in the sketch
-          List of timeline IDs that should be part of the output.
+          List of timeline IDs that should be part of the output. Indices that
+          are shared with other sketches are only searched through the IDs of
+          the timelines of this sketch in them.
     """
+    # Import here to avoid circular imports.
+    # pylint: disable=import-outside-toplevel
+    from timesketch.lib import index_placement
+
     allowed_statuses = ["ready"]
     if include_processing_timelines and current_app.config.get(
         "SEARCH_PROCESSING_TIMELINES", False
@@ -677,9 +699,11 @@ def get_validated_indices(
         allowed_statuses.append("processing")
 
     sketch_structure = {}
+    allowed_timelines = []
     for timeline in sketch.timelines:
         if timeline.get_status.status.lower() not in allowed_statuses:
             continue
+        allowed_timelines.append(timeline)
         index_ = timeline.searchindex.index_name
         sketch_structure.setdefault(index_, [])
         sketch_structure[index_].append(
@@ -691,6 +715,7 @@ def get_validated_indices(
 
     sketch_indices = set(sketch_structure.keys())
     exclude = set(indices) - sketch_indices
+    named_indices = set(indices) & sketch_indices
     timelines = set()
 
     if exclude:
@@ -715,6 +740,8 @@ def get_validated_indices(
                         timelines.add(timeline_id)
                         indices.append(index)
 
+    timelines.update(index_placement.get_timeline_ids(allowed_timelines, named_indices))
+
     return list(set(indices)), list(timelines)
 
 
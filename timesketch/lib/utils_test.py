@@ -55,6 +55,35 @@ class TestUtils(BaseTest):
         test_indices, _ = get_validated_indices(invalid_indices, sketch)
         self.assertFalse("fail" in test_indices)
 
+    def test_get_validated_indices_shared_index(self):
+        """Test that shared indices resolve to the timelines of the sketch."""
+        shared_index = self._create_searchindex(
+            "timesketch_shared_plaso_000001", self.user1
+        )
+        timeline = self._create_timeline(
+            "shared", self.sketch1, shared_index, self.user1
+        )
+        other_timeline = self._create_timeline(
+            "other", self.sketch2, shared_index, self.user1
+        )
+
+        indices, timeline_ids = get_validated_indices(
+            [shared_index.index_name], self.sketch1
+        )
+        self.assertEqual(indices, [shared_index.index_name])
+        self.assertEqual(timeline_ids, [timeline.id])
+
+        indices, timeline_ids = get_validated_indices(
+            [shared_index.index_name], self.sketch2
+        )
+        self.assertEqual(timeline_ids, [other_timeline.id])
+
+        # Index names in a search with a shared index also become timelines.
+        _, timeline_ids = get_validated_indices(
+            ["test", shared_index.index_name], self.sketch1
+        )
+        self.assertEqual(sorted(timeline_ids), sorted([self.timeline.id, timeline.id]))
+
     def test_header_validation(self):
         """Test for Timesketch header validation."""
         mandatory_fields = ["message", "datetime", "fortytwo"]
@@ -0,0 +1,24 @@
+"""Add field catalog to the Timeline model.
+
+Revision ID: 3f9d2c41a7b8
+Revises: 87d24c7252fc
+Create Date: 2026-10-19 09:12:31.402117
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "3f9d2c41a7b8"
+down_revision = "87d24c7252fc"
+
+
+def upgrade():
+    with op.batch_alter_table("timeline", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("field_catalog", sa.UnicodeText(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("timeline", schema=None) as batch_op:
+        batch_op.drop_column("field_catalog")
@@ -0,0 +1,44 @@
+"""Add current status columns to timelines, search indices and analyses.
+
+Revision ID: 5b7e9a1c3d24
+Revises: 3f9d2c41a7b8
+Create Date: 2026-10-19 14:02:47.118305
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "5b7e9a1c3d24"
+down_revision = "3f9d2c41a7b8"
+
+TABLES = ("timeline", "searchindex", "analysis")
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(
+                sa.Column("current_status", sa.Unicode(length=255), nullable=True)
+            )
+            batch_op.create_index(
+                batch_op.f(f"ix_{table}_current_status"),
+                ["current_status"],
+                unique=False,
+            )
+
+        # Objects without a status record report the status "new".
+        op.execute(
+            f"UPDATE {table} SET current_status = COALESCE("
+            f"(SELECT {table}_status.status FROM {table}_status "
+            f"WHERE {table}_status.parent_id = {table}.id "
+            f"ORDER BY {table}_status.id DESC LIMIT 1), 'new')"
+        )
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f"ix_{table}_current_status"))
+            batch_op.drop_column("current_status")
@@ -0,0 +1,32 @@
+"""Add the parsed rule and its cache keys to the SigmaRule model.
+
+Revision ID: 8c2e4f6a1b93
+Revises: 5b7e9a1c3d24
+Create Date: 2026-10-19 16:21:08.530914
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "8c2e4f6a1b93"
+down_revision = "5b7e9a1c3d24"
+
+
+def upgrade():
+    with op.batch_alter_table("sigmarule", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("compiled_rule", sa.UnicodeText(), nullable=True))
+        batch_op.add_column(
+            sa.Column("compiled_rule_hash", sa.Unicode(length=64), nullable=True)
+        )
+        batch_op.add_column(
+            sa.Column("compiled_config_hash", sa.Unicode(length=64), nullable=True)
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("sigmarule", schema=None) as batch_op:
+        batch_op.drop_column("compiled_config_hash")
+        batch_op.drop_column("compiled_rule_hash")
+        batch_op.drop_column("compiled_rule")
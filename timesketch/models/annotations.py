@@ -398,6 +398,9 @@ class StatusMixin:
         If multiple statuses are detected during an update, a warning is logged
         and the state is repaired by replacing them with the new single status.
 
+        Models with a current_status column get the status name stored in it
+        as well, so that they can be filtered on their status in SQL.
+
         Args:
             status: Name of the status (e.g. 'ready', 'processing', 'fail').
         """
@@ -412,6 +415,8 @@ class StatusMixin:
         # Use the relationship to ensure consistency and correct FK handling.
         # This also handles the case where the object is new (self.id is None).
         self.status = [self.Status(user=None, status=status)]
+        if hasattr(type(self), "current_status"):
+            self.current_status = status
         session.commit()
 
     @property
@@ -13,6 +13,8 @@
 # limitations under the License.
 """This module implements the sigma model."""
 
+import hashlib
+
 from sqlalchemy import Column
 from sqlalchemy import ForeignKey
 from sqlalchemy import Integer
@@ -44,3 +46,25 @@ class SigmaRule(
     rule_uuid = Column(Unicode(255), unique=True)
     rule_yaml = Column(UnicodeText())
     user_id = Column(Integer, ForeignKey("user.id"))
+    # The parsed rule in JSON, with the hashes of the rule text and of the
+    # Sigma config it was parsed with.
+    compiled_rule = Column(UnicodeText())
+    compiled_rule_hash = Column(Unicode(64))
+    compiled_config_hash = Column(Unicode(64))
+
+    @property
+    def rule_hash(self):
+        """Returns the SHA256 hash of the rule text."""
+        return hashlib.sha256((self.rule_yaml or "").encode("utf-8")).hexdigest()
+
+    def is_compiled(self, config_hash):
+        """Returns True if the stored parsed rule is up to date.
+
+        Args:
+            config_hash: Hash of the current Sigma config.
+        """
+        return (
+            bool(self.compiled_rule)
+            and self.compiled_config_hash == config_hash
+            and self.compiled_rule_hash == self.rule_hash
+        )
@@ -30,6 +30,8 @@ from sqlalchemy import Unicode
 from sqlalchemy import UnicodeText
 from sqlalchemy import Boolean
 from sqlalchemy import TIMESTAMP
+from sqlalchemy import or_
+from sqlalchemy.orm import contains_eager
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import backref
 from sqlalchemy.orm.collections import attribute_mapped_collection
@@ -211,18 +213,25 @@ class Sketch(AccessControlMixin, LabelMixin, StatusMixin, CommentMixin, BaseMode
         Returns:
             List of instances of timesketch.models.sketch.Timeline
         """
-        _timelines = []
         statuts_exclus = ["processing", "fail", "archived"]
         if current_app.config.get("SEARCH_PROCESSING_TIMELINES", False):
             statuts_exclus.remove("processing")
 
-        for timeline in self.timelines:
-            timeline_status = timeline.get_status.status
-            index_status = timeline.searchindex.get_status.status
-            if (timeline_status or index_status) in statuts_exclus:
-                continue
-            _timelines.append(timeline)
-        return _timelines
+        # The search index of a timeline is loaded in the same query, as
+        # callers need the index name of every active timeline.
+        return (
+            Timeline.query.join(Timeline.searchindex)
+            .options(contains_eager(Timeline.searchindex))
+            .filter(Timeline.sketch_id == self.id)
+            .filter(
+                or_(
+                    Timeline.current_status.is_(None),
+                    Timeline.current_status.notin_(statuts_exclus),
+                )
+            )
+            .order_by(Timeline.id)
+            .all()
+        )
 
     def get_active_analysis_sessions(self):
         """List active analysis sessions.
@@ -230,15 +239,16 @@ class Sketch(AccessControlMixin, LabelMixin, StatusMixin, CommentMixin, BaseMode
         Returns:
             List of instances of timesketch.models.sketch.AnalysisSession
         """
-        active_sessions = []
-        for session in self.analysissessions:
-            for analysis in session.analyses:
-                if analysis.get_status.status in ("PENDING", "STARTED"):
-                    active_sessions.append(session)
-                    # Break early on first running analysis as this is enough
-                    # to mark the session as active.
-                    break
-        return active_sessions
+        return (
+            AnalysisSession.query.filter(AnalysisSession.sketch_id == self.id)
+            .filter(
+                AnalysisSession.analyses.any(
+                    Analysis.current_status.in_(("PENDING", "STARTED"))
+                )
+            )
+            .order_by(AnalysisSession.id)
+            .all()
+        )
 
     @property
     def get_search_templates(self):
@@ -273,6 +283,8 @@ class Timeline(LabelMixin, StatusMixin, CommentMixin, BaseModel):
     user_id = Column(Integer, ForeignKey("user.id"))
     searchindex_id = Column(Integer, ForeignKey("searchindex.id"))
     sketch_id = Column(Integer, ForeignKey("sketch.id"))
+    field_catalog = Column(UnicodeText())
+    current_status = Column(Unicode(255), default="new", index=True)
     analysis = relationship(
         "Analysis", backref="timeline", lazy="select"
     )  # No cascade needed here due to Sketch.analysis cascade
@@ -280,6 +292,33 @@ class Timeline(LabelMixin, StatusMixin, CommentMixin, BaseModel):
         "DataSource", backref="timeline", lazy="select", cascade="all, delete-orphan"
     )
 
+    def get_field_catalog(self):
+        """Get the field catalog that was built when the timeline was indexed.
+
+        Returns:
+            A dictionary as created by timesketch.lib.field_catalog, or None
+            if the timeline has no catalog.
+        """
+        if not self.field_catalog:
+            return None
+        try:
+            return json.loads(self.field_catalog)
+        except ValueError:
+            logger.warning("Unable to parse the field catalog of timeline %d", self.id)
+            return None
+
+    def set_field_catalog(self, catalog):
+        """Set the field catalog of the timeline.
+
+        Args:
+            catalog: A dictionary as created by timesketch.lib.field_catalog,
+                or None to remove the catalog.
+        """
+        if catalog is None:
+            self.field_catalog = None
+            return
+        self.field_catalog = json.dumps(catalog, ensure_ascii=False)
+
 
 class SearchIndex(AccessControlMixin, LabelMixin, StatusMixin, CommentMixin, BaseModel):
     """Implements the SearchIndex model."""
@@ -288,6 +327,7 @@ class SearchIndex(AccessControlMixin, LabelMixin, StatusMixin, CommentMixin, Bas
     description = Column(UnicodeText())
     index_name = Column(Unicode(255))
     user_id = Column(Integer, ForeignKey("user.id"))
+    current_status = Column(Unicode(255), default="new", index=True)
     timelines = relationship(
         "Timeline", backref="searchindex", lazy="dynamic", cascade="all, delete-orphan"
     )
@@ -475,6 +515,7 @@ class Analysis(GenericAttributeMixin, LabelMixin, StatusMixin, CommentMixin, Bas
     question_conclusion_id = Column(
         Integer, ForeignKey("investigativequestionconclusion.id")
     )
+    current_status = Column(Unicode(255), default="new", index=True)
 
 
 class AnalysisSession(LabelMixin, StatusMixin, CommentMixin, BaseModel):
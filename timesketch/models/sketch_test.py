@@ -22,6 +22,7 @@ from timesketch.models.sketch import SearchTemplate
 from timesketch.models.sketch import View
 from timesketch.models.sketch import Story
 from timesketch.models.sketch import SearchHistory
+from timesketch.models.sketch import Analysis
 from timesketch.models.sketch import AnalysisSession
 from timesketch.models.user import User
 from timesketch.models.sketch import Event
@@ -274,3 +275,58 @@ class StoryModelTest(ModelBaseTest):
         self.db_session.delete(user)
         # label_obj is already deleted by cascade, no need to delete it manually
         self.db_session.commit()
+
+    def test_active_timelines_and_analysis_sessions(self):
+        """Test the status filters on timelines and analysis sessions."""
+        user = User(username="status_user", name="Status User")
+        sketch = Sketch(name="Status Sketch", description="Status", user=user)
+        search_index = SearchIndex(
+            name="status_index",
+            description="Status index",
+            index_name="status_index",
+            user=user,
+        )
+        self.db_session.add_all([user, sketch, search_index])
+        self.db_session.commit()
+
+        timelines = {}
+        for status in ("ready", "processing", "fail", "archived", None):
+            timeline = Timeline(
+                name=f"Timeline {status}",
+                description="Status timeline",
+                user=user,
+                sketch=sketch,
+                searchindex=search_index,
+            )
+            self.db_session.add(timeline)
+            if status:
+                timeline.set_status(status)
+            timelines[status] = timeline
+        self.db_session.commit()
+
+        self.assertEqual(timelines["ready"].current_status, "ready")
+        self.assertEqual(timelines[None].current_status, "new")
+        self.assertEqual(sketch.active_timelines, [timelines["ready"], timelines[None]])
+
+        self.app.config["SEARCH_PROCESSING_TIMELINES"] = True
+        self.assertEqual(
+            sketch.active_timelines,
+            [timelines["ready"], timelines["processing"], timelines[None]],
+        )
+
+        sessions = []
+        for status in ("DONE", "STARTED"):
+            session = AnalysisSession(user=user, sketch=sketch)
+            analysis = Analysis(
+                name="analysis",
+                analyzer_name="analyzer",
+                user=user,
+                sketch=sketch,
+                analysissession=session,
+            )
+            self.db_session.add_all([session, analysis])
+            analysis.set_status(status)
+            sessions.append(session)
+        self.db_session.commit()
+
+        self.assertEqual(sketch.get_active_analysis_sessions(), [sessions[1]])
@@ -1018,6 +1018,9 @@ def import_sigma_rules(path):
                 title=sigma_rule.get("title"),
                 user=None,
             )
+            sigma_util.set_compiled_rule(
+                sigma_db_rule, sigma_rule, sigma_util.get_sigma_config_hash()
+            )
             db_session.add(sigma_db_rule)
             db_session.commit()
 
@@ -0,0 +1,121 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Scaling benchmark for the authentication brute force utilities.
+
+Generates synthetic authentication events and times the brute force analysis
+for increasing numbers of events, e.g.:
+
+    python3 utils/benchmark_auth_analyzers.py --sizes 10000 100000 1000000 10000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from timesketch.lib.analyzers.authentication.utils import BruteForceUtils
+from timesketch.lib.analyzers.interface import AnalyzerOutput
+
+
+def generate_auth_dataframe(size: int, seed: int = 42) -> pd.DataFrame:
+    """Generates a dataframe with synthetic authentication events.
+
+    Around 95% of the events are failed logins spread over a few thousand
+    source IPs, the rest are successful logins followed by a disconnection.
+
+    Args:
+        size: Number of events to generate.
+        seed: Seed for the random generator.
+
+    Returns:
+        A dataframe with the columns required by BruteForceUtils.
+    """
+    rng = np.random.default_rng(seed)
+    ip_count = max(10, size // 1000)
+    session_count = max(10, size // 20)
+
+    timestamps = np.sort(rng.integers(1672000000, 1672000000 + 86400 * 30, size))
+    source_ips = rng.integers(0, ip_count, size)
+    sessions = rng.integers(0, session_count, size)
+    outcome = rng.random(size)
+
+    result = np.where(outcome < 0.95, "failure", "success")
+    event_type = np.where(
+        outcome < 0.95,
+        "authentication",
+        np.where(outcome < 0.975, "authentication", "disconnection"),
+    )
+
+    return pd.DataFrame(
+        {
+            "event_id": np.arange(size).astype(str),
+            "timestamp": timestamps,
+            "source_ip": [f"10.0.{ip // 256}.{ip % 256}" for ip in source_ips],
+            "source_port": rng.integers(1024, 65535, size),
+            "username": rng.choice(["root", "admin", "alice", "bob"], size),
+            "domain": "",
+            "authentication_method": "password",
+            "authentication_result": result,
+            "event_type": event_type,
+            "session_id": [f"session-{session}" for session in sessions],
+        }
+    )
+
+
+def run_benchmark(sizes: list) -> None:
+    """Runs the benchmark and prints a table with the results.
+
+    Args:
+        sizes: List with the number of events to benchmark.
+    """
+    print(f"{'events':>12} {'index (s)':>10} {'analysis (s)':>13} {'events/s':>12}")
+    for size in sizes:
+        df = generate_auth_dataframe(size)
+        utils = BruteForceUtils()
+        utils.set_dataframe(df)
+
+        start = time.perf_counter()
+        utils.get_session_dataframe("")
+        index_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        utils.start_bruteforce_analysis(
+            AnalyzerOutput("bench", "bench", "http://localhost", 1, 1)
+        )
+        analysis_time = time.perf_counter() - start
+
+        total = index_time + analysis_time
+        print(
+            f"{size:>12,} {index_time:>10.2f} {analysis_time:>13.2f}"
+            f" {size / total:>12,.0f}"
+        )
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=[10000, 100000, 1000000],
+        help="Number of authentication events to benchmark.",
+    )
+    args = parser.parse_args()
+    run_benchmark(args.sizes)
+
+
+if __name__ == "__main__":
+    main()
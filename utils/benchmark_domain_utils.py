@@ -0,0 +1,89 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Microbenchmark for the domain helpers used by the domain analyzers.
+
+Generates synthetic proxy URLs and times URL parsing, TLD extraction and CDN
+classification, comparing the suffix matcher with a linear endswith scan:
+
+    python3 utils/benchmark_domain_utils.py --urls 1000000 --distinct 50000
+"""
+
+import argparse
+import random
+import string
+import time
+
+from timesketch.lib.analyzers import utils
+
+
+def generate_urls(count: int, distinct: int, seed: int = 42) -> list:
+    """Generates synthetic URLs.
+
+    Args:
+        count: Number of URLs to generate.
+        distinct: Number of distinct host names to use.
+        seed: Seed for the random generator.
+
+    Returns:
+        A list of URLs.
+    """
+    rng = random.Random(seed)
+    cdn_suffixes = list(utils.KNOWN_CDN_DOMAINS)
+    hosts = []
+    for _ in range(distinct):
+        label = "".join(rng.choices(string.ascii_lowercase, k=8))
+        if rng.random() < 0.3:
+            hosts.append(f"{label}{rng.choice(cdn_suffixes)}")
+        else:
+            hosts.append(f"www.{label}.{rng.choice(['com', 'net', 'org', 'is'])}")
+    return [
+        f"https://{rng.choice(hosts)}/path/{i}?q={rng.random()}" for i in range(count)
+    ]
+
+
+def _timed(name: str, function, items: list) -> list:
+    """Runs a function over all items and prints the throughput."""
+    start = time.perf_counter()
+    results = [function(item) for item in items]
+    elapsed = time.perf_counter() - start
+    print(f"{name:<32} {elapsed:>8.2f}s {len(items) / elapsed:>14,.0f}/s")
+    return results
+
+
+def _linear_cdn_provider(domain: str) -> str:
+    """Reference implementation scanning every CDN suffix."""
+    providers = [
+        v for k, v in utils.KNOWN_CDN_DOMAINS.items() if domain.endswith(k.lower())
+    ]
+    return " ".join(set(providers))
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--urls", type=int, default=1000000)
+    parser.add_argument("--distinct", type=int, default=50000)
+    args = parser.parse_args()
+
+    urls = generate_urls(args.urls, args.distinct)
+    domains = _timed("get_domain_from_url", utils.get_domain_from_url, urls)
+    _timed("urlparse", lambda url: utils.urlparse.urlparse(url).netloc, urls)
+    _timed("get_tld_from_domain", utils.get_tld_from_domain, domains)
+    _timed("get_cdn_provider", utils.get_cdn_provider, domains)
+    _timed("get_cdn_provider (uncached)", utils.get_cdn_provider.__wrapped__, domains)
+    _timed("linear endswith scan", _linear_cdn_provider, domains)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Copyright 2026 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Latency benchmark for the wildcard subfield routing of query strings.
+
+Runs leading wildcard query strings against an index of a (large) Plaso
+timeline, once as written and once routed to the wildcard subfields, and
+reports the OpenSearch latency of both, e.g.:
+
+    python3 utils/benchmark_wildcard_routing.py --index <index name> \\
+        --query 'message:*evil*' --query 'filename:*\\.exe*' --runs 5
+"""
+
+import argparse
+import statistics
+import time
+
+from opensearchpy import OpenSearch
+
+from timesketch.lib.datastores import wildcard_routing
+
+
+def get_wildcard_fields(client: OpenSearch, index: str) -> set:
+    """Returns the fields of an index that have a wildcard subfield."""
+    mapping = client.indices.get_mapping(index=index)
+    properties = next(iter(mapping.values()))["mappings"].get("properties", {})
+    return {
+        name
+        for name, field in properties.items()
+        if any(
+            subfield.get("type") == "wildcard"
+            for subfield in field.get("fields", {}).values()
+        )
+    }
+
+
+def run_query(client: OpenSearch, index: str, query_string: str) -> tuple:
+    """Runs a query string and returns the server and client latency."""
+    body = {
+        "query": {"query_string": {"query": query_string, "default_operator": "AND"}},
+        "size": 40,
+        "track_total_hits": True,
+    }
+    start = time.perf_counter()
+    # pylint: disable=unexpected-keyword-arg
+    result = client.search(index=index, body=body, request_cache=False)
+    elapsed = time.perf_counter() - start
+    return result["took"], elapsed * 1000, result["hits"]["total"]["value"]
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--index", required=True)
+    parser.add_argument("--query", action="append", required=True)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    client = OpenSearch([{"host": args.host, "port": args.port}], timeout=300)
+    wildcard_fields = get_wildcard_fields(client, args.index)
+    print(f"{'query':<48} {'took ms':>10} {'p50 ms':>10} {'hits':>10}")
+    for query_string in args.query:
+        routed = wildcard_routing.route_query_string(query_string, wildcard_fields)
+        for name, query in (("original", query_string), ("routed", routed)):
+            timings = [run_query(client, args.index, query) for _ in range(args.runs)]
+            took = statistics.median(timing[0] for timing in timings)
+            latency = statistics.median(timing[1] for timing in timings)
+            label = f"{name}: {query}"[:48]
+            print(f"{label:<48} {took:>10.0f} {latency:>10.1f} {timings[0][2]:>10}")
+
+
+if __name__ == "__main__":
+    main()